@@ -0,0 +1,130 @@
+"""
+程序日志
+
+在标准库 logging 之上统一配置本程序的日志：
+- 记录日志时使用 %s 占位符加参数（log.debug("载入 %s", path)），级别不够时不会格式化
+  消息，也不做任何输出，热点路径上的调试日志几乎没有开销
+- 默认级别 INFO；环境变量 BOILER_LOG_LEVEL=DEBUG 或 set_level() 可以打开逐项的详细输出，
+  无法识别的级别按 INFO 处理并记录一条警告
+- 写入日志目录中的滚动文件（单个文件 2 MB，保留 5 个旧文件）
+- 最近的日志保存在内存的环形缓冲区中，程序内的日志查看器从这里读取
+- 控制台只输出 WARNING 及以上的日志
+"""
+import os
+import sys
+import logging
+import threading
+from collections import deque
+from logging.handlers import RotatingFileHandler
+
+LOGGER_NAME = "boiler"
+LOG_FORMAT = "%(asctime)s %(levelname)s [%(threadName)s] %(name)s: %(message)s"
+LEVELS = ["DEBUG", "INFO", "WARNING", "ERROR"]
+
+_setup_lock = threading.Lock()
+_ring = None
+
+
+def get_logger(name=None):
+    """本程序的日志对象；name 为子模块名，如 "images"、"search" """
+    return logging.getLogger(f"{LOGGER_NAME}.{name}" if name else LOGGER_NAME)
+
+
+def _level_value(level):
+    """级别名称或 logging 常量 -> 整数级别；无法识别时返回 None"""
+    if isinstance(level, int):
+        return level
+    value = logging.getLevelName(str(level).strip().upper())
+    return value if isinstance(value, int) else None
+
+
+class RingBufferHandler(logging.Handler):
+    """把最近的日志保存在内存中
+
+    每条日志只在通过级别检查后格式化一次，保存为 (序号, 时间, 级别, 模块, 消息)。
+    查看器用 since(序号) 取出新增的日志。
+    """
+
+    def __init__(self, capacity=5000):
+        super().__init__()
+        self.capacity = capacity
+        self._records = deque(maxlen=capacity)
+        self._next = 0
+
+    def emit(self, record):
+        try:
+            message = record.getMessage()
+            if record.exc_info:
+                message += "\n" + logging.Formatter().formatException(record.exc_info)
+            self.acquire()
+            try:
+                self._records.append((self._next, record.created, record.levelno, record.name, message))
+                self._next += 1
+            finally:
+                self.release()
+        except Exception:
+            self.handleError(record)
+
+    def since(self, sequence=0, level=logging.NOTSET):
+        """序号不小于 sequence 的日志，返回 (下一个序号, 日志列表)"""
+        self.acquire()
+        try:
+            records = [r for r in self._records if r[0] >= sequence and r[2] >= level]
+            return self._next, records
+        finally:
+            self.release()
+
+    def clear(self):
+        self.acquire()
+        try:
+            self._records.clear()
+        finally:
+            self.release()
+
+
+def setup(log_dir=None, level=None, console_level=logging.WARNING, capacity=5000,
+          max_bytes=2 * 1024 * 1024, backups=5):
+    """配置日志（重复调用时只补充尚未配置的文件输出），返回环形缓冲区"""
+    global _ring
+    logger = get_logger()
+    with _setup_lock:
+        if _ring is None:
+            level = level or os.environ.get("BOILER_LOG_LEVEL", "INFO")
+            value = _level_value(level)
+            logger.setLevel(logging.INFO if value is None else value)
+            logger.propagate = False
+            _ring = RingBufferHandler(capacity)
+            logger.addHandler(_ring)
+            console = logging.StreamHandler(sys.stderr)
+            console.setLevel(console_level)
+            console.setFormatter(logging.Formatter(LOG_FORMAT))
+            logger.addHandler(console)
+            if value is None:
+                logger.warning("无法识别的日志级别 %r，改用 INFO", level)
+        if log_dir and not any(isinstance(h, RotatingFileHandler) for h in logger.handlers):
+            try:
+                os.makedirs(log_dir, exist_ok=True)
+                handler = RotatingFileHandler(os.path.join(log_dir, "boiler.log"), maxBytes=max_bytes,
+                                              backupCount=backups, encoding="utf-8", delay=True)
+                handler.setFormatter(logging.Formatter(LOG_FORMAT))
+                logger.addHandler(handler)
+            except OSError as e:
+                logger.warning("无法创建日志文件 %s: %s", log_dir, e)
+    return _ring
+
+
+def ring_buffer():
+    return _ring if _ring is not None else setup()
+
+
+def set_level(level):
+    """修改日志级别，level 为 "DEBUG"/"INFO"/... 或 logging 常量；无法识别时不修改并记录警告"""
+    value = _level_value(level)
+    if value is None:
+        get_logger().warning("无法识别的日志级别 %r，保持 %s", level, level_name())
+        return
+    get_logger().setLevel(value)
+
+
+def level_name():
+    return logging.getLevelName(get_logger().getEffectiveLevel())
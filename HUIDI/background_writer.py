@@ -0,0 +1,93 @@
+"""
+后台写入线程
+
+所有落盘操作（追加日志、重写快照）都放到一个专用线程中顺序执行，界面线程
+只负责把要写入的数据序列化成不可变的文本后提交，从而不会因为磁盘或网络
+同步目录变慢而卡住。
+
+- 队列有上限：写入跟不上时 submit() 会阻塞，形成背压，而不是无限占用内存
+- 任务按提交顺序执行，日志记录与快照之间的先后关系保持不变
+- flush() 等待队列清空；close() 在程序退出时保证所有已提交的写入完成
+"""
+import atexit
+import queue
+import threading
+
+import app_log
+
+log = app_log.get_logger("store")
+
+_STOP = object()
+
+
+class BackgroundWriter:
+    """带有有界队列的单线程写入器"""
+
+    def __init__(self, maxsize=64, on_result=None):
+        # on_result(ok, label, error) 在写入线程中被调用
+        self.on_result = on_result
+        self._queue = queue.Queue(maxsize=maxsize)
+        self._closed = False
+
+        # 统计信息
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+        self.blocked = 0  # 因队列已满而等待的次数
+
+        self._thread = threading.Thread(target=self._run, name="background-writer", daemon=True)
+        self._thread.start()
+        # 即使窗口没有正常关闭，解释器退出前也要写完已提交的数据
+        atexit.register(self.close)
+
+    def submit(self, label, func, *args):
+        """提交写入任务；参数必须是不会再被修改的数据（如已序列化的文本）"""
+        if self._closed:
+            raise RuntimeError("后台写入器已关闭")
+        self.submitted += 1
+        try:
+            self._queue.put_nowait((label, func, args))
+        except queue.Full:
+            self.blocked += 1
+            self._queue.put((label, func, args))
+
+    def pending(self):
+        """尚未完成的任务数"""
+        return self._queue.unfinished_tasks
+
+    def flush(self):
+        """等待已提交的任务全部完成"""
+        self._queue.join()
+
+    def close(self):
+        """写完所有任务后停止写入线程，可重复调用"""
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put((None, _STOP, ()))
+        self._thread.join()
+
+    def _run(self):
+        while True:
+            label, func, args = self._queue.get()
+            try:
+                if func is _STOP:
+                    return
+                try:
+                    func(*args)
+                    self.completed += 1
+                    self._report(True, label, "")
+                except Exception as e:
+                    self.failed += 1
+                    log.exception("后台写入失败: %s", label)
+                    self._report(False, label, str(e))
+            finally:
+                self._queue.task_done()
+
+    def _report(self, ok, label, error):
+        if self.on_result is None:
+            return
+        try:
+            self.on_result(ok, label, error)
+        except Exception as e:
+            log.exception("写入结果回调失败: %s", e)
@@ -0,0 +1,480 @@
+"""
+可重复的性能测试套件
+
+用固定的随机种子生成接近真实的知识库（多级分类，设备带有内容、标签、技术参数、
+供应商、零部件和图片引用，图片文件按内容寻址写入图片目录），然后不启动界面，
+通过 knowledge_base.KnowledgeBase 依次测量：
+
+- 保存完整快照、启动加载（含节点索引和标签索引）
+- 逐个设备保存、自动保存的连续写入（同几个设备在短时间内被反复保存）、编辑后重新加载
+- 标签索引重建、全文索引建立与搜索、价格索引建立与价格区间查询
+- 采购模块的部件汇总、图片存储检查
+- NDJSON 流式导出与导入（含格式检查）
+
+--mode startup 只比较启动：旧格式（整个 JSON）与拆分格式分别读取数据、建立节点索引和
+标签索引并打开一个设备的耗时。--mode tag-index 比较旧的全量重建（每个标签保存路径列表）
+与标签索引的初次建立和逐次编辑的增量更新，并做一致性检查。
+
+每个规模在单独的临时目录中运行，耗时用 perf_stats.Recorder 统计（次数、p50/p95/p99、最大值），
+结果连同运行环境和生成参数写成 JSON，两次结果可以用 --compare 对比，找出变慢的操作。
+
+用法:
+    python benchmark_suite.py [--mode full|startup|tag-index] [--sizes 1000 10000 100000] [--seed 0]
+                              [--store journal|lazy|sqlite] [--output 结果.json]
+                              [--compare 基准.json] [--threshold 0.2]
+"""
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import platform
+import tempfile
+import argparse
+
+import perf_stats
+import lazy_store
+import ndjson_io
+from blob_store import BlobStore
+from journal_store import JournalStore
+from node_index import NodeIndex
+from tag_index import TagIndex
+from knowledge_base import KnowledgeBase
+
+SUITE_VERSION = 1
+DEFAULT_SIZES = (1000, 10000, 100000)
+# 各模式的默认规模
+MODE_SIZES = {"full": DEFAULT_SIZES, "startup": (10000, 100000), "tag-index": (100000,)}
+
+_SYSTEMS = ["给料", "燃烧", "汽水", "烟风", "除灰", "除尘", "脱硫", "脱硝", "给水", "排污",
+            "吹灰", "点火", "冷却", "润滑", "仪控", "电气"]
+_DEVICES = ["皮带", "给料机", "燃烧器", "点火器", "汽包", "水冷壁", "过热器", "省煤器", "空预器",
+            "引风机", "送风机", "一次风机", "磨煤机", "给水泵", "除渣机", "阀门", "减温器", "吹灰器"]
+_PARTS = ["轴承", "密封圈", "叶轮", "联轴器", "电机", "减速机", "滤网", "喷嘴", "托辊", "法兰",
+          "阀芯", "传感器", "变频器", "链条", "螺栓组"]
+_MATERIALS = ["碳钢", "不锈钢", "合金钢", "铸铁", "橡胶", "陶瓷"]
+_WORDS = ["检查", "润滑", "更换", "磨损", "张力", "温度", "压力", "振动", "泄漏", "清理", "紧固",
+          "校准", "腐蚀", "结焦", "堵塞", "效率", "负荷", "启动", "停机", "巡检", "油位", "间隙"]
+_CURRENCIES = ["CNY"] * 8 + ["USD", "EUR"]
+
+
+def _plan(nodes, depth, fanout):
+    """每一级分类的数量和设备数"""
+    if fanout is None:
+        # 每个最底层分类平均约 25 个设备
+        fanout = max(2, round(max(1, nodes // 25) ** (1 / depth)))
+    levels = []
+    count = 1
+    for _ in range(depth):
+        count *= fanout
+        levels.append(count)
+    while sum(levels) >= nodes and len(levels) > 1:
+        levels.pop()
+    devices = max(0, nodes - sum(levels))
+    return fanout, levels, devices
+
+
+def write_images(images_dir, count, seed=0, min_size=2048, max_size=16384):
+    """生成 count 个内容随机的图片文件并放入内容寻址存储，返回图片名列表"""
+    rng = random.Random(seed)
+    store = BlobStore(images_dir)
+    source_dir = tempfile.mkdtemp()
+    names = []
+    try:
+        for i in range(count):
+            source = os.path.join(source_dir, f"照片{i}.jpg")
+            size = rng.randint(min_size, max_size)
+            with open(source, "wb") as f:
+                # JPEG 文件头 + 随机内容，文件名由内容决定，同一种子得到同一组图片名
+                f.write(b"\xff\xd8\xff\xe0" + rng.getrandbits(8 * size).to_bytes(size, "little"))
+            names.append(store.put(source, move=True))
+    finally:
+        shutil.rmtree(source_dir, ignore_errors=True)
+    return names
+
+
+def _device(rng, number, images, dangling_ratio):
+    def image_list(low, high):
+        refs = []
+        for _ in range(rng.randint(low, high)):
+            if images and rng.random() >= dangling_ratio:
+                refs.append(rng.choice(images))
+            else:
+                # 文件已不存在的引用，图片存储检查应当报告出来
+                refs.append(f"{rng.getrandbits(256):064x}.jpg")
+        return refs
+
+    system = rng.choice(_SYSTEMS)
+    suppliers = []
+    base_price = rng.randint(5, 2000) * 100
+    currency = rng.choice(_CURRENCIES)
+    for _ in range(rng.randint(0, 4)):
+        suppliers.append({
+            "name": f"{rng.choice(_SYSTEMS)}设备厂{rng.randint(1, 300)}",
+            "price": round(base_price * rng.uniform(0.7, 1.4), 2),
+            "lead_time": f"{rng.randint(3, 60)}天",
+            "contact": f"联系人{rng.randint(1, 999)} 138{rng.randint(0, 99999999):08d}",
+            "images": image_list(0, 2),
+        })
+    parts = []
+    for _ in range(rng.randint(0, 5)):
+        parts.append({
+            "name": f"{rng.choice(_PARTS)}{rng.randint(1, 50)}",
+            "description": " ".join(rng.sample(_WORDS, 2)),
+            "principle_images": image_list(0, 1),
+        })
+    return {
+        "content": "，".join(" ".join(rng.sample(_WORDS, 3)) for _ in range(rng.randint(1, 6)))
+                   + f"。编号 {number}",
+        "tags": [f"{system}系统"] + rng.sample(_WORDS, rng.randint(1, 3)),
+        "images": image_list(0, 3),
+        "principle_images": image_list(0, 1),
+        "technical_params": {
+            "型号": f"{rng.choice('ABCDGHMS')}{rng.randint(100, 9999)}",
+            "功率": f"{rng.choice([1.5, 5.5, 11, 22, 45, 90, 160])}kW",
+            "材质": rng.choice(_MATERIALS),
+            "长度": f"{rng.randint(1, 120)}m",
+        },
+        "pricing": {"base_price": base_price, "currency": currency, "suppliers": suppliers},
+        "maintenance": {
+            "cycle": rng.choice(["每周检查", "每月检查", "每季度检查", "每年大修"]),
+            "procedures": "，".join(rng.sample(_WORDS, 4)),
+            "notes": rng.choice(_WORDS),
+        },
+        "parts": parts,
+    }
+
+
+def generate_catalogue(nodes, seed=0, depth=3, fanout=None, images=(), dangling_ratio=0.001):
+    """生成约 nodes 个节点的知识库数据
+
+    depth 级分类，每级 fanout 个子分类（默认按规模选择，使每个最底层分类约有 25 个设备），
+    设备平均分布在最底层分类中；images 为可以引用的图片名，
+    其中约 dangling_ratio 比例的引用指向不存在的文件。
+    """
+    rng = random.Random(seed)
+    fanout, levels, devices = _plan(nodes, depth, fanout)
+    categories = {}
+    current = [categories]
+    for level in range(len(levels)):
+        following = []
+        for container in current:
+            for i in range(fanout):
+                name = f"{_SYSTEMS[i % len(_SYSTEMS)]}系统{i}" if level == 0 else f"{level}级分类{i}"
+                node = container[name] = {"children": {}}
+                following.append(node["children"])
+        current = following
+    for number in range(devices):
+        container = current[number % len(current)]
+        name = f"{_DEVICES[number % len(_DEVICES)]}{number}"
+        container[name] = _device(rng, number, images, dangling_ratio)
+    return {"categories": categories, "tags": {}, "suppliers": {}}
+
+
+def _leaf_paths(kb):
+    return [kb.node_index.path(node_id) for node_id in kb.node_index.leaf_ids()]
+
+
+def _category_paths(kb):
+    return [kb.node_index.path(node_id) for node_id in kb.node_index.all_ids()
+            if kb.node_index.is_category(node_id)]
+
+
+def _open(storage_dir, recorder, name):
+    kb = KnowledgeBase(storage_dir)
+    with recorder.measure(name):
+        kb.load()
+    return kb
+
+
+def run_size(nodes, seed=0, store="journal", depth=3, fanout=None, image_count=None,
+             searches=50, price_queries=100, edits=200, bursts=20, burst_saves=50):
+    """在临时目录中按一种规模运行全部操作，返回该规模的结果字典"""
+    recorder = perf_stats.Recorder()
+    rng = random.Random(seed + 1)
+    root = tempfile.mkdtemp()
+    storage_dir = os.path.join(root, "锅炉系统文件")
+    counters = {}
+    try:
+        kb = KnowledgeBase(storage_dir)
+        kb.ensure_directories()
+        if image_count is None:
+            image_count = min(5000, max(20, nodes // 20))
+        with recorder.measure("generate.images"):
+            images = write_images(kb.images_dir, image_count, seed)
+        with recorder.measure("generate.catalogue"):
+            data = generate_catalogue(nodes, seed, depth, fanout, images)
+
+        # 保存完整快照，需要时转换为拆分格式或 SQLite，之后的加载都使用该存储
+        kb.replace_data(data)
+        with recorder.measure("save.snapshot"):
+            kb.save()
+            kb.writer.flush()
+        kb.close()
+        if store == "lazy":
+            with recorder.measure("store.convert"):
+                lazy_store.convert_json(kb.data_file)
+        elif store == "sqlite":
+            import sqlite_store
+            with recorder.measure("store.convert"):
+                sqlite_store.migrate_json(kb.data_file)
+
+        kb = _open(storage_dir, recorder, "load")
+        leaves = _leaf_paths(kb)
+        category_paths = _category_paths(kb)
+        counters.update(nodes=len(kb.node_index), devices=len(leaves), categories=len(category_paths),
+                        images=len(images), store=type(kb.store).__name__)
+
+        for _ in range(5):
+            with recorder.measure("tag_index.rebuild"):
+                kb.update_tag_index()
+
+        with recorder.measure("search_index.build"):
+            kb.ensure_search_index()
+        queries = [rng.choice(_WORDS) for _ in range(searches // 2)]
+        queries += [" ".join(rng.sample(_WORDS, 2)) for _ in range(searches // 4)]
+        queries += [rng.choice(leaves)[-1] for _ in range(searches - len(queries) - 1)] + ["不存在的词"]
+        hits = 0
+        for query in queries:
+            with recorder.measure("search.query"):
+                hits += len(kb.search(query, limit=50))
+        counters["search_hits"] = hits
+
+        with recorder.measure("price_index.build"):
+            kb.ensure_price_index()
+        offers = 0
+        for i in range(price_queries):
+            low = rng.randint(5, 1500) * 100
+            high = low + rng.randint(1, 50) * 100
+            with recorder.measure("price.query"):
+                total, results = kb.price_query(low, high, offset=(i % 3) * 100, limit=100,
+                                                descending=bool(i % 2))
+            offers += total
+        for path in rng.sample(leaves, min(len(leaves), price_queries)):
+            with recorder.measure("price.product_offers"):
+                kb.product_offers(path, 1000, None)
+        counters["price_offers"] = offers
+
+        # 逐个设备保存（搜索索引和价格索引已建立，随保存增量更新）
+        for path in rng.sample(leaves, min(len(leaves), edits)):
+            node = kb.get_data_by_path(path)
+            node["content"] += " 已检修"
+            node["tags"].append("已检修")
+            kb.update_node_tags(path)
+            with recorder.measure("save.node"):
+                kb.save(path)
+        with recorder.measure("save.node_flush"):
+            kb.writer.flush()
+
+        # 自动保存的连续写入：几个设备在短时间内被反复保存，不等待写入完成
+        blocked = kb.writer.blocked
+        for _ in range(bursts):
+            targets = rng.sample(leaves, min(len(leaves), 5))
+            with recorder.measure("autosave.burst"):
+                for i in range(burst_saves):
+                    path = targets[i % len(targets)]
+                    kb.get_data_by_path(path)["maintenance"]["notes"] += "。"
+                    with recorder.measure("autosave.save"):
+                        kb.save(path)
+                kb.writer.flush()
+        counters["writer_blocked"] = kb.writer.blocked - blocked
+
+        # 采购模块：选中分类后汇总其下设备的部件和单价
+        parts = 0
+        amount = 0.0
+        for path in rng.sample(category_paths, min(len(category_paths), 200)) + rng.sample(leaves, min(len(leaves), 200)):
+            with recorder.measure("procurement.aggregate"):
+                lines = kb.procurement_parts(path)
+                amount += sum(float(line["unit_price"] or 0) for line in lines)
+            parts += len(lines)
+        counters["procurement_parts"] = parts
+        counters["procurement_amount"] = round(amount, 2)
+
+        with recorder.measure("images.check"):
+            report = kb.check_images()
+        counters.update(image_files=report.files, image_references=report.references,
+                        dangling_references=len(report.dangling), orphan_files=len(report.orphans))
+
+        export_path = os.path.join(root, "export.ndjson")
+        with recorder.measure("ndjson.export"):
+            counters["exported_nodes"] = ndjson_io.export_ndjson(kb.system_data, export_path)
+        with recorder.measure("ndjson.import"):
+            imported = ndjson_io.import_ndjson(export_path, validate=True)
+        counters["imported_nodes"] = ndjson_io.count_nodes(imported["categories"])
+        kb.close()
+
+        # 编辑后重新加载（重放增量日志）
+        kb = _open(storage_dir, recorder, "load.after_edits")
+        counters["reloaded_nodes"] = len(kb.node_index)
+        kb.close()
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+    return {"nodes": nodes, "counters": counters, "operations": recorder.snapshot()}
+
+
+def _startup(store, categories_of):
+    """读取数据、建立节点索引和标签索引并打开第一个设备（与程序启动时的顺序相同）"""
+    data = store.load()
+    node_index = NodeIndex()
+    node_index.rebuild(categories_of(data))
+    TagIndex().rebuild(node_index)
+    node_index.node(node_index.leaf_ids()[0]).get("content")
+    return len(node_index)
+
+
+def run_startup(nodes, seed=0, repeats=3, **options):
+    """比较旧格式（整个 JSON）与拆分格式的启动耗时，返回该规模的结果字典"""
+    recorder = perf_stats.Recorder()
+    root = tempfile.mkdtemp()
+    json_path = os.path.join(root, "system_data.json")
+    counters = {}
+    try:
+        with recorder.measure("generate.catalogue"):
+            data = generate_catalogue(nodes, seed, options.get("depth", 3), options.get("fanout"))
+        JournalStore(json_path).write_snapshot(data)
+        with recorder.measure("store.convert"):
+            skeleton_path = lazy_store.convert_json(json_path)
+        del data
+
+        for _ in range(repeats):
+            with recorder.measure("startup.json"):
+                counters["nodes"] = _startup(JournalStore(json_path), lambda loaded: loaded["categories"])
+            store = lazy_store.LazyStore(skeleton_path)
+            with recorder.measure("startup.lazy"):
+                _startup(store, lambda loaded: loaded["categories"])
+            store.close()
+
+        operations = recorder.snapshot()
+        counters.update(json_bytes=os.path.getsize(json_path),
+                        skeleton_bytes=os.path.getsize(skeleton_path),
+                        speedup=round(operations["startup.json"]["p50_ms"]
+                                      / operations["startup.lazy"]["p50_ms"], 2))
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+    return {"nodes": nodes, "counters": counters, "operations": recorder.snapshot()}
+
+
+def _legacy_tag_index(categories, path, index):
+    """旧的 build_tag_index：遍历整棵树，每个标签保存完整路径列表"""
+    for name, info in categories.items():
+        current_path = path + [name]
+        if isinstance(info, dict) and "children" in info:
+            _legacy_tag_index(info["children"], current_path, index)
+        else:
+            for tag in info.get("tags", []):
+                index.setdefault(tag, []).append(current_path)
+    return index
+
+
+def run_tag_index(nodes, seed=0, edits=1000, repeats=5, **options):
+    """比较标签的全量重建与增量更新，返回该规模的结果字典"""
+    recorder = perf_stats.Recorder()
+    rng = random.Random(seed + 1)
+    with recorder.measure("generate.catalogue"):
+        data = generate_catalogue(nodes, seed, options.get("depth", 3), options.get("fanout"))
+    categories = data["categories"]
+    node_index = NodeIndex()
+    node_index.rebuild(categories)
+    tag_index = TagIndex()
+
+    for _ in range(repeats):
+        with recorder.measure("tag_index.legacy_rebuild"):
+            _legacy_tag_index(categories, [], {})
+        with recorder.measure("tag_index.rebuild"):
+            tag_index.rebuild(node_index)
+
+    leaf_ids = node_index.leaf_ids()
+    for _ in range(edits):
+        node_id = rng.choice(leaf_ids)
+        tags = [rng.choice(_WORDS) for _ in range(3)]
+        node_index.node(node_id)["tags"] = tags
+        with recorder.measure("tag_index.set_tags"):
+            tag_index.set_tags(node_id, tags)
+    with recorder.measure("tag_index.check"):
+        problems = tag_index.check(node_index)
+
+    counters = {"nodes": len(node_index), "devices": len(leaf_ids), "tags": len(tag_index.tags()),
+                "problems": len(problems)}
+    return {"nodes": nodes, "counters": counters, "operations": recorder.snapshot()}
+
+
+MODES = {"full": run_size, "startup": run_startup, "tag-index": run_tag_index}
+
+
+def run(sizes=DEFAULT_SIZES, seed=0, store="journal", mode="full", **options):
+    """按各个规模运行，返回完整结果"""
+    results = {
+        "suite": "boiler-benchmark",
+        "version": SUITE_VERSION,
+        "generated": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "config": dict(options, seed=seed, store=store, mode=mode, sizes=list(sizes)),
+        "runs": [],
+    }
+    for nodes in sizes:
+        start = time.perf_counter()
+        if mode == "full":
+            result = run_size(nodes, seed, store, **options)
+        else:
+            result = MODES[mode](nodes, seed, **options)
+        result["elapsed_s"] = round(time.perf_counter() - start, 3)
+        results["runs"].append(result)
+        print(f"{nodes} 个节点（{result['counters'].get('store', mode)}）: {result['elapsed_s']:.1f}s")
+        for name, stats in result["operations"].items():
+            print(f"  {name:24} {stats['count']:5} 次  p50 {stats['p50_ms']:9.3f}ms  "
+                  f"p95 {stats['p95_ms']:9.3f}ms  最大 {stats['max_ms']:9.3f}ms")
+        if mode != "full":
+            print("  " + "，".join(f"{key} {value}" for key, value in result["counters"].items()))
+    return results
+
+
+def compare(baseline, current, threshold=0.2, min_ms=0.05):
+    """对比两次结果，返回 p50 变慢超过 threshold 的操作 [(节点数, 操作, 基准 ms, 当前 ms), ...]"""
+    previous = {run["nodes"]: run["operations"] for run in baseline.get("runs", [])}
+    regressions = []
+    for run in current.get("runs", []):
+        for name, stats in run["operations"].items():
+            old = previous.get(run["nodes"], {}).get(name)
+            if not old or name.startswith("generate."):
+                continue
+            if stats["p50_ms"] > max(old["p50_ms"] * (1 + threshold), min_ms):
+                regressions.append((run["nodes"], name, old["p50_ms"], stats["p50_ms"]))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="锅炉知识库性能测试")
+    parser.add_argument("--mode", choices=sorted(MODES), default="full", help="测试内容")
+    parser.add_argument("--sizes", type=int, nargs="+", help="节点数（默认按模式选择）")
+    parser.add_argument("--seed", type=int, default=0, help="随机种子")
+    parser.add_argument("--store", choices=["journal", "lazy", "sqlite"], default="journal", help="存储后端")
+    parser.add_argument("--depth", type=int, default=3, help="分类层数")
+    parser.add_argument("--fanout", type=int, default=None, help="每级子分类数（默认按规模选择）")
+    parser.add_argument("--output", default="benchmark_results.json", help="结果 JSON 文件")
+    parser.add_argument("--compare", help="与之对比的基准结果 JSON 文件")
+    parser.add_argument("--threshold", type=float, default=0.2, help="p50 变慢多少算退化（比例）")
+    args = parser.parse_args(argv)
+
+    sizes = args.sizes or MODE_SIZES[args.mode]
+    results = run(sizes, args.seed, args.store, args.mode, depth=args.depth, fanout=args.fanout)
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(results, f, ensure_ascii=False, indent=2)
+    print(f"结果已写入: {args.output}")
+
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare(baseline, results, args.threshold)
+        for nodes, name, old, new in regressions:
+            print(f"变慢: {nodes} 个节点 {name}: p50 {old:.3f}ms -> {new:.3f}ms")
+        if regressions:
+            return 1
+        print("没有发现变慢的操作")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
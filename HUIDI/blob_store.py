@@ -0,0 +1,270 @@
+"""
+内容寻址的图片存储
+
+导入图片时按块读取计算 SHA-256，以 "<哈希><扩展名>" 作为图片名保存在图片目录下
+按哈希前两级分片的子目录中（如 图片/3f/a2/3fa2....jpg）。数据中的图片字段只保存
+这个名称，同一张照片无论关联到多少设备、供应商或零部件都只存一份，重复导入不占
+额外空间。
+
+- 引用计数在第一次删除图片时由数据中的全部引用建立，之后随导入和删除增量维护；
+  计数归零时才删除文件。整体修改数据（删除设备、导入）后调用 invalidate() 重新统计
+- 后台导入中、尚未写入数据的图片用 put(hold=True) 登记，重新统计时也计入，
+  写入数据后 unhold()，放弃导入时 discard()
+- 每张图片可以在旁边保存一个 .json 元数据文件（如 EXIF 信息），随图片一起删除；
+  同一内容以不同文件名重复导入时保留第一次的 original_name，全部文件名记在 original_names 中
+- 可以在多个线程中同时导入
+- 旧版本按时间戳命名、直接放在图片目录中的文件名（以及零部件原理图片的完整路径）
+  仍然可以解析，migrate() 把它们移入存储
+"""
+import os
+import re
+import json
+import hashlib
+import shutil
+import tempfile
+import threading
+from collections import Counter
+
+_BLOB_RE = re.compile(r"[0-9a-f]{64}(\.[0-9a-z]+)?")
+CHUNK_SIZE = 1 << 20
+# 同一种格式的不同写法归为同一个扩展名，内容相同时得到同一个图片名
+_EXTENSIONS = {".jpeg": ".jpg", ".tif": ".tiff"}
+
+
+def is_blob(name):
+    return isinstance(name, str) and _BLOB_RE.fullmatch(name) is not None
+
+
+def blob_path(root, name):
+    """图片名 -> 完整路径；旧版本的文件名和完整路径原样解析"""
+    if is_blob(name):
+        return os.path.join(root, name[:2], name[2:4], name)
+    return name if os.path.isabs(name) else os.path.join(root, name)
+
+
+def file_digest(path):
+    """按块读取文件，返回 SHA-256 十六进制摘要"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _image_lists(node):
+    if not isinstance(node, dict) or "children" in node:
+        return
+    for key in ("images", "principle_images", "supplier_images"):
+        if isinstance(node.get(key), list):
+            yield node[key]
+    pricing = node.get("pricing")
+    suppliers = pricing.get("suppliers") if isinstance(pricing, dict) else None
+    for supplier in suppliers if isinstance(suppliers, list) else []:
+        if isinstance(supplier, dict) and isinstance(supplier.get("images"), list):
+            yield supplier["images"]
+    parts = node.get("parts")
+    for part in parts if isinstance(parts, list) else []:
+        if isinstance(part, dict) and isinstance(part.get("principle_images"), list):
+            yield part["principle_images"]
+
+
+def image_refs(node):
+    """设备的全部图片引用：图片、原理图片、供应商图片和零部件原理图片"""
+    if hasattr(node, "to_plain"):
+        # 按需加载的设备直接读取数据，不占用缓存
+        node = node.to_plain()
+    refs = []
+    for images in _image_lists(node):
+        refs.extend(name for name in images if isinstance(name, str))
+    return refs
+
+
+def map_image_refs(node, func):
+    """用 func(图片名) 的返回值替换设备中的每个图片引用，返回被改动的引用数"""
+    changed = 0
+    for images in _image_lists(node):
+        for i, name in enumerate(images):
+            if isinstance(name, str):
+                new_name = func(name)
+                if new_name != name:
+                    images[i] = new_name
+                    changed += 1
+    return changed
+
+
+def remove_image_refs(node, names):
+    """从设备的各个图片字段中移除 names 中的引用，返回移除的个数"""
+    removed = 0
+    for images in _image_lists(node):
+        kept = [name for name in images if name not in names]
+        removed += len(images) - len(kept)
+        images[:] = kept
+    return removed
+
+
+class BlobStore:
+    """按内容哈希保存图片，带引用计数"""
+
+    def __init__(self, root):
+        self.root = root
+        self.counts = None  # 图片名 -> 引用数；None 表示尚未统计
+        self._held = Counter()  # 后台导入中、尚未写入数据的引用
+        self._lock = threading.Lock()
+
+        # 统计信息
+        self.stored = 0
+        self.deduplicated = 0
+        self.bytes_saved = 0
+
+    def path(self, name):
+        return blob_path(self.root, name)
+
+    def meta_path(self, name):
+        return self.path(name) + ".json"
+
+    def put(self, source_path, move=False, hold=False):
+        """把文件放入存储并登记一个引用，返回图片名
+
+        内容已存在时不写入任何数据。move=True 时移动源文件（迁移旧图片时使用），
+        hold=True 表示引用暂时还不在数据中（后台导入）。
+        """
+        extension = os.path.splitext(source_path)[1].lower()
+        extension = _EXTENSIONS.get(extension, extension)
+        if not re.fullmatch(r"\.[0-9a-z]+", extension):
+            extension = ""
+        name = file_digest(source_path) + extension
+        target = self.path(name)
+        size = os.path.getsize(source_path)
+        if os.path.exists(target):
+            with self._lock:
+                self.deduplicated += 1
+                self.bytes_saved += size
+            if move:
+                os.remove(source_path)
+        else:
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            if move:
+                os.replace(source_path, target)
+            else:
+                # 先复制到同一目录下的临时文件再改名，中途失败不会留下不完整的图片
+                fd, temp_path = tempfile.mkstemp(suffix=".tmp", dir=os.path.dirname(target))
+                os.close(fd)
+                try:
+                    shutil.copyfile(source_path, temp_path)
+                    copied = os.path.getsize(temp_path)
+                    if copied != size:
+                        raise OSError(f"文件大小不匹配: 原始={size}, 复制={copied}")
+                    os.replace(temp_path, target)
+                except BaseException:
+                    if os.path.exists(temp_path):
+                        os.remove(temp_path)
+                    raise
+            with self._lock:
+                self.stored += 1
+        with self._lock:
+            if self.counts is not None:
+                self.counts[name] += 1
+            if hold:
+                self._held[name] += 1
+        return name
+
+    def held(self):
+        """导入中、尚未写入数据的图片名"""
+        with self._lock:
+            return list(self._held)
+
+    def unhold(self, name):
+        """后台导入的引用已写入数据"""
+        with self._lock:
+            self._held[name] -= 1
+            if self._held[name] <= 0:
+                del self._held[name]
+
+    def discard(self, name, references=None):
+        """放弃后台导入的引用（取消导入时），没有其他引用时删除文件"""
+        self.unhold(name)
+        return self.release(name, references)
+
+    def recount(self, refs):
+        """根据数据中的全部引用（加上导入中的引用）重新统计"""
+        counts = Counter(refs)
+        with self._lock:
+            counts.update(self._held)
+            self.counts = counts
+
+    def invalidate(self):
+        with self._lock:
+            self.counts = None
+
+    def ref_count(self, name):
+        with self._lock:
+            return self.counts.get(name, 0) if self.counts is not None else None
+
+    def write_meta(self, name, meta):
+        """保存图片的元数据，与已有的合并
+
+        original_name 保留第一次导入时的文件名，之后导入的不同文件名按顺序追加到 original_names。
+        """
+        with self._lock:
+            merged = self.read_meta(name)
+            names = merged.get("original_names") or ([merged["original_name"]] if "original_name" in merged else [])
+            first = merged.get("original_name")
+            merged.update(meta)
+            if "original_name" in meta:
+                if meta["original_name"] not in names:
+                    names.append(meta["original_name"])
+                if first is not None:
+                    merged["original_name"] = first
+            if names:
+                merged["original_names"] = names
+            with open(self.meta_path(name), "w", encoding="utf-8") as f:
+                json.dump(merged, f, ensure_ascii=False)
+
+    def read_meta(self, name):
+        """图片的元数据；没有时返回空字典"""
+        try:
+            with open(self.meta_path(name), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def release(self, name, references=None):
+        """释放一个引用，计数归零时删除文件，返回是否删除了文件
+
+        引用计数尚未建立时，由 references()（已移除该引用后的全部引用）统计。
+        """
+        if self.counts is None:
+            self.recount(references() if references else ())
+            if self.ref_count(name) > 0:
+                return False
+        else:
+            with self._lock:
+                if self.counts.get(name, 0) > 1:
+                    self.counts[name] -= 1
+                    return False
+                self.counts.pop(name, None)
+        path = self.path(name)
+        if os.path.exists(self.meta_path(name)):
+            os.remove(self.meta_path(name))
+        if not os.path.exists(path):
+            return False
+        os.remove(path)
+        return True
+
+    def migrate(self, name, cache):
+        """旧版本的图片名 -> 图片名
+
+        cache 以旧文件的完整路径为键，保存已经移入存储的文件，同一个文件以文件名
+        和完整路径两种方式引用时得到同一个图片名。
+        """
+        if is_blob(name):
+            return name
+        path = os.path.abspath(self.path(name))
+        if path in cache:
+            return cache[path]
+        if not os.path.isfile(path):
+            return name
+        # 图片目录中的旧文件直接移入存储，其他位置的文件复制
+        inside = os.path.dirname(path) == os.path.abspath(self.root)
+        cache[path] = self.put(path, move=inside)
+        return cache[path]
@@ -0,0 +1,159 @@
+"""
+图片存储检查与孤立文件回收
+
+对图片目录做一次 os.scandir 遍历（按哈希分片的子目录在线程池中并行遍历），
+与数据中的全部图片引用（图片、原理图片、供应商图片、零部件原理图片）做集合比较：
+- 无效引用：引用的文件不存在或为空
+- 孤立文件：没有任何引用的图片、元数据文件以及中断的导入留下的临时文件
+
+check() 只生成报告（相当于试运行），collect() 删除报告中的孤立文件并清理空的分片目录。
+最近修改的文件（默认一小时内）和导入中的图片不算孤立文件，避免与正在进行的导入冲突。
+"""
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import app_log
+from blob_store import blob_path
+
+log = app_log.get_logger("images")
+
+# 图片目录中由程序自己维护、不属于任何图片的文件
+RESERVED_FILES = {"legacy_images.json"}
+
+
+class StoreReport:
+    """一次检查的结果"""
+
+    def __init__(self):
+        self.files = 0
+        self.bytes = 0
+        self.references = 0
+        self.dangling = []      # [(所属设备, 图片名, 原因), ...]
+        self.orphans = []       # [(完整路径, 字节数), ...]
+        self.orphan_bytes = 0
+        self.removed = 0
+        self.removed_bytes = 0
+        self.elapsed = 0.0
+
+    def summary(self):
+        return (f"{self.files} 个文件（{self.bytes / 1e6:.1f} MB），{self.references} 个引用；"
+                f"无效引用 {len(self.dangling)} 个，孤立文件 {len(self.orphans)} 个"
+                f"（{self.orphan_bytes / 1e6:.1f} MB），耗时 {self.elapsed:.2f}s")
+
+
+def _normalize(path):
+    return os.path.normcase(os.path.abspath(path))
+
+
+def _scan_tree(top):
+    """递归遍历目录，返回 [(完整路径, 字节数, 修改时间), ...]"""
+    files = []
+    stack = [top]
+    while stack:
+        folder = stack.pop()
+        try:
+            with os.scandir(folder) as entries:
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):
+                        stack.append(entry.path)
+                    elif entry.is_file(follow_symlinks=False):
+                        stat = entry.stat(follow_symlinks=False)
+                        files.append((entry.path, stat.st_size, stat.st_mtime))
+        except OSError as e:
+            log.warning("无法读取目录 %s: %s", folder, e)
+    return files
+
+
+def scan(root, workers=8):
+    """遍历图片目录，返回 {规范化路径: (完整路径, 字节数, 修改时间)}"""
+    files = {}
+    subdirs = []
+    try:
+        with os.scandir(root) as entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    subdirs.append(entry.path)
+                elif entry.is_file(follow_symlinks=False) and entry.name not in RESERVED_FILES:
+                    stat = entry.stat(follow_symlinks=False)
+                    files[_normalize(entry.path)] = (entry.path, stat.st_size, stat.st_mtime)
+    except OSError as e:
+        log.warning("无法读取图片目录 %s: %s", root, e)
+        return files
+    # 分片目录之间没有关系，并行遍历（目录读取不持有 GIL）
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for found in pool.map(_scan_tree, subdirs):
+            for path, size, mtime in found:
+                files[_normalize(path)] = (path, size, mtime)
+    return files
+
+
+def check(root, refs, keep=(), min_age=3600, workers=8):
+    """生成检查报告（不做任何修改）
+
+    refs 为 [(所属设备, 图片名), ...]；keep 为不能回收的图片名（如导入中的图片）。
+    """
+    started = time.perf_counter()
+    report = StoreReport()
+    files = scan(root, workers)
+    report.files = len(files)
+    report.bytes = sum(size for _, size, _ in files.values())
+
+    referenced = set()
+    for owner, name in refs:
+        report.references += 1
+        path = _normalize(blob_path(root, name))
+        referenced.add(path)
+        entry = files.get(path)
+        if entry is None and not path.startswith(_normalize(root) + os.sep):
+            # 图片目录以外的旧版本完整路径，单独检查
+            try:
+                size = os.path.getsize(path)
+                entry = (path, size, 0)
+            except OSError:
+                entry = None
+        if entry is None:
+            report.dangling.append((owner, name, "文件不存在"))
+        elif entry[1] == 0:
+            report.dangling.append((owner, name, "文件为空"))
+    for name in keep:
+        referenced.add(_normalize(blob_path(root, name)))
+
+    cutoff = time.time() - min_age
+    for key, (path, size, mtime) in files.items():
+        if key in referenced:
+            continue
+        if key.endswith(".json") and key[:-5] in referenced:
+            # 被引用图片的元数据
+            continue
+        if mtime > cutoff:
+            continue
+        report.orphans.append((path, size))
+        report.orphan_bytes += size
+    report.orphans.sort()
+    report.elapsed = time.perf_counter() - started
+    return report
+
+
+def collect(root, report):
+    """删除报告中的孤立文件，并移除空的分片目录"""
+    folders = set()
+    for path, size in report.orphans:
+        try:
+            os.remove(path)
+            report.removed += 1
+            report.removed_bytes += size
+            folders.add(os.path.dirname(path))
+        except OSError as e:
+            log.error("删除孤立文件失败 %s: %s", path, e)
+    root = os.path.abspath(root)
+    for folder in sorted(folders, key=len, reverse=True):
+        # 从最深的目录开始向上删除空目录，不删除图片目录本身
+        folder = os.path.abspath(folder)
+        while folder != root and folder.startswith(root + os.sep):
+            try:
+                os.rmdir(folder)
+            except OSError:
+                break
+            folder = os.path.dirname(folder)
+    return report
@@ -0,0 +1,198 @@
+"""
+批量导入图片
+
+一批图片在后台线程中导入，每张图片在线程池中完成：
+- 存入内容寻址存储（按块计算哈希、复制并核对大小，相同内容不重复写入）
+- 读取 JPEG 的 EXIF 信息（拍摄时间、相机、方向、尺寸），与原文件名一起保存为
+  图片的元数据
+- 生成缩略图（由调用方提供的 thumbnail(完整路径) 完成，例如预先填充缩略图缓存）
+
+导入中的图片以 hold=True 登记在存储中，全部完成后由调用方一次性写入数据，
+然后对成功的图片调用 store.unhold()；取消或放弃时调用 store.discard()。
+"""
+import os
+import struct
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import app_log
+
+log = app_log.get_logger("images")
+
+# EXIF 标签 -> 名称
+_EXIF_TAGS = {
+    0x010F: "make",
+    0x0110: "model",
+    0x0112: "orientation",
+    0x0132: "datetime",
+    0x9003: "taken",
+    0xA002: "width",
+    0xA003: "height",
+}
+_EXIF_POINTER = 0x8769
+_TYPE_SIZES = {1: 1, 2: 1, 3: 2, 4: 4, 7: 1}
+
+
+def read_exif(path):
+    """读取 JPEG 文件的常用 EXIF 信息，返回字典；没有 EXIF 或格式不支持时返回空字典"""
+    try:
+        with open(path, "rb") as f:
+            if f.read(2) != b"\xff\xd8":
+                return {}
+            while True:
+                marker = f.read(2)
+                if len(marker) < 2 or marker[0] != 0xFF or marker[1] in (0xD9, 0xDA):
+                    return {}
+                length = struct.unpack(">H", f.read(2))[0]
+                if marker[1] == 0xE1:
+                    segment = f.read(length - 2)
+                    if segment.startswith(b"Exif\x00\x00"):
+                        return _summarize(_parse_tiff(segment[6:]))
+                else:
+                    f.seek(length - 2, 1)
+    except (OSError, struct.error):
+        return {}
+
+
+def _parse_tiff(data):
+    endian = {b"II": "<", b"MM": ">"}.get(data[:2])
+    if endian is None:
+        return {}
+    tags = {}
+    try:
+        _read_ifd(data, endian, struct.unpack(endian + "I", data[4:8])[0], tags, True)
+    except (struct.error, IndexError, ValueError):
+        pass
+    return tags
+
+
+def _read_ifd(data, endian, offset, tags, follow_exif):
+    count = struct.unpack(endian + "H", data[offset:offset + 2])[0]
+    for i in range(count):
+        entry = data[offset + 2 + i * 12:offset + 14 + i * 12]
+        if len(entry) < 12:
+            break
+        tag, kind, n = struct.unpack(endian + "HHI", entry[:8])
+        if tag == _EXIF_POINTER and follow_exif:
+            _read_ifd(data, endian, struct.unpack(endian + "I", entry[8:12])[0], tags, False)
+            continue
+        name = _EXIF_TAGS.get(tag)
+        size = _TYPE_SIZES.get(kind)
+        if name is None or size is None:
+            continue
+        if size * n <= 4:
+            raw = entry[8:8 + size * n]
+        else:
+            pointer = struct.unpack(endian + "I", entry[8:12])[0]
+            raw = data[pointer:pointer + size * n]
+        if kind == 2:
+            tags[name] = raw.split(b"\x00", 1)[0].decode("ascii", "replace").strip()
+        elif kind == 3:
+            tags[name] = struct.unpack(endian + "H", raw[:2])[0]
+        elif kind == 4:
+            tags[name] = struct.unpack(endian + "I", raw[:4])[0]
+
+
+def _summarize(tags):
+    info = {}
+    taken = tags.get("taken") or tags.get("datetime")
+    if taken:
+        info["taken"] = taken
+    camera = f"{tags.get('make', '')} {tags.get('model', '')}".strip()
+    if camera:
+        info["camera"] = camera
+    for key in ("orientation", "width", "height"):
+        if tags.get(key):
+            info[key] = tags[key]
+    return info
+
+
+class ImageImportJob:
+    """一批图片的后台导入任务
+
+    on_progress(已完成数, 总数, 源文件路径) 和 on_finished(任务) 都在后台线程中调用。
+    结果保存在 results 中，顺序与 paths 相同，每项为
+    {"source": 源文件, "name": 图片名或 None, "error": 错误说明或 None, "meta": 元数据}。
+    """
+
+    def __init__(self, store, paths, on_progress=None, on_finished=None, thumbnail=None, workers=None):
+        self.store = store
+        self.paths = list(paths)
+        self.on_progress = on_progress
+        self.on_finished = on_finished
+        self.thumbnail = thumbnail
+        self.workers = workers or min(8, (os.cpu_count() or 2) + 2)
+        self.results = [None] * len(self.paths)
+        self.elapsed = 0.0
+        self._cancelled = threading.Event()
+        self._done = 0
+        self._lock = threading.Lock()
+        self._thread = threading.Thread(target=self._run, name="image-import", daemon=True)
+
+    @property
+    def cancelled(self):
+        return self._cancelled.is_set()
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def cancel(self):
+        """尚未开始的图片不再导入；已存入的图片由调用方放弃"""
+        self._cancelled.set()
+
+    def wait(self, timeout=None):
+        self._thread.join(timeout)
+        return not self._thread.is_alive()
+
+    def imported(self):
+        """成功导入的图片名（按源文件顺序）"""
+        return [result["name"] for result in self.results if result and result["name"]]
+
+    def failures(self):
+        return [result for result in self.results if result and result["error"] and not self.cancelled]
+
+    def _run(self):
+        started = time.perf_counter()
+        try:
+            with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="image-import") as pool:
+                for i, path in enumerate(self.paths):
+                    pool.submit(self._import_one, i, path)
+        except Exception:
+            log.exception("图片导入失败")
+        self.elapsed = time.perf_counter() - started
+        if self.on_finished:
+            try:
+                self.on_finished(self)
+            except Exception as e:
+                log.exception("导入完成回调失败: %s", e)
+
+    def _import_one(self, i, path):
+        result = {"source": path, "name": None, "error": None, "meta": {}}
+        try:
+            if self.cancelled:
+                result["error"] = "已取消"
+            elif not os.access(path, os.R_OK):
+                result["error"] = "文件不存在或无读取权限"
+            else:
+                name = self.store.put(path, hold=True)
+                result["name"] = name
+                meta = read_exif(path)
+                meta["original_name"] = os.path.basename(path)
+                meta["bytes"] = os.path.getsize(path)
+                self.store.write_meta(name, meta)
+                result["meta"] = meta
+                if self.thumbnail:
+                    self.thumbnail(self.store.path(name))
+        except Exception as e:
+            result["error"] = str(e)
+        self.results[i] = result
+        with self._lock:
+            self._done += 1
+            done = self._done
+        if self.on_progress:
+            try:
+                self.on_progress(done, len(self.paths), path)
+            except Exception as e:
+                log.exception("导入进度回调失败: %s", e)
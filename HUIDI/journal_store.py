@@ -0,0 +1,237 @@
+"""
+增量日志存储引擎
+
+system_data 以 "快照 + 预写日志" 的形式保存在数据目录中：
+
+- 快照: system_data.json，格式与旧版完全相同，旧数据文件可直接读取
+- 日志: system_data.journal，每行一条 JSON 变更记录，只记录被修改的节点
+
+每次编辑只向日志追加一条记录，写入量与编辑大小成正比，而不是与整个
+知识库的大小成正比。日志超过阈值后在后台线程中合并进快照。
+
+变更记录中的 path 与 BoilerKnowledge.get_data_by_path 使用的路径一致，
+即 system_data["categories"] 下按名称逐级定位的列表。所有记录都是幂等的，
+即使快照写入后、日志清空前程序中断，重放也不会破坏数据。
+"""
+import os
+import json
+import threading
+
+import app_log
+
+log = app_log.get_logger("store")
+
+
+def resolve_parent(categories, path):
+    """根据路径返回目标节点所在的父级字典（categories 或某个分类的 children）"""
+    current = categories
+    for name in path[:-1]:
+        node = current.get(name)
+        if not isinstance(node, dict) or "children" not in node:
+            return None
+        current = node["children"]
+    return current
+
+
+def apply_record(system_data, record):
+    """把一条变更记录应用到 system_data 上"""
+    op = record.get("op")
+    categories = system_data.setdefault("categories", {})
+    path = record.get("path") or []
+    if not path:
+        return
+
+    parent = resolve_parent(categories, path)
+    if parent is None:
+        return
+    name = path[-1]
+
+    if op == "set":
+        parent[name] = record["value"]
+    elif op == "delete":
+        parent.pop(name, None)
+    elif op == "rename":
+        new_name = record["new_name"]
+        if name in parent:
+            parent[new_name] = parent.pop(name)
+
+
+class JournalStore:
+    """快照 + 预写日志存储"""
+
+    def __init__(self, snapshot_path, compact_threshold=2 * 1024 * 1024, indent=2):
+        self.snapshot_path = snapshot_path
+        # 快照的缩进；只给程序读取的文件可以设为 None，体积更小、读取更快
+        self.indent = indent
+        base = os.path.splitext(snapshot_path)[0]
+        self.journal_path = base + ".journal"
+        # 后台合并时，旧日志被改名为此文件，新的变更继续写入 journal_path
+        self.compacting_path = base + ".journal.compacting"
+        self.compact_threshold = compact_threshold
+
+        self._journal_file = None
+        self._journal_lock = threading.Lock()
+        self._snapshot_lock = threading.Lock()
+        self._compact_thread = None
+
+        # 统计信息
+        self.records_written = 0
+        self.bytes_written = 0
+        self.compactions = 0
+
+    def exists(self):
+        """是否存在已保存的数据"""
+        return any(os.path.exists(p) for p in
+                   (self.snapshot_path, self.compacting_path, self.journal_path))
+
+    def load(self):
+        """读取快照并按顺序重放未合并的日志"""
+        with self._snapshot_lock:
+            system_data = {}
+            if os.path.exists(self.snapshot_path):
+                with open(self.snapshot_path, 'r', encoding='utf-8') as f:
+                    system_data = json.load(f)
+
+            replayed = 0
+            for journal_path in (self.compacting_path, self.journal_path):
+                replayed += self._replay(system_data, journal_path)
+            if replayed:
+                log.info("已重放 %s 条日志记录", replayed)
+            return system_data
+
+    def _replay(self, system_data, journal_path):
+        """重放单个日志文件，返回应用的记录数"""
+        if not os.path.exists(journal_path):
+            return 0
+        count = 0
+        with open(journal_path, 'r', encoding='utf-8') as f:
+            for line_no, line in enumerate(f, 1):
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # 程序中断时最后一行可能只写了一半，直接忽略
+                    log.warning("忽略损坏的日志记录: %s 第 %s 行", journal_path, line_no)
+                    continue
+                apply_record(system_data, record)
+                count += 1
+        return count
+
+    @staticmethod
+    def encode_records(records):
+        """把变更记录序列化为日志文本（可在界面线程调用，结果不受之后的编辑影响）"""
+        return "".join(json.dumps(record, ensure_ascii=False) + "\n" for record in records)
+
+    @staticmethod
+    def encode_snapshot(system_data, indent=2):
+        """把完整数据序列化为快照文本"""
+        return json.dumps(system_data, ensure_ascii=False, indent=indent)
+
+    def append(self, records):
+        """向日志追加变更记录，写入后立即落盘"""
+        if not records:
+            return
+        self.append_encoded(self.encode_records(records), len(records))
+
+    def append_encoded(self, payload, count):
+        """追加已序列化的日志文本，count 为其中的记录数"""
+        with self._journal_lock:
+            if self._journal_file is None:
+                directory = os.path.dirname(self.journal_path)
+                if directory and not os.path.exists(directory):
+                    os.makedirs(directory, exist_ok=True)
+                self._journal_file = open(self.journal_path, 'a', encoding='utf-8')
+            self._journal_file.write(payload)
+            self._journal_file.flush()
+            os.fsync(self._journal_file.fileno())
+            self.records_written += count
+            self.bytes_written += len(payload.encode('utf-8'))
+            journal_size = self._journal_file.tell()
+
+        if journal_size >= self.compact_threshold:
+            self.compact_async()
+
+    def set_node(self, path, value):
+        """记录节点的新内容（新增或修改）"""
+        self.append([{"op": "set", "path": list(path), "value": value}])
+
+    def delete_node(self, path):
+        """记录节点被删除"""
+        self.append([{"op": "delete", "path": list(path)}])
+
+    def rename_node(self, path, new_name):
+        """记录节点被重命名"""
+        self.append([{"op": "rename", "path": list(path), "new_name": new_name}])
+
+    def write_snapshot(self, system_data):
+        """重写完整快照，并清空已被快照包含的日志"""
+        self.write_snapshot_text(self.encode_snapshot(system_data, self.indent))
+
+    def write_snapshot_text(self, text):
+        """写入已序列化的快照文本"""
+        with self._snapshot_lock:
+            self._write_atomic(self.snapshot_path, text)
+            with self._journal_lock:
+                self._close_journal()
+                for path in (self.journal_path, self.compacting_path):
+                    if os.path.exists(path):
+                        os.remove(path)
+
+    def compact_async(self):
+        """在后台线程中把日志合并进快照"""
+        if self._compact_thread is not None and self._compact_thread.is_alive():
+            return
+        with self._journal_lock:
+            if os.path.exists(self.compacting_path) or not os.path.exists(self.journal_path):
+                return
+            # 轮换日志：旧日志交给后台线程，新的变更写入新日志
+            self._close_journal()
+            os.replace(self.journal_path, self.compacting_path)
+
+        self._compact_thread = threading.Thread(target=self._compact, name="journal-compaction", daemon=True)
+        self._compact_thread.start()
+
+    def _compact(self):
+        """后台合并：快照 + 旧日志 -> 新快照"""
+        try:
+            with self._snapshot_lock:
+                if not os.path.exists(self.compacting_path):
+                    return
+                system_data = {}
+                if os.path.exists(self.snapshot_path):
+                    with open(self.snapshot_path, 'r', encoding='utf-8') as f:
+                        system_data = json.load(f)
+                self._replay(system_data, self.compacting_path)
+                self._write_atomic(self.snapshot_path, self.encode_snapshot(system_data, self.indent))
+                os.remove(self.compacting_path)
+                self.compactions += 1
+            log.info("日志已合并到快照: %s", self.snapshot_path)
+        except Exception as e:
+            # 合并失败不影响数据：旧日志仍保留，下次加载时会被重放
+            log.exception("日志合并失败: %s", e)
+
+    def _write_atomic(self, path, text):
+        """先写临时文件再原子替换，避免写入中断导致快照损坏"""
+        directory = os.path.dirname(path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(text)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+
+    def _close_journal(self):
+        if self._journal_file is not None:
+            self._journal_file.close()
+            self._journal_file = None
+
+    def close(self):
+        """等待后台合并结束并关闭日志文件"""
+        if self._compact_thread is not None:
+            self._compact_thread.join()
+        with self._journal_lock:
+            self._close_journal()
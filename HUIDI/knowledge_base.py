@@ -0,0 +1,732 @@
+"""
+锅炉知识库核心（不依赖 Qt）
+
+把数据、存储和各个索引放在一起，界面和批处理脚本使用同一套代码：
+- 数据：system_data["categories"] 分类树，按路径或节点 id 读取，新增/重命名/删除节点
+- 存储：快照 + 增量日志（或已转换的拆分格式 / SQLite 数据库），写入在后台线程中完成
+- 索引：节点 id 索引、标签索引、全文搜索索引、供应商价格索引，随编辑增量更新
+- 图片：内容寻址存储、引用计数、旧图片迁移和图片存储检查
+
+这里不弹出任何对话框，出错时抛出异常，由调用方决定如何提示。界面通过
+on_children_changed(父节点 id) 和 on_node_changed(节点 id) 两个回调得知树结构的变化。
+"""
+import os
+import json
+
+import image_gc
+import app_log
+import perf_stats
+from journal_store import JournalStore
+from background_writer import BackgroundWriter
+from sqlite_store import SQLiteStore
+from lazy_store import LazyStore
+from node_index import NodeIndex
+from tag_index import TagIndex
+from search_index import SearchIndex
+from price_index import PriceIndex
+from blob_store import BlobStore, is_blob, image_refs, map_image_refs, remove_image_refs
+
+log = app_log.get_logger("core")
+
+# 第一次运行时的默认数据
+DEFAULT_CATALOGUE = {
+    "categories": {
+        "锅炉系统": {
+            "children": {
+                "给料系统": {
+                    "children": {
+                        "皮带": {
+                            "content": "皮带是一条皮带\n",
+                            "tags": ["给料系统", "输送设备"],
+                            "images": [],
+                            "technical_params": {
+                                "型号": "B800",
+                                "长度": "50m",
+                                "材质": "橡胶",
+                                "功率": "5.5kW"
+                            },
+                            "pricing": {
+                                "base_price": 15000,
+                                "currency": "CNY",
+                                "suppliers": [
+                                    {
+                                        "name": "上海输送设备厂",
+                                        "price": 15000,
+                                        "lead_time": "7天",
+                                        "contact": "张经理 13800138000"
+                                    }
+                                ]
+                            },
+                            "maintenance": {
+                                "cycle": "每月检查",
+                                "procedures": "检查皮带张力、清理杂物",
+                                "notes": "注意防止跑偏"
+                            },
+                            "parts": []
+                        },
+                        "给料机": {
+                            "content": "",
+                            "tags": ["给料系统", "输送设备"],
+                            "images": [],
+                            "technical_params": {},
+                            "pricing": {"base_price": 0, "currency": "CNY", "suppliers": []},
+                            "maintenance": {"cycle": "", "procedures": "", "notes": ""},
+                            "parts": []
+                        }
+                    }
+                },
+                "燃烧系统": {
+                    "children": {
+                        "燃烧器": {
+                            "content": "",
+                            "tags": ["燃烧系统", "燃烧设备"],
+                            "images": [],
+                            "technical_params": {},
+                            "pricing": {"base_price": 0, "currency": "CNY", "suppliers": []},
+                            "maintenance": {"cycle": "", "procedures": "", "notes": ""},
+                            "parts": []
+                        },
+                        "点火器": {
+                            "content": "",
+                            "tags": ["燃烧系统", "点火设备"],
+                            "images": [],
+                            "technical_params": {},
+                            "pricing": {"base_price": 0, "currency": "CNY", "suppliers": []},
+                            "maintenance": {"cycle": "", "procedures": "", "notes": ""},
+                            "parts": []
+                        }
+                    }
+                },
+                "汽水系统": {
+                    "children": {
+                        "汽包": {
+                            "content": "",
+                            "tags": ["汽水系统", "压力容器"],
+                            "images": [],
+                            "technical_params": {},
+                            "pricing": {"base_price": 0, "currency": "CNY", "suppliers": []},
+                            "maintenance": {"cycle": "", "procedures": "", "notes": ""},
+                            "parts": []
+                        },
+                        "水冷壁": {
+                            "content": "",
+                            "tags": ["汽水系统", "受热面"],
+                            "images": [],
+                            "technical_params": {},
+                            "pricing": {"base_price": 0, "currency": "CNY", "suppliers": []},
+                            "maintenance": {"cycle": "", "procedures": "", "notes": ""},
+                            "parts": []
+                        }
+                    }
+                }
+            }
+        }
+    },
+    "tags": {},  # 标签索引
+    "suppliers": {}  # 供应商信息
+}
+
+
+def new_item():
+    """新设备的数据"""
+    return {
+        "content": "",
+        "tags": [],
+        "images": [],
+        "technical_params": {},
+        "pricing": {"base_price": 0, "currency": "CNY", "suppliers": []},
+        "maintenance": {"cycle": "", "procedures": "", "notes": ""},
+        "parts": []
+    }
+
+
+def default_catalogue():
+    """默认数据的副本"""
+    return json.loads(json.dumps(DEFAULT_CATALOGUE))
+
+
+def model_info(data):
+    """取设备型号：优先使用"型号"参数，否则使用第一个技术参数"""
+    tech_params = data.get("technical_params")
+    if not isinstance(tech_params, dict) or not tech_params:
+        return ""
+    if "型号" in tech_params:
+        return tech_params["型号"]
+    first_param = next(iter(tech_params.items()))
+    return f"{first_param[0]}: {first_param[1]}"
+
+
+def price_in_range(price, min_price, max_price):
+    """检查价格是否在指定范围内"""
+    log.debug("检查价格范围: 价格=%s, 最低价=%s, 最高价=%s", price, min_price, max_price)
+    if min_price is not None and price < min_price:
+        return False
+    if max_price is not None and price > max_price:
+        return False
+    return True
+
+
+def supplier_offers(data, path, min_price=None, max_price=None):
+    """一个设备在价格区间内的供应商报价，返回结果字典列表"""
+    results = []
+    if not isinstance(data, dict) or not isinstance(data.get("pricing"), dict):
+        return results
+    info = model_info(data)
+    currency = data["pricing"].get("currency") or "CNY"
+    for supplier in data["pricing"].get("suppliers", []):
+        if not isinstance(supplier, dict):
+            continue
+        price = supplier.get("price")
+        if price is None or price == "":
+            log.debug("  供应商 %s 没有价格信息，跳过", supplier.get("name", "未知"))
+            continue
+        try:
+            price = float(price)
+        except (ValueError, TypeError):
+            log.warning("  供应商价格转换失败: %s", price)
+            continue
+        if not price_in_range(price, min_price, max_price):
+            continue
+        results.append({
+            'path': list(path),
+            'model': info,
+            'supplier_name': supplier.get('name', '未知供应商'),
+            'supplier_price': price,
+            'currency': currency,
+            'lead_time': supplier.get('lead_time', ''),
+            'contact': supplier.get('contact', ''),
+            'product_images': supplier.get('images', []),
+        })
+    return results
+
+
+class KnowledgeBase:
+    """锅炉知识库：数据、存储、索引和图片存储"""
+
+    def __init__(self, storage_dir, on_save_result=None):
+        self.storage_dir = storage_dir
+        self.images_dir = os.path.join(storage_dir, "图片")
+        self.data_dir = os.path.join(storage_dir, "数据")
+        self.data_file = os.path.join(self.data_dir, "system_data.json")
+        self.skeleton_file = os.path.join(self.data_dir, "system_data.skeleton.json")
+        self.db_file = os.path.join(self.data_dir, "system_data.db")
+
+        self.system_data = {"categories": {}, "tags": {}, "suppliers": {}}
+        # 节点 id 索引：界面的树形模型在 Qt.UserRole 中返回节点 id
+        self.node_index = NodeIndex()
+        # 标签倒排索引：标签 -> 设备 id，编辑时增量更新
+        self.tag_index = TagIndex()
+        # 全文搜索索引：第一次搜索时建立，之后随保存增量更新
+        self.search_index = SearchIndex()
+        # 全部设备的供应商价格索引：第一次全局价格搜索时建立，之后随保存增量更新
+        self.price_index = PriceIndex()
+        # 图片按内容哈希保存，数据中的图片字段只保存图片名
+        self.blob_store = BlobStore(self.images_dir)
+
+        # 树结构变化的回调（界面更新树形模型）
+        self.on_children_changed = None
+        self.on_node_changed = None
+
+        self.store = self.open_store()
+        # 落盘操作在后台线程中执行；on_save_result(ok, label, error) 在写入线程中调用
+        self.writer = BackgroundWriter(on_result=on_save_result)
+
+    def ensure_directories(self):
+        for dir_path in (self.storage_dir, self.images_dir, self.data_dir):
+            os.makedirs(dir_path, exist_ok=True)
+
+    def open_store(self):
+        """按数据目录中已有的文件选择存储后端"""
+        if os.path.exists(self.skeleton_file):
+            # 已通过 lazy_store.py 转换为拆分格式：启动时只读取骨架，设备数据按需加载
+            log.info("使用拆分格式数据: %s", self.skeleton_file)
+            return LazyStore(self.skeleton_file)
+        if os.path.exists(self.db_file):
+            # 已通过 sqlite_store.py 迁移，改用 SQLite 存储后端
+            log.info("使用SQLite数据库: %s", self.db_file)
+            return SQLiteStore(self.db_file)
+        return JournalStore(self.data_file)
+
+    def close(self):
+        """写完已提交的数据并关闭存储"""
+        self.writer.close()
+        self.store.close()
+
+    # ---------- 加载与保存 ----------
+
+    def load(self):
+        """加载数据；没有数据文件时使用默认数据并返回 False（调用方随后保存）"""
+        if self.store.exists():
+            self.replace_data(self.store.load())
+            log.info("数据已从以下位置加载: %s", self.data_file)
+            return True
+        log.info("未找到现有数据文件，将创建新的数据文件: %s", self.data_file)
+        self.replace_data(default_catalogue())
+        return False
+
+    def replace_data(self, system_data):
+        """整体替换数据（加载、导入）并重建索引"""
+        self.system_data = system_data
+        self.node_index.rebuild(self.system_data["categories"])
+        self.update_tag_index()
+        self.search_index.clear()
+        self.price_index.clear()
+        self.blob_store.invalidate()
+
+    def install_import(self, system_data, snapshot_text=None):
+        """用导入的数据替换当前数据并写入完整快照，返回迁移的旧图片引用数
+
+        snapshot_text 为导入线程中预先序列化的快照；旧图片迁移改动了数据时重新序列化。
+        """
+        self.replace_data(system_data)
+        migrated = self.migrate_legacy_images(force=True)
+        if snapshot_text is None or migrated:
+            self.save()
+        else:
+            self.writer.submit("全部数据", self.store.write_snapshot_text, snapshot_text)
+            log.info("导入的数据已提交写入: %s", self.data_file)
+        return migrated
+
+    @perf_stats.timed("save_data")
+    def save(self, path=None):
+        """保存数据
+
+        传入设备/分类路径时只向日志追加该节点的变更记录，
+        不传路径时重写完整快照（用于导入、批量修复等整体变更）。
+        数据在调用线程中序列化后交给后台写入线程，之后的编辑不会影响已提交的内容。
+        """
+        node = self.get_data_by_path(path) if path else None
+        if path and isinstance(node, dict):
+            payload = self.store.encode_records([{"op": "set", "path": list(path), "value": node}])
+            self.writer.submit(' > '.join(path), self.store.append_encoded, payload, 1)
+            self.update_search_index(path)
+            self.update_price_index(path)
+            log.debug("变更已提交写入: %s", ' > '.join(path))
+        else:
+            text = self.store.encode_snapshot(self.system_data)
+            self.writer.submit("全部数据", self.store.write_snapshot_text, text)
+            log.info("完整数据已提交写入: %s", self.data_file)
+
+    def save_renamed(self, path, new_name):
+        """记录节点重命名"""
+        payload = self.store.encode_records([{"op": "rename", "path": list(path), "new_name": new_name}])
+        self.writer.submit(f"重命名 {' > '.join(path)}", self.store.append_encoded, payload, 1)
+        log.debug("重命名已提交写入: %s -> %s", ' > '.join(path), new_name)
+
+    def save_deleted(self, path):
+        """记录节点删除"""
+        payload = self.store.encode_records([{"op": "delete", "path": list(path)}])
+        self.writer.submit(f"删除 {' > '.join(path)}", self.store.append_encoded, payload, 1)
+        log.debug("删除已提交写入: %s", ' > '.join(path))
+
+    # ---------- 读取 ----------
+
+    @perf_stats.timed("get_data_by_path")
+    def get_data_by_path(self, path):
+        """根据路径获取数据"""
+        try:
+            if not path:
+                return self.system_data["categories"]
+            node_id = self.node_index.id_for_path(path)
+            if node_id is not None:
+                return self.node_index.node(node_id)
+            current = self.system_data["categories"]
+            for i, name in enumerate(path):
+                if name in current:
+                    if i == len(path) - 1:
+                        # 这是最后一个元素，返回当前节点
+                        return current[name]
+                    elif "children" in current[name]:
+                        # 还有更多路径，继续遍历
+                        current = current[name]["children"]
+                    else:
+                        return None
+                else:
+                    return None
+            return current
+        except Exception as e:
+            log.error("获取路径数据失败: %s, 路径: %s", str(e), path)
+            return None
+
+    def get_parent_data_by_path(self, path):
+        """根据路径获取父级数据（所在的 children 字典）"""
+        if not path:
+            return self.system_data["categories"]
+        current = self.system_data["categories"]
+        for i, name in enumerate(path[:-1]):  # 除了最后一个元素
+            if name in current and "children" in current[name]:
+                current = current[name]["children"]
+            else:
+                return None
+        return current
+
+    # ---------- 增删改 ----------
+
+    def add_category(self, parent_path, name):
+        """在数据中添加分类，返回新分类的路径"""
+        return self._add_node(parent_path, name, {"children": {}})
+
+    def add_item(self, parent_path, name):
+        """在数据中添加具体项目，返回新项目的路径"""
+        return self._add_node(parent_path, name, new_item())
+
+    def _add_node(self, parent_path, name, node):
+        if not parent_path:
+            self.system_data["categories"][name] = node
+            return self.register_node([name])
+        # 检查当前路径指向的是否是一个分类（有children属性）
+        current_data = self.get_data_by_path(parent_path)
+        if current_data and isinstance(current_data, dict) and "children" in current_data:
+            # 当前路径指向的是一个分类，直接在其children中添加
+            current_data["children"][name] = node
+            return self.register_node(list(parent_path) + [name])
+        # 当前路径指向的是一个项目，添加到它所在的分类
+        parent_data = self.get_parent_data_by_path(parent_path)
+        if parent_data is not None:
+            parent_data[name] = node
+            return self.register_node(list(parent_path[:-1]) + [name])
+        return None
+
+    def rename_node(self, path, new_name):
+        """重命名节点（与字典语义一致，同名的兄弟节点被替换），返回是否成功"""
+        container = self.get_parent_data_by_path(path)
+        old_name = path[-1]
+        if container is None or old_name not in container:
+            return False
+        container[new_name] = container.pop(old_name)
+        self.rename_node_in_index(path, new_name)
+        return True
+
+    def delete_node(self, path):
+        """删除节点及其后代，返回是否成功"""
+        container = self.get_parent_data_by_path(path)
+        if container is None or path[-1] not in container:
+            return False
+        del container[path[-1]]
+        self.unregister_node(path)
+        return True
+
+    def register_node(self, path):
+        """在各个索引中登记新增的节点，返回其路径"""
+        # 同名节点被整体替换时先移除旧节点
+        self.unregister_node(path)
+        node_id = self.node_index.add(path)
+        if node_id is not None:
+            added_ids = self.node_index.walk_ids(node_id)
+            for child_id in added_ids:
+                child = self.node_index.node(child_id)
+                if isinstance(child, dict) and "children" not in child:
+                    self.tag_index.set_tags(child_id, child.get("tags", []))
+            self._search_changed(added_ids)
+            self._price_changed(added_ids)
+        self._children_changed(path)
+        return path
+
+    def unregister_node(self, path):
+        """从各个索引中移除节点及其后代"""
+        node_id = self.node_index.id_for_path(path)
+        if node_id is not None:
+            removed_ids = self.node_index.walk_ids(node_id)
+            self.tag_index.remove(removed_ids)
+            self.node_index.remove(path)
+            self._search_changed(removed_ids)
+            self._price_changed(removed_ids)
+            self.blob_store.invalidate()
+            self._children_changed(path)
+
+    def rename_node_in_index(self, old_path, new_name):
+        """登记节点重命名；节点 id 不变，标签索引无需改动，搜索索引只更新该节点的名称"""
+        replaced_path = list(old_path[:-1]) + [new_name]
+        replaced_id = self.node_index.id_for_path(replaced_path)
+        if replaced_id is not None:
+            # 同名的兄弟节点已被覆盖
+            replaced_ids = self.node_index.walk_ids(replaced_id)
+            self.tag_index.remove(replaced_ids)
+        node_id = self.node_index.rename(old_path, new_name)
+        if replaced_id is not None:
+            self._search_changed(replaced_ids)
+            self._price_changed(replaced_ids)
+        if node_id is not None:
+            self._search_changed([node_id])
+        if node_id is not None and self.on_node_changed:
+            self.on_node_changed(node_id)
+        # 字典中改名的节点移到了末尾
+        self._children_changed(old_path)
+
+    def _children_changed(self, path):
+        if not self.on_children_changed:
+            return
+        parent_id = self.node_index.id_for_path(path[:-1]) if len(path) > 1 else None
+        if parent_id is None and len(path) > 1:
+            return
+        self.on_children_changed(parent_id)
+
+    # ---------- 索引 ----------
+
+    def update_tag_index(self):
+        """全量重建标签索引（加载、导入数据后调用）"""
+        # 索引只保存在内存中；保留空的 tags 键，旧版本读取数据文件时会自行重建
+        self.system_data["tags"] = {}
+        self.tag_index.rebuild(self.node_index)
+
+    def update_node_tags(self, path):
+        """设备标签修改后增量更新标签索引"""
+        node_id = self.node_index.id_for_path(path)
+        data = self.node_index.node(node_id) if node_id is not None else None
+        if isinstance(data, dict):
+            self.tag_index.set_tags(node_id, data.get("tags", []))
+
+    def update_search_index(self, path):
+        """节点保存后增量更新搜索索引（索引尚未建立时跳过）"""
+        node_id = self.node_index.id_for_path(path)
+        if node_id is not None:
+            self._search_changed([node_id])
+
+    def _search_changed(self, node_ids):
+        """节点新增、修改、重命名或删除后更新搜索索引；后台建立期间先记下，完成后再更新"""
+        with self.search_index.lock:
+            if self.search_index.building:
+                self.search_index.stale.update(node_ids)
+                return
+            if not self.search_index.built:
+                return
+        self._reindex_search(node_ids)
+
+    def _reindex_search(self, node_ids):
+        removed = []
+        for node_id in node_ids:
+            name = self.node_index.name(node_id)
+            if name is None:
+                removed.append(node_id)
+            else:
+                self.search_index.update(node_id, name, self.node_index.node(node_id))
+        if removed:
+            self.search_index.remove(removed)
+
+    def update_price_index(self, path):
+        """设备保存后增量更新价格索引（索引尚未建立时跳过）"""
+        node_id = self.node_index.id_for_path(path)
+        if node_id is not None:
+            self._price_changed([node_id])
+
+    def _price_changed(self, node_ids):
+        """设备新增、修改或删除后更新价格索引；后台建立期间先记下，完成后再更新"""
+        with self.price_index.lock:
+            if self.price_index.building:
+                self.price_index.stale.update(node_ids)
+                return
+            if not self.price_index.built:
+                return
+        self._reindex_price(node_ids)
+
+    def _reindex_price(self, node_ids):
+        removed = []
+        for node_id in node_ids:
+            if self.node_index.is_category(node_id):
+                continue
+            node = self.node_index.node(node_id)
+            if node is None:
+                removed.append(node_id)
+            elif isinstance(node, dict):
+                self.price_index.set_pricing(node_id, node.get("pricing"))
+        if removed:
+            self.price_index.remove(removed)
+
+    def ensure_search_index(self):
+        """第一次搜索前建立全文索引（在调用线程中完成），返回是否新建了索引"""
+        if self.search_index.built:
+            return False
+        self.search_index.rebuild(self.node_index)
+        return True
+
+    def prepare_search_index(self):
+        """取出建立全文索引所需的节点，返回交给 SearchIndex.build() 的任务（可在后台线程中建立）"""
+        return self.search_index.prepare(self.node_index)
+
+    def finish_search_index(self):
+        """后台建立全文索引完成后，重新索引建立期间被修改的节点"""
+        self._reindex_search(self.search_index.take_stale())
+
+    def ensure_price_index(self):
+        """第一次全局价格搜索前建立价格索引（在调用线程中完成），返回是否新建了索引"""
+        if self.price_index.built:
+            return False
+        self.price_index.rebuild(self.node_index)
+        return True
+
+    def prepare_price_index(self):
+        """取出建立价格索引所需的设备，返回交给 PriceIndex.build() 的任务（可在后台线程中建立）"""
+        return self.price_index.prepare(self.node_index)
+
+    def finish_price_index(self):
+        """后台建立价格索引完成后，重新登记建立期间被修改的设备"""
+        self._reindex_price(self.price_index.take_stale())
+
+    # ---------- 查询 ----------
+
+    @perf_stats.timed("search")
+    def search(self, query, limit=50):
+        """全文搜索（在调用线程中执行），返回 [(路径, 分数), ...]"""
+        self.ensure_search_index()
+        results = []
+        for node_id, score in self.search_index.search(query.strip().lower(), limit):
+            path = self.node_index.path(node_id)
+            if path is not None:
+                results.append((path, score))
+        return results
+
+    def nodes_with_tag(self, tag):
+        """带有某个标签的设备路径"""
+        return [self.node_index.path(node_id) for node_id in self.tag_index.ids_for(tag)]
+
+    @perf_stats.timed("price_query")
+    def price_query(self, min_price=None, max_price=None, currency=None, offset=0, limit=100, descending=False):
+        """在全部设备的供应商报价中按价格区间查询，返回 (总条数, 结果字典列表)
+
+        不限币种时结果按币种分组（见 PriceIndex.query）。
+        """
+        self.ensure_price_index()
+        total, entries = self.price_index.query(
+            min_price, max_price, currency, offset=offset, limit=limit, descending=descending)
+        results = []
+        for price, supplier_name, node_id, slot, currency in entries:
+            path = self.node_index.path(node_id)
+            data = self.node_index.node(node_id)
+            if path is None or not isinstance(data, dict):
+                continue
+            suppliers = data.get("pricing", {}).get("suppliers", [])
+            supplier = suppliers[slot] if slot < len(suppliers) else {}
+            results.append({
+                'path': path,
+                'model': model_info(data) or ' > '.join(path),
+                'supplier_name': supplier_name,
+                'supplier_price': price,
+                'currency': currency,
+                'lead_time': supplier.get('lead_time', ''),
+                'contact': supplier.get('contact', ''),
+                'product_images': supplier.get('images', []),
+            })
+        return total, results
+
+    def product_offers(self, path, min_price=None, max_price=None):
+        """一个设备在价格区间内的供应商报价"""
+        return supplier_offers(self.get_data_by_path(path), path, min_price, max_price)
+
+    @perf_stats.timed("procurement_parts")
+    def procurement_parts(self, path):
+        """采购模块中可选的部件：设备自身的部件，或分类下一级各设备的部件
+
+        返回 [{"path", "part", "label", "supplier_name", "unit_price"}, ...]，path 为部件所属设备的路径；
+        价格取所属设备的第一个供应商，没有供应商时 supplier_name 和 unit_price 为 None。
+        """
+        data = self.get_data_by_path(path) if path else None
+        if not isinstance(data, dict):
+            return []
+        path = list(path)
+        if "parts" in data:
+            owners = [(path, "", data)]
+        elif "children" in data:
+            owners = [(path + [name], f"{name} - ", child) for name, child in data["children"].items()
+                      if isinstance(child, dict) and "parts" in child]
+        else:
+            return []
+        lines = []
+        for owner_path, prefix, owner in owners:
+            pricing = owner.get("pricing")
+            suppliers = pricing.get("suppliers") if isinstance(pricing, dict) else None
+            supplier = suppliers[0] if suppliers and isinstance(suppliers[0], dict) else None
+            for part in owner["parts"]:
+                if not isinstance(part, dict) or "name" not in part:
+                    continue
+                label = prefix + part["name"]
+                if part.get("description", ""):
+                    label += f" - {part['description']}"
+                lines.append({
+                    "path": owner_path,
+                    "part": part,
+                    "label": label,
+                    "supplier_name": supplier.get("name", "未指定") if supplier else None,
+                    "unit_price": supplier.get("price", 0.0) if supplier else None,
+                })
+        return lines
+
+    # ---------- 图片 ----------
+
+    def image_path(self, image_name):
+        """图片字段中的图片名 -> 完整路径"""
+        return self.blob_store.path(image_name)
+
+    def store_image(self, source_path):
+        """把图片存入内容寻址存储，返回写入数据的图片名"""
+        return self.blob_store.put(source_path)
+
+    def release_image(self, image_name):
+        """释放已从数据中移除的一个图片引用，没有其他引用时删除文件"""
+        if self.blob_store.release(image_name, self.all_image_refs):
+            log.debug("已删除图片文件: %s", self.image_path(image_name))
+            return True
+        return False
+
+    def all_image_refs(self):
+        """全部设备的图片引用（建立引用计数时使用）"""
+        refs = []
+        for node_id in self.node_index.leaf_ids():
+            refs.extend(image_refs(self.node_index.node(node_id)))
+        return refs
+
+    def migrate_legacy_images(self, force=False):
+        """把旧版本按时间戳命名的图片移入内容寻址存储，返回迁移的引用数
+
+        第一次启动和导入数据后执行。旧文件名与图片名的对应关系保存在图片目录中，
+        导入旧版本导出的数据时仍能找到已经移入存储的图片。迁移后由调用方保存数据。
+        """
+        mapping_file = os.path.join(self.images_dir, "legacy_images.json")
+        if os.path.exists(mapping_file) and not force:
+            return 0
+        mapping = {}
+        try:
+            if os.path.exists(mapping_file):
+                with open(mapping_file, 'r', encoding='utf-8') as f:
+                    mapping = json.load(f)
+        except Exception as e:
+            log.error("读取旧图片对应关系失败: %s", e)
+
+        migrated = 0
+        for node_id in self.node_index.leaf_ids():
+            node = self.node_index.node(node_id)
+            if all(is_blob(name) for name in image_refs(node)):
+                continue
+            try:
+                migrated += map_image_refs(node, lambda name: self.blob_store.migrate(name, mapping))
+            except OSError as e:
+                log.error("迁移图片失败 %s: %s", self.node_index.path(node_id), e)
+
+        try:
+            os.makedirs(self.images_dir, exist_ok=True)
+            with open(mapping_file, 'w', encoding='utf-8') as f:
+                json.dump(mapping, f, ensure_ascii=False)
+        except Exception as e:
+            log.error("保存旧图片对应关系失败: %s", e)
+        if migrated:
+            self.blob_store.invalidate()
+            log.info("已将 %s 个图片引用迁移到内容寻址存储，去重 %s 张，节省 %s KB",
+                     migrated, self.blob_store.deduplicated, self.blob_store.bytes_saved // 1024)
+        return migrated
+
+    def check_images(self):
+        """检查图片存储（试运行，不做修改），返回 image_gc.StoreReport"""
+        refs = [(node_id, name) for node_id in self.node_index.leaf_ids()
+                for name in image_refs(self.node_index.node(node_id))]
+        return image_gc.check(self.images_dir, refs, keep=self.blob_store.held())
+
+    def repair_images(self, report):
+        """移除报告中的无效引用（每个设备只保存一次）并删除孤立文件"""
+        dangling = {}
+        for node_id, name, _ in report.dangling:
+            dangling.setdefault(node_id, set()).add(name)
+        for node_id, names in dangling.items():
+            remove_image_refs(self.node_index.node(node_id), names)
+            self.save(self.node_index.path(node_id))
+        image_gc.collect(self.images_dir, report)
+        self.blob_store.invalidate()
+        return report
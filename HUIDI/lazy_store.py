@@ -0,0 +1,421 @@
+"""
+按需加载的拆分存储格式
+
+知识库拆分为两部分保存：
+
+- 骨架: system_data.skeleton.json（及其增量日志），只包含分类/设备名称、
+  层级关系、每个设备的标签和设备数据在数据文件中的位置
+- 数据: system_data.payloads.<代>，每行一个设备的完整数据（内容、维护规程、
+  供应商、图片列表等），只追加写入
+
+启动时只读取骨架，树形结构和标签索引不需要读取任何设备数据即可建立；
+设备数据在第一次访问时才从数据文件中读取，并由 LRU 缓存保留最近打开的设备。
+
+设备在内存中以 LazyLeaf 表示，它是 dict 的子类，界面代码可以像普通字典一样
+使用。被修改或保存过的设备会常驻内存，不会被缓存淘汰；读取时借出的列表或字典
+（如 data["images"]）被原地修改过的设备，在被淘汰时也会改为常驻内存。
+
+直接运行本文件把现有的 system_data.json（连同未合并的日志）转换为拆分格式：
+
+    python lazy_store.py <system_data.json 路径>
+"""
+import os
+import json
+import glob
+import functools
+import logging
+import threading
+from collections import OrderedDict
+
+import app_log
+from journal_store import JournalStore
+from node_index import copy_reader
+
+log = app_log.get_logger("store")
+
+# 骨架中设备引用的键：[数据文件的代, 偏移, 长度]
+REF_KEY = "@"
+
+
+class LazyLeaf(dict):
+    """按需加载的设备数据"""
+
+    __slots__ = ("_store", "_ref", "_loaded", "_pinned", "_lent")
+
+    def __init__(self, store, ref):
+        dict.__init__(self)
+        self._store = store
+        self._ref = ref
+        self._loaded = False
+        self._pinned = False
+        self._lent = False  # 是否借出过可以原地修改的列表或字典
+
+    @property
+    def loaded(self):
+        return self._loaded
+
+    def _ensure(self):
+        if not self._loaded:
+            dict.update(self, self._store.read_payload(self._ref))
+            self._loaded = True
+        if not self._pinned:
+            self._store._touch(self)
+
+    def _unload(self):
+        dict.clear(self)
+        self._loaded = False
+        self._lent = False
+
+    def _evict(self):
+        """被缓存淘汰：借出的数据被原地修改过时改为常驻内存，否则释放数据"""
+        if self._lent and dict.__ne__(self, self._store.read_payload(self._ref)):
+            self._pinned = True
+            return
+        self._unload()
+
+    def _lend(self, value):
+        if isinstance(value, (dict, list)):
+            self._lent = True
+        return value
+
+    def pin(self):
+        """加载并常驻内存（数据被修改后，内存中的版本才是最新的）"""
+        self._ensure()
+        if not self._pinned:
+            self._pinned = True
+            self._store._forget(self)
+
+    def to_plain(self):
+        """返回普通字典；未加载时直接读取，不放入缓存"""
+        if self._loaded:
+            return dict(dict.items(self))
+        return self._store.read_payload(self._ref)
+
+    def reader(self):
+        """返回读取当前数据的函数，可在其他线程中调用，不进入缓存
+
+        已加载时取数据的副本（见 node_index.copy_reader），之后在界面线程中修改也不影响；
+        否则之后直接从数据文件读取（数据文件只追加，引用一直有效）。
+        """
+        if self._loaded:
+            return copy_reader(dict(dict.items(self)))
+        return functools.partial(self._store.read_payload, self._ref)
+
+    # 以下操作不需要读取设备数据
+    def __contains__(self, key):
+        if not self._loaded and key == "children":
+            return False
+        self._ensure()
+        return dict.__contains__(self, key)
+
+    def get(self, key, default=None):
+        if not self._loaded and key == "tags":
+            tags = self._ref.get("tags")
+            return list(tags) if tags is not None else default
+        self._ensure()
+        return self._lend(dict.get(self, key, default))
+
+    # 读取操作：先加载
+    def __getitem__(self, key):
+        self._ensure()
+        return self._lend(dict.__getitem__(self, key))
+
+    def __iter__(self):
+        self._ensure()
+        return dict.__iter__(self)
+
+    def __len__(self):
+        self._ensure()
+        return dict.__len__(self)
+
+    def __eq__(self, other):
+        self._ensure()
+        return dict.__eq__(self, other)
+
+    def __ne__(self, other):
+        self._ensure()
+        return dict.__ne__(self, other)
+
+    __hash__ = None
+
+    def __repr__(self):
+        if not self._loaded:
+            return "LazyLeaf(<未加载>)"
+        return dict.__repr__(self)
+
+    def keys(self):
+        self._ensure()
+        return dict.keys(self)
+
+    def values(self):
+        self._ensure()
+        self._lent = True
+        return dict.values(self)
+
+    def items(self):
+        self._ensure()
+        self._lent = True
+        return dict.items(self)
+
+    def copy(self):
+        # 浅拷贝与设备共用其中的列表和字典
+        self._ensure()
+        self._lent = True
+        return dict(dict.items(self))
+
+    # 修改操作：加载并常驻内存
+    def __setitem__(self, key, value):
+        self.pin()
+        dict.__setitem__(self, key, value)
+
+    def __delitem__(self, key):
+        self.pin()
+        dict.__delitem__(self, key)
+
+    def setdefault(self, key, default=None):
+        self.pin()
+        return dict.setdefault(self, key, default)
+
+    def pop(self, key, *args):
+        self.pin()
+        return dict.pop(self, key, *args)
+
+    def popitem(self):
+        self.pin()
+        return dict.popitem(self)
+
+    def update(self, *args, **kwargs):
+        self.pin()
+        dict.update(self, *args, **kwargs)
+
+    def clear(self):
+        self.pin()
+        dict.clear(self)
+
+
+def to_plain(node):
+    """把包含 LazyLeaf 的分类树转换为普通字典（用于序列化）"""
+    if isinstance(node, LazyLeaf):
+        return node.to_plain()
+    if isinstance(node, dict) and isinstance(node.get("children"), dict):
+        plain = dict(node)
+        plain["children"] = {name: to_plain(child) for name, child in node["children"].items()}
+        return plain
+    return node
+
+
+class LazyStore:
+    """骨架 + 按需加载数据的存储"""
+
+    def __init__(self, skeleton_path, cache_size=256):
+        self.skeleton_path = skeleton_path
+        self.skeleton = JournalStore(skeleton_path, indent=None)
+        base = skeleton_path[:-len(".skeleton.json")] if skeleton_path.endswith(".skeleton.json") \
+            else os.path.splitext(skeleton_path)[0]
+        self.payload_prefix = base + ".payloads."
+        self.generation = 0
+        self.cache_size = cache_size
+
+        self._cache = OrderedDict()  # id(LazyLeaf) -> LazyLeaf，最近访问的在末尾
+        self._read_files = {}        # 代 -> 只读文件
+        self._read_lock = threading.Lock()
+        self._append_file = None
+
+        # 统计信息
+        self.records_written = 0
+        self.bytes_written = 0
+        self.payload_reads = 0
+
+    def payload_path(self, generation):
+        return f"{self.payload_prefix}{generation}"
+
+    # ---------- 读取 ----------
+
+    def exists(self):
+        return self.skeleton.exists()
+
+    def load(self):
+        """只读取骨架，设备数据以 LazyLeaf 的形式按需加载"""
+        skeleton = self.skeleton.load()
+        self.generation = skeleton.pop("payload_generation", 0)
+        skeleton["categories"] = self._wrap(skeleton.get("categories", {}))
+        self._remove_stale_payloads()
+        return skeleton
+
+    def _wrap(self, tree):
+        for name, node in tree.items():
+            if isinstance(node, dict) and REF_KEY in node:
+                tree[name] = LazyLeaf(self, node)
+            elif isinstance(node, dict) and isinstance(node.get("children"), dict):
+                self._wrap(node["children"])
+        return tree
+
+    def _remove_stale_payloads(self):
+        """删除不再被骨架引用的旧数据文件"""
+        current = self.payload_path(self.generation)
+        for path in glob.glob(self.payload_prefix + "*"):
+            if path != current and os.path.isfile(path):
+                try:
+                    os.remove(path)
+                except OSError as e:
+                    log.error("删除旧数据文件失败: %s: %s", path, e)
+
+    def read_payload(self, ref):
+        """按骨架中的引用读取一个设备的数据"""
+        generation, offset, length = ref[REF_KEY]
+        with self._read_lock:
+            f = self._read_files.get(generation)
+            if f is None:
+                f = open(self.payload_path(generation), 'rb')
+                self._read_files[generation] = f
+            f.seek(offset)
+            data = f.read(length)
+            self.payload_reads += 1
+        return json.loads(data.decode('utf-8'))
+
+    def _touch(self, leaf):
+        """记录最近访问，超出容量时淘汰最久未访问的设备"""
+        key = id(leaf)
+        if key in self._cache:
+            self._cache.move_to_end(key)
+            return
+        self._cache[key] = leaf
+        while len(self._cache) > self.cache_size:
+            _, oldest = self._cache.popitem(last=False)
+            oldest._evict()
+
+    def _forget(self, leaf):
+        self._cache.pop(id(leaf), None)
+
+    # ---------- 与 JournalStore 相同的持久化接口 ----------
+
+    def encode_records(self, records):
+        """序列化变更记录；被保存的设备会常驻内存"""
+        plain_records = []
+        for record in records:
+            if "value" in record:
+                record = dict(record)
+                self._pin_tree(record["value"])
+                record["value"] = to_plain(record["value"])
+            plain_records.append(record)
+        return JournalStore.encode_records(plain_records)
+
+    def _pin_tree(self, node):
+        if isinstance(node, LazyLeaf):
+            node.pin()
+        elif isinstance(node, dict) and isinstance(node.get("children"), dict):
+            for child in node["children"].values():
+                self._pin_tree(child)
+
+    def encode_snapshot(self, system_data):
+        """序列化完整数据（未加载的设备直接从数据文件读取）"""
+        plain = dict(system_data)
+        plain["categories"] = {name: to_plain(node)
+                               for name, node in system_data.get("categories", {}).items()}
+        return JournalStore.encode_snapshot(plain)
+
+    def append_encoded(self, payload, count):
+        """写入变更：设备数据追加到数据文件，骨架只记录引用（在后台写入线程中调用）"""
+        records = []
+        for line in payload.splitlines():
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            if "value" in record:
+                record["value"] = self._skeletonize(record["value"], self._append_payload)
+            records.append(record)
+        self.skeleton.append(records)
+        self.records_written += count
+        self.bytes_written += len(payload.encode('utf-8'))
+
+    def _skeletonize(self, node, write_payload):
+        """把设备数据写入数据文件，返回只含引用的骨架"""
+        if isinstance(node, dict) and isinstance(node.get("children"), dict):
+            skeleton = dict(node)
+            skeleton["children"] = {name: self._skeletonize(child, write_payload)
+                                    for name, child in node["children"].items()}
+            return skeleton
+        ref = {REF_KEY: write_payload(json.dumps(node, ensure_ascii=False).encode('utf-8'))}
+        if isinstance(node, dict) and isinstance(node.get("tags"), list):
+            ref["tags"] = node["tags"]
+        return ref
+
+    def _append_payload(self, data):
+        if self._append_file is None:
+            self._append_file = open(self.payload_path(self.generation), 'ab')
+        offset = self._append_file.tell()
+        self._append_file.write(data + b"\n")
+        self._append_file.flush()
+        os.fsync(self._append_file.fileno())
+        return [self.generation, offset, len(data)]
+
+    def write_snapshot(self, system_data):
+        """重写全部数据：写入新一代数据文件，再原子替换骨架"""
+        generation = self.generation + 1
+        path = self.payload_path(generation)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, 'wb') as f:
+            def write_payload(data):
+                offset = f.tell()
+                f.write(data + b"\n")
+                return [generation, offset, len(data)]
+            skeleton = {key: value for key, value in system_data.items() if key != "categories"}
+            skeleton["categories"] = {name: self._skeletonize(to_plain(node), write_payload)
+                                      for name, node in system_data.get("categories", {}).items()}
+            skeleton["payload_generation"] = generation
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+        self.skeleton.write_snapshot(skeleton)
+
+        # 之后的增量写入追加到新一代数据文件；旧文件在下次启动时删除
+        if self._append_file is not None:
+            self._append_file.close()
+            self._append_file = None
+        self.generation = generation
+
+    def write_snapshot_text(self, text):
+        """写入已序列化的快照文本"""
+        self.write_snapshot(json.loads(text))
+
+    def close(self):
+        self.skeleton.close()
+        if self._append_file is not None:
+            self._append_file.close()
+            self._append_file = None
+        with self._read_lock:
+            for f in self._read_files.values():
+                f.close()
+            self._read_files.clear()
+
+
+def skeleton_path_for(json_path):
+    """system_data.json 对应的骨架文件路径"""
+    return os.path.splitext(json_path)[0] + ".skeleton.json"
+
+
+def convert_json(json_path):
+    """把 system_data.json（及未合并的日志）转换为拆分格式，返回骨架文件路径"""
+    system_data = JournalStore(json_path).load()
+    skeleton_path = skeleton_path_for(json_path)
+    store = LazyStore(skeleton_path)
+    store.write_snapshot(system_data)
+    store.close()
+
+    check = LazyStore(skeleton_path)
+    try:
+        loaded = check.load()
+        if json.loads(check.encode_snapshot(loaded)) != system_data:
+            raise ValueError("转换校验失败：拆分格式的内容与原数据不一致")
+    finally:
+        check.close()
+    log.info("已转换为拆分格式: %s", skeleton_path)
+    return skeleton_path
+
+
+if __name__ == "__main__":
+    import sys
+    if len(sys.argv) != 2:
+        sys.exit("用法: python lazy_store.py <system_data.json 路径>")
+    app_log.setup(console_level=logging.INFO)
+    convert_json(sys.argv[1])
@@ -0,0 +1,411 @@
+"""
+流式导入/导出（NDJSON）
+
+知识库导出为每行一个 JSON 记录的文本文件：
+    {"format": "boiler-ndjson", "version": 1, "nodes": 节点数, "suppliers": {...}}     第一行：文件头
+    {"path": ["锅炉系统"], "type": "category"}                                        分类
+    {"path": ["锅炉系统", "给料系统", "皮带"], "type": "device", "value": {...}}        设备
+
+节点按先序排列，分类总在其子节点之前，读取时逐行建立分类树：
+- 导出前在界面线程中取出快照（分类结构、设备数据的副本或数据文件中的位置），后台线程
+  逐个节点序列化写入临时文件，完成后再替换目标文件；未加载的设备直接从数据文件读取，
+  不经过缓存
+- 导入时按行读取，内存中只有当前一行和已经建立的数据，不需要先把整个文件读入再解析
+- 进度回调 on_progress(已完成, 总数, 记录数)：导出按节点数，导入按字节数
+- validate=True 时逐条检查记录格式（路径、类型、设备各字段的类型），出错时给出行号
+- 旧版本导出的整个 JSON 文件（.json）仍可导入
+- ExportJob / ImportJob 在后台线程中运行，可以取消
+"""
+import os
+import abc
+import json
+import time
+import tempfile
+import threading
+
+import app_log
+from lazy_store import LazyLeaf
+from node_index import copy_reader
+
+log = app_log.get_logger("io")
+
+FORMAT = "boiler-ndjson"
+VERSION = 1
+PROGRESS_EVERY = 1000  # 每处理多少条记录报告一次进度
+
+
+class SchemaError(ValueError):
+    """导入文件格式错误"""
+
+    def __init__(self, line, message):
+        super().__init__(f"第 {line} 行: {message}")
+        self.line = line
+
+
+class Cancelled(Exception):
+    """导入/导出已被取消"""
+
+
+def _is_category(node):
+    # 按需加载的设备一定不是分类；不调用它的 get，避免读取数据、进入缓存
+    return (not isinstance(node, LazyLeaf) and isinstance(node, dict)
+            and isinstance(dict.get(node, "children"), dict))
+
+
+def count_nodes(categories):
+    """分类树中的节点数"""
+    total = 0
+    stack = [categories]
+    while stack:
+        children = stack.pop()
+        total += len(children)
+        stack.extend(node["children"] for node in children.values() if _is_category(node))
+    return total
+
+
+def iter_records(categories):
+    """按先序生成每个节点的记录（设备数据原样给出，用于普通字典组成的分类树）"""
+    for path, kind, value in snapshot_nodes(categories, copy=False):
+        yield _record(path, kind, value)
+
+
+def _record(path, kind, value):
+    record = {"path": path, "type": kind}
+    if kind == "device" or value:
+        record["value"] = value() if callable(value) else value
+    return record
+
+
+def snapshot_nodes(categories, copy=True):
+    """取出分类树的结构，返回按先序排列的 (路径, 类型, 数据) 列表
+
+    分类的数据为除 children 外的字段，设备的数据为读取函数：copy=True 时返回取出时的副本
+    （见 node_index.copy_reader），之后修改嵌套的列表和字典也不影响；未加载的设备在导出线程中
+    直接从数据文件读取。需要在修改数据的线程（界面线程）中调用。
+    """
+    nodes = []
+    stack = [([], iter(list(categories.items())))]
+    while stack:
+        path, items = stack[-1]
+        item = next(items, None)
+        if item is None:
+            stack.pop()
+            continue
+        name, node = item
+        node_path = path + [name]
+        if _is_category(node):
+            extra = {key: value for key, value in node.items() if key != "children"}
+            nodes.append((node_path, "category", copy_reader(extra) if copy and extra else extra or None))
+            stack.append((node_path, iter(list(node["children"].items()))))
+        elif isinstance(node, LazyLeaf):
+            nodes.append((node_path, "device", node.reader()))
+        else:
+            nodes.append((node_path, "device", copy_reader(node) if copy else node))
+    return nodes
+
+
+def snapshot(system_data):
+    """导出用的快照：供应商列表的副本和分类树的结构（在界面线程中调用）"""
+    return {"suppliers": json.loads(json.dumps(system_data.get("suppliers", {}))),
+            "nodes": snapshot_nodes(system_data.get("categories", {}))}
+
+
+def write_ndjson(data, path, progress=None, cancelled=None):
+    """把 snapshot() 取出的快照写入 NDJSON 文件，返回写入的节点数"""
+    nodes = data["nodes"]
+    total = len(nodes)
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, temp_path = tempfile.mkstemp(suffix=".tmp", dir=directory)
+    written = 0
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8", newline="\n") as f:
+            header = {"format": FORMAT, "version": VERSION, "nodes": total,
+                      "suppliers": data["suppliers"]}
+            f.write(json.dumps(header, ensure_ascii=False) + "\n")
+            for node_path, kind, value in nodes:
+                f.write(json.dumps(_record(node_path, kind, value), ensure_ascii=False) + "\n")
+                written += 1
+                if written % PROGRESS_EVERY == 0:
+                    if cancelled and cancelled():
+                        raise Cancelled()
+                    if progress:
+                        progress(written, total, written)
+        os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+    if progress:
+        progress(total, total, written)
+    return written
+
+
+def export_ndjson(system_data, path, progress=None, cancelled=None):
+    """把知识库导出为 NDJSON 文件，返回写入的节点数（在修改数据的线程中调用）"""
+    return write_ndjson(snapshot(system_data), path, progress, cancelled)
+
+
+def _check_list_of_str(value, line, field):
+    if not isinstance(value, list) or not all(isinstance(item, str) for item in value):
+        raise SchemaError(line, f"{field} 应为字符串列表")
+
+
+def _check_number(value, line, field):
+    if value in (None, ""):
+        return
+    try:
+        float(value)
+    except (TypeError, ValueError):
+        raise SchemaError(line, f"{field} 不是有效的价格: {value!r}") from None
+
+
+def validate_device(value, line):
+    """检查设备数据各字段的类型"""
+    if not isinstance(value, dict):
+        raise SchemaError(line, "设备数据应为对象")
+    if "children" in value:
+        raise SchemaError(line, "设备数据不能包含 children")
+    if "content" in value and not isinstance(value["content"], str):
+        raise SchemaError(line, "content 应为字符串")
+    for field in ("tags", "images", "principle_images"):
+        if field in value:
+            _check_list_of_str(value[field], line, field)
+    for field in ("technical_params", "maintenance"):
+        if field in value and not isinstance(value[field], dict):
+            raise SchemaError(line, f"{field} 应为对象")
+    pricing = value.get("pricing")
+    if pricing is not None:
+        if not isinstance(pricing, dict):
+            raise SchemaError(line, "pricing 应为对象")
+        _check_number(pricing.get("base_price"), line, "pricing.base_price")
+        suppliers = pricing.get("suppliers", [])
+        if not isinstance(suppliers, list):
+            raise SchemaError(line, "pricing.suppliers 应为列表")
+        for i, supplier in enumerate(suppliers):
+            if not isinstance(supplier, dict):
+                raise SchemaError(line, f"pricing.suppliers[{i}] 应为对象")
+            _check_number(supplier.get("price"), line, f"pricing.suppliers[{i}].price")
+            if "images" in supplier:
+                _check_list_of_str(supplier["images"], line, f"pricing.suppliers[{i}].images")
+    parts = value.get("parts")
+    if parts is not None:
+        if not isinstance(parts, list):
+            raise SchemaError(line, "parts 应为列表")
+        for i, part in enumerate(parts):
+            if not isinstance(part, dict) or not isinstance(part.get("name", ""), str):
+                raise SchemaError(line, f"parts[{i}] 应为带有 name 字符串的对象")
+            if "principle_images" in part:
+                _check_list_of_str(part["principle_images"], line, f"parts[{i}].principle_images")
+
+
+class CatalogueBuilder:
+    """按先序记录逐条建立分类树"""
+
+    def __init__(self, validate=False):
+        self.validate = validate
+        self.system_data = {"categories": {}, "tags": {}, "suppliers": {}}
+        self.records = 0
+        # 分类路径 -> 其 children 字典；只保存分类，设备数据直接挂到树上
+        self._containers = {(): self.system_data["categories"]}
+
+    def add(self, record, line):
+        if not isinstance(record, dict):
+            raise SchemaError(line, "记录应为对象")
+        path = record.get("path")
+        kind = record.get("type")
+        if not isinstance(path, list) or not path or not all(isinstance(name, str) and name for name in path):
+            raise SchemaError(line, "path 应为非空的名称列表")
+        if kind not in ("category", "device"):
+            raise SchemaError(line, f"未知的记录类型: {kind!r}")
+        container = self._containers.get(tuple(path[:-1]))
+        if container is None:
+            raise SchemaError(line, f"上级分类尚未出现: {' > '.join(path[:-1])}")
+        name = path[-1]
+        if self.validate and name in container:
+            raise SchemaError(line, f"节点重复: {' > '.join(path)}")
+        value = record.get("value")
+        if kind == "category":
+            if value is not None and not isinstance(value, dict):
+                raise SchemaError(line, "分类的 value 应为对象")
+            node = dict(value or {})
+            node["children"] = {}
+            container[name] = node
+            self._containers[tuple(path)] = node["children"]
+        else:
+            if self.validate:
+                validate_device(value, line)
+            elif not isinstance(value, dict):
+                raise SchemaError(line, "设备数据应为对象")
+            container[name] = value
+        self.records += 1
+
+
+def _read_header(line):
+    try:
+        header = json.loads(line)
+    except ValueError:
+        header = None
+    if not isinstance(header, dict) or header.get("format") != FORMAT:
+        raise SchemaError(1, "不是知识库导出的 NDJSON 文件")
+    if header.get("version", 0) > VERSION:
+        raise SchemaError(1, f"文件版本 {header.get('version')} 高于程序支持的版本 {VERSION}")
+    return header
+
+
+def import_ndjson(path, validate=False, progress=None, cancelled=None):
+    """逐行读取 NDJSON 文件并建立知识库数据，返回 system_data"""
+    total = os.path.getsize(path)
+    builder = CatalogueBuilder(validate)
+    with open(path, "rb") as f:
+        first = f.readline()
+        header = _read_header(first)
+        suppliers = header.get("suppliers", {})
+        builder.system_data["suppliers"] = suppliers if isinstance(suppliers, dict) else {}
+        done = len(first)
+        for number, raw in enumerate(f, start=2):
+            done += len(raw)
+            if not raw.strip():
+                continue
+            try:
+                record = json.loads(raw)
+            except ValueError as e:
+                raise SchemaError(number, f"JSON 格式错误: {e}") from None
+            builder.add(record, number)
+            if builder.records % PROGRESS_EVERY == 0:
+                if cancelled and cancelled():
+                    raise Cancelled()
+                if progress:
+                    progress(done, total, builder.records)
+    expected = header.get("nodes")
+    if validate and isinstance(expected, int) and expected != builder.records:
+        raise SchemaError(number if builder.records else 1,
+                          f"文件头记录了 {expected} 个节点，实际读取 {builder.records} 个（文件可能不完整）")
+    if progress:
+        progress(total, total, builder.records)
+    return builder.system_data
+
+
+def import_json(path, validate=False, progress=None, cancelled=None):
+    """导入旧版本导出的整个 JSON 文件"""
+    with open(path, "r", encoding="utf-8") as f:
+        system_data = json.load(f)
+    if not isinstance(system_data, dict) or not isinstance(system_data.get("categories"), dict):
+        raise SchemaError(1, "缺少 categories")
+    if validate:
+        # 按导出的记录顺序重新建立一遍，做同样的检查（错误位置按记录序号给出）
+        builder = CatalogueBuilder(validate=True)
+        for number, record in enumerate(iter_records(system_data["categories"]), start=1):
+            builder.add(record, number)
+    total = os.path.getsize(path)
+    if progress:
+        progress(total, total, count_nodes(system_data["categories"]))
+    return system_data
+
+
+def import_file(path, validate=False, progress=None, cancelled=None):
+    """按扩展名导入 NDJSON 或旧版本的 JSON 文件"""
+    if path.lower().endswith(".json"):
+        return import_json(path, validate, progress, cancelled)
+    return import_ndjson(path, validate, progress, cancelled)
+
+
+class _Job(abc.ABC):
+    """后台线程中的导入/导出任务，子类在 work() 中完成工作并返回结果
+
+    on_progress(已完成, 总数, 记录数) 和 on_finished(任务) 都在后台线程中调用。
+    结束后 result 为结果，error 为错误说明（取消时为 None，cancelled 为 True）。
+    """
+
+    name = "transfer"
+
+    def __init__(self, on_progress=None, on_finished=None):
+        self.on_progress = on_progress
+        self.on_finished = on_finished
+        self.result = None
+        self.error = None
+        self.elapsed = 0.0
+        self._cancelled = threading.Event()
+        self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+
+    @property
+    def cancelled(self):
+        return self._cancelled.is_set()
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def cancel(self):
+        self._cancelled.set()
+
+    def wait(self, timeout=None):
+        self._thread.join(timeout)
+        return not self._thread.is_alive()
+
+    @abc.abstractmethod
+    def work(self):
+        """在后台线程中执行，返回 result；取消时抛出 Cancelled"""
+
+    def _progress(self, done, total, records):
+        if self.on_progress:
+            try:
+                self.on_progress(done, total, records)
+            except Exception as e:
+                log.exception("进度回调失败: %s", e)
+
+    def _run(self):
+        started = time.perf_counter()
+        try:
+            self.result = self.work()
+        except Cancelled:
+            pass
+        except SchemaError as e:
+            self.error = str(e)
+        except Exception as e:
+            log.exception("数据导入/导出失败")
+            self.error = str(e)
+        self.elapsed = time.perf_counter() - started
+        if self.on_finished:
+            try:
+                self.on_finished(self)
+            except Exception as e:
+                log.exception("完成回调失败: %s", e)
+
+
+class ExportJob(_Job):
+    """在后台线程中导出，result 为写入的节点数
+
+    创建任务时（界面线程中）取出快照，后台线程只读取快照，不访问正在编辑的数据。
+    """
+
+    name = "ndjson-export"
+
+    def __init__(self, system_data, path, on_progress=None, on_finished=None):
+        super().__init__(on_progress, on_finished)
+        self.snapshot = snapshot(system_data)
+        self.path = path
+
+    def work(self):
+        return write_ndjson(self.snapshot, self.path, self._progress, lambda: self.cancelled)
+
+
+class ImportJob(_Job):
+    """在后台线程中导入，result 为 system_data
+
+    encode 为存储后端的 encode_snapshot 时，同时在后台线程中序列化快照，保存在 snapshot_text 中。
+    """
+
+    name = "ndjson-import"
+
+    def __init__(self, path, validate=False, encode=None, on_progress=None, on_finished=None):
+        super().__init__(on_progress, on_finished)
+        self.path = path
+        self.validate = validate
+        self.encode = encode
+        self.snapshot_text = None
+
+    def work(self):
+        system_data = import_file(self.path, self.validate, self._progress, lambda: self.cancelled)
+        if self.encode and not self.cancelled:
+            self.snapshot_text = self.encode(system_data)
+        return system_data
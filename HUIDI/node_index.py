@@ -0,0 +1,200 @@
+"""
+节点 id 索引
+
+为 system_data["categories"] 中的每个分类和设备分配一个在本次运行中不变的整数 id，
+并维护 id -> 节点位置、id -> 路径、路径 -> id 以及父子关系。
+
+树形控件的每一项在 Qt.UserRole 中保存节点 id，由 id 可以直接得到路径和数据，
+不再需要沿着控件逐级读取显示文字再从根开始查找。重命名时 id 不变。
+
+节点位置保存为 (所在的 children 字典, 名称)，读取时总是得到字典中的当前对象。
+"""
+
+import pickle
+import functools
+
+
+def copy_reader(value):
+    """返回取得 value 副本的函数，可在其他线程中调用
+
+    在调用线程中先序列化，之后再修改 value（包括其中嵌套的列表和字典）都不影响副本。
+    """
+    return functools.partial(pickle.loads, pickle.dumps(value, pickle.HIGHEST_PROTOCOL))
+
+
+class NodeIndex:
+    """节点 id 索引"""
+
+    def __init__(self):
+        self._categories = {}
+        self._entries = {}   # id -> [所在字典, 名称, 父节点 id]
+        self._paths = {}     # id -> 路径元组
+        self._ids = {}       # 路径元组 -> id
+        self._children = {}  # id -> 子节点 id 集合（None 表示顶层）
+        self._next_id = 1
+
+    def __len__(self):
+        return len(self._entries)
+
+    def rebuild(self, categories):
+        """根据完整的分类树重建索引（加载或导入数据后调用）"""
+        self._categories = categories
+        self._entries.clear()
+        self._paths.clear()
+        self._ids.clear()
+        self._children = {None: set()}
+        for name in categories:
+            self._register(categories, name, None, (name,))
+
+    def _register(self, container, name, parent_id, path):
+        node_id = self._next_id
+        self._next_id += 1
+        self._entries[node_id] = [container, name, parent_id]
+        self._paths[node_id] = path
+        self._ids[path] = node_id
+        self._children.setdefault(parent_id, set()).add(node_id)
+        node = container[name]
+        if isinstance(node, dict) and "children" in node:
+            self._children[node_id] = set()
+            children = node["children"]
+            for child_name in children:
+                self._register(children, child_name, node_id, path + (child_name,))
+        return node_id
+
+    # ---------- 查询 ----------
+
+    def id_for_path(self, path):
+        """路径 -> id，找不到时返回 None"""
+        return self._ids.get(tuple(path))
+
+    def path(self, node_id):
+        """id -> 路径列表，找不到时返回 None"""
+        path = self._paths.get(node_id)
+        return list(path) if path is not None else None
+
+    def node(self, node_id):
+        """id -> 节点数据，找不到时返回 None"""
+        entry = self._entries.get(node_id)
+        if entry is None:
+            return None
+        return entry[0].get(entry[1])
+
+    def name(self, node_id):
+        """id -> 节点名称，找不到时返回 None"""
+        entry = self._entries.get(node_id)
+        return entry[1] if entry else None
+
+    def is_category(self, node_id):
+        """是否是分类节点（不读取节点数据）"""
+        return node_id in self._children
+
+    def parent_id(self, node_id):
+        entry = self._entries.get(node_id)
+        return entry[2] if entry else None
+
+    def child_ids(self, node_id):
+        return set(self._children.get(node_id, ()))
+
+    def ordered_child_ids(self, node_id):
+        """按数据中的顺序返回子节点 id（None 表示顶层）"""
+        if node_id is None:
+            container, path = self._categories, ()
+        else:
+            node = self.node(node_id)
+            if node_id not in self._children or not isinstance(node, dict):
+                return []
+            container, path = node.get("children") or {}, self._paths[node_id]
+        result = []
+        for name in container:
+            child_id = self._ids.get(path + (name,))
+            if child_id is not None:
+                result.append(child_id)
+        return result
+
+    def all_ids(self):
+        """返回全部节点的 id"""
+        return list(self._entries)
+
+    def leaf_ids(self):
+        """返回全部设备（非分类节点）的 id"""
+        return [node_id for node_id in self._entries if node_id not in self._children]
+
+    def snapshot(self, ids):
+        """取出节点供其他线程读取，返回 [(id, 名称, 读取函数), ...]
+
+        需要在修改数据的线程中调用。读取函数返回取出时的数据副本（见 copy_reader），
+        分类的 children 换成空字典；按需加载的设备用 LazyLeaf.reader，
+        未加载时在其他线程中直接读取数据文件，不经过缓存。
+        """
+        result = []
+        for node_id in ids:
+            container, name, _ = self._entries[node_id]
+            node = container.get(name)
+            reader = getattr(node, "reader", None)
+            if reader is not None:
+                read = reader()
+            elif isinstance(node, dict) and "children" in node:
+                read = copy_reader({key: {} if key == "children" else value for key, value in node.items()})
+            else:
+                read = copy_reader(node)
+            result.append((node_id, name, read))
+        return result
+
+    def walk_ids(self, node_id):
+        """返回节点及其全部后代的 id"""
+        result = [node_id]
+        i = 0
+        while i < len(result):
+            result.extend(self._children.get(result[i], ()))
+            i += 1
+        return result
+
+    # ---------- 维护 ----------
+
+    def add(self, path):
+        """登记数据中新增（或整体替换）的节点，返回其 id"""
+        path = tuple(path)
+        if path in self._ids:
+            self.remove(path)
+        if len(path) == 1:
+            container, parent_id = self._categories, None
+        else:
+            parent_id = self._ids.get(path[:-1])
+            parent = self.node(parent_id) if parent_id is not None else None
+            if not isinstance(parent, dict) or "children" not in parent:
+                return None
+            container = parent["children"]
+        if path[-1] not in container:
+            return None
+        return self._register(container, path[-1], parent_id, path)
+
+    def rename(self, path, new_name):
+        """登记节点重命名；与字典语义一致，同名的兄弟节点被替换"""
+        path = tuple(path)
+        node_id = self._ids.get(path)
+        if node_id is None:
+            return None
+        new_path = path[:-1] + (new_name,)
+        if new_path in self._ids and new_path != path:
+            self.remove(new_path)
+        self._entries[node_id][1] = new_name
+        depth = len(path)
+        for descendant in self.walk_ids(node_id):
+            old = self._paths[descendant]
+            updated = new_path + old[depth:]
+            del self._ids[old]
+            self._ids[updated] = descendant
+            self._paths[descendant] = updated
+        return node_id
+
+    def remove(self, path):
+        """登记节点及其后代被删除"""
+        node_id = self._ids.get(tuple(path))
+        if node_id is None:
+            return
+        parent_id = self._entries[node_id][2]
+        self._children.get(parent_id, set()).discard(node_id)
+        for descendant in self.walk_ids(node_id):
+            self._ids.pop(self._paths.pop(descendant), None)
+            self._entries.pop(descendant, None)
+            self._children.pop(descendant, None)
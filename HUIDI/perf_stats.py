@@ -0,0 +1,166 @@
+"""
+热点路径计时
+
+用 perf_counter_ns 记录每个操作的耗时，按操作名称保存在对数分桶的直方图中：
+- 每个 2 倍区间按最高的 3 位二进制分 8 个桶（只用整数运算），百分位数的相对误差
+  不超过约 6%，内存占用与调用次数无关
+- @timed("名称") 装饰函数，with measure("名称"): 计时一段代码，可以在任意线程中使用
+- snapshot() 给出每个操作的调用次数、合计、p50/p95/p99 和最大耗时（毫秒）
+- export_json() 把统计结果连同运行环境写入 JSON 文件，便于附在问题报告中
+"""
+import os
+import sys
+import json
+import math
+import time
+import platform
+import threading
+import functools
+from contextlib import contextmanager
+
+SUB_BITS = 3  # 每个 2 倍区间分 2**SUB_BITS 个桶
+
+
+def _bucket(ns):
+    bits = ns.bit_length()
+    if bits <= SUB_BITS + 1:
+        return ns
+    return ((bits - SUB_BITS) << SUB_BITS) + ((ns >> (bits - SUB_BITS - 1)) & ((1 << SUB_BITS) - 1))
+
+
+def _bucket_middle(bucket):
+    """桶所覆盖区间的中点"""
+    if bucket < (2 << SUB_BITS):
+        return bucket
+    shift = (bucket >> SUB_BITS) - 1
+    low = ((1 << SUB_BITS) + (bucket & ((1 << SUB_BITS) - 1))) << shift
+    return low + (1 << shift) / 2
+
+
+class Histogram:
+    """一个操作的耗时分布（纳秒）"""
+
+    __slots__ = ("buckets", "count", "total", "min", "max")
+
+    def __init__(self):
+        self.buckets = {}
+        self.count = 0
+        self.total = 0
+        self.min = None
+        self.max = 0
+
+    def add(self, ns):
+        bucket = _bucket(ns)
+        self.buckets[bucket] = self.buckets.get(bucket, 0) + 1
+        self.count += 1
+        self.total += ns
+        if self.min is None or ns < self.min:
+            self.min = ns
+        if ns > self.max:
+            self.max = ns
+
+    def percentile(self, q):
+        """第 q 百分位的耗时（纳秒），取所在桶的中点并限制在最小/最大值之间"""
+        if not self.count:
+            return 0
+        rank = max(1, math.ceil(self.count * q / 100))
+        seen = 0
+        for bucket in sorted(self.buckets):
+            seen += self.buckets[bucket]
+            if seen >= rank:
+                value = _bucket_middle(bucket)
+                return min(max(value, self.min), self.max)
+        return self.max
+
+
+class Recorder:
+    """按操作名称保存耗时直方图，线程安全"""
+
+    def __init__(self):
+        self.enabled = True
+        self.started = time.time()
+        self._histograms = {}
+        self._lock = threading.Lock()
+
+    def record(self, name, ns):
+        with self._lock:
+            histogram = self._histograms.get(name)
+            if histogram is None:
+                histogram = self._histograms[name] = Histogram()
+            histogram.add(ns)
+
+    def reset(self):
+        with self._lock:
+            self._histograms.clear()
+            self.started = time.time()
+
+    def snapshot(self):
+        """{操作: {"count", "total_ms", "mean_ms", "p50_ms", "p95_ms", "p99_ms", "max_ms"}}"""
+        with self._lock:
+            items = list(self._histograms.items())
+            result = {}
+            for name, h in items:
+                result[name] = {
+                    "count": h.count,
+                    "total_ms": h.total / 1e6,
+                    "mean_ms": h.total / h.count / 1e6,
+                    "p50_ms": h.percentile(50) / 1e6,
+                    "p95_ms": h.percentile(95) / 1e6,
+                    "p99_ms": h.percentile(99) / 1e6,
+                    "max_ms": h.max / 1e6,
+                }
+        return result
+
+    def export_json(self, path, extra=None):
+        """把统计结果和运行环境写入 JSON 文件"""
+        profile = {
+            "generated": time.strftime("%Y-%m-%d %H:%M:%S"),
+            "since": time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(self.started)),
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "operations": self.snapshot(),
+        }
+        if extra:
+            profile.update(extra)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(profile, f, ensure_ascii=False, indent=2)
+        return profile
+
+    @contextmanager
+    def measure(self, name):
+        if not self.enabled:
+            yield
+            return
+        start = time.perf_counter_ns()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter_ns() - start)
+
+    def timed(self, name=None):
+        """装饰器：记录函数每次调用的耗时（异常退出也记录）"""
+        def decorate(func):
+            label = name or func.__qualname__
+
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return func(*args, **kwargs)
+                start = time.perf_counter_ns()
+                try:
+                    return func(*args, **kwargs)
+                finally:
+                    self.record(label, time.perf_counter_ns() - start)
+            return wrapper
+        return decorate
+
+
+# 程序共用的记录器
+RECORDER = Recorder()
+record = RECORDER.record
+timed = RECORDER.timed
+measure = RECORDER.measure
+snapshot = RECORDER.snapshot
+export_json = RECORDER.export_json
+reset = RECORDER.reset
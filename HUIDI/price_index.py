@@ -0,0 +1,193 @@
+"""
+供应商价格索引
+
+把所有设备的供应商报价按币种保存为有序列表，元素为
+(价格, 供应商名称, 设备 id, 供应商序号)，价格区间查询用二分查找定位，
+不需要遍历整棵分类树。
+
+- 设备价格信息保存时调用 set_pricing() 增量更新，删除设备时调用 remove()
+- query() 支持最低/最高价格、币种过滤、升序/降序和分页；不同币种的价格不能直接比较，
+  不限币种时结果按币种分组，组内按价格排序
+- 设备 id 来自 NodeIndex，重命名不影响索引
+- 全量建立分两步：prepare() 在界面线程中取出设备，build() 在后台线程中建立索引，
+  完成后一次替换；建立期间被修改的设备记在 stale 中，由调用方在完成后重新登记
+"""
+import threading
+from bisect import bisect_left, bisect_right, insort
+
+
+class PriceIndex:
+    """按价格排序的供应商报价索引"""
+
+    def __init__(self):
+        self.built = False
+        self.building = False  # prepare() 之后、build() 完成之前
+        self.stale = set()     # 后台建立期间被修改的设备 id
+        self._generation = 0   # 每次 clear() 加一，作废正在建立的索引
+        self._by_currency = {}  # 币种 -> 有序的 (价格, 供应商, 设备 id, 序号) 列表
+        self._by_node = {}      # 设备 id -> (币种, 该设备的条目列表)
+        # 后台线程替换建立好的索引时与界面线程互斥
+        self.lock = threading.RLock()
+
+    def __len__(self):
+        return sum(len(entries) for entries in self._by_currency.values())
+
+    @staticmethod
+    def entries_for(node_id, pricing):
+        """从设备的 pricing 字段取出有效报价，返回 (币种, 条目列表)"""
+        if not isinstance(pricing, dict):
+            return None, []
+        currency = pricing.get("currency") or "CNY"
+        entries = []
+        suppliers = pricing.get("suppliers")
+        for slot, supplier in enumerate(suppliers if isinstance(suppliers, list) else []):
+            if not isinstance(supplier, dict):
+                continue
+            price = supplier.get("price")
+            if price is None or price == "":
+                continue
+            try:
+                price = float(price)
+            except (ValueError, TypeError):
+                continue
+            entries.append((price, str(supplier.get("name", "未知供应商")), node_id, slot))
+        return currency, entries
+
+    def clear(self):
+        with self.lock:
+            self.built = False
+            self.building = False
+            self.stale.clear()
+            self._generation += 1
+            self._by_currency = {}
+            self._by_node = {}
+
+    def rebuild(self, node_index):
+        """为 NodeIndex 中的全部设备建立索引（在调用线程中完成）"""
+        self.build(self.prepare(node_index))
+
+    def prepare(self, node_index):
+        """清空索引并取出全部设备（在修改数据的线程中调用），返回交给 build() 的任务"""
+        with self.lock:
+            self.clear()
+            self.building = True
+            return self._generation, node_index.snapshot(node_index.leaf_ids())
+
+    def build(self, task, cancelled=None):
+        """按 prepare() 取出的设备建立索引，可以在后台线程中调用，返回是否建立完成
+
+        索引先建立在单独的字典中，完成后在锁内一次替换；期间索引被 clear() 时放弃。
+        无论完成、取消还是出错都清除 building，之后的搜索可以重新建立。
+        """
+        generation, nodes = task
+        by_currency = {}
+        by_node = {}
+        try:
+            for count, (node_id, _, node) in enumerate(nodes):
+                if cancelled and count % 1024 == 0 and cancelled():
+                    return False
+                node = node() if callable(node) else node
+                if not isinstance(node, dict):
+                    continue
+                currency, entries = self.entries_for(node_id, node.get("pricing"))
+                if entries:
+                    by_node[node_id] = (currency, entries)
+                    by_currency.setdefault(currency, []).extend(entries)
+            for entries in by_currency.values():
+                entries.sort()
+            with self.lock:
+                if generation != self._generation:
+                    return False
+                self._by_currency = by_currency
+                self._by_node = by_node
+                self.built = True
+                return True
+        finally:
+            with self.lock:
+                if generation == self._generation:
+                    self.building = False
+
+    def take_stale(self):
+        """取出建立期间被修改的设备 id"""
+        with self.lock:
+            stale, self.stale = self.stale, set()
+            return stale
+
+    def set_pricing(self, node_id, pricing):
+        """更新一个设备的报价；内容未变化时不做任何改动"""
+        currency, entries = self.entries_for(node_id, pricing)
+        old = self._by_node.get(node_id)
+        if old is not None and old == (currency, entries):
+            return
+        self.remove([node_id])
+        if not entries:
+            return
+        self._by_node[node_id] = (currency, entries)
+        ordered = self._by_currency.setdefault(currency, [])
+        for entry in entries:
+            insort(ordered, entry)
+
+    def remove(self, node_ids):
+        """移除设备的全部报价"""
+        for node_id in node_ids:
+            old = self._by_node.pop(node_id, None)
+            if old is None:
+                continue
+            currency, entries = old
+            ordered = self._by_currency[currency]
+            for entry in entries:
+                i = bisect_left(ordered, entry)
+                if i < len(ordered) and ordered[i] == entry:
+                    del ordered[i]
+            if not ordered:
+                del self._by_currency[currency]
+
+    def currencies(self):
+        return sorted(self._by_currency)
+
+    def _range(self, ordered, min_price, max_price):
+        start = 0 if min_price is None else bisect_left(ordered, (min_price,))
+        # (价格, ) 排在同价格的所有条目之前，所以上界用 (价格, 最大字符)
+        end = len(ordered) if max_price is None else bisect_right(ordered, (max_price, "\U0010ffff"))
+        return start, max(start, end)
+
+    def count(self, min_price=None, max_price=None, currency=None):
+        """区间内的报价条数"""
+        total = 0
+        for name, ordered in self._by_currency.items():
+            if currency is None or name == currency:
+                start, end = self._range(ordered, min_price, max_price)
+                total += end - start
+        return total
+
+    def query(self, min_price=None, max_price=None, currency=None, offset=0, limit=50, descending=False):
+        """返回 (总条数, [(价格, 供应商, 设备 id, 序号, 币种), ...])
+
+        不限币种时按币种名称分组依次返回，descending 只影响组内的价格顺序。
+        """
+        ranges = []
+        for name in self.currencies():
+            if currency is None or name == currency:
+                ordered = self._by_currency[name]
+                start, end = self._range(ordered, min_price, max_price)
+                if end > start:
+                    ranges.append((name, ordered, start, end))
+        total = sum(end - start for _, _, start, end in ranges)
+
+        # 跳过 offset 之前的整组，只在起始的组内按下标定位
+        results = []
+        for name, ordered, start, end in ranges:
+            if len(results) >= limit:
+                break
+            if offset >= end - start:
+                offset -= end - start
+                continue
+            if descending:
+                stop = end - offset
+                indices = range(stop - 1, max(start, stop - (limit - len(results))) - 1, -1)
+            else:
+                first = start + offset
+                indices = range(first, min(end, first + limit - len(results)))
+            results.extend(ordered[i] + (name,) for i in indices)
+            offset = 0
+        return total, results
@@ -0,0 +1,185 @@
+"""
+后台搜索线程
+
+界面线程只提交查询文本，搜索在专用线程中执行，结果按相关度分页回调。
+
+- 同一时间只执行最新的查询：提交新查询时，尚未开始的旧查询直接丢弃，
+  正在计算的旧查询在下一个检查点停止
+- 第一页结果算出后立即回调，其余结果随后分页回调
+- 记录每个查询的首页耗时和总耗时
+- build_index() 在同一线程中建立全文索引，之后提交的查询等建立完成后再执行
+"""
+import atexit
+import threading
+import time
+from collections import deque
+
+import app_log
+
+log = app_log.get_logger("search")
+
+
+class SearchExecutor:
+    """只执行最新查询的单线程搜索器"""
+
+    def __init__(self, search_index, on_page=None, on_finished=None, page_size=50, limit=None, history=200,
+                 on_built=None):
+        # on_page(查询编号, [(节点 id, 分数), ...])、on_finished(查询编号, 统计字典)
+        # 和 on_built(统计字典) 都在搜索线程中被调用
+        self.search_index = search_index
+        self.on_page = on_page
+        self.on_finished = on_finished
+        self.on_built = on_built
+        self.page_size = page_size
+        self.limit = limit
+
+        self._condition = threading.Condition()
+        self._pending = None  # (查询编号, 查询文本, 提交时间)
+        self._build = None    # SearchIndex.prepare() 取出的建立索引任务
+        self._latest = 0
+        self._closed = False
+
+        # 统计信息
+        self.submitted = 0
+        self.completed = 0
+        self.cancelled = 0
+        self.failed = 0
+        self.latencies = deque(maxlen=history)  # 最近查询的统计字典
+
+        self._thread = threading.Thread(target=self._run, name="search-executor", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def submit(self, query):
+        """提交查询，返回查询编号；之前提交的查询都作废"""
+        with self._condition:
+            if self._closed:
+                raise RuntimeError("搜索线程已关闭")
+            self._latest += 1
+            if self._pending is not None:
+                self.cancelled += 1
+            self._pending = (self._latest, query, time.perf_counter())
+            self.submitted += 1
+            self._condition.notify()
+            return self._latest
+
+    def build_index(self, task):
+        """在搜索线程中建立全文索引（task 由 SearchIndex.prepare() 取出），完成后调用 on_built"""
+        with self._condition:
+            if self._closed:
+                raise RuntimeError("搜索线程已关闭")
+            self._build = task
+            self._condition.notify()
+
+    def cancel(self):
+        """作废所有已提交的查询（例如清空搜索框时）"""
+        with self._condition:
+            self._latest += 1
+            if self._pending is not None:
+                self.cancelled += 1
+                self._pending = None
+
+    def is_current(self, query_id):
+        return query_id == self._latest
+
+    def close(self):
+        """停止搜索线程，可重复调用"""
+        with self._condition:
+            if self._closed:
+                return
+            self._closed = True
+            self._latest += 1
+            self._condition.notify()
+        self._thread.join()
+
+    def summary(self):
+        """最近查询的耗时统计（毫秒）"""
+        finished = [entry for entry in self.latencies if not entry["cancelled"]]
+        if not finished:
+            return {"count": 0}
+
+        def percentile(values, fraction):
+            values = sorted(values)
+            return values[min(len(values) - 1, int(len(values) * fraction))]
+
+        first = [entry["first_page_ms"] for entry in finished if entry["first_page_ms"] is not None]
+        total = [entry["total_ms"] for entry in finished]
+        return {
+            "count": len(finished),
+            "first_page_p50": percentile(first, 0.5) if first else None,
+            "first_page_p95": percentile(first, 0.95) if first else None,
+            "total_p50": percentile(total, 0.5),
+            "total_p95": percentile(total, 0.95),
+        }
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while self._pending is None and self._build is None and not self._closed:
+                    self._condition.wait()
+                if self._closed:
+                    return
+                build, self._build = self._build, None
+                if build is None:
+                    query_id, query, submitted_at = self._pending
+                    self._pending = None
+            if build is not None:
+                self._build_index(build)
+            else:
+                self._execute(query_id, query, submitted_at)
+
+    def _build_index(self, task):
+        started = time.perf_counter()
+        built = False
+        try:
+            built = self.search_index.build(task, lambda: self._closed)
+        except Exception:
+            log.exception("建立搜索索引失败")
+        stats = {"built": built, "nodes": len(self.search_index),
+                 "total_ms": (time.perf_counter() - started) * 1000}
+        if self.on_built is not None:
+            try:
+                self.on_built(stats)
+            except Exception as e:
+                log.exception("索引建立回调失败: %s", e)
+
+    def _execute(self, query_id, query, submitted_at):
+        def cancelled():
+            return query_id != self._latest
+
+        started = time.perf_counter()
+        stats = {
+            "query": query,
+            "queue_ms": (started - submitted_at) * 1000,
+            "first_page_ms": None,
+            "total_ms": None,
+            "results": 0,
+            "cancelled": False,
+        }
+        try:
+            for page in self.search_index.search_pages(query, self.page_size, self.limit, cancelled):
+                if cancelled():
+                    break
+                if stats["first_page_ms"] is None:
+                    stats["first_page_ms"] = (time.perf_counter() - started) * 1000
+                stats["results"] += len(page)
+                self._report(self.on_page, query_id, page)
+        except Exception:
+            self.failed += 1
+            log.exception("搜索失败: %s", query)
+        stats["total_ms"] = (time.perf_counter() - started) * 1000
+        if cancelled():
+            stats["cancelled"] = True
+            self.cancelled += 1
+        else:
+            self.completed += 1
+        self.latencies.append(stats)
+        self._report(self.on_finished, query_id, stats)
+
+    def _report(self, callback, query_id, value):
+        if callback is None:
+            return
+        try:
+            callback(query_id, value)
+        except Exception as e:
+            log.exception("搜索结果回调失败: %s", e)
@@ -0,0 +1,298 @@
+"""
+全文搜索索引
+
+对分类/设备名称、标签、内容、维护信息、技术参数以及零部件名称和描述建立倒排索引，
+按 BM25 排序返回前 k 个结果。
+
+- 中文按字切分为单字和相邻两字（二元组），查询两个字以上时只用二元组，
+  相当于要求查询中的每一对相邻字都出现在文档中
+- 英文和数字按单词切分，查询词同时匹配以它开头的词（如 "b80" 匹配 "b800"）
+- 名称和标签的词频加权，命中名称的结果排在前面
+- 节点保存时调用 update() 增量更新，删除时调用 remove()
+- 索引带有锁，可以在后台线程中查询；search_pages() 先返回第一页，
+  其余结果随后分页返回，并可在计算过程中取消
+- 全量建立分两步：prepare() 在界面线程中取出节点，build() 在后台线程中建立索引，
+  完成后一次替换；建立期间被修改的节点记在 stale 中，由调用方在完成后重新索引
+"""
+import re
+import math
+import heapq
+import threading
+from collections import Counter
+from bisect import bisect_left, insort
+
+_CJK = "㐀-䶿一-鿿豈-﫿"
+_TOKEN_RE = re.compile(f"[{_CJK}]+|[a-z0-9]+(?:\\.[0-9]+)*")
+_CJK_RE = re.compile(f"[{_CJK}]")
+
+# 字段权重
+NAME_WEIGHT = 3
+TAG_WEIGHT = 2
+TEXT_WEIGHT = 1
+
+# 查询词前缀扩展的上限，避免过短的英文查询展开成大量词
+MAX_PREFIX_EXPANSION = 64
+
+
+def tokenize(text, for_query=False):
+    """切分文本；建立索引时中文同时输出单字和二元组，查询时两字以上只用二元组"""
+    tokens = []
+    for run in _TOKEN_RE.findall(text.lower()):
+        if _CJK_RE.match(run):
+            if len(run) == 1:
+                tokens.append(run)
+                continue
+            if not for_query:
+                tokens.extend(run)
+            tokens.extend(run[i:i + 2] for i in range(len(run) - 1))
+        else:
+            tokens.append(run)
+    return tokens
+
+
+def document_fields(name, node):
+    """返回节点需要索引的 (权重, 文本) 列表"""
+    fields = [(NAME_WEIGHT, name)]
+    if not isinstance(node, dict) or "children" in node:
+        return fields
+    if hasattr(node, "to_plain"):
+        # 按需加载的设备直接读取数据，不占用缓存
+        node = node.to_plain()
+
+    def text(value):
+        return value if isinstance(value, str) else ""
+
+    tags = node.get("tags")
+    if isinstance(tags, list):
+        fields.append((TAG_WEIGHT, " ".join(text(tag) for tag in tags)))
+    fields.append((TEXT_WEIGHT, text(node.get("content"))))
+    maintenance = node.get("maintenance")
+    if isinstance(maintenance, dict):
+        fields.append((TEXT_WEIGHT, " ".join(text(maintenance.get(key)) for key in ("cycle", "procedures", "notes"))))
+    params = node.get("technical_params")
+    if isinstance(params, dict):
+        fields.append((TEXT_WEIGHT, " ".join(f"{key} {value}" for key, value in params.items())))
+    parts = node.get("parts")
+    if isinstance(parts, list):
+        for part in parts:
+            if isinstance(part, dict):
+                fields.append((TEXT_WEIGHT, f"{text(part.get('name'))} {text(part.get('description'))}"))
+    return fields
+
+
+class SearchIndex:
+    """BM25 倒排索引"""
+
+    def __init__(self, k1=1.2, b=0.75):
+        self.k1 = k1
+        self.b = b
+        self.built = False
+        self.building = False  # prepare() 之后、build() 完成之前
+        self.stale = set()     # 后台建立期间被修改的节点 id
+        self._generation = 0   # 每次 clear() 加一，作废正在建立的索引
+        self._postings = {}    # 词 -> {节点 id: 加权词频}
+        self._doc_terms = {}   # 节点 id -> {词: 加权词频}
+        self._doc_len = {}     # 节点 id -> 加权长度
+        self._total_len = 0
+        self._ascii_terms = []  # 排序后的英文/数字词，用于前缀扩展
+        # 界面线程更新索引、搜索线程查询时互斥
+        self.lock = threading.RLock()
+
+    def __len__(self):
+        return len(self._doc_terms)
+
+    def clear(self):
+        with self.lock:
+            self.built = False
+            self.building = False
+            self.stale.clear()
+            self._generation += 1
+            self._postings = {}
+            self._doc_terms = {}
+            self._doc_len = {}
+            self._total_len = 0
+            self._ascii_terms = []
+
+    def rebuild(self, node_index):
+        """为 NodeIndex 中的全部节点建立索引（在调用线程中完成）"""
+        self.build(self.prepare(node_index))
+
+    def prepare(self, node_index):
+        """清空索引并取出全部节点（在修改数据的线程中调用），返回交给 build() 的任务"""
+        with self.lock:
+            self.clear()
+            self.building = True
+            return self._generation, node_index.snapshot(node_index.all_ids())
+
+    def build(self, task, cancelled=None):
+        """按 prepare() 取出的节点建立索引，可以在后台线程中调用，返回是否建立完成
+
+        索引先建立在单独的对象中，完成后在锁内一次替换；期间索引被 clear() 时放弃。
+        无论完成、取消还是出错都清除 building，之后的搜索可以重新建立。
+        """
+        generation, nodes = task
+        fresh = SearchIndex(self.k1, self.b)
+        try:
+            for count, (node_id, name, node) in enumerate(nodes):
+                if cancelled and count % 1024 == 0 and cancelled():
+                    return False
+                fresh._add(node_id, name, node() if callable(node) else node, fresh._ascii_terms.append)
+            # 全量建立时最后统一排序，比逐个插入快得多
+            fresh._ascii_terms.sort()
+            with self.lock:
+                if generation != self._generation:
+                    return False
+                self._postings = fresh._postings
+                self._doc_terms = fresh._doc_terms
+                self._doc_len = fresh._doc_len
+                self._total_len = fresh._total_len
+                self._ascii_terms = fresh._ascii_terms
+                self.built = True
+                return True
+        finally:
+            with self.lock:
+                if generation == self._generation:
+                    self.building = False
+
+    def take_stale(self):
+        """取出建立期间被修改的节点 id"""
+        with self.lock:
+            stale, self.stale = self.stale, set()
+            return stale
+
+    def update(self, node_id, name, node):
+        """新增或替换一个节点的索引"""
+        with self.lock:
+            self.remove([node_id])
+            self._add(node_id, name, node, lambda term: insort(self._ascii_terms, term))
+
+    def _add(self, node_id, name, node, add_ascii_term):
+        terms = {}
+        for weight, text in document_fields(name, node):
+            # Counter 在 C 中计数，比逐词累加快
+            for token, count in Counter(tokenize(text)).items():
+                terms[token] = terms.get(token, 0) + count * weight
+        if not terms:
+            return
+        self._doc_terms[node_id] = terms
+        length = sum(terms.values())
+        self._doc_len[node_id] = length
+        self._total_len += length
+        for term, tf in terms.items():
+            postings = self._postings.get(term)
+            if postings is None:
+                postings = self._postings[term] = {}
+                if not _CJK_RE.match(term):
+                    add_ascii_term(term)
+            postings[node_id] = tf
+
+    def remove(self, node_ids):
+        """移除节点的索引"""
+        with self.lock:
+            for node_id in node_ids:
+                terms = self._doc_terms.pop(node_id, None)
+                if terms is None:
+                    continue
+                self._total_len -= self._doc_len.pop(node_id)
+                for term in terms:
+                    postings = self._postings[term]
+                    del postings[node_id]
+                    if not postings:
+                        del self._postings[term]
+                        if not _CJK_RE.match(term):
+                            i = bisect_left(self._ascii_terms, term)
+                            if i < len(self._ascii_terms) and self._ascii_terms[i] == term:
+                                del self._ascii_terms[i]
+
+    def _expand(self, token):
+        """查询词 -> 匹配的索引词（英文/数字词按前缀扩展）"""
+        if _CJK_RE.match(token):
+            return [token] if token in self._postings else []
+        terms = []
+        i = bisect_left(self._ascii_terms, token)
+        while i < len(self._ascii_terms) and self._ascii_terms[i].startswith(token):
+            terms.append(self._ascii_terms[i])
+            if len(terms) >= MAX_PREFIX_EXPANSION:
+                break
+            i += 1
+        return terms
+
+    def search(self, query, limit=50):
+        """返回按相关度排序的 [(节点 id, 分数), ...]，所有查询词都必须命中"""
+        scored = self._score(query)
+        return heapq.nlargest(limit, scored, key=lambda result: result[1]) if scored else []
+
+    def search_pages(self, query, page_size=50, limit=None, cancelled=None):
+        """分页返回排序结果的生成器
+
+        先用堆选出第一页立即返回，其余结果排序后再逐页返回。
+        cancelled() 返回 True 时停止计算，不再返回任何结果。
+        """
+        scored = self._score(query, cancelled)
+        if not scored:
+            return
+        if limit is not None:
+            scored = heapq.nlargest(limit, scored, key=lambda result: result[1])
+            for i in range(0, len(scored), page_size):
+                yield scored[i:i + page_size]
+            return
+        first = heapq.nlargest(page_size, scored, key=lambda result: result[1])
+        yield first
+        if len(scored) <= page_size or (cancelled and cancelled()):
+            return
+        shown = {node_id for node_id, _ in first}
+        rest = sorted((result for result in scored if result[0] not in shown),
+                      key=lambda result: result[1], reverse=True)
+        for i in range(0, len(rest), page_size):
+            if cancelled and cancelled():
+                return
+            yield rest[i:i + page_size]
+
+    def _score(self, query, cancelled=None):
+        """对所有命中的节点计算 BM25 分数，返回 [(节点 id, 分数), ...]；被取消时返回 None"""
+        tokens = list(dict.fromkeys(tokenize(query, for_query=True)))
+        with self.lock:
+            if not tokens or not self._doc_terms:
+                return []
+
+            # 每个查询词对应的 {节点 id: 词频}，前缀扩展出的多个词合并
+            groups = []
+            for token in tokens:
+                terms = self._expand(token)
+                if not terms:
+                    return []
+                if len(terms) == 1:
+                    groups.append(self._postings[terms[0]])
+                else:
+                    merged = {}
+                    for term in terms:
+                        for node_id, tf in self._postings[term].items():
+                            merged[node_id] = merged.get(node_id, 0) + tf
+                    groups.append(merged)
+
+            # 从最短的倒排表开始求交集
+            groups.sort(key=len)
+            candidates = set(groups[0])
+            for postings in groups[1:]:
+                candidates.intersection_update(postings)
+                if not candidates:
+                    return []
+
+            doc_count = len(self._doc_terms)
+            avg_len = self._total_len / doc_count
+            k1, b = self.k1, self.b
+            weights = [(postings, math.log(1 + (doc_count - len(postings) + 0.5) / (len(postings) + 0.5)))
+                       for postings in groups]
+            doc_len = self._doc_len
+
+            scored = []
+            for count, node_id in enumerate(candidates):
+                if cancelled and count % 2048 == 0 and cancelled():
+                    return None
+                norm = k1 * (1 - b + b * doc_len[node_id] / avg_len)
+                total = 0.0
+                for postings, idf in weights:
+                    tf = postings[node_id]
+                    total += idf * tf * (k1 + 1) / (tf + norm)
+                scored.append((node_id, total))
+            return scored
@@ -0,0 +1,427 @@
+"""
+SQLite 知识库存储
+
+把 system_data["categories"] 的树结构拆分保存在 SQLite 数据库中：
+
+- nodes:       分类和设备节点，按 (parent_id, name) 建立唯一索引，路径逐级走索引定位
+- node_tags:   设备标签
+- tech_params: 技术参数
+- suppliers:   供应商（按价格建立索引）
+- parts:       零部件
+- image_refs:  设备图片、原理图片、供应商图片和零部件原理图片的引用
+- meta:        categories 以外的顶层数据（tags、suppliers 等）
+
+提供与 JournalStore 相同的持久化接口（load / append_encoded / write_snapshot_text /
+close），作为 KnowledgeBase 的存储后端：启动时 load() 读出完整的分类树，之后每条变更
+记录只改动相关节点的行。节点在父分类中的顺序与字典语义一致（重命名的节点移到末尾），
+换用不同的后端不会改变界面中的顺序。
+
+直接运行本文件可以把现有的 system_data.json（连同未合并的日志）一次性迁移到
+同目录下的 system_data.db：
+
+    python sqlite_store.py <system_data.json 路径>
+"""
+import os
+import json
+import sqlite3
+import logging
+import threading
+
+import app_log
+from journal_store import JournalStore
+
+log = app_log.get_logger("store")
+
+ROOT_ID = 0
+
+# 设备节点中被拆分到独立表的字段
+SPLIT_KEYS = ("tags", "technical_params", "images", "principle_images", "parts")
+# 拆分后在 extra 中记录原节点包含哪些字段，重建时据此还原
+SPLIT_MARK = "__split__"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS nodes (
+    id INTEGER PRIMARY KEY,
+    parent_id INTEGER REFERENCES nodes(id) ON DELETE CASCADE,
+    name TEXT NOT NULL,
+    position INTEGER NOT NULL DEFAULT 0,
+    is_category INTEGER NOT NULL DEFAULT 0,
+    content TEXT,
+    base_price REAL,
+    currency TEXT,
+    extra TEXT NOT NULL DEFAULT '{}'
+);
+CREATE UNIQUE INDEX IF NOT EXISTS idx_nodes_parent_name ON nodes(parent_id, name);
+
+CREATE TABLE IF NOT EXISTS node_tags (
+    node_id INTEGER NOT NULL REFERENCES nodes(id) ON DELETE CASCADE,
+    position INTEGER NOT NULL,
+    tag TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_node_tags_node ON node_tags(node_id);
+CREATE INDEX IF NOT EXISTS idx_node_tags_tag ON node_tags(tag);
+
+CREATE TABLE IF NOT EXISTS tech_params (
+    node_id INTEGER NOT NULL REFERENCES nodes(id) ON DELETE CASCADE,
+    position INTEGER NOT NULL,
+    name TEXT NOT NULL,
+    value TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_tech_params_node ON tech_params(node_id);
+
+CREATE TABLE IF NOT EXISTS suppliers (
+    id INTEGER PRIMARY KEY,
+    node_id INTEGER NOT NULL REFERENCES nodes(id) ON DELETE CASCADE,
+    position INTEGER NOT NULL,
+    name TEXT,
+    price REAL,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_suppliers_node ON suppliers(node_id);
+CREATE INDEX IF NOT EXISTS idx_suppliers_price ON suppliers(price);
+
+CREATE TABLE IF NOT EXISTS parts (
+    id INTEGER PRIMARY KEY,
+    node_id INTEGER NOT NULL REFERENCES nodes(id) ON DELETE CASCADE,
+    position INTEGER NOT NULL,
+    name TEXT,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_parts_node ON parts(node_id);
+
+CREATE TABLE IF NOT EXISTS image_refs (
+    node_id INTEGER NOT NULL REFERENCES nodes(id) ON DELETE CASCADE,
+    kind TEXT NOT NULL,
+    owner_id INTEGER,
+    position INTEGER NOT NULL,
+    path TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_image_refs_node ON image_refs(node_id);
+CREATE INDEX IF NOT EXISTS idx_image_refs_path ON image_refs(path);
+
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+
+def _to_float(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+class SQLiteStore:
+    """SQLite 知识库存储"""
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        directory = os.path.dirname(db_path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory, exist_ok=True)
+
+        # 后台写入线程与界面线程共用一个连接，由锁保证串行访问
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA foreign_keys = ON")
+        self._conn.execute("PRAGMA journal_mode = WAL")
+        self._conn.executescript(SCHEMA)
+        self._conn.execute(
+            "INSERT OR IGNORE INTO nodes (id, parent_id, name, is_category) VALUES (?, NULL, '', 1)",
+            (ROOT_ID,))
+        self._conn.commit()
+
+        # 统计信息
+        self.records_written = 0
+        self.bytes_written = 0
+
+    # ---------- 树操作 ----------
+
+    def _resolve(self, path):
+        """按路径逐级查找节点 id，找不到时返回 None"""
+        node_id = ROOT_ID
+        for name in path:
+            row = self._conn.execute(
+                "SELECT id FROM nodes WHERE parent_id = ? AND name = ?", (node_id, name)).fetchone()
+            if row is None:
+                return None
+            node_id = row[0]
+        return node_id
+
+    def _set_node(self, path, value):
+        if not path or not isinstance(value, dict):
+            return
+        parent_id = self._resolve(path[:-1])
+        if parent_id is None:
+            return
+        row = self._conn.execute(
+            "SELECT id, position FROM nodes WHERE parent_id = ? AND name = ?",
+            (parent_id, path[-1])).fetchone()
+        if row:
+            node_id, position = row
+            self._conn.execute("DELETE FROM nodes WHERE id = ?", (node_id,))
+        else:
+            node_id, position = None, self._next_position(parent_id)
+        self._insert_node(parent_id, path[-1], position, value, node_id)
+
+    def _rename_node(self, path, new_name):
+        # 与 container[new_name] = container.pop(old_name) 相同：改名的节点移到末尾，
+        # 同名的兄弟节点被替换时占据它原来的位置
+        node_id = self._resolve(path)
+        if node_id is None or path[-1] == new_name:
+            return
+        parent_id = self._resolve(path[:-1])
+        row = self._conn.execute(
+            "SELECT id, position FROM nodes WHERE parent_id = ? AND name = ?", (parent_id, new_name)).fetchone()
+        if row:
+            self._conn.execute("DELETE FROM nodes WHERE id = ?", (row[0],))
+            position = row[1]
+        else:
+            position = self._next_position(parent_id)
+        self._conn.execute("UPDATE nodes SET name = ?, position = ? WHERE id = ?", (new_name, position, node_id))
+
+    def _delete_node(self, path):
+        node_id = self._resolve(path)
+        if node_id is not None and node_id != ROOT_ID:
+            self._conn.execute("DELETE FROM nodes WHERE id = ?", (node_id,))
+
+    def _next_position(self, parent_id):
+        row = self._conn.execute(
+            "SELECT MAX(position) FROM nodes WHERE parent_id = ?", (parent_id,)).fetchone()
+        return 0 if row[0] is None else row[0] + 1
+
+    # ---------- 节点拆分与重建 ----------
+
+    def _insert_node(self, parent_id, name, position, node, node_id=None):
+        """把节点字典拆分写入各表，分类会递归写入子节点"""
+        if "children" in node and isinstance(node["children"], dict):
+            extra = {k: v for k, v in node.items() if k != "children"}
+            cursor = self._conn.execute(
+                "INSERT INTO nodes (id, parent_id, name, position, is_category, extra) VALUES (?, ?, ?, ?, 1, ?)",
+                (node_id, parent_id, name, position, json.dumps(extra, ensure_ascii=False)))
+            new_id = cursor.lastrowid
+            for child_position, (child_name, child) in enumerate(node["children"].items()):
+                if isinstance(child, dict):
+                    self._insert_node(new_id, child_name, child_position, child)
+            return new_id
+
+        extra = {}
+        split = []
+        content = None
+        for key, value in node.items():
+            if key == "content" and isinstance(value, str):
+                content = value
+            elif key in ("tags", "images", "principle_images", "parts") and isinstance(value, list):
+                split.append(key)
+            elif key == "technical_params" and isinstance(value, dict):
+                split.append(key)
+            else:
+                extra[key] = value
+
+        pricing = node.get("pricing")
+        base_price = currency = None
+        if isinstance(pricing, dict):
+            base_price = _to_float(pricing.get("base_price"))
+            currency = pricing.get("currency")
+            if isinstance(pricing.get("suppliers"), list):
+                extra["pricing"] = {k: v for k, v in pricing.items() if k != "suppliers"}
+                split.append("pricing.suppliers")
+        if split:
+            extra[SPLIT_MARK] = split
+
+        cursor = self._conn.execute(
+            "INSERT INTO nodes (id, parent_id, name, position, is_category, content, base_price, currency, extra)"
+            " VALUES (?, ?, ?, ?, 0, ?, ?, ?, ?)",
+            (node_id, parent_id, name, position, content, base_price,
+             currency if isinstance(currency, str) else None, json.dumps(extra, ensure_ascii=False)))
+        new_id = cursor.lastrowid
+
+        if "tags" in split:
+            self._conn.executemany(
+                "INSERT INTO node_tags (node_id, position, tag) VALUES (?, ?, ?)",
+                [(new_id, i, str(tag)) for i, tag in enumerate(node["tags"])])
+        if "technical_params" in split:
+            self._conn.executemany(
+                "INSERT INTO tech_params (node_id, position, name, value) VALUES (?, ?, ?, ?)",
+                [(new_id, i, param_name, json.dumps(param_value, ensure_ascii=False))
+                 for i, (param_name, param_value) in enumerate(node["technical_params"].items())])
+        for kind in ("images", "principle_images"):
+            if kind in split:
+                self._insert_images(new_id, kind, None, node[kind])
+        if "pricing.suppliers" in split:
+            for i, supplier in enumerate(pricing["suppliers"]):
+                self._insert_owned(new_id, "suppliers", "supplier", i, supplier, "images",
+                                   price=_to_float(supplier.get("price")) if isinstance(supplier, dict) else None)
+        if "parts" in split:
+            for i, part in enumerate(node["parts"]):
+                self._insert_owned(new_id, "parts", "part", i, part, "principle_images")
+        return new_id
+
+    def _insert_owned(self, node_id, table, kind, position, item, image_key, price=None):
+        """写入供应商或零部件，其图片列表写入 image_refs"""
+        data = dict(item) if isinstance(item, dict) else {"__value__": item}
+        images = data.pop(image_key, None)
+        if isinstance(images, list):
+            data[SPLIT_MARK] = [image_key]
+        elif images is not None:
+            data[image_key] = images
+        name = data.get("name") if isinstance(data.get("name"), str) else None
+        if table == "suppliers":
+            cursor = self._conn.execute(
+                "INSERT INTO suppliers (node_id, position, name, price, data) VALUES (?, ?, ?, ?, ?)",
+                (node_id, position, name, price, json.dumps(data, ensure_ascii=False)))
+        else:
+            cursor = self._conn.execute(
+                "INSERT INTO parts (node_id, position, name, data) VALUES (?, ?, ?, ?)",
+                (node_id, position, name, json.dumps(data, ensure_ascii=False)))
+        if isinstance(images, list):
+            self._insert_images(node_id, kind, cursor.lastrowid, images)
+
+    def _insert_images(self, node_id, kind, owner_id, images):
+        self._conn.executemany(
+            "INSERT INTO image_refs (node_id, kind, owner_id, position, path) VALUES (?, ?, ?, ?, ?)",
+            [(node_id, kind, owner_id, i, str(path)) for i, path in enumerate(images)])
+
+    def _assemble(self, rows):
+        """根据全部节点行和拆分表重建节点字典"""
+        nodes = {}
+        for node_id, is_category, content, extra in rows:
+            node = json.loads(extra)
+            split = node.pop(SPLIT_MARK, [])
+            if is_category:
+                node["children"] = {}
+            else:
+                if content is not None:
+                    node["content"] = content
+                for key in split:
+                    if key == "technical_params":
+                        node[key] = {}
+                    elif key == "pricing.suppliers":
+                        node.setdefault("pricing", {})["suppliers"] = []
+                    else:
+                        node[key] = []
+            nodes[node_id] = node
+
+        for node_id, tag in self._conn.execute(
+                "SELECT node_id, tag FROM node_tags ORDER BY node_id, position"):
+            nodes[node_id]["tags"].append(tag)
+        for node_id, name, value in self._conn.execute(
+                "SELECT node_id, name, value FROM tech_params ORDER BY node_id, position"):
+            nodes[node_id]["technical_params"][name] = json.loads(value) if value is not None else None
+
+        owned_images = {}
+        for node_id, kind, owner_id, path in self._conn.execute(
+                "SELECT node_id, kind, owner_id, path FROM image_refs ORDER BY node_id, position"):
+            if owner_id is None:
+                nodes[node_id][kind].append(path)
+            else:
+                owned_images.setdefault((kind, owner_id), []).append(path)
+
+        for table, kind, image_key, target in (("suppliers", "supplier", "images", "pricing"),
+                                               ("parts", "part", "principle_images", "parts")):
+            for owner_id, node_id, data in self._conn.execute(
+                    "SELECT id, node_id, data FROM " + table + " ORDER BY node_id, position"):
+                item = json.loads(data)
+                if SPLIT_MARK in item:
+                    del item[SPLIT_MARK]
+                    item[image_key] = owned_images.get((kind, owner_id), [])
+                if "__value__" in item:
+                    item = item["__value__"]
+                if target == "pricing":
+                    nodes[node_id]["pricing"]["suppliers"].append(item)
+                else:
+                    nodes[node_id]["parts"].append(item)
+        return nodes
+
+    # ---------- 与 JournalStore 相同的持久化接口 ----------
+
+    encode_records = staticmethod(JournalStore.encode_records)
+    encode_snapshot = staticmethod(JournalStore.encode_snapshot)
+
+    def exists(self):
+        """数据库中是否已有数据"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT (SELECT COUNT(*) FROM nodes WHERE id != ?) + (SELECT COUNT(*) FROM meta)",
+                (ROOT_ID,)).fetchone()
+            return row[0] > 0
+
+    def load(self):
+        """读取完整的 system_data（与 system_data.json 的结构相同）"""
+        with self._lock:
+            system_data = {key: json.loads(value)
+                           for key, value in self._conn.execute("SELECT key, value FROM meta")}
+            rows = self._conn.execute(
+                "SELECT id, parent_id, name, is_category, content, extra FROM nodes"
+                " WHERE id != ? ORDER BY parent_id, position", (ROOT_ID,)).fetchall()
+            nodes = self._assemble([(r[0], r[3], r[4], r[5]) for r in rows])
+            nodes[ROOT_ID] = {"children": {}}
+            for node_id, parent_id, name, _, _, _ in rows:
+                parent = nodes.get(parent_id)
+                if parent is not None:
+                    parent["children"][name] = nodes[node_id]
+            system_data["categories"] = nodes[ROOT_ID]["children"]
+            return system_data
+
+    def append_encoded(self, payload, count):
+        """应用已序列化的变更记录（JournalStore 的日志格式），在同一个事务中提交"""
+        records = [json.loads(line) for line in payload.splitlines() if line.strip()]
+        with self._lock, self._conn:
+            for record in records:
+                path = record.get("path") or []
+                op = record.get("op")
+                if op == "set":
+                    self._set_node(path, record["value"])
+                elif op == "delete":
+                    self._delete_node(path)
+                elif op == "rename":
+                    self._rename_node(path, record["new_name"])
+        self.records_written += count
+        self.bytes_written += len(payload.encode('utf-8'))
+
+    def write_snapshot(self, system_data):
+        """用完整数据替换数据库内容"""
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM nodes WHERE id != ?", (ROOT_ID,))
+            self._conn.execute("DELETE FROM meta")
+            for key, value in system_data.items():
+                if key != "categories":
+                    self._conn.execute("INSERT INTO meta (key, value) VALUES (?, ?)",
+                                       (key, json.dumps(value, ensure_ascii=False)))
+            for position, (name, node) in enumerate(system_data.get("categories", {}).items()):
+                if isinstance(node, dict):
+                    self._insert_node(ROOT_ID, name, position, node)
+
+    def write_snapshot_text(self, text):
+        """写入已序列化的快照文本"""
+        self.write_snapshot(json.loads(text))
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def migrate_json(json_path, db_path=None):
+    """把 system_data.json（及未合并的日志）一次性迁移到 SQLite，返回数据库路径"""
+    if db_path is None:
+        db_path = os.path.splitext(json_path)[0] + ".db"
+    system_data = JournalStore(json_path).load()
+    store = SQLiteStore(db_path)
+    try:
+        store.write_snapshot(system_data)
+        if store.load() != system_data:
+            raise ValueError("迁移校验失败：数据库内容与原数据不一致")
+    finally:
+        store.close()
+    log.info("已迁移到: %s", db_path)
+    return db_path
+
+
+if __name__ == "__main__":
+    import sys
+    if len(sys.argv) < 2:
+        sys.exit("用法: python sqlite_store.py <system_data.json 路径> [数据库路径]")
+    app_log.setup(console_level=logging.INFO)
+    migrate_json(sys.argv[1], sys.argv[2] if len(sys.argv) > 2 else None)
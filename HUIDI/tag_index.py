@@ -0,0 +1,86 @@
+"""
+增量维护的标签倒排索引
+
+标签 -> 设备 id 集合，设备 id -> 标签元组。设备 id 来自 NodeIndex，路径在查询时
+再由 NodeIndex 换算，因此重命名分类或设备时索引不需要任何改动；
+编辑标签、新增和删除设备时只更新变化的部分。
+"""
+
+
+class TagIndex:
+    """标签倒排索引"""
+
+    def __init__(self):
+        self._by_tag = {}   # 标签 -> 设备 id 集合
+        self._by_node = {}  # 设备 id -> 标签元组
+
+    def __len__(self):
+        return len(self._by_tag)
+
+    @staticmethod
+    def _normalize(tags):
+        """去重并保持顺序，忽略非字符串和空标签"""
+        if not isinstance(tags, (list, tuple)):
+            return ()
+        return tuple(dict.fromkeys(tag for tag in tags if isinstance(tag, str) and tag))
+
+    def rebuild(self, node_index):
+        """根据节点索引全量重建（加载或导入数据后调用）"""
+        self._by_tag.clear()
+        self._by_node.clear()
+        for node_id in node_index.leaf_ids():
+            node = node_index.node(node_id)
+            if isinstance(node, dict):
+                self.set_tags(node_id, node.get("tags", []))
+
+    def set_tags(self, node_id, tags):
+        """更新一个设备的标签，只处理新增和移除的部分"""
+        new_tags = self._normalize(tags)
+        old_tags = self._by_node.get(node_id, ())
+        if new_tags == old_tags:
+            return
+        for tag in set(old_tags).difference(new_tags):
+            ids = self._by_tag.get(tag)
+            if ids is not None:
+                ids.discard(node_id)
+                if not ids:
+                    del self._by_tag[tag]
+        for tag in set(new_tags).difference(old_tags):
+            self._by_tag.setdefault(tag, set()).add(node_id)
+        if new_tags:
+            self._by_node[node_id] = new_tags
+        else:
+            self._by_node.pop(node_id, None)
+
+    def remove(self, node_ids):
+        """移除被删除的设备"""
+        for node_id in node_ids:
+            self.set_tags(node_id, ())
+
+    def tags(self):
+        return list(self._by_tag)
+
+    def tags_of(self, node_id):
+        return self._by_node.get(node_id, ())
+
+    def ids_for(self, tag):
+        return set(self._by_tag.get(tag, ()))
+
+    def match(self, query):
+        """模糊匹配标签，返回 [(标签, 按 id 排序的设备 id 列表), ...]"""
+        query = query.lower()
+        return [(tag, sorted(ids)) for tag, ids in self._by_tag.items() if query in tag.lower()]
+
+    def check(self, node_index):
+        """与全量重建的结果比较，返回不一致之处的说明列表（为空表示一致）"""
+        expected = TagIndex()
+        expected.rebuild(node_index)
+        problems = []
+        for tag in set(expected._by_tag) | set(self._by_tag):
+            missing = expected._by_tag.get(tag, set()) - self._by_tag.get(tag, set())
+            extra = self._by_tag.get(tag, set()) - expected._by_tag.get(tag, set())
+            for node_id in sorted(missing):
+                problems.append(f"标签 '{tag}' 缺少设备 {node_index.path(node_id)}")
+            for node_id in sorted(extra):
+                problems.append(f"标签 '{tag}' 多出设备 {node_index.path(node_id) or node_id}")
+        return problems
@@ -1,16 +1,679 @@
 import sys
 import os
-import shutil
-import json
+import re
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
 from datetime import datetime
 from PyQt5.QtWidgets import *
 from PyQt5.QtGui import *
 from PyQt5.QtCore import *
 from PyQt5.QtWidgets import QMenu # Added QMenu import
+from search_executor import SearchExecutor
+from blob_store import blob_path
+from knowledge_base import KnowledgeBase, supplier_offers
+from image_import import ImageImportJob
+from ndjson_io import ExportJob, ImportJob
+import app_log
+import perf_stats
+
+log = app_log.get_logger()
+
+
+class ThumbnailCache:
+    """缩略图缓存
+
+    按 (图片路径, 修改时间, 文件大小, 尺寸档位) 缓存缩小后的图片：
+    - 内存中是按字节预算淘汰的 LRU，保存 QImage（可在工作线程中使用）
+    - 磁盘上保存在图片目录旁的缩略图目录中，重启后仍然有效；目录超过 max_disk_bytes 时
+      在后台线程中按修改时间删除最久未用的文件（磁盘命中时更新修改时间），
+      图片删除或修改后留下的旧缩略图不再被读取，也随之清理
+    - 需要解码原图时用 QImageReader 在解码阶段直接缩小，不生成全尺寸图片
+
+    请求的尺寸先向上取到档位（36、116、256、512、1024、2048），同一档位的
+    缩略图可以满足不同窗口大小；返回前再缩放到精确尺寸。图片被修改后修改时间
+    变化，自然得到新的缩略图。
+    """
+    BUCKETS = (36, 116, 256, 512, 1024, 2048)
+    PRUNE_EVERY = 256  # 每写入这么多个缩略图检查一次磁盘占用
+    _shared = None
+
+    def __init__(self, cache_dir=None, max_bytes=64 * 1024 * 1024, max_disk_bytes=512 * 1024 * 1024):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.max_disk_bytes = max_disk_bytes
+        self._images = OrderedDict()  # 键 -> QImage
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._disk_writes = 0
+        self._pruning = False
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+
+        # 统计信息
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.decodes = 0
+        self.failures = 0
+
+    @classmethod
+    def shared(cls):
+        """程序共用的缓存；主窗口未配置缓存目录时只使用内存"""
+        if cls._shared is None:
+            cls._shared = cls()
+        return cls._shared
+
+    @classmethod
+    def set_shared(cls, cache):
+        cls._shared = cache
+
+    @classmethod
+    def bucket_for(cls, width, height):
+        side = max(width, height)
+        for bucket in cls.BUCKETS:
+            if side <= bucket:
+                return bucket
+        return cls.BUCKETS[-1]
+
+    @staticmethod
+    def image_bytes(image):
+        return image.sizeInBytes() if hasattr(image, "sizeInBytes") else image.byteCount()
+
+    def key_for(self, image_path, bucket):
+        """缓存键；文件不存在时返回 None"""
+        try:
+            stat = os.stat(image_path)
+        except OSError:
+            return None
+        return (os.path.abspath(image_path), stat.st_mtime_ns, stat.st_size, bucket)
+
+    def disk_path(self, key):
+        if not self.cache_dir:
+            return None
+        path, mtime_ns, size, bucket = key
+        digest = hashlib.sha1(f"{path}|{mtime_ns}|{size}".encode("utf-8")).hexdigest()[:24]
+        # 小档位用 PNG 保留透明度，大档位用 JPEG 节省空间
+        extension = "png" if bucket <= 256 else "jpg"
+        return os.path.join(self.cache_dir, f"{digest}_{bucket}.{extension}")
+
+    @perf_stats.timed("ThumbnailCache.image")
+    def image(self, image_path, width, height=None):
+        """返回按比例缩放到 width x height 以内的 QImage；无法读取时返回空 QImage"""
+        height = width if height is None else height
+        bucket = self.bucket_for(width, height)
+        key = self.key_for(image_path, bucket)
+        if key is None:
+            return QImage()
+        image = self._bucket_image(image_path, key)
+        if image.isNull() or (image.width() == width and image.height() <= height) or \
+                (image.height() == height and image.width() <= width):
+            return image
+        return image.scaled(width, height, Qt.KeepAspectRatio, Qt.SmoothTransformation)
+
+    def peek(self, image_path, width, height=None):
+        """只查内存缓存：命中时返回缩放好的 QImage，否则返回 None（不读磁盘、不解码）"""
+        height = width if height is None else height
+        key = self.key_for(image_path, self.bucket_for(width, height))
+        if key is None:
+            return None
+        with self._lock:
+            if key not in self._images:
+                return None
+        return self.image(image_path, width, height)
+
+    def pixmap(self, image_path, width, height=None):
+        """image() 的 QPixmap 版本，只能在界面线程中调用"""
+        return QPixmap.fromImage(self.image(image_path, width, height))
+
+    def _bucket_image(self, image_path, key):
+        with self._lock:
+            image = self._images.get(key)
+            if image is not None:
+                self._images.move_to_end(key)
+                self.memory_hits += 1
+                return image
+
+        disk_path = self.disk_path(key)
+        image = QImage(disk_path) if disk_path and os.path.exists(disk_path) else QImage()
+        if not image.isNull():
+            self.disk_hits += 1
+            try:
+                # 修改时间即最近使用时间，清理时保留常用的缩略图
+                os.utime(disk_path)
+            except OSError:
+                pass
+        else:
+            image = self._decode(image_path, key[3])
+            if image.isNull():
+                self.failures += 1
+                return image
+            self.decodes += 1
+            if disk_path:
+                try:
+                    image.save(disk_path, None, 90)
+                except Exception as e:
+                    log.error("保存缩略图失败 %s: %s", disk_path, e)
+                with self._lock:
+                    self._disk_writes += 1
+                    check = self._disk_writes % self.PRUNE_EVERY == 0
+                if check:
+                    self.prune_disk_async()
+        self._remember(key, image)
+        return image
+
+    def prune_disk_async(self):
+        """在后台线程中清理磁盘缓存（启动时和每写入 PRUNE_EVERY 个缩略图后调用）"""
+        with self._lock:
+            if not self.cache_dir or self._pruning:
+                return
+            self._pruning = True
+        threading.Thread(target=self.prune_disk, name="thumbnail-prune", daemon=True).start()
+
+    def prune_disk(self):
+        """磁盘缓存超过 max_disk_bytes 时删除最久未用的缩略图，降到预算的 80%，返回删除的文件数"""
+        try:
+            files = []
+            total = 0
+            with os.scandir(self.cache_dir) as entries:
+                for entry in entries:
+                    try:
+                        if entry.is_file():
+                            stat = entry.stat()
+                            files.append((stat.st_mtime_ns, stat.st_size, entry.path))
+                            total += stat.st_size
+                    except OSError:
+                        continue
+            if total <= self.max_disk_bytes:
+                return 0
+            files.sort()
+            target = self.max_disk_bytes * 4 // 5
+            removed = 0
+            for _, size, path in files:
+                if total <= target:
+                    break
+                try:
+                    os.remove(path)
+                except OSError:
+                    continue
+                total -= size
+                removed += 1
+            log.info("缩略图缓存清理: 删除 %s 个文件，剩余 %.1f MB", removed, total / 1024 / 1024)
+            return removed
+        except OSError as e:
+            log.error("清理缩略图缓存失败 %s: %s", self.cache_dir, e)
+            return 0
+        finally:
+            with self._lock:
+                self._pruning = False
+
+    @staticmethod
+    def _decode(image_path, bucket):
+        """解码原图并缩小到档位以内；原图比档位小时保持原尺寸"""
+        reader = QImageReader(image_path)
+        size = reader.size()
+        if size.isValid() and max(size.width(), size.height()) > bucket:
+            reader.setScaledSize(size.scaled(bucket, bucket, Qt.KeepAspectRatio))
+        image = reader.read()
+        if not image.isNull() and max(image.width(), image.height()) > bucket:
+            # 不支持解码时缩小的格式
+            image = image.scaled(bucket, bucket, Qt.KeepAspectRatio, Qt.SmoothTransformation)
+        return image
+
+    def _remember(self, key, image):
+        with self._lock:
+            if key in self._images:
+                return
+            self._images[key] = image
+            self._bytes += self.image_bytes(image)
+            while self._bytes > self.max_bytes and len(self._images) > 1:
+                _, evicted = self._images.popitem(last=False)
+                self._bytes -= self.image_bytes(evicted)
+
+    def memory_usage(self):
+        """返回 (内存中的缩略图数量, 占用字节数)"""
+        with self._lock:
+            return len(self._images), self._bytes
+
+
+class ImageLoadSignals(QObject):
+    """工作线程通知界面线程的信号"""
+    # 参数: 请求编号, 缩放后的图片（读取失败时为空图片）
+    loaded = pyqtSignal(int, QImage)
+
+
+class ImageLoadTask(QRunnable):
+    """在线程池中解码并缩放一张图片"""
+
+    def __init__(self, loader, request_id, group, generation, image_path, width, height):
+        super().__init__()
+        self.loader = loader
+        self.request_id = request_id
+        self.group = group
+        self.generation = generation
+        self.image_path = image_path
+        self.width = width
+        self.height = height
+
+    def run(self):
+        # 已被取消的请求不再解码
+        if not self.loader.is_current(self.group, self.generation):
+            return
+        try:
+            image = self.loader.cache.image(self.image_path, self.width, self.height)
+        except Exception as e:
+            log.error("后台载入图片失败 %s: %s", self.image_path, e)
+            image = QImage()
+        try:
+            self.loader.signals.loaded.emit(self.request_id, image)
+        except RuntimeError:
+            # 载入器已随窗口删除
+            pass
+
+
+class ImageLoader(QObject):
+    """后台图片载入器
+
+    图片在 QThreadPool 的工作线程中通过缩略图缓存解码（QImageReader 在解码时缩小），
+    完成后用信号把 QImage 交回界面线程，由回调填入占位的缩略图。
+    请求按分组（如 "images"、"supplier"）管理，切换设备时 cancel(分组) 使该分组
+    尚未完成的请求全部作废：未开始的不再解码，已完成的结果被丢弃。
+    cache 默认为程序共用的缩略图缓存。
+    """
+
+    def __init__(self, parent=None, max_threads=None, cache=None):
+        super().__init__(parent)
+        self._cache = cache
+        self.pool = QThreadPool(self)
+        self.pool.setMaxThreadCount(max_threads or max(2, QThread.idealThreadCount() - 1))
+        self.signals = ImageLoadSignals()
+        self.signals.loaded.connect(self._deliver)
+        self._generations = {}  # 分组 -> 当前代数
+        self._callbacks = {}    # 请求编号 -> (分组, 代数, 回调)
+        self._next_id = 1
+        self._lock = threading.Lock()
+
+        # 统计信息
+        self.requested = 0
+        self.delivered = 0
+        self.cancelled = 0
+
+    @property
+    def cache(self):
+        return self._cache if self._cache is not None else ThumbnailCache.shared()
+
+    def is_current(self, group, generation):
+        with self._lock:
+            return self._generations.get(group, 0) == generation
+
+    def request(self, image_path, width, height, callback, group="default"):
+        """请求一张缩放到 width x height 以内的图片，完成后在界面线程调用 callback(QImage)"""
+        cached = self.cache.peek(image_path, width, height)
+        if cached is not None:
+            # 内存缓存命中时直接填入，不经过线程池
+            callback(cached)
+            return None
+        with self._lock:
+            generation = self._generations.get(group, 0)
+            request_id = self._next_id
+            self._next_id += 1
+        self._callbacks[request_id] = (group, generation, callback)
+        self.requested += 1
+        self.pool.start(ImageLoadTask(self, request_id, group, generation, image_path, width, height))
+        return request_id
+
+    def cancel(self, group):
+        """作废分组中尚未完成的请求"""
+        with self._lock:
+            self._generations[group] = self._generations.get(group, 0) + 1
+        stale = [request_id for request_id, entry in self._callbacks.items() if entry[0] == group]
+        for request_id in stale:
+            del self._callbacks[request_id]
+        self.cancelled += len(stale)
+
+    def cancel_all(self):
+        """作废全部分组中尚未完成的请求（切换设备时使用）"""
+        groups = {entry[0] for entry in self._callbacks.values()}
+        for group in groups:
+            self.cancel(group)
+
+    def pending(self):
+        return len(self._callbacks)
+
+    def wait(self, msecs=-1):
+        """等待线程池中的任务结束（关闭程序时使用）"""
+        return self.pool.waitForDone(msecs)
+
+    def _deliver(self, request_id, image):
+        entry = self._callbacks.pop(request_id, None)
+        if entry is None:
+            return
+        self.delivered += 1
+        try:
+            entry[2](image)
+        except RuntimeError:
+            # 占位控件已被删除
+            pass
+        except Exception as e:
+            log.error("填入图片失败: %s", e)
+
+
+class ImagePyramid:
+    """大图的多分辨率金字塔
+
+    第 0 级是原图（超过 MAX_SIDE 时先在解码阶段缩小），之后每级边长减半，直到不超过
+    2048。每级切成 TILE x TILE 的图块，绘制时只取可见区域内的图块，放大查看大图时
+    不需要对整张原图做缩放。
+    """
+    TILE = 512
+    MAX_SIDE = 8192
+
+    def __init__(self, image, full_size):
+        # levels: [(相对原图的比例, 宽, 高, {(列, 行): QImage}), ...]，从最清晰到最粗糙
+        self.levels = []
+        self.bytes = 0
+        scale = image.width() / max(1, full_size.width())
+        while True:
+            self.levels.append((scale, image.width(), image.height(), self._cut(image)))
+            if max(image.width(), image.height()) <= 2048:
+                break
+            image = image.scaled(max(1, image.width() // 2), max(1, image.height() // 2),
+                                 Qt.IgnoreAspectRatio, Qt.SmoothTransformation)
+            scale /= 2
+
+    def _cut(self, image):
+        tiles = {}
+        for top in range(0, image.height(), self.TILE):
+            for left in range(0, image.width(), self.TILE):
+                tile = image.copy(left, top, min(self.TILE, image.width() - left),
+                                  min(self.TILE, image.height() - top))
+                tiles[(left // self.TILE, top // self.TILE)] = tile
+                self.bytes += ThumbnailCache.image_bytes(tile)
+        return tiles
+
+    def level_for(self, scale):
+        """显示比例为 scale 时使用的级别：清晰度足够的级别中最粗糙的一级"""
+        for level in reversed(self.levels):
+            if level[0] >= scale:
+                return level
+        return self.levels[0]
+
+    @classmethod
+    def load(cls, image_path):
+        """在工作线程中解码原图并建立金字塔；无法读取时返回 None"""
+        reader = QImageReader(image_path)
+        full_size = reader.size()
+        if full_size.isValid() and max(full_size.width(), full_size.height()) > cls.MAX_SIDE:
+            reader.setScaledSize(full_size.scaled(cls.MAX_SIDE, cls.MAX_SIDE, Qt.KeepAspectRatio))
+        image = reader.read()
+        if image.isNull():
+            return None
+        if not full_size.isValid():
+            full_size = image.size()
+        return cls(image, full_size)
+
+
+class PyramidSignals(QObject):
+    # 参数: 代数, ImagePyramid（读取失败时为 None）
+    ready = pyqtSignal(int, object)
+
+
+class PyramidTask(QRunnable):
+    """在线程池中建立图片金字塔"""
+
+    def __init__(self, signals, generation, image_path, is_current):
+        super().__init__()
+        self.signals = signals
+        self.generation = generation
+        self.image_path = image_path
+        self.is_current = is_current
+
+    def run(self):
+        if not self.is_current(self.generation):
+            return
+        try:
+            with perf_stats.measure("ImagePyramid.load"):
+                pyramid = ImagePyramid.load(self.image_path)
+        except Exception as e:
+            log.error("建立图片金字塔失败 %s: %s", self.image_path, e)
+            pyramid = None
+        try:
+            self.signals.ready.emit(self.generation, pyramid)
+        except RuntimeError:
+            # 查看器已关闭
+            pass
+
+
+class ZoomImageView(QWidget):
+    """可缩放、拖动的图片显示区域
+
+    默认适应窗口显示预览图（缩略图缓存中的大尺寸档位）。滚轮以鼠标位置为中心缩放，
+    按住左键拖动平移，双击在适应窗口和 100% 之间切换。放大超过预览图的清晰度时
+    发出 pyramid_needed，拿到金字塔后只绘制可见的图块。
+    """
+    pyramid_needed = pyqtSignal()
+    zoom_changed = pyqtSignal(float)
+    MAX_ZOOM = 8.0
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._preview = None
+        self._pyramid = None
+        self._full_size = QSize()
+        self._zoom = None  # None 表示适应窗口
+        self._center = QPointF()
+        self._drag_pos = None
+        self._message = ""
+        self.tiles_drawn = 0
+        self.setMouseTracking(False)
+        self.setFocusPolicy(Qt.StrongFocus)
+
+    # ---------- 内容 ----------
+
+    def set_message(self, message):
+        self._preview = None
+        self._pyramid = None
+        self._message = message
+        self._zoom = None
+        self.update()
+
+    def set_image(self, full_size):
+        """开始显示新图片；full_size 为原图尺寸（无效时等预览图到达后再确定）"""
+        self._preview = None
+        self._pyramid = None
+        self._full_size = QSize(full_size)
+        self._message = "載入中..."
+        self._zoom = None
+        self.update()
+        self.zoom_changed.emit(0.0)
+
+    def set_preview(self, image):
+        self._preview = image
+        self._message = ""
+        if not self._full_size.isValid():
+            self._full_size = image.size()
+        self.update()
+        self.zoom_changed.emit(self.scale())
+
+    def set_pyramid(self, pyramid):
+        self._pyramid = pyramid
+        self.update()
+
+    def has_image(self):
+        return self._preview is not None
+
+    def pixmap(self):
+        """当前预览图（与 QLabel 接口一致，便于调试）"""
+        return QPixmap.fromImage(self._preview) if self._preview is not None else QPixmap()
+
+    # ---------- 比例与位置 ----------
+
+    def fit_scale(self):
+        if not self._full_size.isValid() or self._full_size.isEmpty():
+            return 1.0
+        return min(self.width() / self._full_size.width(), self.height() / self._full_size.height())
+
+    def preview_scale(self):
+        if self._preview is None or not self._full_size.isValid():
+            return 1.0
+        return self._preview.width() / max(1, self._full_size.width())
+
+    def scale(self):
+        return self.fit_scale() if self._zoom is None else self._zoom
+
+    def is_fitted(self):
+        return self._zoom is None
+
+    def image_rect(self):
+        """图片在控件坐标中的位置"""
+        scale = self.scale()
+        width = self._full_size.width() * scale
+        height = self._full_size.height() * scale
+        if self._zoom is None or width <= self.width():
+            left = (self.width() - width) / 2
+        else:
+            left = self.width() / 2 - self._center.x() * scale
+        if self._zoom is None or height <= self.height():
+            top = (self.height() - height) / 2
+        else:
+            top = self.height() / 2 - self._center.y() * scale
+        return QRectF(left, top, width, height)
+
+    def _clamp_center(self):
+        scale = self.scale()
+        half_w = self.width() / 2 / scale
+        half_h = self.height() / 2 / scale
+        x = min(max(self._center.x(), half_w), self._full_size.width() - half_w)
+        y = min(max(self._center.y(), half_h), self._full_size.height() - half_h)
+        self._center = QPointF(x, y)
+
+    def fit(self):
+        if self._zoom is None:
+            return
+        self._zoom = None
+        self.update()
+        self.zoom_changed.emit(self.scale())
+
+    def zoom_to(self, scale, anchor=None):
+        """缩放到 scale（原图像素 -> 屏幕像素），anchor 处的图片内容保持不动"""
+        if self._preview is None:
+            return
+        anchor = QPointF(anchor) if anchor is not None else QPointF(self.width() / 2, self.height() / 2)
+        old_scale = self.scale()
+        target = self.image_rect()
+        point = QPointF((anchor.x() - target.left()) / old_scale, (anchor.y() - target.top()) / old_scale)
+        scale = min(self.MAX_ZOOM, scale)
+        if scale <= self.fit_scale() * 1.001:
+            self.fit()
+            return
+        self._zoom = scale
+        self._center = QPointF(point.x() - (anchor.x() - self.width() / 2) / scale,
+                               point.y() - (anchor.y() - self.height() / 2) / scale)
+        self._clamp_center()
+        if self._pyramid is None and scale > self.preview_scale() * 1.01:
+            self.pyramid_needed.emit()
+        self.update()
+        self.zoom_changed.emit(scale)
+
+    def zoom_by(self, factor, anchor=None):
+        self.zoom_to(self.scale() * factor, anchor)
+
+    # ---------- 事件 ----------
+
+    def wheelEvent(self, event):
+        steps = event.angleDelta().y() / 120
+        if steps:
+            self.zoom_by(1.25 ** steps, event.pos())
+        event.accept()
+
+    def mousePressEvent(self, event):
+        if event.button() == Qt.LeftButton and self._zoom is not None:
+            self._drag_pos = event.pos()
+            self.setCursor(Qt.ClosedHandCursor)
+        super().mousePressEvent(event)
+
+    def mouseMoveEvent(self, event):
+        if self._drag_pos is not None:
+            delta = event.pos() - self._drag_pos
+            self._drag_pos = event.pos()
+            scale = self.scale()
+            self._center = QPointF(self._center.x() - delta.x() / scale, self._center.y() - delta.y() / scale)
+            self._clamp_center()
+            self.update()
+        super().mouseMoveEvent(event)
+
+    def mouseReleaseEvent(self, event):
+        if self._drag_pos is not None:
+            self._drag_pos = None
+            self.unsetCursor()
+        super().mouseReleaseEvent(event)
+
+    def mouseDoubleClickEvent(self, event):
+        if self._zoom is None:
+            # 小图的 100% 可能比适应窗口还小，此时放大一倍
+            self.zoom_to(max(1.0, self.fit_scale() * 2), event.pos())
+        else:
+            self.fit()
+
+    def resizeEvent(self, event):
+        if self._zoom is not None:
+            if self._zoom <= self.fit_scale():
+                self._zoom = None
+            else:
+                self._clamp_center()
+        super().resizeEvent(event)
+
+    def paintEvent(self, event):
+        painter = QPainter(self)
+        if self._preview is None:
+            painter.drawText(self.rect(), Qt.AlignCenter, self._message)
+            return
+        painter.setRenderHint(QPainter.SmoothPixmapTransform)
+        target = self.image_rect()
+        scale = self.scale()
+        if self._pyramid is None or scale <= self.preview_scale() * 1.01:
+            painter.drawImage(target, self._preview)
+            return
+
+        # 只绘制与可见区域相交的图块
+        level_scale, width, height, tiles = self._pyramid.level_for(scale)
+        visible = target.intersected(QRectF(event.rect()))
+        factor = level_scale / scale  # 屏幕像素 -> 该级别的像素
+        tile = ImagePyramid.TILE
+        first_col = max(0, int((visible.left() - target.left()) * factor) // tile)
+        last_col = min((width - 1) // tile, int((visible.right() - target.left()) * factor) // tile)
+        first_row = max(0, int((visible.top() - target.top()) * factor) // tile)
+        last_row = min((height - 1) // tile, int((visible.bottom() - target.top()) * factor) // tile)
+        drawn = 0
+        for row in range(first_row, last_row + 1):
+            for col in range(first_col, last_col + 1):
+                image = tiles.get((col, row))
+                if image is None:
+                    continue
+                painter.drawImage(QRectF(target.left() + col * tile / factor, target.top() + row * tile / factor,
+                                         image.width() / factor, image.height() / factor), image)
+                drawn += 1
+        self.tiles_drawn = drawn
 
 
 class ImageViewerDialog(QDialog):
-    """圖片查看器對話框"""
+    """圖片查看器對話框
+
+    顯示當前圖片的同時在後台預先解碼前後 PREFETCH 張，切換時直接從預覽緩存取圖。
+    預覽緩存按字節預算淘汰，金字塔只保留當前圖片的，長圖集也不會佔用過多內存。
+    """
+    PREFETCH = 2
+    PREVIEW_CACHE_BYTES = 64 * 1024 * 1024
+    _preview_cache = None
+
+    @classmethod
+    def preview_cache(cls):
+        """查看器專用的預覽緩存（與縮略圖分開，避免大圖把縮略圖擠出緩存）"""
+        cache_dir = ThumbnailCache.shared().cache_dir
+        if cls._preview_cache is None or cls._preview_cache.cache_dir != cache_dir:
+            cls._preview_cache = ThumbnailCache(cache_dir, cls.PREVIEW_CACHE_BYTES)
+        return cls._preview_cache
+
     def __init__(self, image_paths, current_index=0, parent=None):
         super().__init__(parent)
         self.setWindowTitle("圖片查看器")
@@ -20,14 +683,23 @@ class ImageViewerDialog(QDialog):
         # 保存图片路径列表和当前索引
         self.image_paths = image_paths if isinstance(image_paths, list) else [image_paths]
         self.current_index = current_index
+
+        # 預覽圖和金字塔都在後台線程中解碼
+        self.loader = ImageLoader(self, max_threads=2, cache=self.preview_cache())
+        self.pyramid_signals = PyramidSignals(self)
+        self.pyramid_signals.ready.connect(self.on_pyramid_ready)
+        self.pyramid_generation = 0
+        self.pyramid_pending = False
+        self.preview_bucket = None
         
         layout = QVBoxLayout()
         
         # 圖片顯示區域
-        self.image_label = QLabel()
-        self.image_label.setAlignment(Qt.AlignCenter)
-        self.image_label.setMinimumSize(600, 400)
-        layout.addWidget(self.image_label)
+        self.image_view = ZoomImageView()
+        self.image_view.setMinimumSize(600, 400)
+        self.image_view.pyramid_needed.connect(self.build_pyramid)
+        self.image_view.zoom_changed.connect(self.update_image_info)
+        layout.addWidget(self.image_view)
         
         # 導航按鈕區域
         nav_layout = QHBoxLayout()
@@ -42,6 +714,11 @@ class ImageViewerDialog(QDialog):
         self.image_info_label = QLabel()
         self.image_info_label.setAlignment(Qt.AlignCenter)
         nav_layout.addWidget(self.image_info_label)
+
+        # 適應窗口按鈕
+        fit_btn = QPushButton("适应窗口")
+        fit_btn.clicked.connect(self.image_view.fit)
+        nav_layout.addWidget(fit_btn)
         
         # 下一張按鈕
         self.next_btn = QPushButton("下一张 ▶")
@@ -60,49 +737,127 @@ class ImageViewerDialog(QDialog):
         
         # 載入當前圖片
         self.load_current_image()
+
+    def current_path(self):
+        if 0 <= self.current_index < len(self.image_paths):
+            return self.image_paths[self.current_index]
+        return None
+
+    def preview_size(self):
+        """預覽圖的尺寸檔位，同一檔位的預覽圖可供不同窗口大小使用"""
+        size = self.image_view.size()
+        return ThumbnailCache.bucket_for(size.width(), size.height())
     
     def load_current_image(self):
         """载入当前索引的圖片"""
         try:
-            if 0 <= self.current_index < len(self.image_paths):
-                image_path = self.image_paths[self.current_index]
-                
-                if os.path.exists(image_path):
-                    pixmap = QPixmap(image_path)
-                    if not pixmap.isNull():
-                        # 計算適合視窗的大小
-                        scaled_pixmap = pixmap.scaled(
-                            self.image_label.size(), 
-                            Qt.KeepAspectRatio, 
-                            Qt.SmoothTransformation
-                        )
-                        self.image_label.setPixmap(scaled_pixmap)
-                        
-                        # 更新圖片信息
-                        filename = os.path.basename(image_path)
-                        self.image_info_label.setText(f"{self.current_index + 1} / {len(self.image_paths)} - {filename}")
-                        
-                        # 更新按鈕狀態
-                        self.prev_btn.setEnabled(self.current_index > 0)
-                        self.next_btn.setEnabled(self.current_index < len(self.image_paths) - 1)
-                        
-                        print(f"成功載入圖片查看器: {image_path}")
-                    else:
-                        self.image_label.setText("無法載入圖片")
-                        self.image_info_label.setText("圖片載入失敗")
-                        print(f"圖片查看器載入失敗: {image_path}")
-                else:
-                    self.image_label.setText("圖片文件不存在")
-                    self.image_info_label.setText("文件不存在")
-                    print(f"圖片查看器文件不存在: {image_path}")
-            else:
-                self.image_label.setText("無效的圖片索引")
+            # 切換圖片時作廢舊的預覽和金字塔請求
+            self.loader.cancel("viewer")
+            self.pyramid_generation += 1
+            self.pyramid_pending = False
+
+            image_path = self.current_path()
+            if image_path is None:
+                self.image_view.set_message("無效的圖片索引")
                 self.image_info_label.setText("索引錯誤")
+                return
+
+            # 更新按鈕狀態
+            self.prev_btn.setEnabled(self.current_index > 0)
+            self.next_btn.setEnabled(self.current_index < len(self.image_paths) - 1)
+
+            if os.path.exists(image_path):
+                # 只讀取文件頭得到原圖尺寸，預覽圖在後台解碼（緩存命中時立即顯示）
+                self.image_view.set_image(QImageReader(image_path).size())
+                self.update_image_info()
+                self.preview_bucket = self.preview_size()
+                self.loader.request(image_path, self.preview_bucket, self.preview_bucket,
+                                    lambda image, path=image_path: self.on_preview_loaded(path, image), "viewer")
+            else:
+                self.image_view.set_message("圖片文件不存在")
+                self.image_info_label.setText("文件不存在")
+                log.warning("圖片查看器文件不存在: %s", image_path)
+            self.prefetch_neighbours()
         except Exception as e:
-            self.image_label.setText("載入圖片時發生錯誤")
+            self.image_view.set_message("載入圖片時發生錯誤")
             self.image_info_label.setText("載入錯誤")
-            print(f"圖片查看器載入錯誤: {str(e)}")
+            log.error("圖片查看器載入錯誤: %s", str(e))
             QMessageBox.critical(self, "圖片載入錯誤", f"載入圖片時發生錯誤:\n{str(e)}")
+
+    def on_preview_loaded(self, image_path, image):
+        if image_path != self.current_path():
+            return
+        if image.isNull():
+            self.image_view.set_message("無法載入圖片")
+            self.image_info_label.setText("圖片載入失敗")
+            log.error("圖片查看器載入失敗: %s", image_path)
+            return
+        self.image_view.set_preview(image)
+        log.debug("成功載入圖片查看器: %s", image_path)
+
+    def prefetch_neighbours(self):
+        """在後台解碼前後 PREFETCH 張圖片的預覽圖，由近及遠"""
+        self.loader.cancel("prefetch")
+        bucket = self.preview_size()
+        for distance in range(1, self.PREFETCH + 1):
+            for index in (self.current_index + distance, self.current_index - distance):
+                if 0 <= index < len(self.image_paths) and os.path.exists(self.image_paths[index]):
+                    self.loader.request(self.image_paths[index], bucket, bucket, lambda image: None, "prefetch")
+
+    def build_pyramid(self):
+        """放大超過預覽圖清晰度時，在後台為當前圖片建立金字塔"""
+        image_path = self.current_path()
+        if self.pyramid_pending or image_path is None:
+            return
+        self.pyramid_pending = True
+        self.loader.pool.start(PyramidTask(self.pyramid_signals, self.pyramid_generation, image_path,
+                                           lambda generation: generation == self.pyramid_generation))
+
+    def on_pyramid_ready(self, generation, pyramid):
+        if generation != self.pyramid_generation:
+            return
+        self.pyramid_pending = False
+        if pyramid is not None:
+            self.image_view.set_pyramid(pyramid)
+            log.debug("圖片金字塔: %s 級，%s KB", len(pyramid.levels), pyramid.bytes // 1024)
+
+    def update_image_info(self, *args):
+        image_path = self.current_path()
+        if image_path is None or not self.image_view.has_image() and not os.path.exists(image_path):
+            return
+        text = f"{self.current_index + 1} / {len(self.image_paths)} - {os.path.basename(image_path)}"
+        if self.image_view.has_image():
+            text += f" ({self.image_view.scale() * 100:.0f}%)"
+        self.image_info_label.setText(text)
+
+    def resizeEvent(self, event):
+        super().resizeEvent(event)
+        # 窗口放大到更大的檔位時重新取預覽圖
+        if self.preview_bucket is not None and self.preview_size() > self.preview_bucket:
+            self.load_current_image()
+
+    def keyPressEvent(self, event):
+        key = event.key()
+        if key in (Qt.Key_Left, Qt.Key_PageUp):
+            self.show_previous_image()
+        elif key in (Qt.Key_Right, Qt.Key_PageDown):
+            self.show_next_image()
+        elif key in (Qt.Key_Plus, Qt.Key_Equal):
+            self.image_view.zoom_by(1.25)
+        elif key == Qt.Key_Minus:
+            self.image_view.zoom_by(0.8)
+        elif key == Qt.Key_0:
+            self.image_view.fit()
+        else:
+            super().keyPressEvent(event)
+
+    def done(self, result):
+        # 作廢後台請求並等待線程結束，避免對話框刪除後仍有信號發出
+        self.loader.cancel_all()
+        self.loader.cancel("prefetch")
+        self.pyramid_generation += 1
+        self.loader.wait()
+        super().done(result)
     
     def show_previous_image(self):
         """顯示上一張圖片"""
@@ -119,7 +874,8 @@ class ImageViewerDialog(QDialog):
 
 class ImageThumbnailWidget(QWidget):
     """圖片縮略圖小部件"""
-    def __init__(self, image_path, image_list=None, current_index=0, parent=None, delete_callback=None):
+    def __init__(self, image_path, image_list=None, current_index=0, parent=None, delete_callback=None,
+                 loader=None, group="default"):
         super().__init__(parent)
         self.image_path = image_path
         self.image_list = image_list if image_list else [image_path]
@@ -136,23 +892,25 @@ class ImageThumbnailWidget(QWidget):
         self.thumbnail_label.setAlignment(Qt.AlignCenter)
         self.thumbnail_label.setFixedSize(116, 116)
         
-        # 載入縮略圖
+        # 載入縮略圖：有載入器時先顯示佔位文字，由後台線程解碼後填入
         try:
-            if os.path.exists(image_path):
-                pixmap = QPixmap(image_path)
-                if not pixmap.isNull():
-                    scaled_pixmap = pixmap.scaled(116, 116, Qt.KeepAspectRatio, Qt.SmoothTransformation)
+            if os.path.exists(image_path) and loader is not None:
+                self.thumbnail_label.setText("載入中...")
+                loader.request(image_path, 116, 116, self.set_thumbnail_image, group)
+            elif os.path.exists(image_path):
+                scaled_pixmap = ThumbnailCache.shared().pixmap(image_path, 116, 116)
+                if not scaled_pixmap.isNull():
                     self.thumbnail_label.setPixmap(scaled_pixmap)
-                    print(f"成功載入縮略圖: {image_path}")
+                    log.debug("成功載入縮略圖: %s", image_path)
                 else:
                     self.thumbnail_label.setText("載入失敗")
-                    print(f"圖片載入失敗: {image_path}")
+                    log.error("圖片載入失敗: %s", image_path)
             else:
                 self.thumbnail_label.setText("文件不存在")
-                print(f"圖片文件不存在: {image_path}")
+                log.warning("圖片文件不存在: %s", image_path)
         except Exception as e:
             self.thumbnail_label.setText("載入錯誤")
-            print(f"載入圖片時發生錯誤 {image_path}: {str(e)}")
+            log.error("載入圖片時發生錯誤 %s: %s", image_path, str(e))
         
         layout.addWidget(self.thumbnail_label)
         self.setLayout(layout)
@@ -163,6 +921,14 @@ class ImageThumbnailWidget(QWidget):
         self.setContextMenuPolicy(Qt.CustomContextMenu)
         self.customContextMenuRequested.connect(self.show_context_menu)
     
+    def set_thumbnail_image(self, image):
+        """後台載入完成後填入縮略圖"""
+        if image.isNull():
+            self.thumbnail_label.setText("載入失敗")
+            log.error("圖片載入失敗: %s", self.image_path)
+        else:
+            self.thumbnail_label.setPixmap(QPixmap.fromImage(image))
+    
     def show_context_menu(self, position):
         """显示右键菜单"""
         if self.delete_callback:
@@ -191,12 +957,12 @@ class ImageThumbnailWidget(QWidget):
                     QMessageBox.warning(self, "文件错误", f"图片文件为空:\n{self.image_path}")
                     return
                 
-                print(f"打開圖片查看器: {self.image_path}")
+                log.debug("打開圖片查看器: %s", self.image_path)
                 # 打開圖片查看器，傳遞圖片列表和當前索引
                 dialog = ImageViewerDialog(self.image_list, self.current_index, self.parent())
                 dialog.exec_()
             except Exception as e:
-                print(f"打開圖片查看器失敗: {str(e)}")
+                log.error("打開圖片查看器失敗: %s", str(e))
                 QMessageBox.warning(self, "錯誤", f"無法打開圖片: {str(e)}")
     
     def enterEvent(self, event):
@@ -206,9 +972,188 @@ class ImageThumbnailWidget(QWidget):
         self.setStyleSheet("border: 1px solid #ccc; margin: 2px;")
 
 
+class ThumbnailListModel(QAbstractListModel):
+    """缩略图列表模型
+
+    只保存图片路径；视图绘制某一行时才通过后台载入器请求缩略图，
+    看不到的图片不会被解码。切换设备时调用 set_paths() 重用同一个模型。
+    """
+    FAILED = object()
+
+    def __init__(self, loader, group, thumbnail_size=116, parent=None):
+        super().__init__(parent)
+        self.loader = loader
+        self.group = group
+        self.thumbnail_size = thumbnail_size
+        self._paths = []
+        self._pixmaps = {}      # 行 -> QPixmap 或 FAILED
+        self._requested = set()
+        self._in_data = False
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._paths)
+
+    def set_paths(self, paths):
+        """换成另一组图片；尚未完成的载入全部取消"""
+        self.loader.cancel(self.group)
+        self.beginResetModel()
+        self._paths = list(paths)
+        self._pixmaps = {}
+        self._requested = set()
+        self.endResetModel()
+
+    def paths(self):
+        return list(self._paths)
+
+    def path(self, row):
+        return self._paths[row] if 0 <= row < len(self._paths) else None
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid() or index.row() >= len(self._paths):
+            return None
+        row = index.row()
+        if role == Qt.ToolTipRole:
+            return os.path.basename(self._paths[row])
+        if role == Qt.UserRole:
+            return self._paths[row]
+        if role == Qt.DecorationRole:
+            if row not in self._requested:
+                self._requested.add(row)
+                self._in_data = True
+                try:
+                    size = self.thumbnail_size
+                    self.loader.request(self._paths[row], size, size,
+                                        lambda image, row=row: self._loaded(row, image), self.group)
+                finally:
+                    self._in_data = False
+            pixmap = self._pixmaps.get(row)
+            return pixmap if pixmap is not self.FAILED else None
+        if role == Qt.DisplayRole:
+            # 供代理绘制占位文字
+            if self._pixmaps.get(row) is self.FAILED:
+                return "載入失敗"
+            return None if row in self._pixmaps else "載入中..."
+        return None
+
+    def _loaded(self, row, image):
+        if row >= len(self._paths):
+            return
+        self._pixmaps[row] = self.FAILED if image.isNull() else QPixmap.fromImage(image)
+        if not self._in_data:
+            index = self.index(row)
+            self.dataChanged.emit(index, index, [Qt.DecorationRole, Qt.DisplayRole])
+
+
+class ThumbnailDelegate(QStyledItemDelegate):
+    """绘制带边框的缩略图格子，鼠标悬停时高亮"""
+
+    def __init__(self, cell_size=120, parent=None):
+        super().__init__(parent)
+        self.cell_size = cell_size
+
+    def sizeHint(self, option, index):
+        return QSize(self.cell_size, self.cell_size)
+
+    def paint(self, painter, option, index):
+        painter.save()
+        rect = option.rect.adjusted(2, 2, -2, -2)
+        hovered = bool(option.state & QStyle.State_MouseOver)
+        painter.setPen(QPen(QColor("#0078d4") if hovered else QColor("#cccccc"), 2 if hovered else 1))
+        painter.drawRect(rect)
+        pixmap = index.data(Qt.DecorationRole)
+        if isinstance(pixmap, QPixmap) and not pixmap.isNull():
+            x = rect.x() + (rect.width() - pixmap.width()) // 2
+            y = rect.y() + (rect.height() - pixmap.height()) // 2
+            painter.drawPixmap(x, y, pixmap)
+        else:
+            painter.setPen(QColor("#999999"))
+            painter.drawText(rect, Qt.AlignCenter, index.data(Qt.DisplayRole) or "")
+        painter.restore()
+
+
+class ThumbnailGallery(QListView):
+    """横向缩略图条
+
+    用 QListView 的图标模式只绘制可见的缩略图，无论图片多少，控件数量都不变。
+    单击打开图片查看器，右键可删除（需要提供 delete_callback(图片路径, 序号)）。
+    """
+
+    def __init__(self, loader, group, placeholder="暂无图片", delete_callback=None, parent=None):
+        super().__init__(parent)
+        self.placeholder = placeholder
+        self.delete_callback = delete_callback
+        self.thumbnail_model = ThumbnailListModel(loader, group, 116, self)
+        self.setModel(self.thumbnail_model)
+        self.setItemDelegate(ThumbnailDelegate(120, self))
+        self.setViewMode(QListView.IconMode)
+        self.setFlow(QListView.LeftToRight)
+        self.setWrapping(False)
+        self.setMovement(QListView.Static)
+        self.setResizeMode(QListView.Adjust)
+        self.setUniformItemSizes(True)
+        self.setGridSize(QSize(124, 124))
+        self.setMouseTracking(True)
+        self.setSelectionMode(QAbstractItemView.NoSelection)
+        self.setHorizontalScrollMode(QAbstractItemView.ScrollPerPixel)
+        self.setVerticalScrollBarPolicy(Qt.ScrollBarAlwaysOff)
+        self.setFixedHeight(145)
+        self.clicked.connect(self.open_viewer)
+        self.setContextMenuPolicy(Qt.CustomContextMenu)
+        self.customContextMenuRequested.connect(self.show_context_menu)
+
+    def set_images(self, paths, placeholder=None):
+        """显示一组图片（完整路径）；没有图片时显示 placeholder"""
+        if placeholder is not None:
+            self.placeholder = placeholder
+        self.thumbnail_model.set_paths(paths)
+        self.viewport().update()
+
+    def paintEvent(self, event):
+        super().paintEvent(event)
+        if self.thumbnail_model.rowCount() == 0 and self.placeholder:
+            painter = QPainter(self.viewport())
+            painter.setPen(QColor("gray"))
+            font = painter.font()
+            font.setItalic(True)
+            painter.setFont(font)
+            painter.drawText(self.viewport().rect(), Qt.AlignCenter, self.placeholder)
+
+    def open_viewer(self, index):
+        image_path = self.thumbnail_model.path(index.row())
+        if not image_path:
+            return
+        try:
+            if not os.path.exists(image_path):
+                QMessageBox.warning(self, "錯誤", f"圖片文件不存在: {image_path}")
+                return
+            if not os.access(image_path, os.R_OK):
+                QMessageBox.warning(self, "文件权限错误", f"无法读取图片文件:\n{image_path}")
+                return
+            if os.path.getsize(image_path) == 0:
+                QMessageBox.warning(self, "文件错误", f"图片文件为空:\n{image_path}")
+                return
+            dialog = ImageViewerDialog(self.thumbnail_model.paths(), index.row(), self.window())
+            dialog.exec_()
+        except Exception as e:
+            log.error("打開圖片查看器失敗: %s", str(e))
+            QMessageBox.warning(self, "錯誤", f"無法打開圖片: {str(e)}")
+
+    def show_context_menu(self, position):
+        """显示右键菜单"""
+        index = self.indexAt(position)
+        if not self.delete_callback or not index.isValid():
+            return
+        image_path = self.thumbnail_model.path(index.row())
+        menu = QMenu(self)
+        delete_action = QAction("删除图片", self)
+        delete_action.triggered.connect(lambda: self.delete_callback(image_path, index.row()))
+        menu.addAction(delete_action)
+        menu.exec_(self.viewport().mapToGlobal(position))
+
+
 class PriceSearchImageWidget(QWidget):
     """价格搜索结果中的图片显示组件"""
-    def __init__(self, image_filenames, images_dir, parent=None):
+    def __init__(self, image_filenames, images_dir, parent=None, loader=None, group="price"):
         super().__init__(parent)
         self.image_filenames = image_filenames
         self.images_dir = images_dir
@@ -222,27 +1167,25 @@ class PriceSearchImageWidget(QWidget):
         layout.setSpacing(2)
         
         if image_filenames:
-            print(f"PriceSearchImageWidget: 处理 {len(image_filenames)} 张图片")
+            log.debug("PriceSearchImageWidget: 处理 %s 张图片", len(image_filenames))
             # 显示前3张图片的缩略图
             for i, filename in enumerate(image_filenames[:3]):
                 try:
-                    image_path = os.path.join(self.images_dir, filename)
-                    print(f"PriceSearchImageWidget: 检查图片路径 {image_path}, 存在: {os.path.exists(image_path)}")
+                    image_path = blob_path(self.images_dir, filename)
+                    if log.isEnabledFor(logging.DEBUG):
+                        log.debug("PriceSearchImageWidget: 检查图片路径 %s, 存在: %s", image_path, os.path.exists(image_path))
                     if os.path.exists(image_path):
                         thumbnail = QLabel()
                         thumbnail.setFixedSize(40, 40)
                         thumbnail.setAlignment(Qt.AlignCenter)
                         thumbnail.setStyleSheet("border: 1px solid #ccc; border-radius: 2px;")
                         
-                        # 加载并缩放图片
-                        pixmap = QPixmap(image_path)
-                        if not pixmap.isNull():
-                            scaled_pixmap = pixmap.scaled(36, 36, Qt.KeepAspectRatio, Qt.SmoothTransformation)
-                            thumbnail.setPixmap(scaled_pixmap)
-                            print(f"PriceSearchImageWidget: 成功加载图片 {filename}")
+                        # 加载并缩放图片（有载入器时在后台解码，完成后填入）
+                        if loader is not None:
+                            loader.request(image_path, 36, 36,
+                                           lambda image, label=thumbnail: self.set_thumbnail_image(label, image), group)
                         else:
-                            thumbnail.setText("❌")
-                            thumbnail.setStyleSheet("border: 1px solid #ccc; border-radius: 2px; color: red; font-size: 10px;")
+                            self.set_thumbnail_image(thumbnail, ThumbnailCache.shared().image(image_path, 36, 36))
                     else:
                         thumbnail = QLabel("❌")
                         thumbnail.setFixedSize(40, 40)
@@ -251,7 +1194,7 @@ class PriceSearchImageWidget(QWidget):
                     
                     layout.addWidget(thumbnail)
                 except Exception as e:
-                    print(f"创建缩略图失败 {filename}: {e}")
+                    log.error("创建缩略图失败 %s: %s", filename, e)
                     thumbnail = QLabel("❌")
                     thumbnail.setFixedSize(40, 40)
                     thumbnail.setAlignment(Qt.AlignCenter)
@@ -267,7 +1210,7 @@ class PriceSearchImageWidget(QWidget):
                 layout.addWidget(more_label)
         else:
             # 没有图片时显示提示
-            print("PriceSearchImageWidget: 没有图片文件")
+            log.debug("PriceSearchImageWidget: 没有图片文件")
             no_image_label = QLabel("无图片")
             no_image_label.setFixedSize(100, 40)
             no_image_label.setAlignment(Qt.AlignCenter)
@@ -283,6 +1226,14 @@ class PriceSearchImageWidget(QWidget):
         self.setContextMenuPolicy(Qt.CustomContextMenu)
         self.customContextMenuRequested.connect(self.show_context_menu)
         
+    
+    def set_thumbnail_image(self, thumbnail, image):
+        """把载入完成的图片填入缩略图标签"""
+        if image.isNull():
+            thumbnail.setText("❌")
+            thumbnail.setStyleSheet("border: 1px solid #ccc; border-radius: 2px; color: red; font-size: 10px;")
+        else:
+            thumbnail.setPixmap(QPixmap.fromImage(image))
     def show_context_menu(self, position):
         """显示右键菜单"""
         if self.image_filenames:
@@ -299,7 +1250,7 @@ class PriceSearchImageWidget(QWidget):
         try:
             image_paths = []
             for filename in self.image_filenames:
-                image_path = os.path.join(self.images_dir, filename)
+                image_path = blob_path(self.images_dir, filename)
                 if os.path.exists(image_path):
                     image_paths.append(image_path)
             
@@ -318,6 +1269,643 @@ class PriceSearchImageWidget(QWidget):
         super().mousePressEvent(event)
 
 
+class LogViewerDialog(QDialog):
+    """程序内的日志查看器，定时从日志环形缓冲区取出新增的日志"""
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("日志")
+        self.resize(900, 500)
+        self.ring = app_log.ring_buffer()
+        self.sequence = 0
+
+        layout = QVBoxLayout(self)
+        options = QHBoxLayout()
+        options.addWidget(QLabel("显示级别:"))
+        self.show_level_combo = QComboBox()
+        self.show_level_combo.addItems(app_log.LEVELS)
+        self.show_level_combo.setCurrentText("INFO")
+        self.show_level_combo.currentTextChanged.connect(self.reload)
+        options.addWidget(self.show_level_combo)
+        options.addWidget(QLabel("记录级别:"))
+        self.record_level_combo = QComboBox()
+        self.record_level_combo.addItems(app_log.LEVELS)
+        self.record_level_combo.setCurrentText(app_log.level_name())
+        self.record_level_combo.currentTextChanged.connect(app_log.set_level)
+        options.addWidget(self.record_level_combo)
+        options.addStretch()
+        clear_btn = QPushButton("清空")
+        clear_btn.clicked.connect(self.clear)
+        options.addWidget(clear_btn)
+        layout.addLayout(options)
+
+        self.text = QPlainTextEdit()
+        self.text.setReadOnly(True)
+        self.text.setMaximumBlockCount(self.ring.capacity)
+        self.text.setLineWrapMode(QPlainTextEdit.NoWrap)
+        layout.addWidget(self.text)
+
+        self.timer = QTimer(self)
+        self.timer.setInterval(500)
+        self.timer.timeout.connect(self.poll)
+        self.reload()
+
+    def reload(self, *args):
+        self.text.clear()
+        self.sequence = 0
+        self.poll()
+
+    def poll(self):
+        level = logging.getLevelName(self.show_level_combo.currentText())
+        self.sequence, records = self.ring.since(self.sequence, level)
+        if not records:
+            return
+        lines = []
+        for _, created, levelno, name, message in records:
+            stamp = datetime.fromtimestamp(created).strftime("%H:%M:%S")
+            lines.append(f"{stamp} {logging.getLevelName(levelno)} {name}: {message}")
+        self.text.appendPlainText("\n".join(lines))
+
+    def clear(self):
+        self.ring.clear()
+        self.text.clear()
+
+    def showEvent(self, event):
+        super().showEvent(event)
+        self.poll()
+        self.timer.start()
+
+    def hideEvent(self, event):
+        self.timer.stop()
+        super().hideEvent(event)
+
+
+class PerformanceDock(QDockWidget):
+    """性能面板：显示各个热点操作的调用次数和 p50/p95/p99 耗时，可导出 JSON 性能报告"""
+
+    HEADERS = ["操作", "次数", "p50 (ms)", "p95 (ms)", "p99 (ms)", "最大 (ms)", "合计 (ms)"]
+
+    def __init__(self, parent=None):
+        super().__init__("性能", parent)
+        self.setObjectName("performance_dock")
+        widget = QWidget()
+        layout = QVBoxLayout(widget)
+
+        self.table = QTableWidget(0, len(self.HEADERS))
+        self.table.setHorizontalHeaderLabels(self.HEADERS)
+        self.table.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        self.table.verticalHeader().setVisible(False)
+        self.table.horizontalHeader().setSectionResizeMode(0, QHeaderView.Stretch)
+        self.table.setSortingEnabled(True)
+        # 默认按合计耗时从大到小排列
+        self.table.horizontalHeader().setSortIndicator(len(self.HEADERS) - 1, Qt.DescendingOrder)
+        layout.addWidget(self.table)
+
+        buttons = QHBoxLayout()
+        self.summary_label = QLabel()
+        buttons.addWidget(self.summary_label)
+        buttons.addStretch()
+        reset_btn = QPushButton("重置")
+        reset_btn.clicked.connect(self.reset)
+        buttons.addWidget(reset_btn)
+        export_btn = QPushButton("导出 JSON")
+        export_btn.clicked.connect(self.export_profile)
+        buttons.addWidget(export_btn)
+        layout.addLayout(buttons)
+        self.setWidget(widget)
+
+        # 只在面板可见时刷新
+        self.timer = QTimer(self)
+        self.timer.setInterval(1000)
+        self.timer.timeout.connect(self.refresh)
+        self.visibilityChanged.connect(self.on_visibility_changed)
+
+    def on_visibility_changed(self, visible):
+        if visible:
+            self.refresh()
+            self.timer.start()
+        else:
+            self.timer.stop()
+
+    def refresh(self):
+        stats = perf_stats.snapshot()
+        sort_column = self.table.horizontalHeader().sortIndicatorSection()
+        sort_order = self.table.horizontalHeader().sortIndicatorOrder()
+        self.table.setSortingEnabled(False)
+        self.table.setRowCount(len(stats))
+        for row, (name, s) in enumerate(sorted(stats.items())):
+            values = [s["count"], s["p50_ms"], s["p95_ms"], s["p99_ms"], s["max_ms"], s["total_ms"]]
+            self.table.setItem(row, 0, QTableWidgetItem(name))
+            for column, value in enumerate(values, 1):
+                item = QTableWidgetItem()
+                # 按数值排序
+                item.setData(Qt.DisplayRole, value if column == 1 else round(value, 3))
+                self.table.setItem(row, column, item)
+        self.table.setSortingEnabled(True)
+        self.table.sortItems(sort_column, sort_order)
+        self.summary_label.setText(f"{len(stats)} 个操作，{sum(s['count'] for s in stats.values())} 次调用")
+
+    def reset(self):
+        perf_stats.reset()
+        self.refresh()
+
+    def export_profile(self):
+        file_path, _ = QFileDialog.getSaveFileName(
+            self, "导出性能报告", f"性能报告_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json", "JSON 文件 (*.json)")
+        if not file_path:
+            return
+        try:
+            perf_stats.export_json(file_path)
+            QMessageBox.information(self, "成功", f"性能报告已导出到:\n{file_path}")
+        except Exception as e:
+            QMessageBox.critical(self, "错误", f"导出性能报告失败: {str(e)}")
+
+
+class AutoSaveScheduler(QObject):
+    """自动保存调度器
+    
+    编辑信号只负责把 (节点路径, 字段) 标记为脏，连续编辑在空闲窗口内被合并，
+    空闲后每个节点只写入一次。切换选中项或关闭程序时可调用 flush() 立即写入。
+    """
+    # 参数: 本次写入的节点数, 累计被合并掉的写入次数
+    flushed = pyqtSignal(int, int)
+
+    def __init__(self, flush_callback, idle_ms=800, parent=None):
+        super().__init__(parent)
+        self.flush_callback = flush_callback
+        self.idle_ms = idle_ms
+        self._dirty = {}  # tuple(路径) -> 脏字段集合
+        self._timer = QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.timeout.connect(self.flush)
+        
+        # 统计信息
+        self.request_count = 0  # 收到的保存请求次数
+        self.write_count = 0    # 实际写入次数
+
+    @property
+    def saved_writes(self):
+        """被合并掉的写入次数"""
+        return self.request_count - self.write_count
+
+    def set_idle_ms(self, idle_ms):
+        """设置空闲窗口（毫秒）"""
+        self.idle_ms = max(0, int(idle_ms))
+
+    def has_pending(self):
+        return bool(self._dirty)
+
+    def mark_dirty(self, path, field):
+        """标记节点字段需要保存，并重新开始计时"""
+        self._dirty.setdefault(tuple(path), set()).add(field)
+        self.request_count += 1
+        self._timer.start(self.idle_ms)
+
+    def discard(self, path):
+        """丢弃某节点尚未写入的变更（节点已被删除时使用）"""
+        self._dirty.pop(tuple(path), None)
+
+    def flush(self):
+        """立即写入所有待保存的变更，返回写入的节点数"""
+        self._timer.stop()
+        if not self._dirty:
+            return 0
+        dirty, self._dirty = self._dirty, {}
+        written = 0
+        for path, fields in dirty.items():
+            try:
+                if self.flush_callback(list(path), fields):
+                    written += 1
+            except Exception as e:
+                log.error("自动保存失败 %s: %s", ' > '.join(path), e)
+        self.write_count += len(dirty)
+        self.flushed.emit(written, self.saved_writes)
+        return written
+
+
+class SaveStatusBridge(QObject):
+    """把后台写入线程的结果转发到界面线程"""
+    # 参数: 是否成功, 写入内容说明, 错误信息
+    finished = pyqtSignal(bool, str, str)
+
+
+class ImageImportBridge(QObject):
+    """把后台导入线程的进度转发到界面线程"""
+    # 参数: 已完成数, 总数, 源文件路径
+    progress = pyqtSignal(int, int, str)
+    # 参数: ImageImportJob
+    finished = pyqtSignal(object)
+
+
+class DataTransferBridge(QObject):
+    """把后台导入/导出线程的进度转发到界面线程"""
+    # 参数: 已完成（导出为节点数，导入为字节数）, 总数, 已处理的记录数
+    progress = pyqtSignal('qint64', 'qint64', int)
+    # 参数: ExportJob 或 ImportJob
+    finished = pyqtSignal(object)
+
+
+class SearchResultBridge(QObject):
+    """把后台搜索线程的结果转发到界面线程"""
+    # 参数: 查询编号, [(节点 id, 分数), ...]
+    page = pyqtSignal(int, object)
+    # 参数: 查询编号, 耗时统计
+    finished = pyqtSignal(int, object)
+    # 参数: 建立索引的统计
+    index_built = pyqtSignal(object)
+
+
+class PriceIndexBridge(QObject):
+    """把后台建立价格索引的结果转发到界面线程"""
+    # 参数: 是否建立完成
+    built = pyqtSignal(bool)
+
+
+class SearchResultModel(QAbstractListModel):
+    """搜索结果列表模型，结果分批追加，不重建已显示的行"""
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._rows = []  # (路径, 匹配类型)
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._rows)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid() or index.row() >= len(self._rows):
+            return None
+        path, match_type = self._rows[index.row()]
+        if role == Qt.DisplayRole:
+            return f"{' > '.join(path)} ({match_type})"
+        if role == Qt.ToolTipRole:
+            return ' > '.join(path)
+        if role == Qt.UserRole:
+            return path
+        return None
+
+    def clear(self):
+        self.beginResetModel()
+        self._rows = []
+        self.endResetModel()
+
+    def append_rows(self, rows):
+        if not rows:
+            return
+        self.beginInsertRows(QModelIndex(), len(self._rows), len(self._rows) + len(rows) - 1)
+        self._rows.extend(rows)
+        self.endInsertRows()
+
+
+class PriceResultModel(QAbstractTableModel):
+    """价格搜索结果表格模型
+
+    每行是一条搜索结果字典（model / supplier_name / supplier_price / currency / lead_time /
+    contact / product_images）。SORT_ROLE 返回按当前排序键算出的名次，
+    代理模型按这个整数排序，多列排序只需在 Python 中排一次序。
+    """
+    HEADERS = ["型号", "供应商", "价格", "供货周期", "联系方式", "产品图片"]
+    PRICE_COLUMN = 2
+    LEAD_TIME_COLUMN = 3
+    SUPPLIER_COLUMN = 1
+    IMAGE_COLUMN = 5
+    SORT_ROLE = Qt.UserRole + 1
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._results = []
+        self._rank = []
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._results)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.HEADERS)
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role == Qt.DisplayRole and orientation == Qt.Horizontal and section < len(self.HEADERS):
+            return self.HEADERS[section]
+        return super().headerData(section, orientation, role)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid() or index.row() >= len(self._results):
+            return None
+        row, column = index.row(), index.column()
+        if role == self.SORT_ROLE:
+            return self._rank[row]
+        if role == Qt.UserRole:
+            return self.sort_value(row, column)
+        if role in (Qt.DisplayRole, Qt.ToolTipRole):
+            result = self._results[row]
+            if column == 0:
+                return str(result.get('model', ''))
+            if column == 1:
+                return str(result.get('supplier_name', ''))
+            if column == 2:
+                return f"{result.get('supplier_price', '')} {result.get('currency', '')}".strip()
+            if column == 3:
+                return str(result.get('lead_time', ''))
+            if column == 4:
+                return str(result.get('contact', ''))
+            if column == 5 and role == Qt.ToolTipRole:
+                return f"{len(result.get('product_images', []))} 张图片"
+        return None
+
+    def set_results(self, results):
+        self.beginResetModel()
+        self._results = list(results)
+        self._rank = list(range(len(self._results)))
+        self.endResetModel()
+
+    def results(self):
+        return self._results
+
+    def result(self, row):
+        return self._results[row] if 0 <= row < len(self._results) else None
+
+    @staticmethod
+    def lead_time_days(text):
+        """把供货周期文字换算成天数用于排序，如 "7天"、"2周"、"1个月"；无法识别时排在最后"""
+        text = str(text or "")
+        match = re.search(r"(\d+(?:\.\d+)?)", text)
+        if not match:
+            return float('inf')
+        value = float(match.group(1))
+        if "周" in text:
+            return value * 7
+        if "月" in text:
+            return value * 30
+        return value
+
+    def sort_value(self, row, column):
+        """某一列的排序值：价格为 (币种, 数值)，不同币种不混在一起比较；供货周期为数值，其余为文字"""
+        result = self._results[row]
+        if column == self.PRICE_COLUMN:
+            price = result.get('supplier_price')
+            return result.get('currency', ''), float(price) if isinstance(price, (int, float)) else float('inf')
+        if column == self.LEAD_TIME_COLUMN:
+            return self.lead_time_days(result.get('lead_time', ''))
+        if column == self.IMAGE_COLUMN:
+            return len(result.get('product_images', []))
+        return self.data(self.index(row, column), Qt.DisplayRole) or ""
+
+    def set_sort_keys(self, keys):
+        """按 [(列, 是否升序), ...] 计算每行名次；第一个键优先"""
+        order = list(range(len(self._results)))
+        # 从次要键到主要键依次做稳定排序
+        for column, ascending in reversed(keys):
+            values = [self.sort_value(row, column) for row in range(len(self._results))]
+            order.sort(key=values.__getitem__, reverse=not ascending)
+        for rank, row in enumerate(order):
+            self._rank[row] = rank
+        if self._results:
+            self.dataChanged.emit(self.index(0, 0), self.index(len(self._results) - 1, len(self.HEADERS) - 1),
+                                  [self.SORT_ROLE])
+
+
+class NodeTreeModel(QAbstractItemModel):
+    """分类树模型
+
+    直接读取 NodeIndex，每一项的 internalId 就是节点 id，Qt.UserRole 返回节点 id。
+    子节点在第一次展开时才取出（canFetchMore/fetchMore）。增删改节点后调用
+    sync_children(父节点 id) 或 node_changed(节点 id)，只发出受影响的行的
+    rowsInserted/rowsRemoved/rowsMoved/dataChanged 信号，视图的展开状态和选中项保持不变。
+    """
+
+    def __init__(self, node_index, style, parent=None):
+        super().__init__(parent)
+        self.node_index = node_index
+        self._folder_icon = style.standardIcon(QStyle.SP_DirIcon)
+        self._file_icon = style.standardIcon(QStyle.SP_FileIcon)
+        self._rows = {}    # 已取出子节点的父节点 id -> 子节点 id 列表（None 表示顶层）
+        self._parent = {}  # 节点 id -> 父节点 id
+        self._row = {}     # 节点 id -> 所在行
+        self._fetch(None)
+
+    def _fetch(self, parent_id):
+        children = self.node_index.ordered_child_ids(parent_id)
+        self._rows[parent_id] = children
+        for row, child_id in enumerate(children):
+            self._parent[child_id] = parent_id
+            self._row[child_id] = row
+        return children
+
+    def _renumber(self, parent_id, start=0):
+        children = self._rows[parent_id]
+        for row in range(start, len(children)):
+            self._row[children[row]] = row
+
+    def _forget(self, node_id):
+        """移除已删除节点及其已取出的后代"""
+        stack = [node_id]
+        while stack:
+            current = stack.pop()
+            self._parent.pop(current, None)
+            self._row.pop(current, None)
+            stack.extend(self._rows.pop(current, ()))
+
+    # ---------- QAbstractItemModel ----------
+
+    def index(self, row, column, parent=QModelIndex()):
+        parent_id = parent.internalId() if parent.isValid() else None
+        children = self._rows.get(parent_id)
+        if column != 0 or children is None or not 0 <= row < len(children):
+            return QModelIndex()
+        return self.createIndex(row, 0, children[row])
+
+    def parent(self, index):
+        if not index.isValid():
+            return QModelIndex()
+        parent_id = self._parent.get(index.internalId())
+        if parent_id is None:
+            return QModelIndex()
+        return self.createIndex(self._row[parent_id], 0, parent_id)
+
+    def rowCount(self, parent=QModelIndex()):
+        if parent.column() > 0:
+            return 0
+        parent_id = parent.internalId() if parent.isValid() else None
+        return len(self._rows.get(parent_id, ()))
+
+    def columnCount(self, parent=QModelIndex()):
+        return 1
+
+    def hasChildren(self, parent=QModelIndex()):
+        if not parent.isValid():
+            return bool(self._rows[None])
+        node_id = parent.internalId()
+        if node_id in self._rows:
+            return bool(self._rows[node_id])
+        return bool(self.node_index.child_ids(node_id))
+
+    def canFetchMore(self, parent):
+        return parent.isValid() and parent.internalId() not in self._rows
+
+    def fetchMore(self, parent):
+        if not self.canFetchMore(parent):
+            return
+        node_id = parent.internalId()
+        count = len(self.node_index.ordered_child_ids(node_id))
+        if count:
+            self.beginInsertRows(parent, 0, count - 1)
+            self._fetch(node_id)
+            self.endInsertRows()
+        else:
+            self._fetch(node_id)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        node_id = index.internalId()
+        if role == Qt.DisplayRole:
+            return self.node_index.name(node_id)
+        if role == Qt.DecorationRole:
+            return self._folder_icon if self.node_index.is_category(node_id) else self._file_icon
+        if role == Qt.UserRole:
+            return node_id
+        return None
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if orientation == Qt.Horizontal and role == Qt.DisplayRole and section == 0:
+            return "设备分类"
+        return None
+
+    # ---------- 增量更新 ----------
+
+    def index_for_id(self, node_id, fetch=True):
+        """节点 id -> 模型索引；fetch=True 时先取出尚未加载的各级父节点"""
+        if node_id is None or node_id not in self._row:
+            if not fetch or self.node_index.path(node_id) is None:
+                return QModelIndex()
+            chain = []
+            current = self.node_index.parent_id(node_id)
+            while current is not None:
+                chain.append(current)
+                current = self.node_index.parent_id(current)
+            for ancestor in reversed(chain):
+                self.fetchMore(self.index_for_id(ancestor, fetch=False))
+            if node_id not in self._row:
+                return QModelIndex()
+        return self.createIndex(self._row[node_id], 0, node_id)
+
+    def sync_children(self, parent_id):
+        """按数据的当前内容更新一个父节点下的行（增加、删除、重命名后调用）"""
+        if parent_id is not None and parent_id not in self._row:
+            # 父节点本身还没有显示，第一次展开时自然是最新的
+            return
+        if parent_id not in self._rows:
+            # 子节点尚未取出，只需要刷新父节点的展开标记
+            self.node_changed(parent_id)
+            return
+        parent = self.index_for_id(parent_id, fetch=False) if parent_id is not None else QModelIndex()
+        current = self._rows[parent_id]
+        wanted = self.node_index.ordered_child_ids(parent_id)
+        wanted_set = set(wanted)
+        for row in range(len(current) - 1, -1, -1):
+            if current[row] not in wanted_set:
+                self.beginRemoveRows(parent, row, row)
+                self._forget(current.pop(row))
+                self._renumber(parent_id, row)
+                self.endRemoveRows()
+        for row, node_id in enumerate(wanted):
+            if row < len(current) and current[row] == node_id:
+                continue
+            if node_id in self._row and self._parent.get(node_id) == parent_id:
+                old_row = self._row[node_id]
+                self.beginMoveRows(parent, old_row, old_row, parent, row)
+                current.insert(row, current.pop(old_row))
+                self._renumber(parent_id, min(row, old_row))
+                self.endMoveRows()
+            else:
+                self.beginInsertRows(parent, row, row)
+                current.insert(row, node_id)
+                self._parent[node_id] = parent_id
+                self._renumber(parent_id, row)
+                self.endInsertRows()
+        if parent_id is not None:
+            self.node_changed(parent_id)
+
+    def node_changed(self, node_id):
+        """节点名称或类型改变"""
+        index = self.index_for_id(node_id, fetch=False)
+        if index.isValid():
+            self.dataChanged.emit(index, index)
+
+    def reset(self):
+        """整体替换数据后（导入）重建"""
+        self.beginResetModel()
+        self._rows.clear()
+        self._parent.clear()
+        self._row.clear()
+        self._fetch(None)
+        self.endResetModel()
+
+
+class ProcurementTreeProxy(QSortFilterProxyModel):
+    """采购模块的系统树：与锅炉系统登记模块共用 NodeTreeModel，只在上面加一层名称筛选
+
+    名称包含筛选文字的节点连同其各级父节点和全部后代一起显示。可见节点的集合在
+    筛选文字改变或源模型变化后重新计算一次，filterAcceptsRow 只做集合查找。
+    """
+
+    def __init__(self, source, parent=None):
+        super().__init__(parent)
+        self.node_index = source.node_index
+        self._text = ""
+        self._matches = []
+        self._visible = None  # 可见的节点 id；None 表示需要重新计算
+        # 先于代理模型自己的处理函数连接，源模型变化时先作废可见集合
+        for signal in (source.rowsAboutToBeInserted, source.dataChanged, source.modelAboutToBeReset):
+            signal.connect(self._source_changed)
+        self.setSourceModel(source)
+
+    def _source_changed(self, *args):
+        self._visible = None
+
+    def set_filter(self, text):
+        self._text = text.strip().lower()
+        self._visible = None
+        if self._text:
+            self._update_visible()
+            # 匹配的节点必须已经在源模型中取出，才能在代理中显示
+            source = self.sourceModel()
+            for node_id in self._matches:
+                source.index_for_id(node_id)
+        self.invalidateFilter()
+
+    def matches(self):
+        """名称匹配筛选文字的节点 id"""
+        return list(self._matches) if self._text else []
+
+    def _update_visible(self):
+        matches = []
+        for node_id in self.node_index.all_ids():
+            name = self.node_index.name(node_id)
+            if name and self._text in name.lower():
+                matches.append(node_id)
+        visible = set()
+        for node_id in matches:
+            visible.update(self.node_index.walk_ids(node_id))
+            parent_id = self.node_index.parent_id(node_id)
+            while parent_id is not None and parent_id not in visible:
+                visible.add(parent_id)
+                parent_id = self.node_index.parent_id(parent_id)
+        self._matches = matches
+        self._visible = visible
+
+    def filterAcceptsRow(self, source_row, source_parent):
+        if not self._text:
+            return True
+        if self._visible is None:
+            self._update_visible()
+        index = self.sourceModel().index(source_row, 0, source_parent)
+        return index.isValid() and index.internalId() in self._visible
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if orientation == Qt.Horizontal and role == Qt.DisplayRole and section == 0:
+            return "锅炉系统"
+        return super().headerData(section, orientation, role)
+
+
 class BoilerKnowledge(QMainWindow):
     def __init__(self):
         super().__init__()
@@ -327,9 +1915,26 @@ class BoilerKnowledge(QMainWindow):
         # 创建存储目录 - 改为桌面上的指定文件夹
         desktop_path = os.path.join(os.path.expanduser("~"), "Desktop")
         self.storage_dir = os.path.join(desktop_path, "锅炉知识管理系统安装包", "锅炉系统文件")
-        self.images_dir = os.path.join(self.storage_dir, "图片")
-        self.data_dir = os.path.join(self.storage_dir, "数据")
+        # 知识库核心：数据、存储、索引和图片存储都在 knowledge_base.py 中，不依赖 Qt
+        # 落盘操作在后台线程中执行，结果通过信号回到界面线程
+        self.save_status = SaveStatusBridge(self)
+        self.save_status.finished.connect(self.on_save_finished)
+        self.kb = KnowledgeBase(self.storage_dir, on_save_result=self.save_status.finished.emit)
+        self.images_dir = self.kb.images_dir
+        self.data_dir = self.kb.data_dir
+        self.thumbnails_dir = os.path.join(self.storage_dir, "缩略图")
+        # 日志：默认只记录 INFO 及以上，写入滚动文件并保存在内存中供日志查看器使用
+        self.log_dir = os.path.join(self.storage_dir, "日志")
+        app_log.setup(self.log_dir)
+        self.log_viewer = None
         self.create_storage_directories()
+        self.image_imports = []  # 正在后台进行的图片导入
+        self.data_transfer = None  # 正在后台进行的数据导入或导出
+        # 缩略图缓存：内存 LRU + 图片目录旁的磁盘缓存
+        ThumbnailCache.set_shared(ThumbnailCache(self.thumbnails_dir))
+        ThumbnailCache.shared().prune_disk_async()
+        # 后台图片载入：缩略图在线程池中解码，切换设备时取消未完成的载入
+        self.image_loader = ImageLoader(self)
 
         # 初始化图片路径变量
         self.current_image_paths = []
@@ -341,18 +1946,46 @@ class BoilerKnowledge(QMainWindow):
         
         # 添加初始化标志，防止在初始化过程中触发自动保存
         self._initializing = True
+        
+        # 自动保存调度器：合并连续编辑，空闲 autosave_idle_ms 毫秒后统一写入
+        self.autosave_idle_ms = 800
+        self.autosave = AutoSaveScheduler(self.flush_autosave, self.autosave_idle_ms, self)
+
+        self.search_limit = 200
+        # 输入停顿后才开始搜索；查询在后台线程执行，新查询会取消旧查询
+        self.search_debounce_ms = 200
+        self.search_timer = QTimer(self)
+        self.search_timer.setSingleShot(True)
+        self.search_timer.timeout.connect(self.search_by_tag)
+        self.search_status = SearchResultBridge(self)
+        self.search_status.page.connect(self.on_search_page)
+        self.search_status.finished.connect(self.on_search_finished)
+        self.search_status.index_built.connect(self.on_search_index_built)
+        self.search_executor = SearchExecutor(
+            self.search_index,
+            on_page=self.search_status.page.emit,
+            on_finished=self.search_status.finished.emit,
+            limit=self.search_limit,
+            on_built=self.search_status.index_built.emit,
+        )
+        self.current_search_id = 0
+        self.current_search_query = ""
+        self.price_page_size = 100
+        self.price_query = None  # 当前全局价格搜索的条件
+        # 价格索引在后台线程中建立，建立期间发起的全局价格搜索等建立完成后再执行
+        self.price_index_status = PriceIndexBridge(self)
+        self.price_index_status.built.connect(self.on_price_index_built)
+        self.pending_price_search = None
 
         # 加载或初始化数据
         self.load_data()
+        self.migrate_legacy_images()
 
-        # 创建主界面
+        # 创建主界面（分类树模型在其中建立）
         self.create_ui()
-        
-        # 初始化树形结构
-        self.init_tree()
-        
-        # 初始化标签索引
-        self.update_tag_index()
+        # 节点增删和重命名后，分类树只更新受影响的行
+        self.kb.on_children_changed = self.tree_model.sync_children
+        self.kb.on_node_changed = self.tree_model.node_changed
         
         # 设置自动保存（在UI创建完成后）
         self.setup_auto_save()
@@ -367,255 +2000,76 @@ class BoilerKnowledge(QMainWindow):
         try:
             from stability_optimization import integrate_stability_optimizer
             self.stability_optimizer = integrate_stability_optimizer(self)
-            print("稳定性优化器已成功集成")
+            log.info("稳定性优化器已成功集成")
         except Exception as e:
-            print(f"稳定性优化器集成失败: {e}")
+            log.warning("稳定性优化器集成失败: %s", e)
             self.stability_optimizer = None
     
+    # 数据和索引由知识库核心持有，界面代码沿用原来的属性名
+    @property
+    def system_data(self):
+        return self.kb.system_data
+
+    @system_data.setter
+    def system_data(self, value):
+        self.kb.system_data = value
+
+    @property
+    def node_index(self):
+        return self.kb.node_index
+
+    @property
+    def tag_index(self):
+        return self.kb.tag_index
+
+    @property
+    def search_index(self):
+        return self.kb.search_index
+
+    @property
+    def price_index(self):
+        return self.kb.price_index
+
+    @property
+    def blob_store(self):
+        return self.kb.blob_store
+
+    @property
+    def store(self):
+        return self.kb.store
+
+    @property
+    def writer(self):
+        return self.kb.writer
+
+    @property
+    def data_file(self):
+        return self.kb.data_file
+
     def setup_auto_save(self):
-        """设置自动保存功能"""
-        # 基本信息自动保存
-        if hasattr(self, 'content_edit'):
-            self.content_edit.textChanged.connect(self.auto_save_content)
-        if hasattr(self, 'tags_edit'):
-            self.tags_edit.textChanged.connect(self.auto_save_tags)
-        
-        # 技术参数自动保存
-        if hasattr(self, 'tech_table'):
-            self.tech_table.itemChanged.connect(self.auto_save_tech_params)
-        
-        # 价格信息自动保存
-        if hasattr(self, 'base_price_edit'):
-            self.base_price_edit.textChanged.connect(self.auto_save_pricing)
-        if hasattr(self, 'currency_combo'):
-            self.currency_combo.currentTextChanged.connect(self.auto_save_pricing)
-        if hasattr(self, 'supplier_table'):
-            self.supplier_table.itemChanged.connect(self.auto_save_pricing)
-        
-        # 维护信息自动保存
-        if hasattr(self, 'cycle_edit'):
-            self.cycle_edit.textChanged.connect(self.auto_save_maintenance)
-        if hasattr(self, 'procedures_edit'):
-            self.procedures_edit.textChanged.connect(self.auto_save_maintenance)
-        if hasattr(self, 'notes_edit'):
-            self.notes_edit.textChanged.connect(self.auto_save_maintenance)
-    
-    def auto_save_content(self):
-        """自动保存内容"""
-        try:
-            # 检查是否正在初始化
-            if hasattr(self, '_initializing') and self._initializing:
-                return
-                
-            if not self.current_item:
-                return
-                
-            path = self.get_item_path(self.current_item)
-            if not path:
-                return
-                
-            data = self.get_data_by_path(path)
-            if not data or "children" in data:
-                return
-                
-            data["content"] = self.content_edit.toPlainText()
-            self.save_data()
-            print("内容已自动保存")
-        except Exception as e:
-            print(f"自动保存内容失败: {str(e)}")
-    
-    def auto_save_tags(self):
-        """自动保存标签"""
-        try:
-            # 检查是否正在初始化
-            if hasattr(self, '_initializing') and self._initializing:
-                return
-                
-            if not self.current_item:
-                return
-                
-            path = self.get_item_path(self.current_item)
-            if not path:
-                return
-                
-            data = self.get_data_by_path(path)
-            if not data or "children" in data:
-                return
-                
-            tags_text = self.tags_edit.text().strip()
-            if tags_text:
-                tags = [tag.strip() for tag in tags_text.split(",") if tag.strip()]
-                data["tags"] = tags
-            else:
-                data["tags"] = []
-            
-            self.update_tag_index()
-            self.save_data()
-            print("标签已自动保存")
-        except Exception as e:
-            print(f"自动保存标签失败: {str(e)}")
-    
-    def auto_save_tech_params(self):
-        """自动保存技术参数"""
-        try:
-            # 检查是否正在初始化
-            if hasattr(self, '_initializing') and self._initializing:
-                return
-                
-            if not self.current_item:
-                return
-                
-            path = self.get_item_path(self.current_item)
-            if not path:
-                return
-                
-            data = self.get_data_by_path(path)
-            if not data or "children" in data:
-                return
-            
-            # 获取表格数据
-            params = {}
-            for row in range(self.tech_table.rowCount()):
-                name_item = self.tech_table.item(row, 0)
-                value_item = self.tech_table.item(row, 1)
-                if name_item and value_item:
-                    name = name_item.text().strip()
-                    value = value_item.text().strip()
-                    if name:
-                        params[name] = value
-            
-            data["tech_params"] = params
-            self.save_data()
-            print("技术参数已自动保存")
-        except Exception as e:
-            print(f"自动保存技术参数失败: {str(e)}")
-    
-    def auto_save_pricing(self):
-        """自动保存价格信息"""
-        try:
-            # 检查是否正在初始化
-            if hasattr(self, '_initializing') and self._initializing:
-                print("自动保存价格信息: 正在初始化，跳过")
-                return
-                
-            # 确保 current_item 属性存在
-            if not hasattr(self, 'current_item'):
-                print("自动保存价格信息: current_item 属性不存在")
-                return
-                
-            if not self.current_item:
-                print("自动保存价格信息: 没有选中项目")
-                return
-                
-            path = self.get_item_path(self.current_item)
-            if not path:
-                print("自动保存价格信息: 无法获取项目路径")
-                return
-                
-            data = self.get_data_by_path(path)
-            if not data or "children" in data:
-                print("自动保存价格信息: 数据无效或为分类")
-                return
-            
-            print(f"自动保存价格信息: 开始处理项目 {' > '.join(path)}")
-            
-            # 获取基础价格
-            base_price_text = self.base_price_edit.text().strip()
-            try:
-                base_price = float(base_price_text) if base_price_text else 0
-            except ValueError:
-                base_price = 0
-            currency = self.currency_combo.currentText()
-            
-            # 获取现有供应商数据以保留图片信息
-            existing_suppliers = data.get("pricing", {}).get("suppliers", [])
-            print(f"现有供应商数量: {len(existing_suppliers)}")
-            
-            # 获取供应商信息
-            suppliers = []
-            print(f"开始处理供应商表格，共 {self.supplier_table.rowCount()} 行")
-            for row in range(self.supplier_table.rowCount()):
-                try:
-                    supplier = {}
-                    for col in range(self.supplier_table.columnCount()):
-                        item = self.supplier_table.item(row, col)
-                        if item:
-                            if col == 0:  # 型号（暂时不保存）
-                                pass
-                            elif col == 1:  # 供应商名称
-                                supplier["name"] = item.text().strip()
-                            elif col == 2:  # 价格
-                                price_text = item.text().strip()
-                                try:
-                                    supplier["price"] = float(price_text) if price_text else 0
-                                except ValueError:
-                                    supplier["price"] = 0
-                            elif col == 3:  # 供货周期
-                                supplier["lead_time"] = item.text().strip()
-                            elif col == 4:  # 联系方式
-                                supplier["contact"] = item.text().strip()
-                            elif col == 5:  # 产品图片（仅显示用，不保存到数据）
-                                pass  # 图片信息通过其他方式管理
-                        else:
-                            # 如果单元格为空，设置默认值
-                            if col == 0:  # 型号（暂时不保存）
-                                pass
-                            elif col == 1:  # 供应商名称
-                                supplier["name"] = ""
-                            elif col == 2:  # 价格
-                                supplier["price"] = 0
-                            elif col == 3:  # 供货周期
-                                supplier["lead_time"] = ""
-                            elif col == 4:  # 联系方式
-                                supplier["contact"] = ""
-                            elif col == 5:  # 产品图片（仅显示用，不保存到数据）
-                                pass  # 图片信息通过其他方式管理
-                    
-                    if supplier.get("name"):  # 只保存有供应商名称的行
-                        # 保留现有供应商的图片信息
-                        supplier["images"] = []
-                        for existing_supplier in existing_suppliers:
-                            if existing_supplier.get("name") == supplier["name"]:
-                                supplier["images"] = existing_supplier.get("images", [])
-                                print(f"自动保存时保留供应商 '{supplier['name']}' 的 {len(supplier['images'])} 张图片")
-                                break
-                        
-                        suppliers.append(supplier)
-                        print(f"添加供应商: {supplier['name']} - 价格: {supplier.get('price', 0)}")
-                    else:
-                        print(f"跳过第 {row} 行，供应商名称为空")
-                except Exception as row_error:
-                    print(f"处理第 {row} 行供应商数据时出错: {str(row_error)}")
-                    import traceback
-                    traceback.print_exc()
-                    continue
-            
-            print(f"总共保存 {len(suppliers)} 个供应商")
-            
-            # 更新数据
-            if "pricing" not in data:
-                data["pricing"] = {}
-            
-            data["pricing"]["base_price"] = base_price
-            data["pricing"]["currency"] = currency
-            data["pricing"]["suppliers"] = suppliers
-            
-            self.save_data()
-            print("价格信息已自动保存")
-            # 可选：在状态栏显示保存状态（如果存在状态栏）
-            if hasattr(self, 'statusBar'):
-                self.statusBar().showMessage(f"供应商信息已自动保存 ({len(suppliers)} 个供应商)", 3000)
-        except Exception as e:
-            error_msg = f"自动保存价格信息失败: {str(e)}"
-            print(error_msg)
-            import traceback
-            traceback.print_exc()
-            # 可选：在状态栏显示错误（如果存在状态栏）
-            if hasattr(self, 'statusBar'):
-                self.statusBar().showMessage(error_msg, 5000)
+        """设置自动保存功能
+        
+        基本信息、标签、基础价格、货币和维护信息的 textChanged 信号已在
+        各标签页创建时连接，这里只补充表格的 itemChanged 信号，避免重复触发。
+        """
+        # 技术参数自动保存
+        if hasattr(self, 'tech_table'):
+            self.tech_table.itemChanged.connect(self.auto_save_tech_params)
+        
+        # 供应商表格自动保存
+        if hasattr(self, 'supplier_table'):
+            self.supplier_table.itemChanged.connect(self.auto_save_pricing)
+        
+        # 在状态栏报告合并写入的效果
+        self.autosave.flushed.connect(self.on_autosave_flushed)
     
-    def auto_save_maintenance(self):
-        """自动保存维护信息"""
+    def on_autosave_flushed(self, written, saved_writes):
+        """自动保存完成后更新状态栏"""
+        if written:
+            self.statusBar().showMessage(f"已自动保存 {written} 个设备（累计合并 {saved_writes} 次写入）", 3000)
+    
+    def mark_autosave(self, field):
+        """标记当前设备的字段需要自动保存"""
         try:
             # 检查是否正在初始化
             if hasattr(self, '_initializing') and self._initializing:
@@ -632,18 +2086,170 @@ class BoilerKnowledge(QMainWindow):
             if not data or "children" in data:
                 return
             
-            # 获取维护信息
-            maintenance = {
+            self.autosave.mark_dirty(path, field)
+        except Exception as e:
+            log.error("标记自动保存失败: %s", str(e))
+    
+    def auto_save_content(self):
+        """自动保存内容"""
+        self.mark_autosave("content")
+    
+    def auto_save_tags(self):
+        """自动保存标签"""
+        self.mark_autosave("tags")
+    
+    def auto_save_tech_params(self):
+        """自动保存技术参数"""
+        self.mark_autosave("technical_params")
+    
+    def auto_save_pricing(self):
+        """自动保存价格信息"""
+        self.mark_autosave("pricing")
+    
+    def auto_save_maintenance(self):
+        """自动保存维护信息"""
+        self.mark_autosave("maintenance")
+    
+    @perf_stats.timed("flush_autosave")
+    def flush_autosave(self, path, fields):
+        """把脏字段从界面写回数据，每个设备只保存一次"""
+        data = self.get_data_by_path(path)
+        if not data or "children" in data:
+            log.debug("自动保存跳过: 找不到设备 %s", ' > '.join(path))
+            return False
+        
+        if "content" in fields:
+            data["content"] = self.content_edit.toPlainText()
+        
+        if "tags" in fields:
+            tags_text = self.tags_edit.text().strip()
+            if tags_text:
+                data["tags"] = [tag.strip() for tag in tags_text.split(",") if tag.strip()]
+            else:
+                data["tags"] = []
+        
+        if "technical_params" in fields:
+            data["technical_params"] = self.collect_tech_params()
+        
+        if "pricing" in fields:
+            self.collect_pricing(data)
+        
+        if "maintenance" in fields:
+            data["maintenance"] = {
                 "cycle": self.cycle_edit.text().strip(),
                 "procedures": self.procedures_edit.toPlainText().strip(),
                 "notes": self.notes_edit.toPlainText().strip()
             }
-            
-            data["maintenance"] = maintenance
-            self.save_data()
-            print("维护信息已自动保存")
-        except Exception as e:
-            print(f"自动保存维护信息失败: {str(e)}")
+        
+        # 零部件字段以 (字段名, 标记时的零部件名称) 的形式记录
+        for field in fields:
+            if isinstance(field, tuple):
+                field_name, part_name = field
+                if field_name == "part_name":
+                    self.update_part_name(data, part_name)
+                elif field_name == "part_description":
+                    self.update_part_description(data, part_name)
+        
+        if "tags" in fields:
+            self.update_node_tags(path)
+        
+        self.save_data(path)
+        log.debug("自动保存完成: %s (%s 个字段)", ' > '.join(path), len(fields))
+        return True
+    
+    def collect_tech_params(self):
+        """从技术参数表格收集参数"""
+        params = {}
+        for row in range(self.tech_table.rowCount()):
+            name_item = self.tech_table.item(row, 0)
+            value_item = self.tech_table.item(row, 1)
+            if name_item and value_item:
+                name = name_item.text().strip()
+                value = value_item.text().strip()
+                if name:
+                    params[name] = value
+        return params
+    
+    def collect_pricing(self, data):
+        """从价格标签页收集价格和供应商信息写回数据"""
+        # 获取基础价格
+        base_price_text = self.base_price_edit.text().strip()
+        try:
+            base_price = float(base_price_text) if base_price_text else 0
+        except ValueError:
+            base_price = 0
+        currency = self.currency_combo.currentText()
+        
+        # 获取现有供应商数据以保留图片信息
+        existing_suppliers = data.get("pricing", {}).get("suppliers", [])
+        log.debug("现有供应商数量: %s", len(existing_suppliers))
+        
+        # 获取供应商信息
+        suppliers = []
+        log.debug("开始处理供应商表格，共 %s 行", self.supplier_table.rowCount())
+        for row in range(self.supplier_table.rowCount()):
+            try:
+                supplier = {}
+                for col in range(self.supplier_table.columnCount()):
+                    item = self.supplier_table.item(row, col)
+                    if item:
+                        if col == 0:  # 型号（暂时不保存）
+                            pass
+                        elif col == 1:  # 供应商名称
+                            supplier["name"] = item.text().strip()
+                        elif col == 2:  # 价格
+                            price_text = item.text().strip()
+                            try:
+                                supplier["price"] = float(price_text) if price_text else 0
+                            except ValueError:
+                                supplier["price"] = 0
+                        elif col == 3:  # 供货周期
+                            supplier["lead_time"] = item.text().strip()
+                        elif col == 4:  # 联系方式
+                            supplier["contact"] = item.text().strip()
+                        elif col == 5:  # 产品图片（仅显示用，不保存到数据）
+                            pass  # 图片信息通过其他方式管理
+                    else:
+                        # 如果单元格为空，设置默认值
+                        if col == 0:  # 型号（暂时不保存）
+                            pass
+                        elif col == 1:  # 供应商名称
+                            supplier["name"] = ""
+                        elif col == 2:  # 价格
+                            supplier["price"] = 0
+                        elif col == 3:  # 供货周期
+                            supplier["lead_time"] = ""
+                        elif col == 4:  # 联系方式
+                            supplier["contact"] = ""
+                        elif col == 5:  # 产品图片（仅显示用，不保存到数据）
+                            pass  # 图片信息通过其他方式管理
+                
+                if supplier.get("name"):  # 只保存有供应商名称的行
+                    # 保留现有供应商的图片信息
+                    supplier["images"] = []
+                    for existing_supplier in existing_suppliers:
+                        if existing_supplier.get("name") == supplier["name"]:
+                            supplier["images"] = existing_supplier.get("images", [])
+                            log.debug("自动保存时保留供应商 '%s' 的 %s 张图片", supplier['name'], len(supplier['images']))
+                            break
+                    
+                    suppliers.append(supplier)
+                    log.debug("添加供应商: %s - 价格: %s", supplier['name'], supplier.get('price', 0))
+                else:
+                    log.debug("跳过第 %s 行，供应商名称为空", row)
+            except Exception as row_error:
+                log.exception("处理第 %s 行供应商数据时出错: %s", row, row_error)
+                continue
+        
+        log.debug("总共保存 %s 个供应商", len(suppliers))
+        
+        # 更新数据
+        if "pricing" not in data:
+            data["pricing"] = {}
+        
+        data["pricing"]["base_price"] = base_price
+        data["pricing"]["currency"] = currency
+        data["pricing"]["suppliers"] = suppliers
     
     def delete_image_callback(self, image_path, current_index):
         """删除图片回调函数"""
@@ -673,15 +2279,12 @@ class BoilerKnowledge(QMainWindow):
             image_filename = os.path.basename(image_path)
             if "images" in data and image_filename in data["images"]:
                 data["images"].remove(image_filename)
-                print(f"已从数据中移除图片引用: {image_filename}")
-            
-            # 删除物理文件
-            if os.path.exists(image_path):
-                os.remove(image_path)
-                print(f"已删除图片文件: {image_path}")
+                log.debug("已从数据中移除图片引用: %s", image_filename)
+                # 没有其他引用时删除文件
+                self.release_image(image_filename)
             
             # 保存数据
-            self.save_data()
+            self.save_data(path)
             
             # 重新加载图片显示
             self.load_content(self.current_item)
@@ -689,7 +2292,7 @@ class BoilerKnowledge(QMainWindow):
             QMessageBox.information(self, "成功", "图片已删除！")
         except Exception as e:
             error_msg = f"删除图片失败: {str(e)}"
-            print(error_msg)
+            log.error(error_msg)
             QMessageBox.critical(self, "删除失败", error_msg)
     
     def delete_principle_image_callback(self, image_path, current_index):
@@ -720,15 +2323,12 @@ class BoilerKnowledge(QMainWindow):
             image_filename = os.path.basename(image_path)
             if "principle_images" in data and image_filename in data["principle_images"]:
                 data["principle_images"].remove(image_filename)
-                print(f"已从数据中移除原理图片引用: {image_filename}")
-            
-            # 删除物理文件
-            if os.path.exists(image_path):
-                os.remove(image_path)
-                print(f"已删除原理图片文件: {image_path}")
+                log.debug("已从数据中移除原理图片引用: %s", image_filename)
+                # 没有其他引用时删除文件
+                self.release_image(image_filename)
             
             # 保存数据
-            self.save_data()
+            self.save_data(path)
             
             # 重新加载图片显示
             self.load_content(self.current_item)
@@ -736,7 +2336,7 @@ class BoilerKnowledge(QMainWindow):
             QMessageBox.information(self, "成功", "原理图片已删除！")
         except Exception as e:
             error_msg = f"删除原理图片失败: {str(e)}"
-            print(error_msg)
+            log.error(error_msg)
             QMessageBox.critical(self, "删除失败", error_msg)
     
     def delete_supplier_image_callback(self, image_path, current_index):
@@ -777,15 +2377,12 @@ class BoilerKnowledge(QMainWindow):
                     supplier = suppliers[supplier_row]
                     if "images" in supplier and image_filename in supplier["images"]:
                         supplier["images"].remove(image_filename)
-                        print(f"已从供应商数据中移除图片引用: {image_filename}")
-            
-            # 删除物理文件
-            if os.path.exists(image_path):
-                os.remove(image_path)
-                print(f"已删除供应商图片文件: {image_path}")
+                        log.debug("已从供应商数据中移除图片引用: %s", image_filename)
+                        # 没有其他引用时删除文件
+                        self.release_image(image_filename)
             
             # 保存数据
-            self.save_data()
+            self.save_data(path)
             
             # 重新加载供应商图片显示
             self.load_supplier_images_for_specific_supplier(supplier_row)
@@ -796,164 +2393,119 @@ class BoilerKnowledge(QMainWindow):
             QMessageBox.information(self, "成功", "供应商图片已删除！")
         except Exception as e:
             error_msg = f"删除供应商图片失败: {str(e)}"
-            print(error_msg)
+            log.error(error_msg)
             QMessageBox.critical(self, "删除失败", error_msg)
 
     def create_storage_directories(self):
         """创建存储目录"""
         try:
-            print(f"正在创建存储目录...")
-            print(f"存储根目录: {self.storage_dir}")
-            print(f"图片目录: {self.images_dir}")
-            print(f"数据目录: {self.data_dir}")
+            log.info("正在创建存储目录...")
+            log.info("存储根目录: %s", self.storage_dir)
+            log.info("图片目录: %s", self.images_dir)
+            log.info("数据目录: %s", self.data_dir)
             
             for dir_path in [self.storage_dir, self.images_dir, self.data_dir]:
                 if not os.path.exists(dir_path):
                     os.makedirs(dir_path, exist_ok=True)
-                    print(f"已创建目录: {dir_path}")
+                    log.info("已创建目录: %s", dir_path)
                 else:
-                    print(f"目录已存在: {dir_path}")
+                    log.debug("目录已存在: %s", dir_path)
                     
             # 验证目录是否可写
             for dir_path in [self.storage_dir, self.images_dir, self.data_dir]:
                 if not os.access(dir_path, os.W_OK):
                     raise Exception(f"目录无写入权限: {dir_path}")
                     
-            print(f"存储目录已准备就绪: {self.storage_dir}")
+            log.info("存储目录已准备就绪: %s", self.storage_dir)
         except Exception as e:
             error_msg = f"创建存储目录失败: {e}"
-            print(error_msg)
+            log.error(error_msg)
             QMessageBox.critical(self, "目录创建失败", error_msg)
 
     def load_data(self):
-        """加载数据"""
-        self.data_file = os.path.join(self.data_dir, "system_data.json")
+        """加载数据（快照 + 增量日志，或已转换的拆分格式 / SQLite 数据库）"""
         try:
-            if os.path.exists(self.data_file):
-                with open(self.data_file, 'r', encoding='utf-8') as f:
-                    self.system_data = json.load(f)
-                print(f"数据已从以下位置加载: {self.data_file}")
-            else:
-                print(f"未找到现有数据文件，将创建新的数据文件: {self.data_file}")
-                # 初始化默认数据结构
-                self.system_data = {
-                    "categories": {
-                        "锅炉系统": {
-                            "children": {
-                                "给料系统": {
-                                    "children": {
-                                        "皮带": {
-                                            "content": "皮带是一条皮带\n",
-                                            "tags": ["给料系统", "输送设备"],
-                                            "images": [],
-                                            "technical_params": {
-                                                "型号": "B800",
-                                                "长度": "50m",
-                                                "材质": "橡胶",
-                                                "功率": "5.5kW"
-                                            },
-                                            "pricing": {
-                                                "base_price": 15000,
-                                                "currency": "CNY",
-                                                "suppliers": [
-                                                    {
-                                                        "name": "上海输送设备厂",
-                                                        "price": 15000,
-                                                        "lead_time": "7天",
-                                                        "contact": "张经理 13800138000"
-                                                    }
-                                                ]
-                                            },
-                                            "maintenance": {
-                                                "cycle": "每月检查",
-                                                "procedures": "检查皮带张力、清理杂物",
-                                                "notes": "注意防止跑偏"
-                                            },
-                                            "parts": []
-                                        },
-                                        "给料机": {
-                                            "content": "",
-                                            "tags": ["给料系统", "输送设备"],
-                                            "images": [],
-                                            "technical_params": {},
-                                            "pricing": {"base_price": 0, "currency": "CNY", "suppliers": []},
-                                            "maintenance": {"cycle": "", "procedures": "", "notes": ""},
-                                            "parts": []
-                                        }
-                                    }
-                                },
-                                "燃烧系统": {
-                                    "children": {
-                                        "燃烧器": {
-                                            "content": "",
-                                            "tags": ["燃烧系统", "燃烧设备"],
-                                            "images": [],
-                                            "technical_params": {},
-                                            "pricing": {"base_price": 0, "currency": "CNY", "suppliers": []},
-                                            "maintenance": {"cycle": "", "procedures": "", "notes": ""},
-                                            "parts": []
-                                        },
-                                        "点火器": {
-                                            "content": "",
-                                            "tags": ["燃烧系统", "点火设备"],
-                                            "images": [],
-                                            "technical_params": {},
-                                            "pricing": {"base_price": 0, "currency": "CNY", "suppliers": []},
-                                            "maintenance": {"cycle": "", "procedures": "", "notes": ""},
-                                            "parts": []
-                                        }
-                                    }
-                                },
-                                "汽水系统": {
-                                    "children": {
-                                        "汽包": {
-                                            "content": "",
-                                            "tags": ["汽水系统", "压力容器"],
-                                            "images": [],
-                                            "technical_params": {},
-                                            "pricing": {"base_price": 0, "currency": "CNY", "suppliers": []},
-                                            "maintenance": {"cycle": "", "procedures": "", "notes": ""},
-                                            "parts": []
-                                        },
-                                        "水冷壁": {
-                                            "content": "",
-                                            "tags": ["汽水系统", "受热面"],
-                                            "images": [],
-                                            "technical_params": {},
-                                            "pricing": {"base_price": 0, "currency": "CNY", "suppliers": []},
-                                            "maintenance": {"cycle": "", "procedures": "", "notes": ""},
-                                            "parts": []
-                                        }
-                                    }
-                                }
-                            }
-                        }
-                    },
-                    "tags": {},  # 标签索引
-                    "suppliers": {}  # 供应商信息
-                }
+            if not self.kb.load():
+                # 第一次运行，保存默认数据
                 self.save_data()
         except Exception as e:
             error_msg = f"加载数据失败: {e}"
-            print(error_msg)
+            log.error(error_msg)
             QMessageBox.critical(self, "数据加载失败", error_msg)
-            self.system_data = {"categories": {}, "tags": {}, "suppliers": {}}
+            self.kb.replace_data({"categories": {}, "tags": {}, "suppliers": {}})
 
-    def save_data(self):
-        """保存数据"""
+    def save_data(self, path=None):
+        """保存数据（只保存 path 指向的节点；不传路径时重写完整快照）"""
         try:
-            # 确保数据目录存在
-            if not os.path.exists(self.data_dir):
-                os.makedirs(self.data_dir)
-            
-            with open(self.data_file, 'w', encoding='utf-8') as f:
-                json.dump(self.system_data, f, ensure_ascii=False, indent=2)
-            print(f"数据已成功保存到: {self.data_file}")
+            self.kb.save(path)
+        except Exception as e:
+            error_msg = f"保存数据失败: {e}"
+            log.error(error_msg)
+            QMessageBox.critical(self, "保存失败", error_msg)
+
+    def save_current_item(self):
+        """只保存当前选中设备的变更"""
+        path = self.get_item_path(self.current_item) if self.current_item else None
+        self.save_data(path)
+
+    def save_node_renamed(self, path, new_name):
+        """记录节点重命名"""
+        try:
+            self.kb.save_renamed(path, new_name)
+        except Exception as e:
+            error_msg = f"保存数据失败: {e}"
+            log.error(error_msg)
+            QMessageBox.critical(self, "保存失败", error_msg)
+
+    def save_node_deleted(self, path):
+        """记录节点删除"""
+        try:
+            self.kb.save_deleted(path)
         except Exception as e:
             error_msg = f"保存数据失败: {e}"
-            print(error_msg)
+            log.error(error_msg)
             QMessageBox.critical(self, "保存失败", error_msg)
 
+    def on_save_finished(self, ok, label, error):
+        """后台写入完成后在状态栏报告结果"""
+        if ok:
+            if self.writer.pending() == 0:
+                self.statusBar().showMessage(f"已保存: {label}", 2000)
+        else:
+            error_msg = f"保存失败: {label}: {error}"
+            log.error(error_msg)
+            self.statusBar().showMessage(error_msg)
+
+    def closeEvent(self, event):
+        """关闭窗口前写入未保存的编辑，并等待后台存储任务结束"""
+        try:
+            self.autosave.flush()
+        except Exception as e:
+            log.error("关闭前自动保存失败: %s", e)
+        try:
+            self.search_executor.close()
+            self.image_loader.cancel_all()
+            self.image_loader.wait(2000)
+            # 未完成的图片导入不写入数据，放弃已导入的图片
+            for job in list(self.image_imports):
+                job.cancel()
+                job.wait()
+                for name in job.imported():
+                    self.blob_store.discard(name, self.all_image_refs)
+            self.image_imports.clear()
+            # 未完成的导入不替换数据，未完成的导出不留下文件
+            if self.data_transfer is not None:
+                self.data_transfer.cancel()
+                self.data_transfer.wait()
+        except Exception as e:
+            log.error("关闭后台线程失败: %s", e)
+        try:
+            # 等待已提交的写入全部落盘
+            self.kb.close()
+        except Exception as e:
+            log.error("关闭存储失败: %s", e)
+        super().closeEvent(event)
+
     def create_ui(self):
         """创建主界面"""
         # 创建中央部件
@@ -982,6 +2534,24 @@ class BoilerKnowledge(QMainWindow):
         # 添加弹性空间
         left_layout.addStretch()
         
+        # 数据导入/导出（NDJSON，在后台线程中进行）
+        self.import_data_btn = QPushButton("导入数据")
+        self.import_data_btn.clicked.connect(self.import_data)
+        left_layout.addWidget(self.import_data_btn)
+        self.export_data_btn = QPushButton("导出数据")
+        self.export_data_btn.clicked.connect(self.export_data)
+        left_layout.addWidget(self.export_data_btn)
+        
+        # 日志查看器
+        self.log_btn = QPushButton("查看日志")
+        self.log_btn.clicked.connect(self.show_log_viewer)
+        left_layout.addWidget(self.log_btn)
+        
+        # 性能面板（默认隐藏，Ctrl+Shift+P 切换）
+        self.perf_btn = QPushButton("性能")
+        self.perf_btn.clicked.connect(self.toggle_performance_dock)
+        left_layout.addWidget(self.perf_btn)
+        
         left_panel.setLayout(left_layout)
         main_layout.addWidget(left_panel)
         
@@ -989,6 +2559,11 @@ class BoilerKnowledge(QMainWindow):
         self.work_area = QStackedWidget()
         self.work_area.setStyleSheet("background-color: white;")
         
+        # 分类树模型只建立一次，锅炉系统登记模块和采购模块的树形控件共用
+        self.tree_model = NodeTreeModel(self.node_index, self.style(), self)
+        self.tree_model.rowsRemoved.connect(self.on_tree_rows_removed)
+        self.tree_model.modelReset.connect(self.on_tree_rows_removed)
+        
         # 创建各个模块的工作区
         self.create_boiler_module()  # 锅炉系统登记模块
         self.create_patent_module()  # 知识产权管理模块
@@ -1003,6 +2578,12 @@ class BoilerKnowledge(QMainWindow):
         self.setWindowTitle("锅炉管理系统 - 专业版")
         self.setGeometry(100, 100, 1400, 900)
         
+        # 性能面板：各热点操作的耗时分布，默认隐藏
+        self.performance_dock = PerformanceDock(self)
+        self.addDockWidget(Qt.RightDockWidgetArea, self.performance_dock)
+        self.performance_dock.hide()
+        QShortcut(QKeySequence("Ctrl+Shift+P"), self, self.toggle_performance_dock)
+        
         # 初始化状态栏
         self.statusBar().showMessage("系统就绪", 3000)
 
@@ -1100,6 +2681,17 @@ class BoilerKnowledge(QMainWindow):
         self.procurement_btn.clicked.connect(lambda: self.switch_module(3))
         layout.addWidget(self.procurement_btn)
 
+    def toggle_performance_dock(self):
+        """显示或隐藏性能面板"""
+        self.performance_dock.setVisible(not self.performance_dock.isVisible())
+
+    def show_log_viewer(self):
+        """打开程序内的日志查看器"""
+        if self.log_viewer is None:
+            self.log_viewer = LogViewerDialog(self)
+        self.log_viewer.show()
+        self.log_viewer.raise_()
+
     def switch_module(self, module_index):
         """切换功能模块"""
         self.work_area.setCurrentIndex(module_index)
@@ -1140,7 +2732,8 @@ class BoilerKnowledge(QMainWindow):
         search_layout = QHBoxLayout()
         self.search_input = QLineEdit()
         self.search_input.setPlaceholderText("搜索设备...")
-        self.search_input.textChanged.connect(self.search_by_tag)
+        self.search_input.textChanged.connect(self.schedule_search)
+        self.search_input.returnPressed.connect(self.search_by_tag)
         search_layout.addWidget(self.search_input)
         
         self.search_btn = QPushButton("搜索")
@@ -1149,15 +2742,19 @@ class BoilerKnowledge(QMainWindow):
         left_layout.addLayout(search_layout)
         
         # 搜索结果显示列表
-        self.search_results = QListWidget()
-        self.search_results.itemClicked.connect(self.select_search_result)
+        self.search_model = SearchResultModel(self)
+        self.search_results = QListView()
+        self.search_results.setModel(self.search_model)
+        self.search_results.setUniformItemSizes(True)
+        self.search_results.clicked.connect(self.select_search_result)
         self.search_results.setMaximumHeight(150)
         left_layout.addWidget(self.search_results)
         
-        # 树形控件
-        self.tree = QTreeWidget()
-        self.tree.setHeaderLabel("设备分类")
-        self.tree.itemClicked.connect(self.load_content)
+        # 树形控件：模型直接读取节点索引，增删改只更新受影响的行
+        self.tree = QTreeView()
+        self.tree.setModel(self.tree_model)
+        self.tree.setUniformRowHeights(True)
+        self.tree.clicked.connect(self.load_content)
         self.tree.setContextMenuPolicy(Qt.CustomContextMenu)
         self.tree.customContextMenuRequested.connect(self.show_context_menu)
         left_layout.addWidget(self.tree)
@@ -1278,24 +2875,33 @@ class BoilerKnowledge(QMainWindow):
         system_title.setStyleSheet("font-size: 16px; font-weight: bold; color: #333; padding: 5px;")
         left_layout.addWidget(system_title)
         
-        # 系统树形控件
-        self.system_tree = QTreeWidget()
-        self.system_tree.setHeaderLabel("锅炉系统")
+        # 系统筛选
+        self.system_filter_edit = QLineEdit()
+        self.system_filter_edit.setPlaceholderText("筛选系统或设备...")
+        self.system_filter_edit.setClearButtonEnabled(True)
+        self.system_filter_edit.textChanged.connect(self.filter_procurement_systems)
+        left_layout.addWidget(self.system_filter_edit)
+        
+        # 系统树形控件：与锅炉系统登记模块共用分类树模型，编辑后立即反映在这里
+        self.system_tree_proxy = ProcurementTreeProxy(self.tree_model, self)
+        self.system_tree = QTreeView()
+        self.system_tree.setModel(self.system_tree_proxy)
+        self.system_tree.setUniformRowHeights(True)
         self.system_tree.setStyleSheet("""
-            QTreeWidget {
+            QTreeView {
                 border: 1px solid #ccc;
                 border-radius: 4px;
                 background-color: white;
             }
-            QTreeWidget::item {
+            QTreeView::item {
                 padding: 5px;
             }
-            QTreeWidget::item:selected {
+            QTreeView::item:selected {
                 background-color: #0078d4;
                 color: white;
             }
         """)
-        self.system_tree.itemClicked.connect(self.on_system_selected)
+        self.system_tree.clicked.connect(self.on_system_selected)
         left_layout.addWidget(self.system_tree)
         
         # 部件选择标题
@@ -1454,96 +3060,38 @@ class BoilerKnowledge(QMainWindow):
         
         procurement_layout.addLayout(main_horizontal_layout)
         
-        # 初始化系统树
-        self.init_procurement_system_tree()
-        
         procurement_widget.setLayout(procurement_layout)
         self.work_area.addWidget(procurement_widget)
 
-    def init_procurement_system_tree(self):
-        """初始化采购模块的系统树"""
-        self.system_tree.clear()
-        self.build_procurement_tree(self.system_data["categories"], self.system_tree)
-
-    def build_procurement_tree(self, data, parent_item):
-        """递归构建采购模块的树形结构"""
-        for name, info in data.items():
-            if isinstance(info, dict) and "children" in info:
-                # 这是一个分类节点
-                item = QTreeWidgetItem(parent_item, [name])
-                item.setIcon(0, self.style().standardIcon(QStyle.SP_DirIcon))
-                self.build_procurement_tree(info["children"], item)
-            else:
-                # 这是一个叶子节点（具体项目）
-                item = QTreeWidgetItem(parent_item, [name])
-                item.setIcon(0, self.style().standardIcon(QStyle.SP_FileIcon))
+    def filter_procurement_systems(self, text):
+        """按名称筛选采购模块的系统树，并展开到匹配的节点"""
+        self.system_tree_proxy.set_filter(text)
+        if not text.strip():
+            return
+        for node_id in self.system_tree_proxy.matches():
+            index = self.system_tree_proxy.mapFromSource(self.tree_model.index_for_id(node_id))
+            index = index.parent()
+            while index.isValid():
+                self.system_tree.expand(index)
+                index = index.parent()
 
     def on_system_selected(self, item):
         """当系统被选中时，加载对应的部件列表"""
         self.parts_list.clear()
         
-        # 获取选中项的路径
-        path = []
-        current_item = item
-        while current_item is not None:
-            path.insert(0, current_item.text(0))
-            current_item = current_item.parent()
-        
-        # 获取对应的数据
-        data = self.get_data_by_path(path)
-        if data and isinstance(data, dict):
-            # 如果是叶子节点（具体项目），显示其部件
-            if "parts" in data:
-                for part in data["parts"]:
-                    if isinstance(part, dict) and "name" in part:
-                        part_name = part["name"]
-                        part_description = part.get("description", "")
-                        display_text = f"{part_name}"
-                        if part_description:
-                            display_text += f" - {part_description}"
-                        
-                        item = QListWidgetItem(display_text)
-                        item.setData(Qt.UserRole, part)
-                        item.setData(Qt.UserRole + 1, path)  # 保存父级路径
-                        
-                        # 添加价格信息到工具提示
-                        pricing_info = self.get_pricing_info_for_part_with_path(part, path)
-                        if pricing_info and "suppliers" in pricing_info and pricing_info["suppliers"]:
-                            supplier = pricing_info["suppliers"][0]
-                            price = supplier.get("price", 0.0)
-                            supplier_name = supplier.get("name", "未指定")
-                            item.setToolTip(f"供应商: {supplier_name}\n价格: ¥{price:.2f}")
-                        else:
-                            item.setToolTip("暂无价格信息")
-                        
-                        self.parts_list.addItem(item)
-            # 如果是分类节点，显示其子项目
-            elif "children" in data:
-                for child_name, child_data in data["children"].items():
-                    if isinstance(child_data, dict) and "parts" in child_data:
-                        for part in child_data["parts"]:
-                            if isinstance(part, dict) and "name" in part:
-                                part_name = part["name"]
-                                part_description = part.get("description", "")
-                                display_text = f"{child_name} - {part_name}"
-                                if part_description:
-                                    display_text += f" - {part_description}"
-                                
-                                item = QListWidgetItem(display_text)
-                                item.setData(Qt.UserRole, part)
-                                item.setData(Qt.UserRole + 1, path + [child_name])  # 保存父级路径
-                                
-                                # 添加价格信息到工具提示
-                                pricing_info = self.get_pricing_info_for_part_with_path(part, path + [child_name])
-                                if pricing_info and "suppliers" in pricing_info and pricing_info["suppliers"]:
-                                    supplier = pricing_info["suppliers"][0]
-                                    price = supplier.get("price", 0.0)
-                                    supplier_name = supplier.get("name", "未指定")
-                                    item.setToolTip(f"供应商: {supplier_name}\n价格: ¥{price:.2f}")
-                                else:
-                                    item.setToolTip("暂无价格信息")
-                                
-                                self.parts_list.addItem(item)
+        # 设备显示其部件，分类显示其下一级设备的部件
+        for line in self.kb.procurement_parts(self.get_item_path(item) or []):
+            list_item = QListWidgetItem(line["label"])
+            list_item.setData(Qt.UserRole, line["part"])
+            list_item.setData(Qt.UserRole + 1, line["path"])  # 保存父级路径
+            
+            # 添加价格信息到工具提示
+            if line["supplier_name"] is not None:
+                list_item.setToolTip(f"供应商: {line['supplier_name']}\n价格: ¥{line['unit_price']:.2f}")
+            else:
+                list_item.setToolTip("暂无价格信息")
+            
+            self.parts_list.addItem(list_item)
 
     def add_to_procurement_list(self, item):
         """将选中的部件添加到采购清单"""
@@ -1725,27 +3273,18 @@ class BoilerKnowledge(QMainWindow):
                 self.add_to_procurement_list(item)
 
     def init_tree(self):
-        """初始化树形结构"""
-        self.tree.clear()
-        self.build_tree(self.system_data["categories"], self.tree)
-
-    def build_tree(self, data, parent_item):
-        """递归构建树形结构"""
-        for name, info in data.items():
-            if isinstance(info, dict) and "children" in info:
-                # 这是一个分类节点
-                item = QTreeWidgetItem(parent_item, [name])
-                item.setIcon(0, self.style().standardIcon(QStyle.SP_DirIcon))
-                self.build_tree(info["children"], item)
-            else:
-                # 这是一个叶子节点（具体项目）
-                item = QTreeWidgetItem(parent_item, [name])
-                item.setIcon(0, self.style().standardIcon(QStyle.SP_FileIcon))
+        """整体替换数据后（导入）重建树形结构"""
+        self.tree_model.reset()
+
+    def on_tree_rows_removed(self, *args):
+        """当前设备所在的行被删除（或模型重建）后不再引用它"""
+        if self.current_item is not None and not self.current_item.isValid():
+            self.current_item = None
 
     def add_category(self):
         """添加分类"""
-        current_item = self.tree.currentItem()
-        if not current_item:
+        current_item = self.tree.currentIndex()
+        if not current_item.isValid():
             QMessageBox.warning(self, "警告", "请先选择一个父分类！")
             return
             
@@ -1753,26 +3292,19 @@ class BoilerKnowledge(QMainWindow):
         if ok and name:
             # 在数据结构中添加新分类
             parent_path = self.get_item_path(current_item)
-            self.add_category_to_data(parent_path, name)
+            new_path = self.add_category_to_data(parent_path, name)
             
-            # 记住当前展开状态
-            expanded_items = self.get_expanded_items()
-            
-            # 重新构建树
-            self.init_tree()
-            
-            # 恢复展开状态
-            self.restore_expanded_items(expanded_items)
-            
-            # 展开新添加的分类
-            self.expand_new_item(parent_path + [name])
+            if new_path is None:
+                return
+            # 展开新添加的分类（设备下添加时新节点在设备所在的分类中）
+            self.expand_new_item(new_path)
             
-            self.save_data()
+            self.save_data(new_path)
 
     def add_item(self):
         """添加具体项目"""
-        current_item = self.tree.currentItem()
-        if not current_item:
+        current_item = self.tree.currentIndex()
+        if not current_item.isValid():
             QMessageBox.warning(self, "警告", "请先选择一个父分类！")
             return
             
@@ -1780,23 +3312,14 @@ class BoilerKnowledge(QMainWindow):
         if ok and name:
             # 在数据结构中添加新项目
             parent_path = self.get_item_path(current_item)
-            self.add_item_to_data(parent_path, name)
-            
-            # 记住当前展开状态
-            expanded_items = self.get_expanded_items()
+            new_path = self.add_item_to_data(parent_path, name)
             
-            # 重新构建树
-            self.init_tree()
-            
-            # 恢复展开状态
-            self.restore_expanded_items(expanded_items)
-            
-            self.save_data()
+            self.save_data(new_path)
 
     def delete_category(self):
         """删除分类或项目"""
-        current_item = self.tree.currentItem()
-        if not current_item:
+        current_item = self.tree.currentIndex()
+        if not current_item.isValid():
             QMessageBox.warning(self, "警告", "请先选择要删除的项目！")
             return
         
@@ -1804,76 +3327,58 @@ class BoilerKnowledge(QMainWindow):
 
     def rename_category(self):
         """重命名分类或项目"""
-        current_item = self.tree.currentItem()
-        if not current_item:
+        current_item = self.tree.currentIndex()
+        if not current_item.isValid():
             QMessageBox.warning(self, "警告", "请先选择要重命名的项目！")
             return
-            
-        old_name = current_item.text(0)
+        
+        # 路径即将改变，先写入待保存的编辑
+        self.autosave.flush()
+        old_name = current_item.data()
         new_name, ok = QInputDialog.getText(self, "重命名", "请输入新名称:", text=old_name)
         if ok and new_name and new_name != old_name:
             try:
                 parent_path = self.get_item_path(current_item.parent())
-                if parent_path:
-                    # 使用 get_parent_data_by_path 获取父级的 children 字典
-                    parent_data = self.get_parent_data_by_path(parent_path + [old_name])
-                    if parent_data and old_name in parent_data:
-                        parent_data[new_name] = parent_data.pop(old_name)
-                else:
-                    if old_name in self.system_data["categories"]:
-                        self.system_data["categories"][new_name] = self.system_data["categories"].pop(old_name)
-                
-                # 记住当前展开状态
-                expanded_items = self.get_expanded_items()
-                
-                # 重新构建树
-                self.init_tree()
-                
-                # 恢复展开状态
-                self.restore_expanded_items(expanded_items)
-                
-                self.save_data()
+                old_path = (parent_path or []) + [old_name]
+                if self.kb.rename_node(old_path, new_name):
+                    self.save_node_renamed(old_path, new_name)
                 QMessageBox.information(self, "成功", f"'{old_name}' 已重命名为 '{new_name}'！")
             except Exception as e:
                 QMessageBox.critical(self, "错误", f"重命名失败: {str(e)}")
 
+    def get_item_node_id(self, item):
+        """获取树形项（分类树模型或其代理模型的索引）保存的节点 id"""
+        try:
+            if item is None:
+                return None
+            if not item.isValid():
+                return None
+            return item.data(Qt.UserRole)
+        except RuntimeError:
+            # 控件项已在重建树时被销毁
+            return None
+
+    def get_item_data(self, item):
+        """根据树形控件项直接获取节点数据"""
+        node_id = self.get_item_node_id(item)
+        if node_id is not None:
+            return self.node_index.node(node_id)
+        return self.get_data_by_path(self.get_item_path(item))
+
     def get_item_path(self, item):
         """获取项目在数据中的路径"""
         try:
-            if not item:
+            node_id = self.get_item_node_id(item)
+            if node_id is None:
                 return None
-            path = [item.text(0)]
-            parent = item.parent()
-            while parent:
-                path.insert(0, parent.text(0))
-                parent = parent.parent()
-            return path
+            return self.node_index.path(node_id)
         except Exception as e:
-            print(f"获取项目路径失败: {str(e)}")
+            log.error("获取项目路径失败: %s", str(e))
             return None
 
     def get_data_by_path(self, path):
         """根据路径获取数据"""
-        try:
-            if not path:
-                return self.system_data["categories"]
-            current = self.system_data["categories"]
-            for i, name in enumerate(path):
-                if name in current:
-                    if i == len(path) - 1:
-                        # 这是最后一个元素，返回当前节点
-                        return current[name]
-                    elif "children" in current[name]:
-                        # 还有更多路径，继续遍历
-                        current = current[name]["children"]
-                    else:
-                        return None
-                else:
-                    return None
-            return current
-        except Exception as e:
-            print(f"获取路径数据失败: {str(e)}, 路径: {path}")
-            return None
+        return self.kb.get_data_by_path(path)
 
     def get_current_item_data(self):
         """获取当前选中项目的数据"""
@@ -1881,168 +3386,61 @@ class BoilerKnowledge(QMainWindow):
             if not self.current_item:
                 return None
             
-            path = self.get_item_path(self.current_item)
-            if not path:
-                return None
-            
-            data = self.get_data_by_path(path)
+            data = self.get_item_data(self.current_item)
             if not data or "children" in data:
                 return None
             
             return data
         except Exception as e:
-            print(f"获取当前项目数据失败: {e}")
+            log.error("获取当前项目数据失败: %s", e)
             return None
 
-    def get_parent_data_by_path(self, path):
-        """根据路径获取父级数据"""
-        if not path:
-            return self.system_data["categories"]
-        current = self.system_data["categories"]
-        for i, name in enumerate(path[:-1]):  # 除了最后一个元素
-            if name in current and "children" in current[name]:
-                current = current[name]["children"]
-            else:
-                return None
-        return current
-
     def add_category_to_data(self, parent_path, name):
-        """在数据中添加分类"""
-        if parent_path:
-            # 检查当前路径指向的是否是一个分类（有children属性）
-            current_data = self.get_data_by_path(parent_path)
-            if current_data and isinstance(current_data, dict) and "children" in current_data:
-                # 当前路径指向的是一个分类，直接在其children中添加
-                current_data["children"][name] = {"children": {}}
-            else:
-                # 当前路径指向的是一个项目，需要获取其父级
-                parent_data = self.get_parent_data_by_path(parent_path)
-                if parent_data:
-                    parent_data[name] = {"children": {}}
-                else:
-                    # 如果还是找不到父级，可能是根目录的情况
-                    # 检查是否在根目录下添加
-                    if len(parent_path) == 1 and parent_path[0] in self.system_data["categories"]:
-                        # 在根分类下添加
-                        self.system_data["categories"][parent_path[0]]["children"][name] = {"children": {}}
-        else:
-            self.system_data["categories"][name] = {"children": {}}
-            
-    def add_item_to_data(self, parent_path, name):
-        """在数据中添加具体项目"""
-        if parent_path:
-            # 检查当前路径指向的是否是一个分类（有children属性）
-            current_data = self.get_data_by_path(parent_path)
-            if current_data and isinstance(current_data, dict) and "children" in current_data:
-                # 当前路径指向的是一个分类，直接在其children中添加
-                current_data["children"][name] = {
-                    "content": "",
-                    "tags": [],
-                    "images": [],
-                    "technical_params": {},
-                    "pricing": {"base_price": 0, "currency": "CNY", "suppliers": []},
-                    "maintenance": {"cycle": "", "procedures": "", "notes": ""},
-                    "parts": []
-                }
-            else:
-                # 当前路径指向的是一个项目，需要获取其父级
-                parent_data = self.get_parent_data_by_path(parent_path)
-                if parent_data:
-                    parent_data[name] = {
-                        "content": "",
-                        "tags": [],
-                        "images": [],
-                        "technical_params": {},
-                        "pricing": {"base_price": 0, "currency": "CNY", "suppliers": []},
-                        "maintenance": {"cycle": "", "procedures": "", "notes": ""},
-                        "parts": []
-                    }
-                else:
-                    # 如果还是找不到父级，可能是根目录的情况
-                    # 检查是否在根目录下添加
-                    if len(parent_path) == 1 and parent_path[0] in self.system_data["categories"]:
-                        # 在根分类下添加
-                        self.system_data["categories"][parent_path[0]]["children"][name] = {
-                            "content": "",
-                            "tags": [],
-                            "images": [],
-                            "technical_params": {},
-                            "pricing": {"base_price": 0, "currency": "CNY", "suppliers": []},
-                            "maintenance": {"cycle": "", "procedures": "", "notes": ""},
-                            "parts": []
-                        }
-        else:
-            self.system_data["categories"][name] = {
-                "content": "",
-                "tags": [],
-                "images": [],
-                "technical_params": {},
-                "pricing": {"base_price": 0, "currency": "CNY", "suppliers": []},
-                "maintenance": {"cycle": "", "procedures": "", "notes": ""},
-                "parts": []
-            }
+        """在数据中添加分类，返回新分类的路径"""
+        return self.kb.add_category(parent_path, name)
 
-    def get_expanded_items(self):
-        """获取当前展开的项目"""
-        expanded = []
-        self.collect_expanded_items(self.tree.invisibleRootItem(), [], expanded)
-        return expanded
-
-    def collect_expanded_items(self, item, path, expanded):
-        """收集展开的项目路径"""
-        for i in range(item.childCount()):
-            child = item.child(i)
-            child_path = path + [child.text(0)]
-            if child.isExpanded():
-                expanded.append(child_path)
-            self.collect_expanded_items(child, child_path, expanded)
-
-    def restore_expanded_items(self, expanded_items):
-        """恢复展开状态"""
-        for path in expanded_items:
-            self.expand_path(path)
+    def add_item_to_data(self, parent_path, name):
+        """在数据中添加具体项目，返回新项目的路径"""
+        return self.kb.add_item(parent_path, name)
 
     def expand_path(self, path):
-        """展开指定路径"""
-        current = self.tree.invisibleRootItem()
-        for name in path:
-            found = False
-            for i in range(current.childCount()):
-                child = current.child(i)
-                if child.text(0) == name:
-                    child.setExpanded(True)
-                    current = child
-                    found = True
-                    break
-            if not found:
-                break
+        """展开指定路径（包括各级父节点）"""
+        index = self.tree_model.index_for_id(self.node_index.id_for_path(path))
+        while index.isValid():
+            self.tree.expand(index)
+            index = index.parent()
 
     def expand_new_item(self, path):
         """展开新添加的项目"""
         self.expand_path(path)
 
+    @perf_stats.timed("load_content")
     def load_content(self, item):
         """加载内容"""
         try:
-            print("=== 开始加载内容 ===")
+            log.debug("=== 开始加载内容 ===")
+            # 切换选中项前先写入上一个设备尚未保存的编辑
+            self.autosave.flush()
+            # 上一个设备尚未完成的图片载入全部作废
+            self.image_loader.cancel_all()
             # 设置加载标志，防止自动保存触发
             self._initializing = True
             
-            if not item:
-                print("没有选中项目，跳过加载")
+            if item is None or not item.isValid():
+                log.debug("没有选中项目，跳过加载")
                 self._initializing = False
                 return
                 
             path = self.get_item_path(item)
-            print(f"项目路径: {path}")
+            log.debug("项目路径: %s", path)
             if not path:
-                print("无法获取项目路径，跳过加载")
+                log.debug("无法获取项目路径，跳过加载")
                 return
                 
             # 检查是否是叶子节点（具体项目）
             data = self.get_data_by_path(path)
             if not data:
-                print("无法找到数据，清空所有内容")
+                log.debug("无法找到数据，清空所有内容")
                 # 无法找到数据，清空内容
                 self.content_edit.clear()
                 self.tags_edit.clear()
@@ -2060,12 +3458,12 @@ class BoilerKnowledge(QMainWindow):
                     if hasattr(self, 'current_supplier_info'):
                         self.current_supplier_info.setText("请双击供应商表格中的供应商来管理其产品图片")
                 except Exception as e:
-                    print(f"隱藏供應商圖片管理區域失敗: {str(e)}")
+                    log.error("隱藏供應商圖片管理區域失敗: %s", str(e))
                     pass
                 return
                 
             if "children" in data:
-                print(f"这是分类节点: {item.text(0)}，清空所有内容")
+                log.debug("这是分类节点: %s，清空所有内容", item.data())
                 # 这是一个分类节点，清空内容
                 self.content_edit.clear()
                 self.tags_edit.clear()
@@ -2083,43 +3481,44 @@ class BoilerKnowledge(QMainWindow):
                     if hasattr(self, 'current_supplier_info'):
                         self.current_supplier_info.setText("请双击供应商表格中的供应商来管理其产品图片")
                 except Exception as e:
-                    print(f"隱藏供應商圖片管理區域失敗: {str(e)}")
+                    log.error("隱藏供應商圖片管理區域失敗: %s", str(e))
                     pass
                 return
                 
             # 这是一个叶子节点，加载详细信息
-            print(f"这是叶子节点: {item.text(0)}，开始加载详细信息")
-            self.current_item = item
+            log.debug("这是叶子节点: %s，开始加载详细信息", item.data())
+            # 行被移动（如兄弟节点重命名）后仍指向同一个设备
+            self.current_item = QPersistentModelIndex(item)
             
             # 加载基本信息
-            print("加载基本信息...")
+            log.debug("加载基本信息...")
             self.content_edit.setPlainText(data.get("content", ""))
             self.tags_edit.setText(", ".join(data.get("tags", [])))
             
             # 加载技术参数
-            print("加载技术参数...")
+            log.debug("加载技术参数...")
             self.load_tech_params(data.get("technical_params", {}))
             
             # 加载价格信息
-            print("加载价格信息...")
+            log.debug("加载价格信息...")
             pricing_data = data.get("pricing", {})
-            print(f"价格数据: {pricing_data}")
+            log.debug("价格数据: %s", pricing_data)
             self.load_pricing(pricing_data)
             
             # 加载维护信息
-            print("加载维护信息...")
+            log.debug("加载维护信息...")
             self.load_maintenance(data.get("maintenance", {}))
             
             # 加载图片
-            print("加载图片...")
+            log.debug("加载图片...")
             self.load_images(data.get("images", []))
             
             # 加载原理图片
-            print("加载原理图片...")
+            log.debug("加载原理图片...")
             self.load_principle_images(data.get("principle_images", []))
             
             # 加载零部件列表
-            print("加载零部件列表...")
+            log.debug("加载零部件列表...")
             self.load_parts_list(data)
             
             # 隐藏供应商图片管理区域
@@ -2129,16 +3528,16 @@ class BoilerKnowledge(QMainWindow):
                 if hasattr(self, 'current_supplier_info'):
                     self.current_supplier_info.setText("请双击供应商表格中的供应商来管理其产品图片")
             except Exception as e:
-                print(f"隱藏供應商圖片管理區域失敗: {str(e)}")
+                log.error("隱藏供應商圖片管理區域失敗: %s", str(e))
                 pass
             
-            print("=== 内容加载完成 ===")
+            log.debug("=== 内容加载完成 ===")
             
             # 清除加载标志，恢复自动保存
             self._initializing = False
         except Exception as e:
             error_msg = f"加载内容失败: {str(e)}"
-            print(error_msg)
+            log.error(error_msg)
             # 确保在异常情况下也清除加载标志
             self._initializing = False
             QMessageBox.critical(self, "加载失败", error_msg)
@@ -2152,9 +3551,12 @@ class BoilerKnowledge(QMainWindow):
             self.tech_table.setItem(row, 0, QTableWidgetItem(param_name))
             self.tech_table.setItem(row, 1, QTableWidgetItem(str(param_value)))
 
+    @perf_stats.timed("load_pricing")
     def load_pricing(self, pricing):
         """加载价格信息"""
-        print(f"开始加载价格信息: {pricing}")
+        log.debug("开始加载价格信息: %s", pricing)
+        # 重新填充表格前先写入尚未保存的价格编辑
+        self.autosave.flush()
         
         # 临时禁用自动保存，防止UI变化触发自动保存
         auto_save_enabled = not (hasattr(self, '_initializing') and self._initializing)
@@ -2176,7 +3578,7 @@ class BoilerKnowledge(QMainWindow):
         
         # 加載供應商信息
         suppliers = pricing.get("suppliers", [])
-        print(f"加載 {len(suppliers)} 個供應商")
+        log.debug("加載 %s 個供應商", len(suppliers))
         
         # 確保供應商表格完全清空
         self.supplier_table.clearContents()
@@ -2188,225 +3590,131 @@ class BoilerKnowledge(QMainWindow):
             # 型号列（第0列）
             self.supplier_table.setItem(row, 0, QTableWidgetItem(""))  # 型号暂时为空
             # 供应商列（第1列）
-            self.supplier_table.setItem(row, 1, QTableWidgetItem(supplier.get("name", "")))
-            # 价格列（第2列）
-            self.supplier_table.setItem(row, 2, QTableWidgetItem(str(supplier.get("price", 0))))
-            # 供货周期列（第3列）
-            self.supplier_table.setItem(row, 3, QTableWidgetItem(supplier.get("lead_time", "")))
-            # 联系方式列（第4列）
-            self.supplier_table.setItem(row, 4, QTableWidgetItem(supplier.get("contact", "")))
-            
-            # 顯示供應商圖片信息（第5列）
-            supplier_images = supplier.get("images", [])
-            if supplier_images:
-                image_count = len(supplier_images)
-                self.supplier_table.setItem(row, 5, QTableWidgetItem(f"📷 {image_count}张图片"))
-                print(f"供應商 '{supplier.get('name', '')}' 有 {image_count} 張圖片")
-            else:
-                self.supplier_table.setItem(row, 5, QTableWidgetItem("无图片"))
-                print(f"供應商 '{supplier.get('name', '')}' 無圖片")
-        
-        print(f"價格信息加載完成，共 {self.supplier_table.rowCount()} 行供應商")
-        
-        # 強制刷新表格
-        self.supplier_table.viewport().update()
-        
-        # 如果之前启用了自动保存，现在恢复
-        if auto_save_enabled:
-            self._initializing = False
-
-    def load_maintenance(self, maintenance):
-        """加载维护信息"""
-        self.cycle_edit.setText(maintenance.get("cycle", ""))
-        self.procedures_edit.setPlainText(maintenance.get("procedures", ""))
-        self.notes_edit.setPlainText(maintenance.get("notes", ""))
-
-    def load_images(self, images):
-        """加载图片缩略图"""
-        try:
-            print(f"開始載入圖片縮略圖，圖片數量: {len(images) if images else 0}")
-            
-            # 清除所有布局项，但保留占位符标签
-            while self.images_layout.count() > 0:
-                item = self.images_layout.takeAt(0)
-                if item.widget():
-                    # 不要删除占位符标签，只删除缩略图小部件
-                    if item.widget() != self.image_thumbnail_label:
-                        item.widget().deleteLater()
-            
-            if images and len(images) > 0:
-                # 隐藏提示标签
-                self.image_thumbnail_label.hide()
-                print(f"隱藏提示標籤，開始載入 {len(images)} 張圖片")
-                
-                # 验证图片文件并过滤掉不存在的文件
-                valid_images = []
-                missing_images = []
-                
-                for image_filename in images:
-                    image_path = os.path.join(self.images_dir, image_filename)
-                    if os.path.exists(image_path):
-                        valid_images.append(image_filename)
-                    else:
-                        missing_images.append(image_filename)
-                        print(f"警告: 图片文件不存在: {image_path}")
-                
-                if missing_images:
-                    print(f"發現 {len(missing_images)} 個缺失的圖片文件: {missing_images}")
-                    # 可以选择是否显示警告给用户
-                    if len(missing_images) > 0:
-                        QMessageBox.warning(self, "圖片文件缺失", 
-                                          f"發現 {len(missing_images)} 個圖片文件缺失:\n" + 
-                                          "\n".join(missing_images[:5]) + 
-                                          ("\n..." if len(missing_images) > 5 else ""))
-                
-                # 为每张有效图片创建缩略图
-                for i, image_filename in enumerate(valid_images):
-                    try:
-                        image_path = os.path.join(self.images_dir, image_filename)
-                        print(f"處理第 {i+1} 張圖片: {image_filename}")
-                        print(f"完整路徑: {image_path}")
-                        
-                        # 验证文件是否可读
-                        if not os.access(image_path, os.R_OK):
-                            print(f"警告: 图片文件无读取权限: {image_path}")
-                            continue
-                        
-                        # 验证文件大小
-                        file_size = os.path.getsize(image_path)
-                        if file_size == 0:
-                            print(f"警告: 图片文件为空: {image_path}")
-                            continue
-                        
-                        print(f"圖片文件存在且可讀，大小: {file_size} 字節")
-                        # 创建完整的图片路径列表用于导航
-                        full_image_paths = [os.path.join(self.images_dir, img) for img in valid_images]
-                        thumbnail_widget = ImageThumbnailWidget(image_path, full_image_paths, i, self.images_widget, self.delete_image_callback)
-                        self.images_layout.addWidget(thumbnail_widget)
-                        print(f"縮略圖已添加到佈局")
-                    except Exception as e:
-                        print(f"創建第 {i+1} 張圖片縮略圖失敗: {str(e)}")
-                        continue
-                
-                # 添加弹性空间
-                spacer = QSpacerItem(40, 20, QSizePolicy.Expanding, QSizePolicy.Minimum)
-                self.images_layout.addItem(spacer)
-                print("已添加彈性空間")
-                
-                if len(valid_images) == 0:
-                    # 如果没有有效图片，显示提示
-                    self.image_thumbnail_label.show()
-                    self.image_thumbnail_label.setText("所有圖片文件均缺失")
-            else:
-                # 显示提示标签
-                self.image_thumbnail_label.show()
-                self.image_thumbnail_label.setText("暂无图片，点击下方按钮添加图片")
-                print("顯示提示標籤：暫無圖片")
-                
-                # 添加弹性空间
-                spacer = QSpacerItem(40, 20, QSizePolicy.Expanding, QSizePolicy.Minimum)
-                self.images_layout.addItem(spacer)
-                print("已添加彈性空間")
+            self.supplier_table.setItem(row, 1, QTableWidgetItem(supplier.get("name", "")))
+            # 价格列（第2列）
+            self.supplier_table.setItem(row, 2, QTableWidgetItem(str(supplier.get("price", 0))))
+            # 供货周期列（第3列）
+            self.supplier_table.setItem(row, 3, QTableWidgetItem(supplier.get("lead_time", "")))
+            # 联系方式列（第4列）
+            self.supplier_table.setItem(row, 4, QTableWidgetItem(supplier.get("contact", "")))
             
-            print("圖片縮略圖載入完成")
+            # 顯示供應商圖片信息（第5列）
+            supplier_images = supplier.get("images", [])
+            if supplier_images:
+                image_count = len(supplier_images)
+                self.supplier_table.setItem(row, 5, QTableWidgetItem(f"📷 {image_count}张图片"))
+                log.debug("供應商 '%s' 有 %s 張圖片", supplier.get('name', ''), image_count)
+            else:
+                self.supplier_table.setItem(row, 5, QTableWidgetItem("无图片"))
+                log.debug("供應商 '%s' 無圖片", supplier.get('name', ''))
+        
+        log.debug("價格信息加載完成，共 %s 行供應商", self.supplier_table.rowCount())
+        
+        # 強制刷新表格
+        self.supplier_table.viewport().update()
+        
+        # 如果之前启用了自动保存，现在恢复
+        if auto_save_enabled:
+            self._initializing = False
+
+    def load_maintenance(self, maintenance):
+        """加载维护信息"""
+        self.cycle_edit.setText(maintenance.get("cycle", ""))
+        self.procedures_edit.setPlainText(maintenance.get("procedures", ""))
+        self.notes_edit.setPlainText(maintenance.get("notes", ""))
+
+    @perf_stats.timed("load_images")
+    def load_images(self, images):
+        """加载图片缩略图（缩略图条只绘制可见的图片）"""
+        try:
+            log.debug("開始載入圖片縮略圖，圖片數量: %s", len(images) if images else 0)
+            valid_paths, missing_images = self.split_existing_images(images)
+            
+            if missing_images:
+                log.warning("發現 %s 個缺失的圖片文件: %s", len(missing_images), missing_images)
+                QMessageBox.warning(self, "圖片文件缺失", 
+                                  f"發現 {len(missing_images)} 個圖片文件缺失:\n" + 
+                                  "\n".join(missing_images[:5]) + 
+                                  ("\n..." if len(missing_images) > 5 else ""))
+            
+            if images and not valid_paths:
+                placeholder = "所有圖片文件均缺失"
+            else:
+                placeholder = "暂无图片，点击下方按钮添加图片"
+            self.images_gallery.set_images(valid_paths, placeholder)
+            log.debug("圖片縮略圖載入完成")
             
         except Exception as e:
             error_msg = f"載入圖片縮略圖失敗: {str(e)}"
-            print(error_msg)
+            log.error(error_msg)
             QMessageBox.critical(self, "錯誤", error_msg)
 
+    def image_path(self, image_name):
+        """图片字段中的图片名 -> 完整路径"""
+        return self.kb.image_path(image_name)
+
+    def store_image(self, source_path):
+        """把图片存入内容寻址存储，返回写入数据的图片名"""
+        return self.kb.store_image(source_path)
+
+    def release_image(self, image_name):
+        """释放已从数据中移除的一个图片引用，没有其他引用时删除文件"""
+        self.kb.release_image(image_name)
+
+    def all_image_refs(self):
+        """全部设备的图片引用（建立引用计数时使用）"""
+        return self.kb.all_image_refs()
+
+    def migrate_legacy_images(self, force=False):
+        """把旧版本按时间戳命名的图片移入内容寻址存储（第一次启动和导入数据后执行）"""
+        if self.kb.migrate_legacy_images(force) and not force:
+            self.save_data()
+
+    def split_existing_images(self, images):
+        """把图片文件名分成 (可读取的完整路径列表, 缺失的文件名列表)"""
+        valid_paths = []
+        missing_images = []
+        for image_filename in images or []:
+            image_path = self.image_path(image_filename)
+            try:
+                if os.path.getsize(image_path) > 0 and os.access(image_path, os.R_OK):
+                    valid_paths.append(image_path)
+                else:
+                    log.warning("图片文件为空或无读取权限: %s", image_path)
+            except OSError:
+                missing_images.append(image_filename)
+                log.warning("图片文件不存在: %s", image_path)
+        return valid_paths, missing_images
+
+    @perf_stats.timed("load_principle_images")
     def load_principle_images(self, images):
         """加载原理图片缩略图"""
         try:
-            print(f"開始載入原理圖片縮略圖，圖片數量: {len(images) if images else 0}")
+            log.debug("開始載入原理圖片縮略圖，圖片數量: %s", len(images) if images else 0)
+            valid_paths, missing_images = self.split_existing_images(images)
             
-            # 清除所有布局项，但保留占位符标签
-            while self.principle_images_layout.count() > 0:
-                item = self.principle_images_layout.takeAt(0)
-                if item.widget():
-                    # 不要删除占位符标签，只删除缩略图小部件
-                    if item.widget() != self.principle_image_thumbnail_label:
-                        item.widget().deleteLater()
+            if missing_images:
+                log.warning("發現 %s 個缺失的原理圖片文件: %s", len(missing_images), missing_images)
             
-            if images and len(images) > 0:
-                # 隐藏提示标签
-                self.principle_image_thumbnail_label.hide()
-                print(f"隱藏原理圖片提示標籤，開始載入 {len(images)} 張原理圖片")
-                
-                # 验证图片文件并过滤掉不存在的文件
-                valid_images = []
-                missing_images = []
-                
-                for image_filename in images:
-                    image_path = os.path.join(self.images_dir, image_filename)
-                    if os.path.exists(image_path):
-                        valid_images.append(image_filename)
-                    else:
-                        missing_images.append(image_filename)
-                        print(f"警告: 原理图片文件不存在: {image_path}")
-                
-                if missing_images:
-                    print(f"發現 {len(missing_images)} 個缺失的原理圖片文件: {missing_images}")
-                
-                # 为每张有效图片创建缩略图
-                for i, image_filename in enumerate(valid_images):
-                    try:
-                        image_path = os.path.join(self.images_dir, image_filename)
-                        print(f"處理第 {i+1} 張原理圖片: {image_filename}")
-                        print(f"完整路徑: {image_path}")
-                        
-                        # 验证文件是否可读
-                        if not os.access(image_path, os.R_OK):
-                            print(f"警告: 原理图片文件无读取权限: {image_path}")
-                            continue
-                        
-                        # 验证文件大小
-                        file_size = os.path.getsize(image_path)
-                        if file_size == 0:
-                            print(f"警告: 原理图片文件为空: {image_path}")
-                            continue
-                        
-                        print(f"原理圖片文件存在且可讀，大小: {file_size} 字節")
-                        # 创建完整的图片路径列表用于导航
-                        full_image_paths = [os.path.join(self.images_dir, img) for img in valid_images]
-                        thumbnail_widget = ImageThumbnailWidget(image_path, full_image_paths, i, self.principle_images_widget, self.delete_principle_image_callback)
-                        self.principle_images_layout.addWidget(thumbnail_widget)
-                        print(f"原理圖片縮略圖已添加到佈局")
-                    except Exception as e:
-                        print(f"創建第 {i+1} 張原理圖片縮略圖失敗: {str(e)}")
-                        continue
-                
-                # 添加弹性空间
-                spacer = QSpacerItem(40, 20, QSizePolicy.Expanding, QSizePolicy.Minimum)
-                self.principle_images_layout.addItem(spacer)
-                print("已添加原理圖片彈性空間")
-                
-                if len(valid_images) == 0:
-                    # 如果没有有效图片，显示提示
-                    self.principle_image_thumbnail_label.show()
-                    self.principle_image_thumbnail_label.setText("所有原理圖片文件均缺失")
+            if images and not valid_paths:
+                placeholder = "所有原理圖片文件均缺失"
             else:
-                # 显示提示标签
-                self.principle_image_thumbnail_label.show()
-                self.principle_image_thumbnail_label.setText("暂无原理图片，点击下方按钮添加图片")
-                print("顯示原理圖片提示標籤：暫無原理圖片")
-                
-                # 添加弹性空间
-                spacer = QSpacerItem(40, 20, QSizePolicy.Expanding, QSizePolicy.Minimum)
-                self.principle_images_layout.addItem(spacer)
-                print("已添加原理圖片彈性空間")
-            
-            print("原理圖片縮略圖載入完成")
+                placeholder = "暂无原理图片，点击下方按钮添加图片"
+            self.principle_images_gallery.set_images(valid_paths, placeholder)
+            log.debug("原理圖片縮略圖載入完成")
             
         except Exception as e:
             error_msg = f"載入原理圖片縮略圖失敗: {str(e)}"
-            print(error_msg)
+            log.error(error_msg)
             QMessageBox.critical(self, "錯誤", error_msg)
 
+    @perf_stats.timed("load_supplier_images")
     def load_supplier_images(self, images):
         """加载供应商图片缩略图"""
+        # 取消上一次尚未完成的后台载入
+        self.image_loader.cancel("supplier_images")
         try:
-            print(f"開始載入供應商圖片縮略圖，圖片數量: {len(images) if images else 0}")
+            log.debug("開始載入供應商圖片縮略圖，圖片數量: %s", len(images) if images else 0)
             
             # 清除現有的縮略圖，但保留占位符标签
             while self.supplier_image_thumbnail_layout.count() > 0:
@@ -2425,48 +3733,49 @@ class BoilerKnowledge(QMainWindow):
                 missing_images = []
                 
                 for image_filename in images:
-                    image_path = os.path.join(self.images_dir, image_filename)
+                    image_path = self.image_path(image_filename)
                     if os.path.exists(image_path):
                         valid_images.append(image_filename)
                     else:
                         missing_images.append(image_filename)
-                        print(f"警告: 供應商圖片文件不存在: {image_path}")
+                        log.warning("供應商圖片文件不存在: %s", image_path)
                 
                 if missing_images:
-                    print(f"發現 {len(missing_images)} 個缺失的供應商圖片文件: {missing_images}")
+                    log.warning("發現 %s 個缺失的供應商圖片文件: %s", len(missing_images), missing_images)
                 
                 # 添加縮略圖
                 for i, image_name in enumerate(valid_images):
                     try:
-                        print(f"正在載入供應商圖片 {i+1}: {image_name}")
-                        image_path = os.path.join(self.images_dir, image_name)
+                        log.debug("正在載入供應商圖片 %s: %s", i+1, image_name)
+                        image_path = self.image_path(image_name)
                         
                         # 验证文件是否可读
                         if not os.access(image_path, os.R_OK):
-                            print(f"警告: 供應商圖片文件无读取权限: {image_path}")
+                            log.warning("供應商圖片文件无读取权限: %s", image_path)
                             continue
                         
                         # 验证文件大小
                         file_size = os.path.getsize(image_path)
                         if file_size == 0:
-                            print(f"警告: 供應商圖片文件为空: {image_path}")
+                            log.warning("供應商圖片文件为空: %s", image_path)
                             continue
                         
-                        print(f"供應商圖片文件存在且可讀，大小: {file_size} 字節")
+                        log.debug("供應商圖片文件存在且可讀，大小: %s 字節", file_size)
                         # 创建完整的图片路径列表用于导航
-                        full_image_paths = [os.path.join(self.images_dir, img) for img in valid_images]
-                        thumbnail_widget = ImageThumbnailWidget(image_path, full_image_paths, i, self.supplier_image_thumbnail_container)
+                        full_image_paths = [self.image_path(img) for img in valid_images]
+                        thumbnail_widget = ImageThumbnailWidget(image_path, full_image_paths, i, self.supplier_image_thumbnail_container,
+                                                                loader=self.image_loader, group="supplier_images")
                         self.supplier_image_thumbnail_layout.addWidget(thumbnail_widget)
-                        print(f"成功添加供應商圖片縮略圖: {image_name}")
+                        log.debug("成功添加供應商圖片縮略圖: %s", image_name)
                     except Exception as e:
-                        print(f"創建第 {i+1} 張供應商圖片縮略圖失敗: {str(e)}")
+                        log.error("創建第 %s 張供應商圖片縮略圖失敗: %s", i+1, str(e))
                         continue
                 
                 # 添加彈性空間
                 spacer = QSpacerItem(40, 20, QSizePolicy.Expanding, QSizePolicy.Minimum)
                 self.supplier_image_thumbnail_layout.addItem(spacer)
                 
-                print(f"供應商圖片縮略圖載入完成，共 {len(valid_images)} 張")
+                log.debug("供應商圖片縮略圖載入完成，共 %s 張", len(valid_images))
                 
                 if len(valid_images) == 0:
                     # 如果没有有效图片，显示提示
@@ -2476,7 +3785,7 @@ class BoilerKnowledge(QMainWindow):
                 # 顯示佔位符標籤
                 self.supplier_image_thumbnail_label.show()
                 self.supplier_image_thumbnail_label.setText("暂无供应商图片，点击下方按钮添加图片")
-                print("沒有供應商圖片，顯示佔位符")
+                log.debug("沒有供應商圖片，顯示佔位符")
                 
                 # 添加彈性空間
                 spacer = QSpacerItem(40, 20, QSizePolicy.Expanding, QSizePolicy.Minimum)
@@ -2484,65 +3793,55 @@ class BoilerKnowledge(QMainWindow):
                 
         except Exception as e:
             error_msg = f"載入供應商圖片縮略圖失敗: {str(e)}"
-            print(error_msg)
+            log.error(error_msg)
             QMessageBox.critical(self, "錯誤", error_msg)
 
     def verify_and_repair_image_references(self):
-        """验证并修复图片引用"""
+        """检查图片存储：找出无效的图片引用和没有任何引用的孤立文件，确认后修复
+
+        图片目录只遍历一次，与全部图片引用做集合比较，10 万个文件也只需几秒。
+        """
         try:
-            print("開始驗證和修復圖片引用...")
-            
-            def check_and_repair_images_in_data(data, path=""):
-                """递归检查数据中的图片引用"""
-                repaired_count = 0
-                
-                for key, value in data.items():
-                    current_path = f"{path}.{key}" if path else key
-                    
-                    if isinstance(value, dict):
-                        if "children" in value:
-                            # 这是一个分类，递归检查子项
-                            repaired_count += check_and_repair_images_in_data(value, current_path)
-                        else:
-                            # 这是一个项目，检查图片字段
-                            for image_field in ["images", "principle_images", "supplier_images"]:
-                                if image_field in value and isinstance(value[image_field], list):
-                                    original_images = value[image_field].copy()
-                                    valid_images = []
-                                    
-                                    for image_filename in original_images:
-                                        image_path = os.path.join(self.images_dir, image_filename)
-                                        if os.path.exists(image_path) and os.access(image_path, os.R_OK):
-                                            file_size = os.path.getsize(image_path)
-                                            if file_size > 0:
-                                                valid_images.append(image_filename)
-                                            else:
-                                                print(f"發現空文件，將移除: {image_path}")
-                                        else:
-                                            print(f"發現無效圖片引用，將移除: {image_path}")
-                                    
-                                    if len(valid_images) != len(original_images):
-                                        value[image_field] = valid_images
-                                        repaired_count += len(original_images) - len(valid_images)
-                                        print(f"修復 {current_path} 的 {image_field}: 移除了 {len(original_images) - len(valid_images)} 個無效引用")
-                
-                return repaired_count
-            
-            total_repaired = check_and_repair_images_in_data(self.system_data)
-            
-            if total_repaired > 0:
-                # 保存修复后的数据
-                self.save_data()
-                QMessageBox.information(self, "圖片引用修復完成", 
-                                      f"已修復 {total_repaired} 個無效的圖片引用。\n數據已自動保存。")
-                print(f"圖片引用修復完成，共修復 {total_repaired} 個引用")
-            else:
-                QMessageBox.information(self, "圖片引用檢查完成", "所有圖片引用均有效。")
-                print("圖片引用檢查完成，無需修復")
+            log.info("開始檢查圖片存儲...")
+            QApplication.setOverrideCursor(Qt.WaitCursor)
+            try:
+                # 试运行：只生成报告，不做修改
+                report = self.kb.check_images()
+            finally:
+                QApplication.restoreOverrideCursor()
+            log.info("圖片存儲檢查完成: %s", report.summary())
+
+            if not report.dangling and not report.orphans:
+                QMessageBox.information(self, "圖片引用檢查完成", f"所有圖片引用均有效，沒有孤立文件。\n{report.summary()}")
+                return
+
+            lines = [report.summary(), ""]
+            for node_id, name, reason in report.dangling[:5]:
+                lines.append(f"無效引用: {' > '.join(self.node_index.path(node_id) or [])}: {name}（{reason}）")
+            if len(report.dangling) > 5:
+                lines.append(f"... 還有 {len(report.dangling) - 5} 個無效引用")
+            for path, size in report.orphans[:5]:
+                lines.append(f"孤立文件: {os.path.relpath(path, self.images_dir)}（{size // 1024} KB）")
+            if len(report.orphans) > 5:
+                lines.append(f"... 還有 {len(report.orphans) - 5} 個孤立文件")
+            lines += ["", "是否移除無效引用並刪除孤立文件？"]
+            reply = QMessageBox.question(self, "圖片存儲檢查", "\n".join(lines),
+                                         QMessageBox.Yes | QMessageBox.No, QMessageBox.No)
+            if reply != QMessageBox.Yes:
+                return
+
+            # 移除无效引用（每个设备只保存一次）并删除孤立文件
+            self.kb.repair_images(report)
+            if self.current_item:
+                self.load_content(self.current_item)
+            message = (f"已移除 {len(report.dangling)} 個無效引用，刪除 {report.removed} 個孤立文件，"
+                       f"回收 {report.removed_bytes / 1e6:.1f} MB。")
+            log.info(message)
+            QMessageBox.information(self, "圖片存儲修復完成", message)
                 
         except Exception as e:
             error_msg = f"驗證和修復圖片引用失敗: {str(e)}"
-            print(error_msg)
+            log.error(error_msg)
             QMessageBox.critical(self, "錯誤", error_msg)
 
     def save_content(self):
@@ -2567,11 +3866,11 @@ class BoilerKnowledge(QMainWindow):
                 return
                 
             data["content"] = self.content.toPlainText()
-            self.save_data()
+            self.save_data(path)
             QMessageBox.information(self, "成功", "内容已保存！")
         except Exception as e:
             error_msg = f"保存内容失败: {str(e)}"
-            print(error_msg)
+            log.error(error_msg)
             QMessageBox.critical(self, "保存失败", error_msg)
 
     def save_tags(self):
@@ -2599,123 +3898,137 @@ class BoilerKnowledge(QMainWindow):
             if tags_text:
                 tags = [tag.strip() for tag in tags_text.split(",") if tag.strip()]
                 data["tags"] = tags
-                self.update_tag_index()
-                self.save_data()
+                self.update_node_tags(path)
+                self.save_data(path)
                 QMessageBox.information(self, "成功", "标签已保存！")
             else:
                 data["tags"] = []
-                self.update_tag_index()
-                self.save_data()
+                self.update_node_tags(path)
+                self.save_data(path)
                 QMessageBox.information(self, "成功", "标签已清空！")
         except Exception as e:
             error_msg = f"保存标签失败: {str(e)}"
-            print(error_msg)
+            log.error(error_msg)
             QMessageBox.critical(self, "保存失败", error_msg)
 
-    def update_tag_index(self):
-        """更新标签索引"""
-        self.system_data["tags"] = {}
-        self.build_tag_index(self.system_data["categories"], [])
-
-    def build_tag_index(self, data, path):
-        """构建标签索引"""
-        for name, info in data.items():
-            current_path = path + [name]
-            if isinstance(info, dict) and "children" in info:
-                # 这是一个分类节点
-                self.build_tag_index(info["children"], current_path)
-            else:
-                # 这是一个叶子节点
-                tags = info.get("tags", [])
-                for tag in tags:
-                    if tag not in self.system_data["tags"]:
-                        self.system_data["tags"][tag] = []
-                    self.system_data["tags"][tag].append(current_path)
+    def update_node_tags(self, path):
+        """设备标签修改后增量更新标签索引"""
+        self.kb.update_node_tags(path)
+
+    def schedule_search(self):
+        """输入变化时重新计时，停顿 search_debounce_ms 后再搜索"""
+        if not self.search_input.text().strip():
+            self.search_timer.stop()
+            self.search_by_tag()
+            return
+        self.search_timer.start(self.search_debounce_ms)
 
+    @perf_stats.timed("search_by_tag")
     def search_by_tag(self):
-        """智能搜索功能"""
+        """智能搜索功能：在后台线程中查询全文索引，结果按相关度分批显示"""
+        self.search_timer.stop()
         query = self.search_input.text().strip().lower()
+        self.search_model.clear()
         if not query:
-            self.search_results.clear()
+            self.search_executor.cancel()
+            self.current_search_query = ""
             return
-            
-        results = []
-        
-        # 1. 搜索标签 - 支持模糊搜索
-        for tag, paths in self.system_data["tags"].items():
-            if query in tag.lower():  # 模糊匹配
-                for path in paths:
-                    results.append((path, f"标签: {tag}"))
-        
-        # 2. 搜索设备名称 - 支持模糊搜索
-        self.search_by_name(self.system_data["categories"], [], query, results)
-        
-        # 3. 搜索设备内容 - 支持模糊搜索
-        self.search_by_content(self.system_data["categories"], [], query, results)
-        
-        # 去重
-        unique_results = []
-        seen_paths = set()
-        for path, match_type in results:
-            path_str = ' > '.join(path)
-            if path_str not in seen_paths:
-                unique_results.append((path, match_type))
-                seen_paths.add(path_str)
-        
-        # 显示结果
-        self.search_results.clear()
-        for path, match_type in unique_results:
-            item_text = f"{' > '.join(path)} ({match_type})"
-            self.search_results.addItem(item_text)
-        
-        # 显示搜索结果数量
-        if unique_results:
-            self.search_results.setToolTip(f"找到 {len(unique_results)} 个结果")
+
+        building = not self.search_index.built
+        if building and not self.search_index.building:
+            # 第一次搜索时在搜索线程中建立索引，查询排在建立之后执行
+            self.search_executor.build_index(self.kb.prepare_search_index())
+            log.info("开始建立搜索索引: %s 个节点", len(self.node_index))
+        if building:
+            self.statusBar().showMessage("正在建立搜索索引，完成后显示搜索结果...")
+
+        self.current_search_query = query
+        self.current_search_id = self.search_executor.submit(query)
+        self.search_results.setToolTip("正在建立搜索索引..." if building else "正在搜索...")
+
+    def on_search_index_built(self, stats):
+        """搜索线程建立完索引（界面线程）：补上建立期间修改过的节点"""
+        if not stats["built"]:
+            return
+        self.kb.finish_search_index()
+        perf_stats.record("search.build_index", int(stats["total_ms"] * 1e6))
+        log.info("搜索索引已建立: %s 个节点，耗时 %.0fms", stats["nodes"], stats["total_ms"])
+        self.statusBar().showMessage(
+            f"搜索索引已建立（{stats['nodes']} 个节点，耗时 {stats['total_ms'] / 1000:.1f}s）", 3000)
+
+    def on_search_page(self, query_id, hits):
+        """接收一页搜索结果（界面线程）；已被新查询取代的结果直接丢弃"""
+        if query_id != self.current_search_id:
+            return
+        rows = []
+        for node_id, score in hits:
+            path = self.node_index.path(node_id)
+            if path is not None:
+                rows.extend(self.describe_search_hit(path, self.node_index.node(node_id), self.current_search_query))
+        self.search_model.append_rows(rows)
+
+    def on_search_finished(self, query_id, stats):
+        """显示搜索结果数量和耗时"""
+        # 搜索在后台线程中执行，耗时由搜索线程统计
+        if stats.get("first_page_ms") is not None:
+            perf_stats.record("search.first_page", int(stats["first_page_ms"] * 1e6))
+        perf_stats.record("search.total", int(stats["total_ms"] * 1e6))
+        if query_id != self.current_search_id:
+            return
+        count = self.search_model.rowCount()
+        if count:
+            self.search_results.setToolTip(f"找到 {count} 个结果")
         else:
             self.search_results.setToolTip("未找到匹配结果")
+        first_page = f"{stats['first_page_ms']:.0f}ms" if stats["first_page_ms"] is not None else "-"
+        self.statusBar().showMessage(
+            f"搜索 '{stats['query']}': {count} 个结果，首批 {first_page}，共 {stats['total_ms']:.0f}ms", 3000)
 
-    def search_by_name(self, data, current_path, query, results):
-        """递归搜索设备名称 - 支持模糊搜索"""
-        for name, info in data.items():
-            path = current_path + [name]
-            
-            # 检查设备名称是否匹配 - 支持模糊搜索
-            if query in name.lower():  # 模糊匹配
-                results.append((path, f"名称: {name}"))
-            
-            # 递归搜索子分类
-            if isinstance(info, dict) and "children" in info:
-                self.search_by_name(info["children"], path, query, results)
-
-    def search_by_content(self, data, current_path, query, results):
-        """递归搜索设备内容和零部件 - 支持模糊搜索"""
-        for name, info in data.items():
-            path = current_path + [name]
-            
-            # 检查设备内容是否匹配
-            if isinstance(info, dict) and "content" in info:
-                content = info.get("content", "").lower()
-                if query in content:  # 模糊匹配
-                    results.append((path, f"内容: {name}"))
-                
-                # 搜索零部件
-                if "parts" in info:
-                    for part in info["parts"]:
-                        part_name = part.get("name", "").lower()
-                        part_description = part.get("description", "").lower()
-                        
-                        # 检查零部件名称和描述是否匹配
-                        if query in part_name or query in part_description:
-                            part_path = path + [f"[零部件] {part.get('name', '未命名')}"]
-                            results.append((part_path, f"零部件: {part.get('name', '未命名')}"))
-            
-            # 递归搜索子分类
-            if isinstance(info, dict) and "children" in info:
-                self.search_by_content(info["children"], path, query, results)
+    def describe_search_hit(self, path, info, query):
+        """说明搜索结果命中的位置，返回 [(路径, 匹配类型), ...]
+
+        命中零部件时额外列出零部件，选择后直接跳到零部件页。
+        """
+        name = path[-1]
+        if not isinstance(info, dict) or "children" in info:
+            return [(path, f"名称: {name}")]
+        if hasattr(info, "to_plain"):
+            info = info.to_plain()
+
+        def text(value):
+            return value.lower() if isinstance(value, str) else ""
+
+        rows = []
+        tags = info.get("tags")
+        matched_tags = [tag for tag in tags if query in text(tag)] if isinstance(tags, list) else []
+        if matched_tags:
+            rows.append((path, f"标签: {matched_tags[0]}"))
+        elif query in name.lower():
+            rows.append((path, f"名称: {name}"))
+        elif query in text(info.get("content")):
+            rows.append((path, f"内容: {name}"))
+        else:
+            maintenance = info.get("maintenance")
+            params = info.get("technical_params")
+            if isinstance(maintenance, dict) and any(query in text(value) for value in maintenance.values()):
+                rows.append((path, f"维护: {name}"))
+            elif isinstance(params, dict) and any(query in f"{key} {value}".lower() for key, value in params.items()):
+                rows.append((path, f"参数: {name}"))
+
+        parts = info.get("parts")
+        for part in parts if isinstance(parts, list) else []:
+            if isinstance(part, dict) and (query in text(part.get("name")) or query in text(part.get("description"))):
+                part_name = part.get("name", "未命名")
+                rows.append((path + [f"[零部件] {part_name}"], f"零部件: {part_name}"))
+
+        if not rows:
+            # 查询词分散出现在不同位置
+            rows.append((path, f"相关: {name}"))
+        return rows
 
     def select_search_result(self, item):
-        """选择搜索结果"""
-        item_text = item.text()
+        """选择搜索结果（item 为结果列表中的模型索引）"""
+        item_text = item.data(Qt.DisplayRole)
         # 提取路径部分 - 支持新的格式
         if " (标签:" in item_text:
             path_text = item_text.split(" (标签:")[0]
@@ -2728,7 +4041,8 @@ class BoilerKnowledge(QMainWindow):
         else:
             path_text = item_text
         
-        path = path_text.split(" > ")
+        # 搜索结果项中保存了完整路径，名称中含有 " > " 时也能正确定位
+        path = item.data(Qt.UserRole) or path_text.split(" > ")
         
         # 检查是否是零部件搜索结果
         if len(path) > 0 and path[-1].startswith("[零部件] "):
@@ -2759,32 +4073,24 @@ class BoilerKnowledge(QMainWindow):
                     # 选择这个零部件
                     self.parts_list.setCurrentRow(i)
                     self.parts_list.itemClicked.emit(item)
-                    print(f"已选择零部件: {part_name}")
+                    log.debug("已选择零部件: %s", part_name)
                     return
             
-            print(f"未找到零部件: {part_name}")
+            log.debug("未找到零部件: %s", part_name)
             
         except Exception as e:
-            print(f"选择零部件失败: {e}")
+            log.error("选择零部件失败: %s", e)
 
     def find_and_select_item(self, path):
         """在树中查找并选择项目"""
-        current = self.tree.invisibleRootItem()
-        for name in path:
-            found = False
-            for i in range(current.childCount()):
-                child = current.child(i)
-                if child.text(0) == name:
-                    current = child
-                    found = True
-                    break
-            if not found:
-                return
+        index = self.tree_model.index_for_id(self.node_index.id_for_path(path))
+        if not index.isValid():
+            return
         
         # 选择并展开到该项目
-        self.tree.setCurrentItem(current)
-        self.tree.scrollToItem(current)
-        self.load_content(current)
+        self.tree.setCurrentIndex(index)
+        self.tree.scrollTo(index)
+        self.load_content(index)
 
     def add_tech_param(self):
         """添加技术参数"""
@@ -2828,16 +4134,16 @@ class BoilerKnowledge(QMainWindow):
                     params[param_name.text().strip()] = param_value.text().strip()
             
             data["technical_params"] = params
-            self.save_data()
+            self.save_data(path)
             QMessageBox.information(self, "成功", "技术参数已保存！")
         except Exception as e:
             error_msg = f"保存技术参数失败: {str(e)}"
-            print(error_msg)
+            log.error(error_msg)
             QMessageBox.critical(self, "保存失败", error_msg)
 
     def add_supplier(self):
         """添加供应商"""
-        print("添加供应商按钮被点击")
+        log.debug("添加供应商按钮被点击")
         row = self.supplier_table.rowCount()
         self.supplier_table.insertRow(row)
         # 型号列（第0列）
@@ -2852,36 +4158,36 @@ class BoilerKnowledge(QMainWindow):
         self.supplier_table.setItem(row, 4, QTableWidgetItem(""))
         # 产品图片列（第5列）
         self.supplier_table.setItem(row, 5, QTableWidgetItem("无图片"))
-        print(f"已添加第 {row} 行供应商")
+        log.debug("已添加第 %s 行供应商", row)
         # 触发自动保存
-        print("调用自动保存价格信息...")
+        log.debug("调用自动保存价格信息...")
         self.auto_save_pricing()
-        print("自动保存价格信息调用完成")
+        log.debug("自动保存价格信息调用完成")
 
     def del_supplier(self):
         """删除供应商"""
-        print("删除供应商按钮被点击")
+        log.debug("删除供应商按钮被点击")
         current_row = self.supplier_table.currentRow()
         if current_row >= 0:
-            print(f"删除第 {current_row} 行供应商")
+            log.debug("删除第 %s 行供应商", current_row)
             self.supplier_table.removeRow(current_row)
             # 触发自动保存
-            print("调用自动保存价格信息...")
+            log.debug("调用自动保存价格信息...")
             self.auto_save_pricing()
-            print("自动保存价格信息调用完成")
+            log.debug("自动保存价格信息调用完成")
         else:
-            print("没有选中的供应商行")
+            log.debug("没有选中的供应商行")
 
     def save_pricing(self):
         """保存价格信息"""
         try:
-            print("=== 开始手动保存价格信息 ===")
+            log.debug("=== 开始手动保存价格信息 ===")
             if not self.current_item:
                 QMessageBox.warning(self, "警告", "请先选择一个设备！")
                 return
                 
             path = self.get_item_path(self.current_item)
-            print(f"当前设备路径: {path}")
+            log.debug("当前设备路径: %s", path)
             if not path:
                 QMessageBox.warning(self, "警告", "无法获取设备路径！")
                 return
@@ -2907,7 +4213,7 @@ class BoilerKnowledge(QMainWindow):
                 "suppliers": []
             }
             
-            print(f"供应商表格行数: {self.supplier_table.rowCount()}")
+            log.debug("供应商表格行数: %s", self.supplier_table.rowCount())
             # 保存供应商信息
             for row in range(self.supplier_table.rowCount()):
                 # 型号列（第0列）- 暂时不保存
@@ -2916,7 +4222,7 @@ class BoilerKnowledge(QMainWindow):
                 lead_time_item = self.supplier_table.item(row, 3)  # 供货周期在第3列
                 contact_item = self.supplier_table.item(row, 4)  # 联系方式在第4列
                 
-                print(f"第{row}行 - 供应商名称: {name_item.text() if name_item else 'None'}")
+                log.debug("第%s行 - 供应商名称: %s", row, name_item.text() if name_item else 'None')
                 
                 if name_item and name_item.text().strip():
                     try:
@@ -2934,24 +4240,24 @@ class BoilerKnowledge(QMainWindow):
                     
                     # 如果供应商已存在，保留其图片信息
                     existing_suppliers = data.get("pricing", {}).get("suppliers", [])
-                    print(f"现有供应商数量: {len(existing_suppliers)}")
+                    log.debug("现有供应商数量: %s", len(existing_suppliers))
                     for existing_supplier in existing_suppliers:
                         if existing_supplier.get("name") == supplier["name"]:
                             supplier["images"] = existing_supplier.get("images", [])
-                            print(f"保留供应商 '{supplier['name']}' 的 {len(supplier['images'])} 张图片")
+                            log.debug("保留供应商 '%s' 的 %s 张图片", supplier['name'], len(supplier['images']))
                             break
                     
                     pricing["suppliers"].append(supplier)
-                    print(f"添加供应商: {supplier['name']}")
+                    log.debug("添加供应商: %s", supplier['name'])
             
-            print(f"最终保存的供应商数量: {len(pricing['suppliers'])}")
+            log.debug("最终保存的供应商数量: %s", len(pricing['suppliers']))
             data["pricing"] = pricing
-            self.save_data()
-            print("=== 手动保存价格信息完成 ===")
+            self.save_data(path)
+            log.debug("=== 手动保存价格信息完成 ===")
             QMessageBox.information(self, "成功", f"供应商信息已保存！\n共保存 {len(pricing['suppliers'])} 个供应商。")
         except Exception as e:
             error_msg = f"保存价格信息失败: {str(e)}"
-            print(error_msg)
+            log.error("保存价格信息失败: %s", e)
             QMessageBox.critical(self, "保存失败", error_msg)
 
     def save_maintenance(self):
@@ -2982,11 +4288,11 @@ class BoilerKnowledge(QMainWindow):
             }
             
             data["maintenance"] = maintenance
-            self.save_data()
+            self.save_data(path)
             QMessageBox.information(self, "成功", "维护信息已保存！")
         except Exception as e:
             error_msg = f"保存维护信息失败: {str(e)}"
-            print(error_msg)
+            log.error(error_msg)
             QMessageBox.critical(self, "保存失败", error_msg)
 
     def insert_image(self):
@@ -3000,7 +4306,7 @@ class BoilerKnowledge(QMainWindow):
                 QMessageBox.information(self, "提示", f"已选择 {len(file_paths)} 张图片，请点击保存按钮保存图片！")
         except Exception as e:
             error_msg = f"插入图片失败: {str(e)}"
-            print(error_msg)
+            log.error(error_msg)
             QMessageBox.critical(self, "错误", error_msg)
 
     def save_image(self):
@@ -3031,97 +4337,106 @@ class BoilerKnowledge(QMainWindow):
             # 确保图片目录存在
             if not os.path.exists(self.images_dir):
                 os.makedirs(self.images_dir)
-                print(f"已创建图片目录: {self.images_dir}")
+                log.debug("已创建图片目录: %s", self.images_dir)
             
             # 检查目录权限
             if not os.access(self.images_dir, os.W_OK):
-                print(f"错误: 图片目录无写入权限: {self.images_dir}")
+                log.error("图片目录无写入权限: %s", self.images_dir)
                 QMessageBox.critical(self, "错误", f"图片目录无写入权限: {self.images_dir}")
                 return
             
-            saved_count = 0
-            failed_count = 0
-            
-            # 初始化图片列表
-            if "images" not in data:
-                data["images"] = []
-            
-            print(f"开始保存 {len(self.current_image_paths)} 张图片...")
-            
-            # 处理每张图片
-            for i, image_path in enumerate(self.current_image_paths):
-                try:
-                    print(f"处理第 {i+1} 张图片: {image_path}")
-                    
-                    # 检查源文件是否存在
-                    if not os.path.exists(image_path):
-                        print(f"警告: 图片文件不存在: {image_path}")
-                        failed_count += 1
-                        continue
-                    
-                    # 检查源文件是否可读
-                    if not os.access(image_path, os.R_OK):
-                        print(f"警告: 图片文件无读取权限: {image_path}")
-                        failed_count += 1
-                        continue
-                    
-                    # 生成时间戳文件名
-                    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S_%f")[:-3]  # 包含毫秒
-                    file_ext = os.path.splitext(image_path)[1]
-                    new_filename = f"{timestamp}{file_ext}"
-                    new_file_path = os.path.join(self.images_dir, new_filename)
-                    
-                    print(f"正在复制图片: {image_path} -> {new_file_path}")
-                    
-                    # 复制文件
-                    shutil.copy2(image_path, new_file_path)
-                    
-                    # 验证文件是否复制成功
-                    if not os.path.exists(new_file_path):
-                        print(f"错误: 文件复制后不存在: {new_file_path}")
-                        failed_count += 1
-                        continue
-                    
-                    # 检查文件大小
-                    original_size = os.path.getsize(image_path)
-                    copied_size = os.path.getsize(new_file_path)
-                    if original_size != copied_size:
-                        print(f"错误: 文件大小不匹配: 原始={original_size}, 复制={copied_size}")
-                        failed_count += 1
-                        continue
-                        
-                    print(f"图片复制成功: {new_file_path} (大小: {copied_size} 字节)")
-                    
-                    # 添加到数据中
-                    data["images"].append(new_filename)
-                    saved_count += 1
-                    
-                except Exception as e:
-                    print(f"保存图片失败 {image_path}: {str(e)}")
-                    failed_count += 1
-            
-            print(f"保存完成: 成功 {saved_count} 张, 失败 {failed_count} 张")
-            
-            # 保存数据并刷新显示
-            self.save_data()
-            self.load_images(data["images"])
-            
-            # 显示结果
-            if saved_count > 0 and failed_count == 0:
-                QMessageBox.information(self, "成功", f"成功保存 {saved_count} 张图片！")
-            elif saved_count > 0 and failed_count > 0:
-                QMessageBox.warning(self, "部分成功", f"成功保存 {saved_count} 张图片，{failed_count} 张图片保存失败！")
-            else:
-                QMessageBox.critical(self, "失败", f"所有图片保存失败！")
+            # 在后台导入，导入期间可以继续操作
+            self.start_image_import(path, "images", self.current_image_paths, "图片")
             
             # 清除已保存的图片路径
             self.current_image_paths = []
             
         except Exception as e:
             error_msg = f"保存图片失败: {str(e)}"
-            print(error_msg)
+            log.error(error_msg)
             QMessageBox.critical(self, "错误", error_msg)
 
+    def start_image_import(self, path, field, source_paths, label):
+        """在后台导入一批图片，完成后把图片名一次性写入设备的 field 字段"""
+        node_id = self.node_index.id_for_path(path)
+        if node_id is None or not source_paths:
+            return None
+        # 导入前建立引用计数，导入中的图片不会被其他删除操作误删
+        if self.blob_store.counts is None:
+            self.blob_store.recount(self.all_image_refs())
+
+        progress = QProgressDialog(f"正在导入{label}...", "取消", 0, len(source_paths), self)
+        progress.setWindowTitle("导入图片")
+        progress.setWindowModality(Qt.NonModal)
+        progress.setMinimumDuration(0)
+        progress.setAutoClose(False)
+        progress.setAutoReset(False)
+
+        bridge = ImageImportBridge(progress)
+        thumbnail_size = self.images_gallery.thumbnail_model.thumbnail_size
+        job = ImageImportJob(
+            self.blob_store, source_paths,
+            on_progress=bridge.progress.emit,
+            on_finished=bridge.finished.emit,
+            # 预先生成缩略图，导入完成后缩略图条直接从缓存显示
+            thumbnail=lambda image_path: ThumbnailCache.shared().image(image_path, thumbnail_size),
+        )
+
+        def on_progress(done, total, source):
+            progress.setValue(done)
+            progress.setLabelText(f"正在导入{label}: {done} / {total}\n{os.path.basename(source)}")
+
+        bridge.progress.connect(on_progress)
+        bridge.finished.connect(lambda job: self.finish_image_import(job, node_id, field, label, progress))
+        progress.canceled.connect(job.cancel)
+        self.image_imports.append(job)
+        log.info("开始后台导入 %s 张%s: %s", len(source_paths), label, ' > '.join(path))
+        job.start()
+        progress.show()
+        return job
+
+    def finish_image_import(self, job, node_id, field, label, progress):
+        """导入结束后在界面线程中一次性写入全部图片引用；取消时放弃已导入的图片"""
+        if job in self.image_imports:
+            self.image_imports.remove(job)
+        progress.canceled.disconnect()
+        progress.close()
+
+        names = job.imported()
+        node = self.node_index.node(node_id)
+        path = self.node_index.path(node_id)
+        if job.cancelled or not isinstance(node, dict) or "children" in node:
+            for name in names:
+                self.blob_store.discard(name, self.all_image_refs)
+            reason = "已取消" if job.cancelled else "设备已被删除"
+            log.info("%s导入%s，放弃 %s 张", label, reason, len(names))
+            self.statusBar().showMessage(f"{label}导入{reason}", 3000)
+            return
+
+        if names:
+            if field not in node:
+                node[field] = []
+            node[field].extend(names)
+            for name in names:
+                self.blob_store.unhold(name)
+            self.save_data(path)
+            # 导入的设备仍在显示时刷新缩略图
+            if self.current_item and self.get_item_path(self.current_item) == path:
+                if field == "principle_images":
+                    self.load_principle_images(node[field])
+                else:
+                    self.load_images(node[field])
+
+        failures = job.failures()
+        log.info("%s导入完成: 成功 %s 张, 失败 %s 张, 耗时 %.2fs", label, len(names), len(failures), job.elapsed)
+        self.statusBar().showMessage(f"已导入 {len(names)} 张{label}到 {path[-1]}", 3000)
+        if failures:
+            QMessageBox.warning(self, "部分图片导入失败",
+                                f"成功导入 {len(names)} 张{label}，{len(failures)} 张失败:\n" +
+                                "\n".join(f"{os.path.basename(result['source'])}: {result['error']}"
+                                          for result in failures[:5]) +
+                                ("\n..." if len(failures) > 5 else ""))
+
     def manage_images(self):
         """管理图片"""
         try:
@@ -3213,14 +4528,11 @@ class BoilerKnowledge(QMainWindow):
                 # 从数据中移除
                 if "images" in data:
                     data["images"].remove(image_filename)
-                
-                # 删除文件
-                image_path = os.path.join(self.images_dir, image_filename)
-                if os.path.exists(image_path):
-                    os.remove(image_path)
+                    # 没有其他引用时删除文件
+                    self.release_image(image_filename)
                 
                 # 保存数据并刷新显示
-                self.save_data()
+                self.save_current_item()
                 self.load_images(data.get("images", []))
                 
                 # 从列表中移除
@@ -3261,20 +4573,17 @@ class BoilerKnowledge(QMainWindow):
                         # 从数据中移除
                         if "images" in data and image_filename in data["images"]:
                             data["images"].remove(image_filename)
-                        
-                        # 删除文件
-                        image_path = os.path.join(self.images_dir, image_filename)
-                        if os.path.exists(image_path):
-                            os.remove(image_path)
+                            # 没有其他引用时删除文件
+                            self.release_image(image_filename)
                         
                         deleted_count += 1
                         
                     except Exception as e:
                         failed_count += 1
-                        print(f"删除图片失败 {image_filename}: {str(e)}")
+                        log.error("删除图片失败 %s: %s", image_filename, e)
                 
                 # 保存数据并刷新显示
-                self.save_data()
+                self.save_current_item()
                 self.load_images(data.get("images", []))
                 
                 # 从列表中移除已删除的项目
@@ -3302,7 +4611,7 @@ class BoilerKnowledge(QMainWindow):
                 QMessageBox.information(self, "提示", f"已选择 {len(file_paths)} 张原理图片，请点击保存按钮保存图片！")
         except Exception as e:
             error_msg = f"插入原理图片失败: {str(e)}"
-            print(error_msg)
+            log.error(error_msg)
             QMessageBox.critical(self, "错误", error_msg)
 
     def save_principle_image(self):
@@ -3333,95 +4642,23 @@ class BoilerKnowledge(QMainWindow):
             # 确保图片目录存在
             if not os.path.exists(self.images_dir):
                 os.makedirs(self.images_dir)
-                print(f"已创建图片目录: {self.images_dir}")
+                log.debug("已创建图片目录: %s", self.images_dir)
             
             # 检查目录权限
             if not os.access(self.images_dir, os.W_OK):
-                print(f"错误: 图片目录无写入权限: {self.images_dir}")
+                log.error("图片目录无写入权限: %s", self.images_dir)
                 QMessageBox.critical(self, "错误", f"图片目录无写入权限: {self.images_dir}")
                 return
             
-            saved_count = 0
-            failed_count = 0
-            
-            # 初始化图片列表
-            if "principle_images" not in data:
-                data["principle_images"] = []
-            
-            print(f"开始保存 {len(self.current_principle_image_paths)} 张原理图片...")
+            # 在后台导入，导入期间可以继续操作
+            self.start_image_import(path, "principle_images", self.current_principle_image_paths, "原理图片")
             
-            # 处理每张图片
-            for i, image_path in enumerate(self.current_principle_image_paths):
-                try:
-                    print(f"处理第 {i+1} 張原理圖片: {image_path}")
-                    
-                    # 检查源文件是否存在
-                    if not os.path.exists(image_path):
-                        print(f"警告: 原理图片文件不存在: {image_path}")
-                        failed_count += 1
-                        continue
-                    
-                    # 检查源文件是否可读
-                    if not os.access(image_path, os.R_OK):
-                        print(f"警告: 原理图片文件无读取权限: {image_path}")
-                        failed_count += 1
-                        continue
-                    
-                    # 生成时间戳文件名
-                    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S_%f")[:-3]  # 包含毫秒
-                    file_ext = os.path.splitext(image_path)[1]
-                    new_filename = f"principle_{timestamp}{file_ext}"
-                    new_file_path = os.path.join(self.images_dir, new_filename)
-                    
-                    print(f"正在复制原理图片: {image_path} -> {new_file_path}")
-                    
-                    # 复制文件
-                    shutil.copy2(image_path, new_file_path)
-                    
-                    # 验证文件是否复制成功
-                    if not os.path.exists(new_file_path):
-                        print(f"错误: 文件复制后不存在: {new_file_path}")
-                        failed_count += 1
-                        continue
-                    
-                    # 检查文件大小
-                    original_size = os.path.getsize(image_path)
-                    copied_size = os.path.getsize(new_file_path)
-                    if original_size != copied_size:
-                        print(f"错误: 文件大小不匹配: 原始={original_size}, 复制={copied_size}")
-                        failed_count += 1
-                        continue
-                        
-                    print(f"原理图片复制成功: {new_file_path} (大小: {copied_size} 字节)")
-                    
-                    # 添加到数据中
-                    data["principle_images"].append(new_filename)
-                    saved_count += 1
-                    
-                except Exception as e:
-                    print(f"保存原理图片失败 {image_path}: {str(e)}")
-                    failed_count += 1
-            
-            print(f"原理图片保存完成: 成功 {saved_count} 张, 失败 {failed_count} 张")
-            
-            # 保存数据并刷新显示
-            self.save_data()
-            self.load_principle_images(data["principle_images"])
-            
-            # 显示结果
-            if saved_count > 0 and failed_count == 0:
-                QMessageBox.information(self, "成功", f"成功保存 {saved_count} 张原理图片！")
-            elif saved_count > 0 and failed_count > 0:
-                QMessageBox.warning(self, "部分成功", f"成功保存 {saved_count} 张原理图片，{failed_count} 张原理图片保存失败！")
-            else:
-                QMessageBox.critical(self, "失败", f"所有原理图片保存失败！")
-            
-            # 清除已保存的图片路径
+            # 清除已保存的原理图片路径
             self.current_principle_image_paths = []
             
         except Exception as e:
             error_msg = f"保存原理图片失败: {str(e)}"
-            print(error_msg)
+            log.error(error_msg)
             QMessageBox.critical(self, "错误", error_msg)
 
     def manage_principle_images(self):
@@ -3515,14 +4752,11 @@ class BoilerKnowledge(QMainWindow):
                 # 从数据中移除
                 if "principle_images" in data:
                     data["principle_images"].remove(image_filename)
-                
-                # 删除文件
-                image_path = os.path.join(self.images_dir, image_filename)
-                if os.path.exists(image_path):
-                    os.remove(image_path)
+                    # 没有其他引用时删除文件
+                    self.release_image(image_filename)
                 
                 # 保存数据并刷新显示
-                self.save_data()
+                self.save_current_item()
                 self.load_principle_images(data.get("principle_images", []))
                 
                 # 从列表中移除
@@ -3563,20 +4797,17 @@ class BoilerKnowledge(QMainWindow):
                         # 从数据中移除
                         if "principle_images" in data and image_filename in data["principle_images"]:
                             data["principle_images"].remove(image_filename)
-                        
-                        # 删除文件
-                        image_path = os.path.join(self.images_dir, image_filename)
-                        if os.path.exists(image_path):
-                            os.remove(image_path)
+                            # 没有其他引用时删除文件
+                            self.release_image(image_filename)
                         
                         deleted_count += 1
                         
                     except Exception as e:
                         failed_count += 1
-                        print(f"删除原理图片失败 {image_filename}: {str(e)}")
+                        log.error("删除原理图片失败 %s: %s", image_filename, e)
                 
                 # 保存数据并刷新显示
-                self.save_data()
+                self.save_current_item()
                 self.load_principle_images(data.get("principle_images", []))
                 
                 # 从列表中移除已删除的项目
@@ -3607,22 +4838,20 @@ class BoilerKnowledge(QMainWindow):
                 QMessageBox.warning(self, "警告", "请先选择一个供应商！\n\n操作步骤：\n1. 在供应商表格中点击选择一个供应商\n2. 或者双击供应商表格中的供应商来管理其图片")
                 return
                 
-            print(f"开始插入供应商图片，当前供应商行: {supplier_row}")
+            log.debug("开始插入供应商图片，当前供应商行: %s", supplier_row)
             
             file_paths, _ = QFileDialog.getOpenFileNames(
                 self, "选择供应商图片", "", "图片文件 (*.png *.jpg *.jpeg *.bmp *.gif)"
             )
             if file_paths:
                 self.current_supplier_image_paths = file_paths
-                print(f"已选择 {len(file_paths)} 张供应商图片")
+                log.debug("已选择 %s 张供应商图片", len(file_paths))
                 QMessageBox.information(self, "成功", f"已选择 {len(file_paths)} 张图片，请点击'保存供应商图片'按钮来保存。")
             else:
-                print("用户取消了图片选择")
+                log.debug("用户取消了图片选择")
         except Exception as e:
             error_msg = f"插入供应商图片失败: {str(e)}"
-            print(error_msg)
-            import traceback
-            traceback.print_exc()
+            log.exception(error_msg)
             QMessageBox.critical(self, "错误", error_msg)
 
     def save_supplier_image(self):
@@ -3658,12 +4887,12 @@ class BoilerKnowledge(QMainWindow):
             # 确保图片目录存在
             if not os.path.exists(self.images_dir):
                 os.makedirs(self.images_dir, exist_ok=True)
-                print(f"已创建图片目录: {self.images_dir}")
+                log.debug("已创建图片目录: %s", self.images_dir)
                 
             # 获取当前选中的供应商行
             supplier_row = self.get_current_supplier_row()
             if supplier_row >= 0:
-                print(f"保存供应商图片: 当前供应商行: {supplier_row}")
+                log.debug("保存供应商图片: 当前供应商行: %s", supplier_row)
             else:
                 QMessageBox.warning(self, "警告", "请先选择一个供应商！\n\n操作步骤：\n1. 在供应商表格中点击选择一个供应商\n2. 或者双击供应商表格中的供应商来管理其图片")
                 return
@@ -3676,41 +4905,18 @@ class BoilerKnowledge(QMainWindow):
                 try:
                     # 检查源文件是否存在和可读
                     if not os.path.exists(image_path):
-                        print(f"源文件不存在: {image_path}")
+                        log.warning("源文件不存在: %s", image_path)
                         failed_count += 1
                         continue
                         
                     if not os.access(image_path, os.R_OK):
-                        print(f"源文件不可读: {image_path}")
+                        log.warning("源文件不可读: %s", image_path)
                         failed_count += 1
                         continue
                     
-                    # 生成时间戳文件名（包含毫秒）
-                    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S_%f")[:-3]
-                    file_ext = os.path.splitext(image_path)[1]
-                    new_filename = f"supplier_{timestamp}{file_ext}"
-                    new_file_path = os.path.join(self.images_dir, new_filename)
-                    
-                    print(f"正在复制供应商图片: {image_path} -> {new_file_path}")
-                    
-                    # 复制文件
-                    shutil.copy2(image_path, new_file_path)
-                    
-                    # 验证文件是否复制成功
-                    if not os.path.exists(new_file_path):
-                        print(f"文件复制后不存在: {new_file_path}")
-                        failed_count += 1
-                        continue
-                    
-                    # 验证文件大小
-                    original_size = os.path.getsize(image_path)
-                    copied_size = os.path.getsize(new_file_path)
-                    if original_size != copied_size:
-                        print(f"文件大小不匹配: 原始={original_size}, 复制={copied_size}")
-                        failed_count += 1
-                        continue
-                        
-                    print(f"供应商图片复制成功: {new_file_path}")
+                    # 按内容哈希存入图片存储，相同的图片只保存一份
+                    new_filename = self.store_image(image_path)
+                    log.debug("图片已存入: %s -> %s", image_path, new_filename)
                     
                     # 更新特定供应商的图片数据
                     if "pricing" in data and "suppliers" in data["pricing"]:
@@ -3719,9 +4925,9 @@ class BoilerKnowledge(QMainWindow):
                             if "images" not in suppliers[supplier_row]:
                                 suppliers[supplier_row]["images"] = []
                             suppliers[supplier_row]["images"].append(new_filename)
-                            print(f"已为供应商 '{suppliers[supplier_row]['name']}' 添加图片: {new_filename}")
+                            log.debug("已为供应商 '%s' 添加图片: %s", suppliers[supplier_row]['name'], new_filename)
                     else:
-                        print("警告: 无法确定当前供应商")
+                        log.warning("无法确定当前供应商")
                         # 如果没有选中供应商，添加到全局供应商图片（向后兼容）
                         if "supplier_images" not in data:
                             data["supplier_images"] = []
@@ -3730,12 +4936,12 @@ class BoilerKnowledge(QMainWindow):
                     saved_count += 1
                     
                 except Exception as e:
-                    print(f"保存供应商图片失败 {image_path}: {str(e)}")
+                    log.error("保存供应商图片失败 %s: %s", image_path, e)
                     failed_count += 1
             
             # 保存数据并刷新显示
             if saved_count > 0:
-                self.save_data()
+                self.save_data(path)
                 # 刷新当前供应商的图片显示
                 supplier_row = self.get_current_supplier_row()
                 if supplier_row >= 0:
@@ -3756,7 +4962,7 @@ class BoilerKnowledge(QMainWindow):
             
         except Exception as e:
             error_msg = f"保存供应商图片失败: {str(e)}"
-            print(error_msg)
+            log.error(error_msg)
             QMessageBox.critical(self, "错误", error_msg)
 
     def delete_selected_supplier_image(self, list_widget, supplier, dialog, supplier_row):
@@ -3781,16 +4987,12 @@ class BoilerKnowledge(QMainWindow):
                 # 从供应商数据中移除
                 if "images" in supplier and image_name in supplier["images"]:
                     supplier["images"].remove(image_name)
-                    print(f"已从供应商 '{supplier.get('name', '未知')}' 移除图片: {image_name}")
-                
-                # 删除物理文件
-                image_path = os.path.join(self.images_dir, image_name)
-                if os.path.exists(image_path):
-                    os.remove(image_path)
-                    print(f"已删除供应商图片文件: {image_path}")
+                    log.debug("已从供应商 '%s' 移除图片: %s", supplier.get('name', '未知'), image_name)
+                    # 没有其他引用时删除文件
+                    self.release_image(image_name)
                 
                 # 保存数据
-                self.save_data()
+                self.save_current_item()
                 
                 # 刷新显示
                 self.load_supplier_images_for_specific_supplier(supplier_row)
@@ -3840,22 +5042,18 @@ class BoilerKnowledge(QMainWindow):
                         # 从供应商数据中移除
                         if "images" in supplier and image_name in supplier["images"]:
                             supplier["images"].remove(image_name)
-                            print(f"已从供应商 '{supplier_name}' 移除图片: {image_name}")
-                        
-                        # 删除物理文件
-                        image_path = os.path.join(self.images_dir, image_name)
-                        if os.path.exists(image_path):
-                            os.remove(image_path)
-                            print(f"已删除供应商图片文件: {image_path}")
+                            log.debug("已从供应商 '%s' 移除图片: %s", supplier_name, image_name)
+                            # 没有其他引用时删除文件
+                            self.release_image(image_name)
                         
                         deleted_count += 1
                         
                     except Exception as e:
                         failed_count += 1
-                        print(f"删除供应商图片失败 {image_name}: {str(e)}")
+                        log.error("删除供应商图片失败 %s: %s", image_name, e)
                 
                 # 保存数据
-                self.save_data()
+                self.save_current_item()
                 
                 # 刷新显示
                 self.load_supplier_images_for_specific_supplier(supplier_row)
@@ -3896,23 +5094,23 @@ class BoilerKnowledge(QMainWindow):
             
             # 如果供应商名称为空，直接进入编辑模式
             if not supplier_name:
-                print(f"供应商行 {row} 名称为空，进入编辑模式")
+                log.debug("供应商行 %s 名称为空，进入编辑模式", row)
                 self.edit_supplier_dialog(row)
                 return
             
             # 设置当前选中的供应商行，然后打开图片管理对话框
             self.current_supplier_row = row
-            print(f"双击供应商 '{supplier_name}'，打开图片管理对话框")
+            log.debug("双击供应商 '%s'，打开图片管理对话框", supplier_name)
             self.manage_supplier_images()
             
         except Exception as e:
             QMessageBox.critical(self, "错误", f"处理供应商选择时发生错误: {str(e)}")
-            print(f"供应商双击事件错误: {e}")
-            import traceback
-            traceback.print_exc()
+            log.exception("供应商双击事件错误: %s", e)
 
     def load_supplier_images_for_specific_supplier(self, supplier_row):
         """加载特定供应商的图片"""
+        # 取消上一次尚未完成的后台载入
+        self.image_loader.cancel("supplier_images")
         try:
             if not self.current_item:
                 return
@@ -3930,7 +5128,7 @@ class BoilerKnowledge(QMainWindow):
             supplier = suppliers[supplier_row]
             supplier_images = supplier.get("images", [])
             
-            print(f"加载供应商 '{supplier.get('name', '')}' 的图片，共 {len(supplier_images)} 张")
+            log.debug("加载供应商 '%s' 的图片，共 %s 张", supplier.get('name', ''), len(supplier_images))
             
             # 清除现有缩略图
             while self.supplier_image_thumbnail_layout.count() > 0:
@@ -3945,20 +5143,21 @@ class BoilerKnowledge(QMainWindow):
                 # 验证图片文件并过滤掉不存在的文件
                 valid_images = []
                 for image_filename in supplier_images:
-                    image_path = os.path.join(self.images_dir, image_filename)
+                    image_path = self.image_path(image_filename)
                     if os.path.exists(image_path) and os.access(image_path, os.R_OK) and os.path.getsize(image_path) > 0:
                         valid_images.append(image_filename)
                 
                 # 为每张有效图片创建缩略图
                 for i, image_filename in enumerate(valid_images):
                     try:
-                        image_path = os.path.join(self.images_dir, image_filename)
+                        image_path = self.image_path(image_filename)
                         # 创建完整的图片路径列表用于导航
-                        full_image_paths = [os.path.join(self.images_dir, img) for img in valid_images]
-                        thumbnail_widget = ImageThumbnailWidget(image_path, full_image_paths, i, self.supplier_image_thumbnail_container, self.delete_supplier_image_callback)
+                        full_image_paths = [self.image_path(img) for img in valid_images]
+                        thumbnail_widget = ImageThumbnailWidget(image_path, full_image_paths, i, self.supplier_image_thumbnail_container, self.delete_supplier_image_callback,
+                                                                self.image_loader, "supplier_images")
                         self.supplier_image_thumbnail_layout.addWidget(thumbnail_widget)
                     except Exception as e:
-                        print(f"创建供应商图片缩略图失败: {str(e)}")
+                        log.error("创建供应商图片缩略图失败: %s", str(e))
                         continue
                 
                 # 添加弹性空间
@@ -3973,7 +5172,7 @@ class BoilerKnowledge(QMainWindow):
                 self.supplier_image_thumbnail_label.setText("暂无供应商图片，点击下方按钮添加图片")
                 
         except Exception as e:
-            print(f"加载供应商图片失败: {str(e)}")
+            log.error("加载供应商图片失败: %s", str(e))
     
     def edit_supplier_dialog(self, row):
         """编辑供应商信息的简单对话框"""
@@ -4092,7 +5291,7 @@ class BoilerKnowledge(QMainWindow):
                     try:
                         self.auto_save_pricing()
                     except Exception as auto_save_error:
-                        print(f"自动保存失败: {auto_save_error}")
+                        log.error("自动保存失败: %s", auto_save_error)
                         # 即使自动保存失败，也继续保存到表格
                     
                     dialog.accept()
@@ -4100,9 +5299,7 @@ class BoilerKnowledge(QMainWindow):
                     
                 except Exception as e:
                     QMessageBox.critical(dialog, "错误", f"保存供应商信息失败: {str(e)}")
-                    print(f"保存供应商信息错误: {e}")
-                    import traceback
-                    traceback.print_exc()
+                    log.exception("保存供应商信息错误: %s", e)
             
             def cancel_edit():
                 dialog.reject()
@@ -4125,57 +5322,55 @@ class BoilerKnowledge(QMainWindow):
             result = dialog.exec_()
             
             if result == QDialog.Accepted:
-                print(f"供应商信息编辑成功，行 {row}")
+                log.debug("供应商信息编辑成功，行 %s", row)
             else:
-                print(f"供应商信息编辑取消，行 {row}")
+                log.debug("供应商信息编辑取消，行 %s", row)
             
         except Exception as e:
             QMessageBox.critical(self, "错误", f"创建供应商编辑对话框失败: {str(e)}")
-            print(f"供应商编辑对话框错误: {e}")
-            import traceback
-            traceback.print_exc()
+            log.exception("供应商编辑对话框错误: %s", e)
 
     def get_current_supplier_row(self):
         """获取当前选中的供应商行"""
         try:
+            # 供应商图片操作依赖数据中的供应商列表，先写入表格中的编辑
+            self.autosave.flush()
             if not self.current_item:
-                print("获取当前供应商行: 没有选中项目")
+                log.debug("获取当前供应商行: 没有选中项目")
                 return -1
                 
             path = self.get_item_path(self.current_item)
             data = self.get_data_by_path(path)
             
             if not data or "pricing" not in data:
-                print("获取当前供应商行: 数据无效或没有价格信息")
+                log.debug("获取当前供应商行: 数据无效或没有价格信息")
                 return -1
                 
             # 首先尝试从供应商表格的选中行获取
             current_row = self.supplier_table.currentRow()
             if current_row >= 0:
-                print(f"获取当前供应商行: 从表格选中行获取，行号: {current_row}")
+                log.debug("获取当前供应商行: 从表格选中行获取，行号: %s", current_row)
                 return current_row
                 
             # 如果表格没有选中行，尝试从当前供应商信息标签获取
             if hasattr(self, 'current_supplier_info') and self.current_supplier_info:
                 try:
                     current_supplier_name = self.current_supplier_info.text()
-                    print(f"获取当前供应商行: 从标签获取供应商名称: {current_supplier_name}")
+                    log.debug("获取当前供应商行: 从标签获取供应商名称: %s", current_supplier_name)
                     if "正在管理供应商 '" in current_supplier_name:
                         supplier_name = current_supplier_name.split("'")[1]
                         suppliers = data["pricing"].get("suppliers", [])
                         for i, supplier in enumerate(suppliers):
                             if supplier.get("name") == supplier_name:
-                                print(f"获取当前供应商行: 找到供应商 '{supplier_name}' 在第 {i} 行")
+                                log.debug("获取当前供应商行: 找到供应商 '%s' 在第 %s 行", supplier_name, i)
                                 return i
                 except Exception as label_error:
-                    print(f"获取当前供应商行: 从标签获取失败: {str(label_error)}")
+                    log.warning("获取当前供应商行: 从标签获取失败: %s", label_error)
             
-            print("获取当前供应商行: 无法确定当前供应商")
+            log.debug("获取当前供应商行: 无法确定当前供应商")
             return -1
         except Exception as e:
-            print(f"获取当前供应商行失败: {str(e)}")
-            import traceback
-            traceback.print_exc()
+            log.exception("获取当前供应商行失败: %s", e)
             return -1
 
     def toggle_supplier_image_section(self):
@@ -4294,22 +5489,20 @@ class BoilerKnowledge(QMainWindow):
                 QMessageBox.warning(self, "警告", "请先选择一个产品！")
                 return
                 
-            print(f"开始插入供应商图片，当前供应商行: {supplier_row}")
+            log.debug("开始插入供应商图片，当前供应商行: %s", supplier_row)
             
             file_paths, _ = QFileDialog.getOpenFileNames(
                 dialog, "选择供应商图片", "", "图片文件 (*.png *.jpg *.jpeg *.bmp *.gif)"
             )
             if file_paths:
                 self.current_supplier_image_paths = file_paths
-                print(f"已选择 {len(file_paths)} 张供应商图片")
+                log.debug("已选择 %s 张供应商图片", len(file_paths))
                 QMessageBox.information(dialog, "成功", f"已选择 {len(file_paths)} 张图片，请点击'保存供应商图片'按钮来保存。")
             else:
-                print("用户取消了图片选择")
+                log.debug("用户取消了图片选择")
         except Exception as e:
             error_msg = f"插入供应商图片失败: {str(e)}"
-            print(error_msg)
-            import traceback
-            traceback.print_exc()
+            log.exception(error_msg)
             QMessageBox.critical(dialog, "错误", error_msg)
 
     def save_supplier_image_from_dialog(self, dialog, supplier_row):
@@ -4345,9 +5538,9 @@ class BoilerKnowledge(QMainWindow):
             # 确保图片目录存在
             if not os.path.exists(self.images_dir):
                 os.makedirs(self.images_dir, exist_ok=True)
-                print(f"已创建图片目录: {self.images_dir}")
+                log.debug("已创建图片目录: %s", self.images_dir)
                 
-            print(f"保存供应商图片: 当前供应商行: {supplier_row}")
+            log.debug("保存供应商图片: 当前供应商行: %s", supplier_row)
                 
             saved_count = 0
             failed_count = 0
@@ -4357,41 +5550,18 @@ class BoilerKnowledge(QMainWindow):
                 try:
                     # 检查源文件是否存在和可读
                     if not os.path.exists(image_path):
-                        print(f"源文件不存在: {image_path}")
+                        log.warning("源文件不存在: %s", image_path)
                         failed_count += 1
                         continue
                         
                     if not os.access(image_path, os.R_OK):
-                        print(f"源文件不可读: {image_path}")
-                        failed_count += 1
-                        continue
-                    
-                    # 生成时间戳文件名（包含毫秒）
-                    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S_%f")[:-3]
-                    file_ext = os.path.splitext(image_path)[1]
-                    new_filename = f"supplier_{timestamp}{file_ext}"
-                    new_file_path = os.path.join(self.images_dir, new_filename)
-                    
-                    print(f"正在复制供应商图片: {image_path} -> {new_file_path}")
-                    
-                    # 复制文件
-                    shutil.copy2(image_path, new_file_path)
-                    
-                    # 验证文件是否复制成功
-                    if not os.path.exists(new_file_path):
-                        print(f"文件复制后不存在: {new_file_path}")
+                        log.warning("源文件不可读: %s", image_path)
                         failed_count += 1
                         continue
                     
-                    # 验证文件大小
-                    original_size = os.path.getsize(image_path)
-                    copied_size = os.path.getsize(new_file_path)
-                    if original_size != copied_size:
-                        print(f"文件大小不匹配: 原始={original_size}, 复制={copied_size}")
-                        failed_count += 1
-                        continue
-                        
-                    print(f"供应商图片复制成功: {new_file_path}")
+                    # 按内容哈希存入图片存储，相同的图片只保存一份
+                    new_filename = self.store_image(image_path)
+                    log.debug("图片已存入: %s -> %s", image_path, new_filename)
                     
                     # 更新特定供应商的图片数据
                     if "pricing" in data and "suppliers" in data["pricing"]:
@@ -4400,9 +5570,9 @@ class BoilerKnowledge(QMainWindow):
                             if "images" not in suppliers[supplier_row]:
                                 suppliers[supplier_row]["images"] = []
                             suppliers[supplier_row]["images"].append(new_filename)
-                            print(f"已为供应商 '{suppliers[supplier_row]['name']}' 添加图片: {new_filename}")
+                            log.debug("已为供应商 '%s' 添加图片: %s", suppliers[supplier_row]['name'], new_filename)
                     else:
-                        print("警告: 无法确定当前供应商")
+                        log.warning("无法确定当前供应商")
                         # 如果没有选中供应商，添加到全局供应商图片（向后兼容）
                         if "supplier_images" not in data:
                             data["supplier_images"] = []
@@ -4411,12 +5581,12 @@ class BoilerKnowledge(QMainWindow):
                     saved_count += 1
                     
                 except Exception as e:
-                    print(f"保存供应商图片失败 {image_path}: {str(e)}")
+                    log.error("保存供应商图片失败 %s: %s", image_path, e)
                     failed_count += 1
             
             # 保存数据并刷新显示
             if saved_count > 0:
-                self.save_data()
+                self.save_data(path)
                 # 刷新供应商表格中的图片信息
                 self.load_pricing(data.get("pricing", {}))
                 # 重新打开对话框以刷新图片列表
@@ -4436,7 +5606,7 @@ class BoilerKnowledge(QMainWindow):
             
         except Exception as e:
             error_msg = f"保存供应商图片失败: {str(e)}"
-            print(error_msg)
+            log.error(error_msg)
             QMessageBox.critical(dialog, "错误", error_msg)
 
     def debug_image_saving(self):
@@ -4471,7 +5641,7 @@ class BoilerKnowledge(QMainWindow):
                     images = data.get("images", [])
                     debug_info.append(f"📸 一般图片数量: {len(images)}")
                     for i, img in enumerate(images):
-                        img_path = os.path.join(self.images_dir, img)
+                        img_path = self.image_path(img)
                         if os.path.exists(img_path):
                             debug_info.append(f"  ✅ 图片 {i+1}: {img} (存在)")
                         else:
@@ -4481,7 +5651,7 @@ class BoilerKnowledge(QMainWindow):
                     principle_images = data.get("principle_images", [])
                     debug_info.append(f"🔬 原理图片数量: {len(principle_images)}")
                     for i, img in enumerate(principle_images):
-                        img_path = os.path.join(self.images_dir, img)
+                        img_path = self.image_path(img)
                         if os.path.exists(img_path):
                             debug_info.append(f"  ✅ 原理图片 {i+1}: {img} (存在)")
                         else:
@@ -4491,7 +5661,7 @@ class BoilerKnowledge(QMainWindow):
                     supplier_images = data.get("supplier_images", [])
                     debug_info.append(f"🏢 供应商图片数量: {len(supplier_images)}")
                     for i, img in enumerate(supplier_images):
-                        img_path = os.path.join(self.images_dir, img)
+                        img_path = self.image_path(img)
                         if os.path.exists(img_path):
                             debug_info.append(f"  ✅ 供应商图片 {i+1}: {img} (存在)")
                         else:
@@ -4522,7 +5692,7 @@ class BoilerKnowledge(QMainWindow):
             
             # 显示调试信息
             debug_text = "\n".join(debug_info)
-            print(debug_text)
+            log.info(debug_text)
             
             # 创建调试信息对话框
             dialog = QDialog(self)
@@ -4548,49 +5718,127 @@ class BoilerKnowledge(QMainWindow):
             
         except Exception as e:
             error_msg = f"调试图片保存功能失败: {str(e)}"
-            print(error_msg)
+            log.error(error_msg)
             QMessageBox.critical(self, "错误", error_msg)
 
     def export_data(self):
-        """导出数据"""
-        file_path, _ = QFileDialog.getSaveFileName(
-            self, "导出数据", "", "JSON文件 (*.json)"
+        """导出数据：NDJSON 在后台线程中逐个节点写入；也可以导出旧版本使用的整个 JSON 文件"""
+        if self.data_transfer is not None:
+            QMessageBox.information(self, "提示", "已有数据导入或导出正在进行！")
+            return
+        file_path, selected_filter = QFileDialog.getSaveFileName(
+            self, "导出数据", "", "NDJSON文件 (*.ndjson);;JSON文件（旧版本） (*.json)"
         )
-        if file_path:
+        if not file_path:
+            return
+        if not os.path.splitext(file_path)[1]:
+            file_path += ".json" if "(*.json)" in selected_filter else ".ndjson"
+        self.autosave.flush()
+        if self.image_imports:
+            QMessageBox.information(self, "提示", "图片导入完成后才能导出数据！")
+            return
+        if file_path.lower().endswith(".json"):
             try:
+                # 由存储后端序列化，按需加载的设备数据也会被完整导出
+                text = self.store.encode_snapshot(self.system_data)
                 with open(file_path, 'w', encoding='utf-8') as f:
-                    json.dump(self.system_data, f, ensure_ascii=False, indent=2)
+                    f.write(text)
                 QMessageBox.information(self, "成功", "数据导出成功！")
             except Exception as e:
                 QMessageBox.critical(self, "错误", f"导出失败: {str(e)}")
+            return
+        bridge = DataTransferBridge(self)
+        # 在界面线程中取出快照；导出期间进度窗口为模态，快照共享的设备数据不会被修改
+        job = ExportJob(self.system_data, file_path,
+                        on_progress=bridge.progress.emit, on_finished=bridge.finished.emit)
+        self.start_data_transfer(job, bridge, "导出数据", "正在导出", self.finish_export,
+                                 modal=True)
 
     def import_data(self):
-        """导入数据"""
+        """导入数据：在后台线程中逐行读取 NDJSON（或旧版本的 JSON）文件，完成后替换当前数据"""
+        if self.data_transfer is not None:
+            QMessageBox.information(self, "提示", "已有数据导入或导出正在进行！")
+            return
         file_path, _ = QFileDialog.getOpenFileName(
-            self, "导入数据", "", "JSON文件 (*.json)"
+            self, "导入数据", "", "知识库数据 (*.ndjson *.json);;NDJSON文件 (*.ndjson);;JSON文件 (*.json)"
         )
-        if file_path:
-            try:
-                with open(file_path, 'r', encoding='utf-8') as f:
-                    imported_data = json.load(f)
-                
-                reply = QMessageBox.question(
-                    self, "确认导入", 
-                    "导入数据将覆盖当前数据，确定继续吗？"
-                )
-                if reply == QMessageBox.Yes:
-                    self.system_data = imported_data
-                    self.save_data()
-                    self.init_tree()
-                    self.update_tag_index()
-                    QMessageBox.information(self, "成功", "数据导入成功！")
-            except Exception as e:
-                QMessageBox.critical(self, "错误", f"导入失败: {str(e)}")
+        if not file_path:
+            return
+        confirm = QMessageBox(QMessageBox.Question, "确认导入", "导入数据将覆盖当前数据，确定继续吗？",
+                              QMessageBox.Yes | QMessageBox.No, self)
+        validate_box = QCheckBox("导入时检查数据格式")
+        validate_box.setChecked(True)
+        confirm.setCheckBox(validate_box)
+        if confirm.exec_() != QMessageBox.Yes:
+            return
+        bridge = DataTransferBridge(self)
+        # 快照也在导入线程中序列化，完成后界面线程只需替换数据
+        job = ImportJob(file_path, validate_box.isChecked(), encode=self.store.encode_snapshot,
+                        on_progress=bridge.progress.emit, on_finished=bridge.finished.emit)
+        self.start_data_transfer(job, bridge, "导入数据", "正在导入", self.finish_import)
+
+    def start_data_transfer(self, job, bridge, title, label, on_done, modal=False):
+        """显示进度并启动后台导入/导出任务，结束后在界面线程中调用 on_done(任务)
+
+        modal 为 True 时进度窗口为模态，任务结束前不能编辑数据。
+        """
+        progress = QProgressDialog(f"{label}...", "取消", 0, 1000, self)
+        progress.setWindowTitle(title)
+        progress.setWindowModality(Qt.WindowModal if modal else Qt.NonModal)
+        progress.setMinimumDuration(0)
+        progress.setAutoClose(False)
+        progress.setAutoReset(False)
+
+        def on_progress(done, total, records):
+            progress.setValue(done * 1000 // total if total else 1000)
+            progress.setLabelText(f"{label}: 已处理 {records} 个节点")
+
+        def on_finished(job):
+            self.data_transfer = None
+            progress.canceled.disconnect()
+            progress.close()
+            bridge.deleteLater()
+            on_done(job)
+
+        bridge.progress.connect(on_progress)
+        bridge.finished.connect(on_finished)
+        progress.canceled.connect(job.cancel)
+        self.data_transfer = job
+        log.info("开始%s: %s", title, job.path)
+        job.start()
+        progress.show()
+
+    def finish_export(self, job):
+        """导出结束"""
+        if job.cancelled:
+            self.statusBar().showMessage("导出已取消", 3000)
+        elif job.error:
+            QMessageBox.critical(self, "错误", f"导出失败: {job.error}")
+        else:
+            log.info("导出完成: %s 个节点，耗时 %.2fs", job.result, job.elapsed)
+            QMessageBox.information(self, "成功", f"数据导出成功！共 {job.result} 个节点。")
+
+    def finish_import(self, job):
+        """导入结束后在界面线程中替换数据并写入完整快照"""
+        if job.cancelled:
+            self.statusBar().showMessage("导入已取消，当前数据未改变", 3000)
+            return
+        if job.error:
+            QMessageBox.critical(self, "错误", f"导入失败: {job.error}")
+            return
+        try:
+            self.autosave.flush()
+            self.kb.install_import(job.result, job.snapshot_text)
+            self.init_tree()
+            log.info("导入完成: %s 个节点，耗时 %.2fs", len(self.node_index), job.elapsed)
+            QMessageBox.information(self, "成功", f"数据导入成功！共 {len(self.node_index)} 个节点。")
+        except Exception as e:
+            QMessageBox.critical(self, "错误", f"导入失败: {str(e)}")
 
     def show_context_menu(self, position):
         """显示右键菜单"""
-        item = self.tree.itemAt(position)
-        if not item:
+        item = self.tree.indexAt(position)
+        if not item.isValid():
             return
             
         menu = QMenu()
@@ -4621,107 +5869,73 @@ class BoilerKnowledge(QMainWindow):
         name, ok = QInputDialog.getText(self, "添加分类", "请输入分类名称:")
         if ok and name:
             parent_path = self.get_item_path(item)
-            self.add_category_to_data(parent_path, name)
+            new_path = self.add_category_to_data(parent_path, name)
             
-            # 记住当前展开状态
-            expanded_items = self.get_expanded_items()
-            
-            # 重新构建树
-            self.init_tree()
-            
-            # 恢复展开状态
-            self.restore_expanded_items(expanded_items)
-            
-            # 展开新添加的分类
-            self.expand_new_item(parent_path + [name])
+            if new_path is None:
+                return
+            # 展开新添加的分类（设备下添加时新节点在设备所在的分类中）
+            self.expand_new_item(new_path)
             
-            self.save_data()
+            self.save_data(new_path)
 
     def add_item_from_context(self, item):
         """从右键菜单添加设备"""
         name, ok = QInputDialog.getText(self, "添加设备", "请输入设备名称:")
         if ok and name:
             parent_path = self.get_item_path(item)
-            self.add_item_to_data(parent_path, name)
-            
-            # 记住当前展开状态
-            expanded_items = self.get_expanded_items()
-            
-            # 重新构建树
-            self.init_tree()
-            
-            # 恢复展开状态
-            self.restore_expanded_items(expanded_items)
+            new_path = self.add_item_to_data(parent_path, name)
             
-            # 展开新添加的项目
-            self.expand_new_item(parent_path + [name])
+            if new_path is None:
+                return
+            # 展开新添加的项目（设备下添加时新节点在设备所在的分类中）
+            self.expand_new_item(new_path)
             
-            self.save_data()
+            self.save_data(new_path)
 
     def rename_category_from_context(self, item):
         """从右键菜单重命名"""
-        old_name = item.text(0)
+        # 路径即将改变，先写入待保存的编辑
+        self.autosave.flush()
+        old_name = item.data()
         new_name, ok = QInputDialog.getText(self, "重命名", "请输入新名称:", text=old_name)
         if ok and new_name and new_name != old_name:
             try:
                 parent_path = self.get_item_path(item.parent())
-                if parent_path:
-                    # 使用 get_parent_data_by_path 获取父级的 children 字典
-                    parent_data = self.get_parent_data_by_path(parent_path + [old_name])
-                    if parent_data and old_name in parent_data:
-                        parent_data[new_name] = parent_data.pop(old_name)
-                else:
-                    if old_name in self.system_data["categories"]:
-                        self.system_data["categories"][new_name] = self.system_data["categories"].pop(old_name)
-                
-                # 记住当前展开状态
-                expanded_items = self.get_expanded_items()
-                
-                # 重新构建树
-                self.init_tree()
-                
-                # 恢复展开状态
-                self.restore_expanded_items(expanded_items)
-                
-                self.save_data()
+                old_path = (parent_path or []) + [old_name]
+                if self.kb.rename_node(old_path, new_name):
+                    self.save_node_renamed(old_path, new_name)
                 QMessageBox.information(self, "成功", f"'{old_name}' 已重命名为 '{new_name}'！")
             except Exception as e:
                 QMessageBox.critical(self, "错误", f"重命名失败: {str(e)}")
 
     def delete_category_from_context(self, item):
         """从右键菜单删除"""
-        name = item.text(0)
+        # 路径即将改变，先写入待保存的编辑
+        self.autosave.flush()
+        name = item.data()
         reply = QMessageBox.question(self, "确认删除", f"确定要删除 '{name}' 吗？")
         if reply == QMessageBox.Yes:
             try:
                 parent_path = self.get_item_path(item.parent())
-                if parent_path:
-                    # 使用 get_parent_data_by_path 获取父级的 children 字典
-                    parent_data = self.get_parent_data_by_path(parent_path + [name])
-                    if parent_data and name in parent_data:
-                        del parent_data[name]
-                else:
-                    if name in self.system_data["categories"]:
-                        del self.system_data["categories"][name]
-                
-                # 记住当前展开状态
-                expanded_items = self.get_expanded_items()
-                
-                # 重新构建树
-                self.init_tree()
-                
-                # 恢复展开状态
-                self.restore_expanded_items(expanded_items)
-                
-                self.save_data()
+                deleted_path = (parent_path or []) + [name]
+                if self.kb.delete_node(deleted_path):
+                    self.save_node_deleted(deleted_path)
                 QMessageBox.information(self, "成功", f"'{name}' 已删除！")
             except Exception as e:
                 QMessageBox.critical(self, "错误", f"删除失败: {str(e)}")
 
+    @perf_stats.timed("search_by_price_range")
     def search_by_price_range(self):
         """根据价格区间搜索当前产品的供应商"""
         try:
-            print("=== 开始当前产品价格搜索 ===")
+            if hasattr(self, 'price_scope_all') and self.price_scope_all.isChecked():
+                price_range = self.parse_price_range()
+                if price_range:
+                    self.search_all_prices(*price_range)
+                return
+            
+            log.debug("=== 开始当前产品价格搜索 ===")
+            self.set_price_query(None)
             
             # 检查是否选择了产品
             if not self.current_item:
@@ -4731,7 +5945,7 @@ class BoilerKnowledge(QMainWindow):
             # 检查UI元素是否存在
             if not hasattr(self, 'min_price_edit') or not hasattr(self, 'max_price_edit'):
                 error_msg = "价格搜索UI元素未初始化"
-                print(error_msg)
+                log.error(error_msg)
                 QMessageBox.critical(self, "搜索失败", error_msg)
                 return
             
@@ -4750,107 +5964,27 @@ class BoilerKnowledge(QMainWindow):
                 QMessageBox.warning(self, "警告", "只能搜索具体产品的供应商信息！")
                 return
             
-            print(f"获取到产品数据: {data}")
-            print(f"产品数据键: {list(data.keys())}")
+            log.debug("获取到产品数据: %s", data)
+            log.debug("产品数据键: %s", list(data.keys()))
             if "pricing" in data:
-                print(f"价格信息: {data['pricing']}")
+                log.debug("价格信息: %s", data['pricing'])
             else:
-                print("产品没有价格信息")
-            
-            min_price_text = self.min_price_edit.text().strip()
-            max_price_text = self.max_price_edit.text().strip()
-            
-            print(f"开始价格搜索 - 产品: {' > '.join(path)} - 最低价: '{min_price_text}', 最高价: '{max_price_text}'")
-            
-            if not min_price_text and not max_price_text:
-                QMessageBox.warning(self, "警告", "请输入至少一个价格范围！")
-                return
-            
-            # 解析价格范围
-            min_price = None
-            max_price = None
-            
-            if min_price_text:
-                try:
-                    min_price = float(min_price_text)
-                    print(f"解析最低价格: {min_price}")
-                except ValueError:
-                    QMessageBox.warning(self, "警告", "最低价格格式不正确！")
-                    return
-            
-            if max_price_text:
-                try:
-                    max_price = float(max_price_text)
-                    print(f"解析最高价格: {max_price}")
-                except ValueError:
-                    QMessageBox.warning(self, "警告", "最高价格格式不正确！")
-                    return
+                log.debug("产品没有价格信息")
             
-            # 检查价格范围逻辑
-            if min_price is not None and max_price is not None and min_price > max_price:
-                QMessageBox.warning(self, "警告", "最低价格不能大于最高价格！")
+            log.debug("开始价格搜索 - 产品: %s", ' > '.join(path))
+            price_range = self.parse_price_range()
+            if not price_range:
                 return
+            min_price, max_price = price_range
             
-            print(f"价格范围验证通过 - 搜索范围: {min_price} 到 {max_price}")
+            log.debug("价格范围验证通过 - 搜索范围: %s 到 %s", min_price, max_price)
             
             # 搜索当前产品的供应商
-            results = []
-            self.search_current_product_suppliers(data, path, min_price, max_price, results)
-            
-            # 存储搜索结果数据以便后续访问
-            self.current_price_search_results = results.copy() if results else []
+            results = supplier_offers(data, path, min_price, max_price)
             
-            print(f"搜索完成，找到 {len(results)} 条结果")
+            log.debug("搜索完成，找到 %s 条结果", len(results))
             
-            # 检查结果表格是否存在
-            if not hasattr(self, 'price_search_results'):
-                error_msg = "价格搜索结果表格未初始化"
-                print(error_msg)
-                QMessageBox.critical(self, "搜索失败", error_msg)
-                return
-            
-            # 显示结果
-            self.price_search_results.clear()
-            self.price_search_results.setRowCount(len(results))
-            
-            # 重新设置表格标题，确保显示正确的标题
-            headers = ["型号", "供应商", "价格", "供货周期", "联系方式", "产品图片"]
-            self.price_search_results.setHorizontalHeaderLabels(headers)
-            
-            # 确保表头可见并刷新
-            self.price_search_results.horizontalHeader().setVisible(True)
-            self.price_search_results.horizontalHeader().setStretchLastSection(True)
-            print(f"价格搜索结果表格当前标题: {[self.price_search_results.horizontalHeaderItem(i).text() if self.price_search_results.horizontalHeaderItem(i) else f'列{i}' for i in range(self.price_search_results.columnCount())]}")
-            
-            for row, result in enumerate(results):
-                try:
-                    # 设置表格数据
-                    self.price_search_results.setItem(row, 0, QTableWidgetItem(result['model']))
-                    self.price_search_results.setItem(row, 1, QTableWidgetItem(result['supplier_name']))
-                    self.price_search_results.setItem(row, 2, QTableWidgetItem(str(result['supplier_price'])))
-                    self.price_search_results.setItem(row, 3, QTableWidgetItem(result['lead_time']))
-                    self.price_search_results.setItem(row, 4, QTableWidgetItem(result['contact']))
-                    
-                    # 添加产品图片信息 - 使用缩略图组件
-                    product_images = result.get('product_images', [])
-                    print(f"搜索结果行 {row}: 产品图片数量: {len(product_images)}, 图片列表: {product_images}")
-                    print(f"图片目录路径: {self.images_dir}")
-                    image_widget = PriceSearchImageWidget(product_images, self.images_dir, self.price_search_results)
-                    self.price_search_results.setCellWidget(row, 5, image_widget)
-                    
-                    print(f"添加结果行 {row}: {result['supplier_name']} - {result['supplier_price']} - 产品图片: {len(product_images)}张")
-                except Exception as row_error:
-                    print(f"添加结果行 {row} 时出错: {row_error}")
-                    continue
-            
-            # 强制刷新表格显示
-            self.price_search_results.resizeColumnsToContents()
-            # 调整行高以显示缩略图
-            self.price_search_results.resizeRowsToContents()
-            # 确保所有行都有足够的高度显示缩略图
-            for row in range(len(results)):
-                self.price_search_results.setRowHeight(row, max(60, self.price_search_results.rowHeight(row)))
-            self.price_search_results.update()
+            self.display_price_search_results(results)
             
             # 显示搜索结果数量
             if results:
@@ -4869,184 +6003,174 @@ class BoilerKnowledge(QMainWindow):
                 self.statusBar().showMessage("未找到符合条件的供应商信息", 3000)
         except Exception as e:
             error_msg = f"价格搜索失败: {str(e)}"
-            print(error_msg)
-            import traceback
-            traceback.print_exc()
+            log.exception(error_msg)
             QMessageBox.critical(self, "搜索失败", error_msg)
     
-    def search_current_product_suppliers(self, data, path, min_price, max_price, results):
-        """搜索当前产品的供应商信息"""
-        try:
-            print(f"搜索产品: {' > '.join(path)}")
-            
-            # 检查产品是否有价格信息
-            if "pricing" not in data:
-                print("  产品没有价格信息")
-                return
-            
-            pricing = data["pricing"]
-            
-            # 获取型号信息
-            model_info = ""
-            if "technical_params" in data and "型号" in data["technical_params"]:
-                model_info = data["technical_params"]["型号"]
-            elif "technical_params" in data:
-                # 如果没有"型号"字段，尝试获取第一个技术参数作为型号
-                tech_params = data["technical_params"]
-                if tech_params:
-                    first_param = list(tech_params.items())[0]
-                    model_info = f"{first_param[0]}: {first_param[1]}"
-            
-            # 获取供应商信息
-            suppliers = pricing.get("suppliers", [])
-            print(f"  供应商数量: {len(suppliers)}")
-            
-            if not suppliers:
-                print("  没有供应商信息，跳过")
-                return
-            
-            # 搜索供应商
-            for supplier in suppliers:
-                # 检查供应商是否有价格信息
-                if 'price' not in supplier or supplier['price'] is None or supplier['price'] == '':
-                    print(f"  供应商 {supplier.get('name', '未知')} 没有价格信息，跳过")
-                    continue
-                
-                # 转换供应商价格为浮点数
-                try:
-                    supplier_price = float(supplier['price'])
-                    print(f"  检查供应商: {supplier.get('name', '未知')} - 价格: {supplier_price} (类型: {type(supplier_price)})")
-                except (ValueError, TypeError):
-                    print(f"  供应商价格转换失败: {supplier['price']}")
-                    continue
-                
-                if self.is_price_in_range(supplier_price, min_price, max_price):
-                    # 获取供应商特定的产品图片信息
-                    product_images = supplier.get('images', [])
-                    
-                    result = {
-                        'path': path,
-                        'model': model_info,
-                        'supplier_name': supplier.get('name', '未知供应商'),
-                        'supplier_price': supplier_price,
-                        'lead_time': supplier.get('lead_time', ''),
-                        'contact': supplier.get('contact', ''),
-                        'product_images': product_images
-                    }
-                    results.append(result)
-                    print(f"  添加供应商结果: {result['supplier_name']} - {result['supplier_price']} - 产品图片: {len(product_images)}张")
-                else:
-                    print(f"  供应商价格 {supplier_price} 不在范围内，跳过")
-                    
-        except Exception as e:
-            print(f"搜索当前产品供应商时出错: {e}")
-            import traceback
-            traceback.print_exc()
+    def parse_price_range(self):
+        """读取价格区间输入，返回 (最低价, 最高价)；输入有误时提示并返回 None"""
+        min_price_text = self.min_price_edit.text().strip()
+        max_price_text = self.max_price_edit.text().strip()
+        
+        if not min_price_text and not max_price_text:
+            QMessageBox.warning(self, "警告", "请输入至少一个价格范围！")
+            return None
+        
+        # 解析价格范围
+        min_price = None
+        max_price = None
+        
+        if min_price_text:
+            try:
+                min_price = float(min_price_text)
+            except ValueError:
+                QMessageBox.warning(self, "警告", "最低价格格式不正确！")
+                return None
+        
+        if max_price_text:
+            try:
+                max_price = float(max_price_text)
+            except ValueError:
+                QMessageBox.warning(self, "警告", "最高价格格式不正确！")
+                return None
+        
+        # 检查价格范围逻辑
+        if min_price is not None and max_price is not None and min_price > max_price:
+            QMessageBox.warning(self, "警告", "最低价格不能大于最高价格！")
+            return None
+        
+        return min_price, max_price
     
-    def is_price_in_range(self, price, min_price, max_price):
-        """检查价格是否在指定范围内"""
-        print(f"检查价格范围: 价格={price}, 最低价={min_price}, 最高价={max_price}")
-        if min_price is not None and price < min_price:
-            print(f"  价格 {price} 低于最低价 {min_price}，返回 False")
-            return False
-        if max_price is not None and price > max_price:
-            print(f"  价格 {price} 高于最高价 {max_price}，返回 False")
-            return False
-        print(f"  价格 {price} 在范围内，返回 True")
-        return True
+    def display_price_search_results(self, results):
+        """把价格搜索结果交给结果模型显示"""
+        # 检查结果表格是否存在
+        if not hasattr(self, 'price_search_results'):
+            error_msg = "价格搜索结果表格未初始化"
+            log.error(error_msg)
+            QMessageBox.critical(self, "搜索失败", error_msg)
+            return
+        
+        # 存储搜索结果数据以便后续访问（双击查看图片时按行读取）
+        self.current_price_search_results = list(results)
+        self.image_loader.cancel("price_results")
+        self.price_result_model.set_results(self.current_price_search_results)
+        self.price_sort_keys = []
+        self.price_search_results.horizontalHeader().setSortIndicatorShown(False)
+        
+        # 图片缩略图组件按持久索引挂在单元格上，排序时随行移动，不需要重建
+        for row, result in enumerate(self.current_price_search_results):
+            source_index = self.price_result_model.index(row, PriceResultModel.IMAGE_COLUMN)
+            image_widget = PriceSearchImageWidget(result.get('product_images', []), self.images_dir, self.price_search_results,
+                                                  self.image_loader, "price_results")
+            self.price_search_results.setIndexWidget(self.price_result_proxy.mapFromSource(source_index), image_widget)
+        
+        self.price_search_results.resizeColumnsToContents()
+        self.price_search_results.setColumnWidth(PriceResultModel.IMAGE_COLUMN, 160)
+        # 确保所有行都有足够的高度显示缩略图
+        self.price_search_results.resizeRowsToContents()
+        for row in range(len(results)):
+            self.price_search_results.setRowHeight(row, max(60, self.price_search_results.rowHeight(row)))
 
-    def search_products_by_price(self, data, current_path, min_price, max_price, results):
-        """递归搜索产品价格"""
-        try:
-            if not isinstance(data, dict):
-                print(f"警告: 数据不是字典类型: {type(data)}")
-                return
-                
-            for name, info in data.items():
-                try:
-                    path = current_path + [name]
-                    
-                    if isinstance(info, dict) and "children" in info:
-                        # 这是一个分类节点，继续递归
-                        print(f"进入分类: {' > '.join(path)}")
-                        self.search_products_by_price(info["children"], path, min_price, max_price, results)
-                    else:
-                        # 这是一个产品节点，检查供应商价格
-                        print(f"检查产品: {' > '.join(path)}")
-                        if "pricing" in info and "suppliers" in info["pricing"]:
-                            suppliers = info["pricing"]["suppliers"]
-                            print(f"  供应商数量: {len(suppliers)}")
-                            
-                            # 只处理有供应商信息的产品
-                            if not suppliers:
-                                print(f"  产品没有供应商信息，跳过")
-                                continue
-                            
-                            # 获取型号信息
-                            model_info = ""
-                            if "technical_params" in info and "型号" in info["technical_params"]:
-                                model_info = info["technical_params"]["型号"]
-                            elif "technical_params" in info:
-                                # 如果没有"型号"字段，尝试获取第一个技术参数作为型号
-                                tech_params = info["technical_params"]
-                                if tech_params:
-                                    first_param = list(tech_params.items())[0]
-                                    model_info = f"{first_param[0]}: {first_param[1]}"
-                            
-                            # 只处理有供应商信息的产品
-                            if suppliers:
-                                # 为每个有价格的供应商创建一个条目
-                                for supplier in suppliers:
-                                    # 检查供应商是否有价格信息
-                                    if 'price' not in supplier or supplier['price'] is None or supplier['price'] == '':
-                                        print(f"  供应商 {supplier.get('name', '未知')} 没有价格信息，跳过")
-                                        continue
-                                    
-                                    try:
-                                        supplier_price = float(supplier['price'])
-                                    except (ValueError, TypeError):
-                                        print(f"  供应商价格转换失败: {supplier['price']}")
-                                        continue
-                                    
-                                    # 检查供应商价格是否在范围内
-                                    if min_price is not None and supplier_price < min_price:
-                                        print(f"  供应商价格 {supplier_price} 低于最低价 {min_price}，跳过")
-                                        continue
-                                    if max_price is not None and supplier_price > max_price:
-                                        print(f"  供应商价格 {supplier_price} 高于最高价 {max_price}，跳过")
-                                        continue
-                                    
-                                    # 获取产品图片信息
-                                    product_images = info.get('images', [])
-                                    
-                                    result = {
-                                        'path': path,
-                                        'model': model_info,
-                                        'supplier_name': supplier.get('name', '未知供应商'),
-                                        'supplier_price': supplier_price,
-                                        'lead_time': supplier.get('lead_time', ''),
-                                        'contact': supplier.get('contact', ''),
-                                        'product_images': product_images
-                                    }
-                                    results.append(result)
-                                    print(f"  添加供应商结果: {result['supplier_name']} - {result['supplier_price']} - 产品图片: {len(product_images)}张")
-                            else:
-                                print(f"  产品没有供应商信息，跳过")
-                        else:
-                            print(f"  产品没有价格信息")
-                except Exception as item_error:
-                    print(f"处理项目 '{name}' 时出错: {item_error}")
-                    continue
-                    
-        except Exception as e:
-            print(f"递归搜索过程中出错: {e}")
-            import traceback
-            traceback.print_exc()
+    @perf_stats.timed("search_all_prices")
+    def search_all_prices(self, min_price, max_price):
+        """在全部设备的供应商报价中按价格区间搜索（使用价格索引）"""
+        if not self.price_index.built:
+            self.pending_price_search = (min_price, max_price)
+            if not self.price_index.building:
+                self.start_price_index_build()
+            self.statusBar().showMessage("正在建立价格索引，完成后显示搜索结果...")
+            return
+        
+        # 刷新币种列表，保留当前选择
+        selected = self.price_currency_filter.currentText()
+        self.price_currency_filter.blockSignals(True)
+        self.price_currency_filter.clear()
+        self.price_currency_filter.addItem("全部币种")
+        self.price_currency_filter.addItems(self.price_index.currencies())
+        index = self.price_currency_filter.findText(selected)
+        self.price_currency_filter.setCurrentIndex(max(0, index))
+        self.price_currency_filter.blockSignals(False)
+        
+        currency = self.price_currency_filter.currentText()
+        self.set_price_query({
+            "min_price": min_price,
+            "max_price": max_price,
+            "currency": None if currency == "全部币种" else currency,
+            "descending": False,
+            "offset": 0,
+        })
+        self.price_sort_btn.setText("按价格升序 ✓")
+        self.price_sort_desc_btn.setText("按价格降序")
+        self.show_price_page(0)
+    
+    def start_price_index_build(self):
+        """在后台线程中建立价格索引（界面线程中只取出设备列表）"""
+        task = self.kb.prepare_price_index()
+        price_index = self.price_index
+        bridge = self.price_index_status
+
+        def build():
+            built = False
+            try:
+                with perf_stats.measure("price_index.build"):
+                    built = price_index.build(task)
+            except Exception as e:
+                log.exception("建立价格索引失败: %s", e)
+            bridge.built.emit(built)
 
+        log.info("开始建立价格索引: %s 个节点", len(self.node_index))
+        threading.Thread(target=build, name="price-index", daemon=True).start()
+
+    def on_price_index_built(self, built):
+        """价格索引建立完成（界面线程）：补上建立期间修改过的设备，再执行等待中的搜索"""
+        if built:
+            self.kb.finish_price_index()
+            log.info("价格索引已建立: %s 条报价", len(self.price_index))
+        if not self.price_index.built:
+            # 建立失败，或期间数据被整体替换；正在重新建立时由新的建立完成后执行搜索
+            if not self.price_index.building:
+                self.pending_price_search = None
+                self.statusBar().showMessage("价格索引未能建立，请重新搜索", 3000)
+            return
+        pending, self.pending_price_search = self.pending_price_search, None
+        if pending is not None:
+            self.search_all_prices(*pending)
+
+    def set_price_query(self, query):
+        """记录当前全局价格搜索条件；None 表示显示的是当前产品的结果"""
+        self.price_query = query
+        if query is None and hasattr(self, 'price_page_label'):
+            self.price_page_label.setText("")
+            self.price_prev_page_btn.setEnabled(False)
+            self.price_next_page_btn.setEnabled(False)
+    
+    @perf_stats.timed("show_price_page")
+    def show_price_page(self, offset):
+        """显示全局价格搜索结果的一页"""
+        query = self.price_query
+        if query is None:
+            return
+        if not self.price_index.built:
+            # 数据被整体替换后索引需要重新建立
+            self.search_all_prices(query["min_price"], query["max_price"])
+            return
+        offset = max(0, offset)
+        total, results = self.kb.price_query(
+            query["min_price"], query["max_price"], query["currency"],
+            offset=offset, limit=self.price_page_size, descending=query["descending"])
+        query["offset"] = offset
+        
+        self.display_price_search_results(results)
+        pages = max(1, (total + self.price_page_size - 1) // self.price_page_size)
+        self.price_page_label.setText(f"第 {offset // self.price_page_size + 1}/{pages} 页")
+        self.price_prev_page_btn.setEnabled(offset > 0)
+        self.price_next_page_btn.setEnabled(offset + self.price_page_size < total)
+        self.statusBar().showMessage(f"全部设备中找到 {total} 条供应商报价", 3000)
+        log.debug("全局价格搜索: %s ~ %s %s，共 %s 条，显示第 %s 条起", query['min_price'], query['max_price'], query['currency'] or '', total, offset + 1)
+    
     def debug_current_product(self):
         """调试当前产品信息"""
         try:
-            print("=== 开始调试当前产品 ===")
+            log.info("=== 开始调试当前产品 ===")
             
             if not self.current_item:
                 QMessageBox.warning(self, "警告", "请先选择一个产品！")
@@ -5066,40 +6190,40 @@ class BoilerKnowledge(QMainWindow):
                 QMessageBox.warning(self, "警告", "请选择具体产品，不是分类！")
                 return
             
-            print(f"当前产品路径: {' > '.join(path)}")
-            print(f"产品数据键: {list(data.keys())}")
-            print(f"完整产品数据: {data}")
+            log.info("当前产品路径: %s", ' > '.join(path))
+            log.info("产品数据键: %s", list(data.keys()))
+            log.info("完整产品数据: %s", data)
             
             if "pricing" in data:
                 pricing = data["pricing"]
-                print(f"价格信息: {pricing}")
+                log.info("价格信息: %s", pricing)
                 
                 if "base_price" in pricing:
                     base_price = pricing["base_price"]
-                    print(f"基础价格: {base_price} (类型: {type(base_price)})")
+                    log.info("基础价格: %s (类型: %s)", base_price, type(base_price))
                     try:
                         base_price_float = float(base_price)
-                        print(f"基础价格转换为浮点数: {base_price_float}")
+                        log.info("基础价格转换为浮点数: %s", base_price_float)
                     except (ValueError, TypeError) as e:
-                        print(f"基础价格转换失败: {e}")
+                        log.info("基础价格转换失败: %s", e)
                 else:
-                    print("没有基础价格")
+                    log.info("没有基础价格")
                 
                 if "suppliers" in pricing:
                     suppliers = pricing["suppliers"]
-                    print(f"供应商数量: {len(suppliers)}")
+                    log.info("供应商数量: %s", len(suppliers))
                     for i, supplier in enumerate(suppliers):
-                        print(f"  供应商{i+1}: {supplier}")
+                        log.info("  供应商%s: %s", i+1, supplier)
                         if "price" in supplier:
                             try:
                                 price_float = float(supplier["price"])
-                                print(f"    价格转换为浮点数: {price_float}")
+                                log.info("    价格转换为浮点数: %s", price_float)
                             except (ValueError, TypeError) as e:
-                                print(f"    价格转换失败: {e}")
+                                log.info("    价格转换失败: %s", e)
                 else:
-                    print("没有供应商信息")
+                    log.info("没有供应商信息")
             else:
-                print("产品没有价格信息")
+                log.info("产品没有价格信息")
             
             # 显示调试信息给用户
             debug_info = f"产品路径: {' > '.join(path)}\n"
@@ -5122,33 +6246,31 @@ class BoilerKnowledge(QMainWindow):
             
         except Exception as e:
             error_msg = f"调试当前产品失败: {str(e)}"
-            print(error_msg)
-            import traceback
-            traceback.print_exc()
+            log.exception(error_msg)
             QMessageBox.critical(self, "调试失败", error_msg)
 
     def test_price_search(self):
         """测试价格搜索功能"""
         try:
-            print("=== 开始测试价格搜索功能 ===")
+            log.info("=== 开始测试价格搜索功能 ===")
             
             # 检查系统数据
             if not hasattr(self, 'system_data'):
                 error_msg = "系统数据未初始化"
-                print(error_msg)
+                log.error(error_msg)
                 QMessageBox.critical(self, "测试失败", error_msg)
                 return
                 
-            print(f"系统数据键: {list(self.system_data.keys())}")
+            log.info("系统数据键: %s", list(self.system_data.keys()))
             
             if "categories" not in self.system_data:
                 error_msg = "系统数据中缺少categories字段"
-                print(error_msg)
+                log.error(error_msg)
                 QMessageBox.critical(self, "测试失败", error_msg)
                 return
                 
             categories = self.system_data.get('categories', {})
-            print(f"分类数据键: {list(categories.keys())}")
+            log.info("分类数据键: %s", list(categories.keys()))
             
             # 统计所有产品数量
             total_products = 0
@@ -5164,118 +6286,88 @@ class BoilerKnowledge(QMainWindow):
                             count_products(info["children"], current_path)
                         else:
                             total_products += 1
-                            print(f"检查产品: {' > '.join(current_path)}")
+                            log.debug("检查产品: %s", ' > '.join(current_path))
                             
                             if "pricing" in info:
-                                print(f"  有pricing字段")
+                                log.debug("  有pricing字段")
                                 if "base_price" in info["pricing"]:
                                     products_with_pricing += 1
                                     price = info["pricing"]["base_price"]
-                                    print(f"  找到有价格的产品: {' > '.join(current_path)} - 价格: {price}")
+                                    log.debug("  找到有价格的产品: %s - 价格: %s", ' > '.join(current_path), price)
                                     
                                     # 检查供应商信息
                                     if "suppliers" in info["pricing"] and info["pricing"]["suppliers"]:
                                         suppliers = info["pricing"]["suppliers"]
                                         products_with_suppliers += 1
-                                        print(f"  供应商数量: {len(suppliers)}")
+                                        log.debug("  供应商数量: %s", len(suppliers))
                                         for i, supplier in enumerate(suppliers):
-                                            print(f"    供应商{i+1}: {supplier.get('name', '未知')} - {supplier.get('price', '未知价格')}")
+                                            log.debug("    供应商%s: %s - %s", i+1, supplier.get('name', '未知'), supplier.get('price', '未知价格'))
                                     else:
-                                        print(f"  没有供应商信息")
+                                        log.debug("  没有供应商信息")
                                 else:
-                                    print(f"  有pricing字段但没有base_price")
+                                    log.debug("  有pricing字段但没有base_price")
                             else:
-                                print(f"  没有pricing字段")
+                                log.debug("  没有pricing字段")
                 except Exception as e:
-                    print(f"统计产品时出错: {e}")
+                    log.error("统计产品时出错: %s", e)
             
             count_products(categories)
             
             result_msg = f"系统统计:\n总产品数: {total_products}\n有价格信息的产品: {products_with_pricing}\n有供应商信息的产品: {products_with_suppliers}"
-            print(result_msg)
+            log.info(result_msg)
             QMessageBox.information(self, "价格搜索测试", result_msg)
             
         except Exception as e:
             error_msg = f"测试价格搜索失败: {str(e)}"
-            print(error_msg)
-            import traceback
-            traceback.print_exc()
+            log.exception(error_msg)
             QMessageBox.critical(self, "测试失败", error_msg)
 
     def select_price_search_result(self, item):
-        """选择价格搜索结果"""
+        """选择价格搜索结果（item 为结果表格中的模型索引）"""
         try:
-            # 获取选中的行
-            row = item.row()
-            if row >= 0:
-                # 获取供应商信息（注意列索引已调整）
-                supplier_item = self.price_search_results.item(row, 1)  # 供应商列
-                price_item = self.price_search_results.item(row, 2)     # 价格列
-                images_item = self.price_search_results.item(row, 5)    # 产品图片列
-                
-                if supplier_item and price_item:
-                    supplier_name = supplier_item.text()
-                    price = price_item.text()
-                    images_text = images_item.text() if images_item else "无图片"
-                    
-                    # 检查是否点击的是图片列
-                    if item.column() == 5 and images_text != "无图片":
-                        # 尝试获取产品图片路径并显示
-                        try:
-                            print(f"=== 處理圖片列雙擊 ===")
-                            print(f"行: {row}, 供應商: {supplier_name}, 價格: {price}")
-                            print(f"圖片文本: {images_text}")
-                            
-                            # 从存储的搜索结果中获取图片数据
-                            if hasattr(self, 'current_price_search_results') and row < len(self.current_price_search_results):
-                                result_data = self.current_price_search_results[row]
-                                product_images = result_data.get('product_images', [])
-                                print(f"從搜索結果獲取的圖片數據: {product_images}")
-                                print(f"圖片數量: {len(product_images)}")
-                                
-                                if product_images:
-                                    # 构建完整的图片路径列表
-                                    image_paths = []
-                                    missing_images = []
-                                    for img_filename in product_images:
-                                        img_path = os.path.join(self.images_dir, img_filename)
-                                        if os.path.exists(img_path):
-                                            image_paths.append(img_path)
-                                        else:
-                                            missing_images.append(img_filename)
-                                    
-                                    if image_paths:
-                                        # 显示图片查看器
-                                        dialog = ImageViewerDialog(image_paths, 0, self)
-                                        dialog.exec_()
-                                    else:
-                                        if missing_images:
-                                            QMessageBox.information(self, "产品图片", 
-                                                                  f"图片文件不存在:\n{', '.join(missing_images[:3])}\n供应商: {supplier_name}\n价格: {price}")
-                                        else:
-                                            QMessageBox.information(self, "产品图片", 
-                                                                  f"该产品没有图片\n供应商: {supplier_name}\n价格: {price}")
-                                else:
-                                    QMessageBox.information(self, "产品图片", 
-                                                          f"该产品没有图片\n供应商: {supplier_name}\n价格: {price}")
+            source_index = self.price_result_proxy.mapToSource(item)
+            result = self.price_result_model.result(source_index.row())
+            if result:
+                supplier_name = result.get('supplier_name', '')
+                price = f"{result.get('supplier_price', '')} {result.get('currency', '')}".strip()
+                product_images = result.get('product_images', [])
+                images_text = f"{len(product_images)}张图片" if product_images else "无图片"
+                
+                # 检查是否点击的是图片列
+                if source_index.column() == PriceResultModel.IMAGE_COLUMN and product_images:
+                    try:
+                        # 构建完整的图片路径列表
+                        image_paths = []
+                        missing_images = []
+                        for img_filename in product_images:
+                            img_path = self.image_path(img_filename)
+                            if os.path.exists(img_path):
+                                image_paths.append(img_path)
                             else:
-                                QMessageBox.information(self, "产品图片", 
-                                                      f"无法获取图片数据\n供应商: {supplier_name}\n价格: {price}")
-                        except Exception as img_error:
-                            print(f"显示产品图片失败: {img_error}")
-                            QMessageBox.information(self, "供应商信息", 
-                                                  f"显示图片时出错\n供应商: {supplier_name}\n价格: {price}\n错误: {str(img_error)}")
-                    else:
-                        # 显示选中信息
-                        info_msg = f"已选择供应商: {supplier_name}\n价格: {price}\n图片信息: {images_text}"
-                        QMessageBox.information(self, "供应商信息", info_msg)
-                    
-                    # 切换到价格管理标签页
-                    self.tab_widget.setCurrentIndex(2)  # 价格管理是第3个标签页（索引2）
+                                missing_images.append(img_filename)
+                        
+                        if image_paths:
+                            # 显示图片查看器
+                            dialog = ImageViewerDialog(image_paths, 0, self)
+                            dialog.exec_()
+                        else:
+                            QMessageBox.information(self, "产品图片", 
+                                                  f"图片文件不存在:\n{', '.join(missing_images[:3])}\n供应商: {supplier_name}\n价格: {price}")
+                    except Exception as img_error:
+                        log.error("显示产品图片失败: %s", img_error)
+                        QMessageBox.information(self, "供应商信息", 
+                                              f"显示图片时出错\n供应商: {supplier_name}\n价格: {price}\n错误: {str(img_error)}")
+                else:
+                    # 显示选中信息
+                    info_msg = f"已选择供应商: {supplier_name}\n价格: {price}\n图片信息: {images_text}"
+                    QMessageBox.information(self, "供应商信息", info_msg)
+                
+                # 切换到价格管理标签页
+                self.tab_widget.setCurrentIndex(2)  # 价格管理是第3个标签页（索引2）
             
         except Exception as e:
             error_msg = f"选择价格搜索结果失败: {str(e)}"
-            print(error_msg)
+            log.error(error_msg)
             QMessageBox.critical(self, "选择失败", error_msg)
     
     def sort_price_results_ascending(self):
@@ -5283,7 +6375,7 @@ class BoilerKnowledge(QMainWindow):
         try:
             self.sort_price_results(ascending=True)
         except Exception as e:
-            print(f"价格升序排序失败: {e}")
+            log.error("价格升序排序失败: %s", e)
             QMessageBox.critical(self, "排序失败", f"价格升序排序失败: {str(e)}")
     
     def sort_price_results_descending(self):
@@ -5291,45 +6383,29 @@ class BoilerKnowledge(QMainWindow):
         try:
             self.sort_price_results(ascending=False)
         except Exception as e:
-            print(f"价格降序排序失败: {e}")
+            log.error("价格降序排序失败: %s", e)
             QMessageBox.critical(self, "排序失败", f"价格降序排序失败: {str(e)}")
     
     def sort_price_results(self, ascending=True):
-        """排序价格搜索结果"""
+        """排序价格搜索结果：按价格，价格相同时按供货周期、供应商"""
         try:
-            if not hasattr(self, 'price_search_results'):
-                QMessageBox.warning(self, "警告", "搜索结果表格不存在！")
+            if self.price_query is not None:
+                # 全局搜索结果由价格索引按顺序分页，直接重新查询
+                self.price_query["descending"] = not ascending
+                self.show_price_page(0)
+                self.price_sort_btn.setText("按价格升序 ✓" if ascending else "按价格升序")
+                self.price_sort_desc_btn.setText("按价格降序 ✓" if not ascending else "按价格降序")
                 return
             
-            # 获取当前表格数据
-            rows = self.price_search_results.rowCount()
-            if rows == 0:
+            if self.price_result_model.rowCount() == 0:
                 QMessageBox.information(self, "提示", "没有搜索结果可排序！")
                 return
             
-            # 收集所有行数据
-            table_data = []
-            for row in range(rows):
-                row_data = []
-                for col in range(self.price_search_results.columnCount()):
-                    item = self.price_search_results.item(row, col)
-                    row_data.append(item.text() if item else "")
-                table_data.append(row_data)
-            
-            # 按价格列（第3列，索引2）排序
-            try:
-                table_data.sort(key=lambda x: float(x[2]) if x[2] and x[2].replace('.', '').replace('-', '').isdigit() else float('inf'), reverse=not ascending)
-            except (ValueError, IndexError):
-                QMessageBox.warning(self, "警告", "价格数据格式错误，无法排序！")
-                return
-            
-            # 重新填充表格
-            self.price_search_results.clearContents()
-            self.price_search_results.setRowCount(len(table_data))
-            
-            for row, row_data in enumerate(table_data):
-                for col, cell_data in enumerate(row_data):
-                    self.price_search_results.setItem(row, col, QTableWidgetItem(cell_data))
+            self.apply_price_sort([
+                (PriceResultModel.PRICE_COLUMN, ascending),
+                (PriceResultModel.LEAD_TIME_COLUMN, True),
+                (PriceResultModel.SUPPLIER_COLUMN, True),
+            ])
             
             # 更新排序按钮文本
             if ascending:
@@ -5343,10 +6419,28 @@ class BoilerKnowledge(QMainWindow):
             self.statusBar().showMessage(f"已按价格{'升序' if ascending else '降序'}排序完成", 3000)
             
         except Exception as e:
-            print(f"排序价格搜索结果时出错: {e}")
-            import traceback
-            traceback.print_exc()
+            log.exception("排序价格搜索结果时出错: %s", e)
             QMessageBox.critical(self, "排序失败", f"排序价格搜索结果时出错: {str(e)}")
+    
+    def sort_price_results_by_column(self, column):
+        """点击表头排序：再次点击同一列切换升降序，原来的排序键作为次要键保留"""
+        if column == PriceResultModel.IMAGE_COLUMN or self.price_result_model.rowCount() == 0:
+            return
+        ascending = True
+        if self.price_sort_keys and self.price_sort_keys[0][0] == column:
+            ascending = not self.price_sort_keys[0][1]
+        keys = [(column, ascending)] + [key for key in self.price_sort_keys if key[0] != column]
+        self.apply_price_sort(keys[:3])
+        self.price_sort_btn.setText("按价格升序")
+        self.price_sort_desc_btn.setText("按价格降序")
+    
+    def apply_price_sort(self, keys):
+        """按 [(列, 是否升序), ...] 对当前结果排序；只重排行，不重建单元格组件"""
+        self.price_sort_keys = keys
+        self.price_result_model.set_sort_keys(keys)
+        header = self.price_search_results.horizontalHeader()
+        header.setSortIndicatorShown(True)
+        header.setSortIndicator(keys[0][0], Qt.AscendingOrder if keys[0][1] else Qt.DescendingOrder)
             
     def create_basic_tab(self):
         """创建基本信息标签页"""
@@ -5370,27 +6464,9 @@ class BoilerKnowledge(QMainWindow):
         images_label = QLabel("设备图片:")
         layout.addWidget(images_label)
         
-        # 图片缩略图区域
-        self.images_scroll = QScrollArea()
-        self.images_widget = QWidget()
-        self.images_layout = QHBoxLayout()
-        
-        # 添加图片提示标签
-        self.image_thumbnail_label = QLabel("暂无图片")
-        self.image_thumbnail_label.setAlignment(Qt.AlignCenter)
-        self.image_thumbnail_label.setStyleSheet("color: gray; font-style: italic; padding: 20px;")
-        self.image_thumbnail_label.setMinimumHeight(80)
-        
-        # 先添加弹性空间，再添加标签，确保标签居中
-        self.images_layout.addStretch()
-        self.images_layout.addWidget(self.image_thumbnail_label)
-        self.images_layout.addStretch()
-        
-        self.images_widget.setLayout(self.images_layout)
-        self.images_scroll.setWidget(self.images_widget)
-        self.images_scroll.setWidgetResizable(True)
-        self.images_scroll.setMaximumHeight(120)
-        layout.addWidget(self.images_scroll)
+        # 图片缩略图区域：只绘制可见的缩略图，切换设备时重用同一个模型
+        self.images_gallery = ThumbnailGallery(self.image_loader, "images", "暂无图片", self.delete_image_callback)
+        layout.addWidget(self.images_gallery)
         
         # 图片操作按钮
         images_btn_layout = QHBoxLayout()
@@ -5400,10 +6476,13 @@ class BoilerKnowledge(QMainWindow):
         self.save_image_btn.clicked.connect(self.save_image)
         self.manage_images_btn = QPushButton("管理图片")
         self.manage_images_btn.clicked.connect(self.manage_images)
+        self.verify_images_btn = QPushButton("检查图片存储")
+        self.verify_images_btn.clicked.connect(self.verify_and_repair_image_references)
         
         images_btn_layout.addWidget(self.insert_image_btn)
         images_btn_layout.addWidget(self.save_image_btn)
         images_btn_layout.addWidget(self.manage_images_btn)
+        images_btn_layout.addWidget(self.verify_images_btn)
         layout.addLayout(images_btn_layout)
         
         # 原理图片管理区域
@@ -5411,26 +6490,9 @@ class BoilerKnowledge(QMainWindow):
         layout.addWidget(principle_images_label)
         
         # 原理图片缩略图区域
-        self.principle_images_scroll = QScrollArea()
-        self.principle_images_widget = QWidget()
-        self.principle_images_layout = QHBoxLayout()
-        
-        # 添加原理图片提示标签
-        self.principle_image_thumbnail_label = QLabel("暂无原理图片")
-        self.principle_image_thumbnail_label.setAlignment(Qt.AlignCenter)
-        self.principle_image_thumbnail_label.setStyleSheet("color: gray; font-style: italic; padding: 20px;")
-        self.principle_image_thumbnail_label.setMinimumHeight(80)
-        
-        # 先添加弹性空间，再添加标签，确保标签居中
-        self.principle_images_layout.addStretch()
-        self.principle_images_layout.addWidget(self.principle_image_thumbnail_label)
-        self.principle_images_layout.addStretch()
-        
-        self.principle_images_widget.setLayout(self.principle_images_layout)
-        self.principle_images_scroll.setWidget(self.principle_images_widget)
-        self.principle_images_scroll.setWidgetResizable(True)
-        self.principle_images_scroll.setMaximumHeight(120)
-        layout.addWidget(self.principle_images_scroll)
+        self.principle_images_gallery = ThumbnailGallery(self.image_loader, "principle_images", "暂无原理图片",
+                                                         self.delete_principle_image_callback)
+        layout.addWidget(self.principle_images_gallery)
         
         # 原理图片操作按钮
         principle_images_btn_layout = QHBoxLayout()
@@ -5531,10 +6593,17 @@ class BoilerKnowledge(QMainWindow):
         self.search_price_btn = QPushButton("搜索")
         self.search_price_btn.clicked.connect(self.search_by_price_range)
         
+        # 搜索范围：当前产品或全部设备（全部设备时可按币种过滤）
+        self.price_scope_all = QCheckBox("全部设备")
+        self.price_currency_filter = QComboBox()
+        self.price_currency_filter.addItem("全部币种")
+        
         search_layout.addWidget(min_price_label)
         search_layout.addWidget(self.min_price_edit)
         search_layout.addWidget(max_price_label)
         search_layout.addWidget(self.max_price_edit)
+        search_layout.addWidget(self.price_scope_all)
+        search_layout.addWidget(self.price_currency_filter)
         search_layout.addWidget(self.search_price_btn)
         layout.addLayout(search_layout)
         
@@ -5542,9 +6611,20 @@ class BoilerKnowledge(QMainWindow):
         results_label = QLabel("搜索结果:")
         layout.addWidget(results_label)
         
-        self.price_search_results = QTableWidget()
-        self.price_search_results.setColumnCount(6)
-        self.price_search_results.setHorizontalHeaderLabels(["型号", "供应商", "价格", "供货周期", "联系方式", "产品图片"])
+        # 结果保存在模型中，排序由代理模型完成，缩略图组件随行移动
+        self.price_result_model = PriceResultModel(self)
+        self.price_result_proxy = QSortFilterProxyModel(self)
+        self.price_result_proxy.setSourceModel(self.price_result_model)
+        self.price_result_proxy.setSortRole(PriceResultModel.SORT_ROLE)
+        self.price_result_proxy.setDynamicSortFilter(True)
+        self.price_result_proxy.sort(0, Qt.AscendingOrder)
+        self.price_sort_keys = []
+        self.price_search_results = QTableView()
+        self.price_search_results.setModel(self.price_result_proxy)
+        self.price_search_results.setSelectionBehavior(QAbstractItemView.SelectRows)
+        self.price_search_results.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        self.price_search_results.horizontalHeader().setSectionsClickable(True)
+        self.price_search_results.horizontalHeader().sectionClicked.connect(self.sort_price_results_by_column)
         self.price_search_results.setColumnWidth(4, 200)  # 联系方式列宽
         self.price_search_results.setColumnWidth(5, 160)  # 产品图片列宽
         self.price_search_results.verticalHeader().setDefaultSectionSize(60)  # 设置默认行高
@@ -5558,8 +6638,21 @@ class BoilerKnowledge(QMainWindow):
         self.price_sort_desc_btn = QPushButton("按价格降序")
         self.price_sort_desc_btn.clicked.connect(self.sort_price_results_descending)
         
+        # 全部设备搜索结果分页
+        self.price_prev_page_btn = QPushButton("上一页")
+        self.price_prev_page_btn.clicked.connect(lambda: self.show_price_page(self.price_query["offset"] - self.price_page_size))
+        self.price_next_page_btn = QPushButton("下一页")
+        self.price_next_page_btn.clicked.connect(lambda: self.show_price_page(self.price_query["offset"] + self.price_page_size))
+        self.price_page_label = QLabel("")
+        self.price_prev_page_btn.setEnabled(False)
+        self.price_next_page_btn.setEnabled(False)
+        
         results_btn_layout.addWidget(self.price_sort_btn)
         results_btn_layout.addWidget(self.price_sort_desc_btn)
+        results_btn_layout.addStretch()
+        results_btn_layout.addWidget(self.price_prev_page_btn)
+        results_btn_layout.addWidget(self.price_page_label)
+        results_btn_layout.addWidget(self.price_next_page_btn)
         layout.addLayout(results_btn_layout)
         
         self.price_tab.setLayout(layout)
@@ -5644,15 +6737,9 @@ class BoilerKnowledge(QMainWindow):
         right_parts_layout.addWidget(part_principle_images_label)
         
         # 原理图片缩略图区域
-        self.part_principle_images_scroll = QScrollArea()
-        self.part_principle_images_widget = QWidget()
-        self.part_principle_images_layout = QHBoxLayout()
-        self.part_principle_images_layout.addStretch()
-        self.part_principle_images_widget.setLayout(self.part_principle_images_layout)
-        self.part_principle_images_scroll.setWidget(self.part_principle_images_widget)
-        self.part_principle_images_scroll.setWidgetResizable(True)
-        self.part_principle_images_scroll.setMaximumHeight(120)
-        right_parts_layout.addWidget(self.part_principle_images_scroll)
+        self.part_principle_images_gallery = ThumbnailGallery(self.image_loader, "part_principle_images", "暂无原理图片",
+                                                              self.delete_part_principle_image_callback)
+        right_parts_layout.addWidget(self.part_principle_images_gallery)
         
         # 原理图片操作按钮
         part_principle_images_btn_layout = QHBoxLayout()
@@ -5703,7 +6790,7 @@ class BoilerKnowledge(QMainWindow):
             menu.exec_(self.parts_list.mapToGlobal(position))
             
         except Exception as e:
-            print(f"显示零部件右键菜单失败: {e}")
+            log.error("显示零部件右键菜单失败: %s", e)
     
     def delete_part_from_context(self, item):
         """从右键菜单删除零部件"""
@@ -5742,7 +6829,7 @@ class BoilerKnowledge(QMainWindow):
                         break
                 
                 # 保存数据
-                self.save_data()
+                self.save_current_item()
                 
                 # 重新加载零部件列表
                 self.load_parts_list(current_data)
@@ -5753,7 +6840,7 @@ class BoilerKnowledge(QMainWindow):
                 QMessageBox.information(self, "成功", f"零部件 '{part_name}' 已删除！")
                 
         except Exception as e:
-            print(f"删除零部件失败: {e}")
+            log.error("删除零部件失败: %s", e)
             QMessageBox.critical(self, "错误", f"删除零部件失败: {e}")
     
     def rename_part_from_context(self, item):
@@ -5802,7 +6889,7 @@ class BoilerKnowledge(QMainWindow):
                         break
                 
                 # 保存数据
-                self.save_data()
+                self.save_current_item()
                 
                 # 重新加载零部件列表
                 self.load_parts_list(current_data)
@@ -5814,48 +6901,60 @@ class BoilerKnowledge(QMainWindow):
                 QMessageBox.information(self, "成功", f"零部件已重命名为 '{new_name}'！")
                 
         except Exception as e:
-            print(f"重命名零部件失败: {e}")
+            log.error("重命名零部件失败: %s", e)
             QMessageBox.critical(self, "错误", f"重命名零部件失败: {e}")
     
     def load_part_details(self, item):
         """加载零部件详情"""
         try:
+            # 先写入上一个零部件尚未保存的编辑
+            self.autosave.flush()
             part_name = item.text()
             
             # 检查当前项目是否存在
             if not hasattr(self, 'current_item') or not self.current_item:
-                print("当前项目不存在，无法加载零部件详情")
+                log.warning("当前项目不存在，无法加载零部件详情")
                 return
             
             # 检查方法是否存在
             if not hasattr(self, 'get_current_item_data'):
-                print("系统错误：无法获取当前项目数据方法！")
+                log.error("系统错误：无法获取当前项目数据方法！")
                 return
                 
             current_data = self.get_current_item_data()
             if not current_data or "parts" not in current_data:
-                print("无法获取当前项目数据或parts字段不存在")
+                log.warning("无法获取当前项目数据或parts字段不存在")
                 return
             
             # 查找对应的零部件
             for part in current_data["parts"]:
                 if part.get("name") == part_name:
                     # 加载零部件信息
-                    self.part_name_edit.setText(part.get("name", ""))
-                    self.part_description.setPlainText(part.get("description", ""))
+                    self._loading_part = True
+                    try:
+                        self.part_name_edit.setText(part.get("name", ""))
+                        self.part_description.setPlainText(part.get("description", ""))
+                    finally:
+                        self._loading_part = False
                     
                     # 加载原理图片
                     self.load_part_principle_images(part.get("principle_images", []))
                     break
         except Exception as e:
-            print(f"加载零部件详情失败: {e}")
+            log.error("加载零部件详情失败: %s", e)
     
     def clear_part_details(self):
         """清空零部件详情"""
-        self.part_name_edit.clear()
-        self.part_description.clear()
+        self.autosave.flush()
+        self._loading_part = True
+        try:
+            self.part_name_edit.clear()
+            self.part_description.clear()
+        finally:
+            self._loading_part = False
         self.clear_part_principle_images()
     
+    @perf_stats.timed("load_parts_list")
     def load_parts_list(self, data):
         """加载零部件列表"""
         try:
@@ -5864,65 +6963,23 @@ class BoilerKnowledge(QMainWindow):
             for part in parts:
                 self.parts_list.addItem(part.get("name", "未命名"))
         except Exception as e:
-            print(f"加载零部件列表失败: {e}")
+            log.error("加载零部件列表失败: %s", e)
     
     def load_part_principle_images(self, images):
         """加载零部件原理图片"""
         try:
-            # 清空现有图片
-            self.clear_part_principle_images()
-            
-            if not images:
-                # 显示提示标签
-                no_images_label = QLabel("暂无原理图片")
-                no_images_label.setStyleSheet("color: #999; font-style: italic; padding: 20px;")
-                no_images_label.setAlignment(Qt.AlignCenter)
-                no_images_label.setMinimumHeight(80)
-                
-                # 先添加弹性空间，再添加标签，确保标签居中
-                self.part_principle_images_layout.addStretch()
-                self.part_principle_images_layout.addWidget(no_images_label)
-                self.part_principle_images_layout.addStretch()
-                
-                print("显示原理图片提示标签：暂无原理图片")
-                return
-            
-            print(f"开始載入零部件原理圖片縮略圖，圖片數量: {len(images)}")
-            
-            for i, image_path in enumerate(images):
-                try:
-                    # 创建缩略图控件
-                    thumbnail = ImageThumbnailWidget(
-                        image_path, 
-                        images, 
-                        i, 
-                        self, 
-                        self.delete_part_principle_image_callback
-                    )
-                    self.part_principle_images_layout.addWidget(thumbnail)
-                except Exception as e:
-                    print(f"加载零部件原理图片缩略图失败 {image_path}: {e}")
-            
-            # 添加弹性空间
-            spacer = QSpacerItem(40, 20, QSizePolicy.Expanding, QSizePolicy.Minimum)
-            self.part_principle_images_layout.addItem(spacer)
-            print("已添加原理图片弹性空间")
-            
-            print("零部件原理圖片縮略圖載入完成")
-            
+            self.part_principle_images_gallery.set_images([self.image_path(image) for image in images or []],
+                                                          "暂无原理图片")
+            log.debug("零部件原理圖片縮略圖載入完成，圖片數量: %s", len(images) if images else 0)
         except Exception as e:
-            print(f"加载零部件原理图片失败: {e}")
+            log.error("加载零部件原理图片失败: %s", e)
     
     def clear_part_principle_images(self):
         """清空零部件原理图片"""
         try:
-            # 清空布局中的所有控件
-            while self.part_principle_images_layout.count():
-                child = self.part_principle_images_layout.takeAt(0)
-                if child.widget():
-                    child.widget().deleteLater()
+            self.part_principle_images_gallery.set_images([])
         except Exception as e:
-            print(f"清空零部件原理图片失败: {e}")
+            log.error("清空零部件原理图片失败: %s", e)
     
     def insert_part_principle_image(self):
         """插入零部件原理图片"""
@@ -5936,7 +6993,7 @@ class BoilerKnowledge(QMainWindow):
             if file_path:
                 self.save_part_principle_image(file_path)
         except Exception as e:
-            print(f"插入零部件原理图片失败: {e}")
+            log.error("插入零部件原理图片失败: %s", e)
             QMessageBox.critical(self, "错误", f"插入零部件原理图片失败: {str(e)}")
     
     def save_part_principle_image(self, source_path=None):
@@ -5982,20 +7039,14 @@ class BoilerKnowledge(QMainWindow):
             if "principle_images" not in target_part:
                 target_part["principle_images"] = []
             
-            # 生成目标文件名
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            file_extension = os.path.splitext(source_path)[1]
-            target_filename = f"part_principle_{timestamp}{file_extension}"
-            target_path = os.path.join(self.images_dir, target_filename)
-            
-            # 复制文件
-            shutil.copy2(source_path, target_path)
+            # 按内容哈希存入图片存储
+            image_name = self.store_image(source_path)
             
             # 添加到数据
-            target_part["principle_images"].append(target_path)
+            target_part["principle_images"].append(image_name)
             
             # 保存数据
-            self.save_data()
+            self.save_current_item()
             
             # 重新加载图片
             self.load_part_principle_images(target_part.get("principle_images", []))
@@ -6003,7 +7054,7 @@ class BoilerKnowledge(QMainWindow):
             QMessageBox.information(self, "成功", "零部件原理图片保存成功！")
             
         except Exception as e:
-            print(f"保存零部件原理图片失败: {e}")
+            log.error("保存零部件原理图片失败: %s", e)
             QMessageBox.critical(self, "错误", f"保存零部件原理图片失败: {str(e)}")
     
     def manage_part_principle_images(self):
@@ -6060,7 +7111,7 @@ class BoilerKnowledge(QMainWindow):
             dialog.exec_()
             
         except Exception as e:
-            print(f"管理零部件原理图片失败: {e}")
+            log.error("管理零部件原理图片失败: %s", e)
             QMessageBox.critical(self, "错误", f"管理零部件原理图片失败: {str(e)}")
     
     def delete_selected_part_principle_image(self, list_widget, data, dialog):
@@ -6068,17 +7119,14 @@ class BoilerKnowledge(QMainWindow):
         try:
             current_row = list_widget.currentRow()
             if current_row >= 0 and current_row < len(data):
-                image_path = data[current_row]
+                image_name = data[current_row]
                 
-                # 从数据中移除
+                # 从数据中移除，没有其他引用时删除文件
                 data.pop(current_row)
-                
-                # 删除文件
-                if os.path.exists(image_path):
-                    os.remove(image_path)
+                self.release_image(image_name)
                 
                 # 保存数据
-                self.save_data()
+                self.save_current_item()
                 
                 # 刷新对话框
                 dialog.load_images(data)
@@ -6088,7 +7136,7 @@ class BoilerKnowledge(QMainWindow):
                 QMessageBox.warning(dialog, "警告", "请先选择要删除的图片！")
                 
         except Exception as e:
-            print(f"删除零部件原理图片失败: {e}")
+            log.error("删除零部件原理图片失败: %s", e)
             QMessageBox.critical(dialog, "错误", f"删除零部件原理图片失败: {str(e)}")
     
     def batch_delete_part_principle_images(self, list_widget, data, dialog, target_part):
@@ -6122,18 +7170,15 @@ class BoilerKnowledge(QMainWindow):
                 deleted_count = 0
                 for row in selected_rows:
                     if row < len(data):
-                        image_path = data[row]
+                        image_name = data[row]
                         
-                        # 从数据中移除
+                        # 从数据中移除，没有其他引用时删除文件
                         data.pop(row)
-                        
-                        # 删除文件
-                        if os.path.exists(image_path):
-                            os.remove(image_path)
-                            deleted_count += 1
+                        self.release_image(image_name)
+                        deleted_count += 1
                 
                 # 保存数据
-                self.save_data()
+                self.save_current_item()
                 
                 # 刷新对话框
                 dialog.load_images(data)
@@ -6144,7 +7189,7 @@ class BoilerKnowledge(QMainWindow):
                 QMessageBox.information(dialog, "成功", f"成功删除 {deleted_count} 张零部件原理图片！")
                 
         except Exception as e:
-            print(f"批量删除零部件原理图片失败: {e}")
+            log.error("批量删除零部件原理图片失败: %s", e)
             QMessageBox.critical(dialog, "错误", f"批量删除零部件原理图片失败: {str(e)}")
     
     def delete_part_principle_image_callback(self, image_path, current_index):
@@ -6152,24 +7197,24 @@ class BoilerKnowledge(QMainWindow):
         try:
             current_item = self.parts_list.currentItem()
             if not current_item:
-                print("未选择零部件，无法删除图片")
+                log.warning("未选择零部件，无法删除图片")
                 return
             
             part_name = current_item.text()
             
             # 检查当前项目是否存在
             if not hasattr(self, 'current_item') or not self.current_item:
-                print("当前项目不存在，无法删除图片")
+                log.warning("当前项目不存在，无法删除图片")
                 return
             
             # 检查方法是否存在
             if not hasattr(self, 'get_current_item_data'):
-                print("系统错误：无法获取当前项目数据方法！")
+                log.error("系统错误：无法获取当前项目数据方法！")
                 return
                 
             current_data = self.get_current_item_data()
             if not current_data or "parts" not in current_data:
-                print("无法获取当前项目数据或parts字段不存在")
+                log.warning("无法获取当前项目数据或parts字段不存在")
                 return
             
             # 查找对应的零部件
@@ -6183,16 +7228,12 @@ class BoilerKnowledge(QMainWindow):
                 return
             
             images = target_part.get("principle_images", [])
-            if current_index < len(images) and images[current_index] == image_path:
-                # 从数据中移除
-                images.pop(current_index)
-                
-                # 删除文件
-                if os.path.exists(image_path):
-                    os.remove(image_path)
+            if current_index < len(images) and self.image_path(images[current_index]) == image_path:
+                # 从数据中移除，没有其他引用时删除文件
+                self.release_image(images.pop(current_index))
                 
                 # 保存数据
-                self.save_data()
+                self.save_current_item()
                 
                 # 重新加载图片
                 self.load_part_principle_images(images)
@@ -6200,7 +7241,7 @@ class BoilerKnowledge(QMainWindow):
                 QMessageBox.information(self, "成功", "零部件原理图片删除成功！")
                 
         except Exception as e:
-            print(f"删除零部件原理图片失败: {e}")
+            log.error("删除零部件原理图片失败: %s", e)
             QMessageBox.critical(self, "错误", f"删除零部件原理图片失败: {str(e)}")
     
     def add_part(self):
@@ -6242,7 +7283,7 @@ class BoilerKnowledge(QMainWindow):
                 current_data["parts"].append(new_part)
                 
                 # 保存数据
-                self.save_data()
+                self.save_current_item()
                 
                 # 重新加载零部件列表
                 self.load_parts_list(current_data)
@@ -6257,7 +7298,7 @@ class BoilerKnowledge(QMainWindow):
                 QMessageBox.information(self, "成功", "零部件添加成功！")
                 
         except Exception as e:
-            print(f"添加零部件失败: {e}")
+            log.error("添加零部件失败: %s", e)
             QMessageBox.critical(self, "错误", f"添加零部件失败: {str(e)}")
     
     def delete_part(self):
@@ -6298,17 +7339,14 @@ class BoilerKnowledge(QMainWindow):
                 # 查找并删除零部件
                 for i, part in enumerate(current_data["parts"]):
                     if part.get("name") == part_name:
-                        # 删除相关的原理图片文件
-                        for image_path in part.get("principle_images", []):
-                            if os.path.exists(image_path):
-                                os.remove(image_path)
-                        
-                        # 从数据中移除
+                        # 从数据中移除，再释放相关的原理图片（没有其他引用时删除文件）
                         current_data["parts"].pop(i)
+                        for image_name in part.get("principle_images", []):
+                            self.release_image(image_name)
                         break
                 
                 # 保存数据
-                self.save_data()
+                self.save_current_item()
                 
                 # 重新加载零部件列表
                 self.load_parts_list(current_data)
@@ -6319,60 +7357,43 @@ class BoilerKnowledge(QMainWindow):
                 QMessageBox.information(self, "成功", "零部件删除成功！")
                 
         except Exception as e:
-            print(f"删除零部件失败: {e}")
+            log.error("删除零部件失败: %s", e)
             QMessageBox.critical(self, "错误", f"删除零部件失败: {str(e)}")
     
     def setup_parts_auto_save(self):
         """设置零部件自动保存"""
-        # 创建定时器
-        self.part_name_timer = QTimer()
-        self.part_name_timer.setSingleShot(True)
-        self.part_name_timer.timeout.connect(self.auto_save_part_name)
-        
-        self.part_description_timer = QTimer()
-        self.part_description_timer.setSingleShot(True)
-        self.part_description_timer.timeout.connect(self.auto_save_part_description)
-        
-        # 连接信号
+        # 连接信号，写入由自动保存调度器在空闲后统一完成
         self.part_name_edit.textChanged.connect(self.auto_save_part_name)
         self.part_description.textChanged.connect(self.auto_save_part_description)
     
+    def mark_part_autosave(self, field_name):
+        """标记当前零部件的字段需要自动保存"""
+        # 加载或清空零部件详情时的文本变化不是用户编辑
+        if getattr(self, '_loading_part', False):
+            return
+        current_item = self.parts_list.currentItem()
+        if not current_item:
+            return
+        # 记录标记时的零部件名称，写入时据此定位零部件，不受之后选中项变化影响
+        self.mark_autosave((field_name, current_item.text()))
+    
     def auto_save_part_name(self):
         """自动保存零部件名称"""
-        self.part_name_timer.start(1000)  # 1秒后保存
-        self.save_part_name()
+        self.mark_part_autosave("part_name")
     
     def auto_save_part_description(self):
         """自动保存零部件描述"""
-        self.part_description_timer.start(1000)  # 1秒后保存
-        self.save_part_description()
+        self.mark_part_autosave("part_description")
     
-    def save_part_name(self):
-        """保存零部件名称"""
+    def update_part_name(self, current_data, part_name):
+        """把零部件名称编辑框的内容写回数据（由自动保存调度器调用）"""
         try:
-            current_item = self.parts_list.currentItem()
-            if not current_item:
-                return
-            
-            part_name = current_item.text()
             new_name = self.part_name_edit.text().strip()
-            
-            if not new_name:
-                return
-            
-            # 检查当前项目是否存在
-            if not hasattr(self, 'current_item') or not self.current_item:
-                print("当前项目不存在，无法保存零部件名称")
+            if not new_name or new_name == part_name:
                 return
             
-            # 检查方法是否存在
-            if not hasattr(self, 'get_current_item_data'):
-                print("系统错误：无法获取当前项目数据方法！")
-                return
-                
-            current_data = self.get_current_item_data()
-            if not current_data or "parts" not in current_data:
-                print("无法获取当前项目数据或parts字段不存在")
+            if "parts" not in current_data:
+                log.warning("parts字段不存在，无法保存零部件名称")
                 return
             
             # 查找并更新零部件名称
@@ -6380,58 +7401,37 @@ class BoilerKnowledge(QMainWindow):
                 if part.get("name") == part_name:
                     part["name"] = new_name
                     break
+            else:
+                return
             
-            # 保存数据
-            self.save_data()
-            
-            # 重新加载零部件列表
-            self.load_parts_list(current_data)
-            
-            # 选择更新后的零部件
+            # 就地更新列表项文字，不重建列表，以免打断用户正在进行的选择
             for i in range(self.parts_list.count()):
-                if self.parts_list.item(i).text() == new_name:
-                    self.parts_list.setCurrentRow(i)
+                list_item = self.parts_list.item(i)
+                if list_item.text() == part_name:
+                    list_item.setText(new_name)
                     break
                     
         except Exception as e:
-            print(f"保存零部件名称失败: {e}")
+            log.error("保存零部件名称失败: %s", e)
     
-    def save_part_description(self):
-        """保存零部件描述"""
+    def update_part_description(self, current_data, part_name):
+        """把零部件描述编辑框的内容写回数据（由自动保存调度器调用）"""
         try:
-            current_item = self.parts_list.currentItem()
-            if not current_item:
-                return
-            
-            part_name = current_item.text()
             new_description = self.part_description.toPlainText()
             
-            # 检查当前项目是否存在
-            if not hasattr(self, 'current_item') or not self.current_item:
-                print("当前项目不存在，无法保存零部件描述")
-                return
-            
-            # 检查方法是否存在
-            if not hasattr(self, 'get_current_item_data'):
-                print("系统错误：无法获取当前项目数据方法！")
-                return
-                
-            current_data = self.get_current_item_data()
-            if not current_data or "parts" not in current_data:
-                print("无法获取当前项目数据或parts字段不存在")
+            if "parts" not in current_data:
+                log.warning("parts字段不存在，无法保存零部件描述")
                 return
             
-            # 查找并更新零部件描述
+            # 名称和描述在同一次写入中保存时，名称可能已经被更新
+            new_name = self.part_name_edit.text().strip()
             for part in current_data["parts"]:
-                if part.get("name") == part_name:
+                if part.get("name") in (part_name, new_name):
                     part["description"] = new_description
                     break
-            
-            # 保存数据
-            self.save_data()
                     
         except Exception as e:
-            print(f"保存零部件描述失败: {e}")
+            log.error("保存零部件描述失败: %s", e)
             
 if __name__ == "__main__":
     try:
@@ -6450,7 +7450,5 @@ if __name__ == "__main__":
         # 運行應用程序
         sys.exit(app.exec_())
     except Exception as e:
-        print(f"程序啟動失敗: {e}")
-        import traceback
-        traceback.print_exc()
+        log.exception("程序啟動失敗: %s", e)
         input("按任意鍵退出...")
\ No newline at end of file
@@ -0,0 +1,23 @@
+import os
+import sys
+
+import pytest
+
+# 各模块位于 HUIDI/ 中，按模块名相互导入
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "HUIDI"))
+
+from benchmark_suite import generate_catalogue  # noqa: E402
+from node_index import NodeIndex  # noqa: E402
+
+
+@pytest.fixture
+def catalogue():
+    """固定种子生成的知识库数据（约 2000 个节点）"""
+    return generate_catalogue(2000, seed=0)
+
+
+@pytest.fixture
+def node_index(catalogue):
+    index = NodeIndex()
+    index.rebuild(catalogue["categories"])
+    return index
@@ -0,0 +1,67 @@
+import logging
+
+import app_log
+
+
+def test_ring_buffer_respects_level():
+    logger = app_log.get_logger("test")
+    handler = app_log.RingBufferHandler(capacity=3)
+    logger.addHandler(handler)
+    old_level = logger.level
+    logger.setLevel(logging.INFO)
+    try:
+        calls = []
+
+        class Expensive:
+            def __str__(self):
+                calls.append(1)
+                return "展开"
+
+        logger.debug("调试 %s", Expensive())
+        assert handler.since()[1] == []
+        assert calls == []
+
+        for i in range(5):
+            logger.info("信息 %d", i)
+        sequence, records = handler.since()
+        assert sequence == 5
+        assert [record[4] for record in records] == ["信息 2", "信息 3", "信息 4"]
+        assert handler.since(4)[1][0][4] == "信息 4"
+        assert handler.since(level=logging.WARNING)[1] == []
+    finally:
+        logger.removeHandler(handler)
+        logger.setLevel(old_level)
+
+
+def test_exception_is_recorded():
+    logger = app_log.get_logger("test")
+    handler = app_log.RingBufferHandler()
+    logger.addHandler(handler)
+    try:
+        try:
+            raise ValueError("出错了")
+        except ValueError:
+            logger.exception("处理失败")
+        message = handler.since()[1][0][4]
+        assert message.startswith("处理失败") and "ValueError: 出错了" in message
+    finally:
+        logger.removeHandler(handler)
+
+
+def test_invalid_level_falls_back_to_info(monkeypatch):
+    logger = app_log.get_logger()
+    handlers, level = logger.handlers[:], logger.level
+    monkeypatch.setattr(app_log, "_ring", None)
+    monkeypatch.setenv("BOILER_LOG_LEVEL", "VERBOSE")
+    try:
+        ring = app_log.setup(console_level=logging.CRITICAL)
+        assert logger.level == logging.INFO
+        assert "VERBOSE" in ring.since(level=logging.WARNING)[1][0][4]
+
+        app_log.set_level("debug")
+        assert logger.level == logging.DEBUG
+        app_log.set_level("详细")
+        assert logger.level == logging.DEBUG
+    finally:
+        logger.handlers[:] = handlers
+        logger.setLevel(level)
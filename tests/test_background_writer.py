@@ -0,0 +1,49 @@
+import json
+import random
+
+from background_writer import BackgroundWriter
+from journal_store import JournalStore
+
+
+def test_no_lost_edits(tmp_path):
+    """快速连续提交（队列很小、合并阈值很小）后重新加载，数据与内存一致"""
+    data_file = str(tmp_path / "system_data.json")
+    store = JournalStore(data_file, compact_threshold=2 * 1024)
+    system_data = {"categories": {"锅炉系统": {"children": {}}}, "tags": {}, "suppliers": {}}
+    children = system_data["categories"]["锅炉系统"]["children"]
+    writer = BackgroundWriter(maxsize=8)
+    writer.submit("快照", store.write_snapshot_text, store.encode_snapshot(system_data))
+
+    rng = random.Random(0)
+    for i in range(3000):
+        name = f"设备{rng.randrange(200)}"
+        node = children.setdefault(name, {"content": "", "tags": []})
+        node["content"] = f"第 {i} 次编辑"
+        if i % 97 == 0:
+            # 偶尔重写整个快照，检查与日志之间的顺序
+            writer.submit("快照", store.write_snapshot_text, store.encode_snapshot(system_data))
+        else:
+            payload = store.encode_records([{"op": "set", "path": ["锅炉系统", name], "value": node}])
+            writer.submit(name, store.append_encoded, payload, 1)
+    writer.close()
+    store.close()
+
+    assert writer.failed == 0
+    assert writer.completed == writer.submitted
+    assert store.compactions > 0
+    loaded = JournalStore(data_file).load()
+    assert json.dumps(loaded, sort_keys=True) == json.dumps(system_data, sort_keys=True)
+
+
+def test_failures_are_reported():
+    results = []
+    writer = BackgroundWriter(on_result=lambda ok, label, error: results.append((ok, label)))
+
+    def fail():
+        raise OSError("磁盘已满")
+
+    writer.submit("失败", fail)
+    writer.submit("成功", lambda: None)
+    writer.close()
+    assert results == [(False, "失败"), (True, "成功")]
+    assert writer.failed == 1
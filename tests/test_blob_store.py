@@ -0,0 +1,82 @@
+import os
+
+from blob_store import BlobStore, is_blob, image_refs
+
+
+def _source(folder, name, data):
+    path = os.path.join(folder, name)
+    with open(path, "wb") as f:
+        f.write(data)
+    return path
+
+
+def test_same_content_is_stored_once(tmp_path):
+    store = BlobStore(str(tmp_path / "images"))
+    first = store.put(_source(tmp_path, "a.JPEG", b"\xff\xd8same"))
+    second = store.put(_source(tmp_path, "b.jpg", b"\xff\xd8same"))
+    assert first == second
+    assert is_blob(first) and first.endswith(".jpg")
+    assert os.path.isfile(store.path(first))
+    assert store.stored == 1 and store.deduplicated == 1
+
+
+def test_meta_keeps_first_original_name(tmp_path):
+    store = BlobStore(str(tmp_path / "images"))
+    name = store.put(_source(tmp_path, "a.jpg", b"\xff\xd8same"))
+    store.write_meta(name, {"original_name": "a.jpg", "bytes": 6})
+    store.put(_source(tmp_path, "b.jpg", b"\xff\xd8same"))
+    store.write_meta(name, {"original_name": "b.jpg", "bytes": 6})
+    store.write_meta(name, {"original_name": "a.jpg", "bytes": 6})
+    assert store.read_meta(name) == {"original_name": "a.jpg", "original_names": ["a.jpg", "b.jpg"], "bytes": 6}
+
+
+def test_release_deletes_after_last_reference(tmp_path):
+    store = BlobStore(str(tmp_path / "images"))
+    name = store.put(_source(tmp_path, "a.jpg", b"\xff\xd8data"))
+    store.write_meta(name, {"original_name": "a.jpg"})
+    store.recount([name, name])
+
+    assert store.release(name) is False
+    assert os.path.isfile(store.path(name))
+    assert store.release(name) is True
+    assert not os.path.exists(store.path(name))
+    assert not os.path.exists(store.meta_path(name))
+
+
+def test_release_counts_from_references(tmp_path):
+    store = BlobStore(str(tmp_path / "images"))
+    name = store.put(_source(tmp_path, "a.jpg", b"\xff\xd8data"))
+    device = {"images": [name], "pricing": {"suppliers": [{"images": [name]}]}}
+    assert sorted(image_refs(device)) == [name, name]
+
+    # 引用计数尚未建立，由删除后剩下的引用统计
+    assert store.release(name, references=lambda: [name]) is False
+    assert store.ref_count(name) == 1
+    assert store.release(name) is True
+
+
+def test_held_references_survive_recount(tmp_path):
+    store = BlobStore(str(tmp_path / "images"))
+    name = store.put(_source(tmp_path, "a.jpg", b"\xff\xd8held"), hold=True)
+    assert store.held() == [name]
+
+    # 数据中的引用被删除，导入中的引用仍然保留文件
+    store.recount([name])
+    assert store.ref_count(name) == 2
+    assert store.release(name) is False
+    assert os.path.isfile(store.path(name))
+
+    # 放弃导入时释放最后一个引用
+    assert store.discard(name) is True
+    assert store.held() == []
+    assert not os.path.exists(store.path(name))
+
+
+def test_unhold_keeps_file(tmp_path):
+    store = BlobStore(str(tmp_path / "images"))
+    name = store.put(_source(tmp_path, "a.jpg", b"\xff\xd8kept"), hold=True)
+    store.unhold(name)
+    store.recount([name])
+    assert store.held() == []
+    assert store.ref_count(name) == 1
+    assert os.path.isfile(store.path(name))
@@ -0,0 +1,57 @@
+import os
+import time
+
+import image_gc
+from blob_store import BlobStore
+
+
+def _put(store, folder, name, data):
+    path = os.path.join(folder, name)
+    with open(path, "wb") as f:
+        f.write(data)
+    return store.put(path)
+
+
+def _age(path, seconds=7200):
+    past = time.time() - seconds
+    os.utime(path, (past, past))
+
+
+def test_check_and_collect(tmp_path):
+    root = str(tmp_path / "images")
+    store = BlobStore(root)
+    used = _put(store, tmp_path, "used.jpg", b"\xff\xd8used")
+    orphan = _put(store, tmp_path, "orphan.jpg", b"\xff\xd8orphan")
+    held = _put(store, tmp_path, "held.jpg", b"\xff\xd8held")
+    recent = _put(store, tmp_path, "recent.jpg", b"\xff\xd8recent")
+    store.write_meta(used, {"original_name": "used.jpg"})
+    store.write_meta(orphan, {"original_name": "orphan.jpg"})
+    for name in (used, orphan, held):
+        _age(store.path(name))
+    _age(store.meta_path(used))
+    _age(store.meta_path(orphan))
+    missing = "0" * 64 + ".jpg"
+
+    report = image_gc.check(root, [("设备甲", used), ("设备乙", missing)], keep=[held])
+
+    assert report.dangling == [("设备乙", missing, "文件不存在")]
+    assert sorted(path for path, _ in report.orphans) == \
+        sorted([store.path(orphan), store.meta_path(orphan)])
+    assert report.references == 2
+
+    image_gc.collect(root, report)
+    assert report.removed == 2
+    assert not os.path.exists(os.path.dirname(store.path(orphan)))
+    for name in (used, held, recent):
+        assert os.path.isfile(store.path(name))
+    assert os.path.isfile(store.meta_path(used))
+
+
+def test_empty_file_is_reported(tmp_path):
+    root = str(tmp_path / "images")
+    os.makedirs(root)
+    with open(os.path.join(root, "old.jpg"), "wb"):
+        pass
+    report = image_gc.check(root, [("设备", "old.jpg")])
+    assert report.dangling == [("设备", "old.jpg", "文件为空")]
+    assert report.orphans == []
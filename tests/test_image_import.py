@@ -0,0 +1,56 @@
+import os
+import threading
+
+from blob_store import BlobStore
+from image_import import ImageImportJob
+
+
+def _sources(folder, count):
+    paths = []
+    for i in range(count):
+        path = os.path.join(folder, f"照片{i}.jpg")
+        with open(path, "wb") as f:
+            f.write(b"\xff\xd8" + f"image {i}".encode())
+        paths.append(path)
+    return paths
+
+
+def test_import_all(tmp_path):
+    store = BlobStore(str(tmp_path / "images"))
+    paths = _sources(tmp_path, 20) + [str(tmp_path / "不存在.jpg")]
+    progress = []
+    job = ImageImportJob(store, paths, on_progress=lambda done, total, path: progress.append(done))
+    assert job.start().wait(10)
+
+    names = job.imported()
+    assert len(names) == 20
+    assert sorted(progress) == list(range(1, 22))
+    assert [result["source"] for result in job.failures()] == [paths[-1]]
+    assert sorted(store.held()) == sorted(names)
+    assert store.read_meta(names[0])["original_name"] == "照片0.jpg"
+
+
+def test_cancel_and_discard(tmp_path):
+    store = BlobStore(str(tmp_path / "images"))
+    paths = _sources(tmp_path, 50)
+    job = None
+    started = threading.Event()
+
+    def on_progress(done, total, path):
+        started.wait()
+        job.cancel()
+
+    job = ImageImportJob(store, paths, on_progress=on_progress, workers=2)
+    job.start()
+    started.set()
+    assert job.wait(10)
+
+    assert job.cancelled
+    assert len(job.imported()) < len(paths)
+    assert job.failures() == []
+    store.recount([])
+    for name in job.imported():
+        store.discard(name)
+    assert store.held() == []
+    remaining = [name for _, _, names in os.walk(store.root) for name in names]
+    assert remaining == []
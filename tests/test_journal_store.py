@@ -0,0 +1,107 @@
+import json
+import os
+
+from journal_store import JournalStore, apply_record
+
+
+def _catalogue():
+    return {"categories": {"锅炉系统": {"children": {
+        "给料系统": {"children": {"皮带": {"content": "皮带", "tags": ["输送设备"]}}},
+        "燃烧系统": {"children": {}},
+    }}}, "tags": {}, "suppliers": {}}
+
+
+def _edits():
+    return [
+        {"op": "set", "path": ["锅炉系统", "燃烧系统", "燃烧器"], "value": {"content": "新设备"}},
+        {"op": "set", "path": ["锅炉系统", "给料系统", "皮带"], "value": {"content": "已修改", "tags": []}},
+        {"op": "rename", "path": ["锅炉系统", "给料系统"], "new_name": "输煤系统"},
+        {"op": "delete", "path": ["锅炉系统", "燃烧系统", "燃烧器"]},
+        {"op": "set", "path": ["锅炉系统", "不存在", "设备"], "value": {}},
+    ]
+
+
+def _expected():
+    data = _catalogue()
+    for record in _edits():
+        apply_record(data, record)
+    return data
+
+
+def test_replay(tmp_path):
+    path = str(tmp_path / "system_data.json")
+    store = JournalStore(path)
+    store.write_snapshot(_catalogue())
+    store.append(_edits())
+    store.close()
+
+    loaded = JournalStore(path).load()
+    assert loaded == _expected()
+    # 重命名的节点移到末尾，与界面中字典的顺序一致
+    assert list(loaded["categories"]["锅炉系统"]["children"]) == ["燃烧系统", "输煤系统"]
+
+
+def test_corrupt_lines_are_skipped(tmp_path):
+    path = str(tmp_path / "system_data.json")
+    store = JournalStore(path)
+    store.write_snapshot(_catalogue())
+    edits = _edits()
+    store.append(edits[:2])
+    store.close()
+    with open(store.journal_path, "a", encoding="utf-8") as f:
+        f.write('{"op": "set", "path": ["锅炉系统"\n')
+        f.write(json.dumps(edits[2], ensure_ascii=False) + "\n")
+        # 程序中断时只写了一半的最后一行
+        f.write(json.dumps(edits[3], ensure_ascii=False)[:20])
+
+    expected = _catalogue()
+    for record in edits[:3]:
+        apply_record(expected, record)
+    assert JournalStore(path).load() == expected
+
+
+def test_replay_is_idempotent(tmp_path):
+    path = str(tmp_path / "system_data.json")
+    store = JournalStore(path)
+    store.write_snapshot(_catalogue())
+    store.append(_edits())
+    store.close()
+    # 快照已写入合并后的内容、日志尚未删除时程序中断
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(_expected(), f, ensure_ascii=False)
+    assert JournalStore(path).load() == _expected()
+
+
+def test_interrupted_compaction_is_replayed_first(tmp_path):
+    path = str(tmp_path / "system_data.json")
+    store = JournalStore(path)
+    store.write_snapshot(_catalogue())
+    edits = _edits()
+    store.append(edits[:2])
+    store.close()
+    os.replace(store.journal_path, store.compacting_path)
+    store = JournalStore(path)
+    store.append(edits[2:])
+    store.close()
+
+    assert JournalStore(path).load() == _expected()
+
+
+def test_compaction_racing_with_appends(tmp_path):
+    path = str(tmp_path / "system_data.json")
+    store = JournalStore(path, compact_threshold=4096)
+    expected = _catalogue()
+    store.write_snapshot(expected)
+    for i in range(2000):
+        record = {"op": "set", "path": ["锅炉系统", "燃烧系统", f"设备{i % 50}"],
+                  "value": {"content": f"第 {i} 次修改 " + "内容" * 20}}
+        apply_record(expected, record)
+        store.append([record])
+        if i % 400 == 0:
+            # 后台合并进行中时继续追加
+            store.compact_async()
+    store.close()
+
+    assert store.compactions > 0
+    assert not os.path.exists(store.compacting_path)
+    assert JournalStore(path).load() == expected
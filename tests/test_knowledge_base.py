@@ -0,0 +1,104 @@
+import threading
+
+from knowledge_base import KnowledgeBase
+from search_index import SearchIndex
+from price_index import PriceIndex
+
+
+def _open(folder, data=None):
+    kb = KnowledgeBase(str(folder))
+    kb.ensure_directories()
+    if not kb.load() or data is not None:
+        if data is not None:
+            kb.replace_data(data)
+        kb.save()
+    return kb
+
+
+def test_edits_survive_reload(tmp_path):
+    kb = _open(tmp_path)
+    assert kb.add_category(["锅炉系统"], "风烟系统") == ["锅炉系统", "风烟系统"]
+    path = kb.add_item(["锅炉系统", "风烟系统"], "引风机")
+    kb.save(["锅炉系统", "风烟系统"])
+    kb.get_data_by_path(path)["content"] = "引风机说明"
+    kb.save(path)
+
+    assert kb.rename_node(path, "一次风机")
+    kb.save_renamed(path, "一次风机")
+    assert kb.delete_node(["锅炉系统", "给料系统"])
+    kb.save_deleted(["锅炉系统", "给料系统"])
+    expected = kb.system_data["categories"]
+    kb.close()
+
+    reopened = _open(tmp_path)
+    try:
+        assert reopened.system_data["categories"] == expected
+        assert reopened.get_data_by_path(["锅炉系统", "风烟系统", "一次风机"])["content"] == "引风机说明"
+        assert reopened.node_index.id_for_path(["锅炉系统", "给料系统"]) is None
+    finally:
+        reopened.close()
+
+
+def test_search_and_price_query(tmp_path, catalogue):
+    kb = _open(tmp_path, catalogue)
+    try:
+        path = kb.add_item([next(iter(catalogue["categories"]))], "特制给煤机")
+        device = kb.get_data_by_path(path)
+        device["content"] = "型号 gm5000"
+        device["pricing"] = {"currency": "CNY", "suppliers": [
+            {"name": "最便宜的厂家", "price": 0.5, "lead_time": "3天", "contact": "李工"}]}
+        kb.save(path)
+
+        assert kb.search("特制给煤机")[0][0] == path
+        assert kb.search("gm50")[0][0] == path
+
+        total, results = kb.price_query(max_price=1, currency="CNY")
+        assert total == 1
+        assert results[0]["path"] == path
+        assert results[0]["supplier_name"] == "最便宜的厂家"
+        assert results[0]["contact"] == "李工"
+
+        kb.delete_node(path)
+        assert kb.search("特制给煤机") == []
+        assert kb.price_query(max_price=1, currency="CNY")[0] == 0
+    finally:
+        kb.close()
+
+
+def test_edits_during_background_build(tmp_path, catalogue):
+    kb = _open(tmp_path, catalogue)
+    try:
+        search_task = kb.prepare_search_index()
+        price_task = kb.prepare_price_index()
+
+        # 建立期间的新增、修改、重命名和删除
+        leaf_ids = kb.node_index.leaf_ids()
+        first = kb.node_index.path(leaf_ids[0])
+        added = kb.add_item(first[:-1], "建立期间新增")
+        kb.get_data_by_path(added)["pricing"] = {"suppliers": [{"name": "新厂家", "price": 1}]}
+        kb.save(added)
+        changed = kb.node_index.path(leaf_ids[1])
+        kb.get_data_by_path(changed)["content"] = "建立期间修改"
+        kb.save(changed)
+        renamed = kb.node_index.path(leaf_ids[2])
+        kb.rename_node(renamed, "建立期间改名")
+        kb.delete_node(kb.node_index.path(leaf_ids[3]))
+
+        workers = [threading.Thread(target=kb.search_index.build, args=(search_task,)),
+                   threading.Thread(target=kb.price_index.build, args=(price_task,))]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        kb.finish_search_index()
+        kb.finish_price_index()
+
+        expected_search = SearchIndex()
+        expected_search.rebuild(kb.node_index)
+        assert kb.search_index._doc_terms == expected_search._doc_terms
+        assert kb.search_index._postings == expected_search._postings
+        expected_price = PriceIndex()
+        expected_price.rebuild(kb.node_index)
+        assert kb.price_index._by_currency == expected_price._by_currency
+    finally:
+        kb.close()
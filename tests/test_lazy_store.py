@@ -0,0 +1,124 @@
+import json
+
+from journal_store import JournalStore
+from lazy_store import LazyLeaf, LazyStore, convert_json, skeleton_path_for, to_plain
+
+
+def _open(tmp_path, catalogue, cache_size=256):
+    store = LazyStore(str(tmp_path / "system_data.skeleton.json"), cache_size=cache_size)
+    store.write_snapshot(catalogue)
+    store.close()
+    store = LazyStore(str(tmp_path / "system_data.skeleton.json"), cache_size=cache_size)
+    return store, store.load()
+
+
+def _plain(categories):
+    return {name: to_plain(node) for name, node in categories.items()}
+
+
+def _leaves(categories):
+    for node in categories.values():
+        if isinstance(node, LazyLeaf):
+            yield node
+        else:
+            yield from _leaves(node["children"])
+
+
+def test_round_trip_reads_no_payloads(tmp_path, catalogue):
+    store, loaded = _open(tmp_path, catalogue)
+    try:
+        leaf = next(_leaves(loaded["categories"]))
+        assert not leaf.loaded
+        # 标签保存在骨架中
+        assert isinstance(leaf.get("tags"), list)
+        assert "children" not in leaf
+        assert store.payload_reads == 0
+
+        assert _plain(loaded["categories"]) == catalogue["categories"]
+        assert len(store._cache) == 0
+    finally:
+        store.close()
+
+
+def test_records_survive_reload(tmp_path, catalogue):
+    store, loaded = _open(tmp_path, catalogue)
+    leaf = next(_leaves(loaded["categories"]))
+    path = [next(iter(loaded["categories"]))]
+    leaf["content"] = "已修改"
+    record = {"op": "set", "path": path, "value": loaded["categories"][path[0]]}
+    store.append_encoded(store.encode_records([record]), 1)
+    expected = _plain(loaded["categories"])
+    store.close()
+
+    store = LazyStore(store.skeleton_path)
+    try:
+        assert _plain(store.load()["categories"]) == expected
+    finally:
+        store.close()
+
+
+def test_lru_eviction(tmp_path, catalogue):
+    store, loaded = _open(tmp_path, catalogue, cache_size=4)
+    try:
+        leaves = list(_leaves(loaded["categories"]))[:10]
+        for leaf in leaves:
+            leaf["content"].lower()
+        assert len(store._cache) == 4
+        assert [leaf.loaded for leaf in leaves] == [False] * 6 + [True] * 4
+
+        # 再次访问会移到最近使用的一端
+        leaves[6]["content"].lower()
+        leaves[0]["content"].lower()
+        assert leaves[6].loaded and not leaves[7].loaded
+    finally:
+        store.close()
+
+
+def test_pinned_leaf_is_kept(tmp_path, catalogue):
+    store, loaded = _open(tmp_path, catalogue, cache_size=2)
+    try:
+        leaves = list(_leaves(loaded["categories"]))[:10]
+        leaves[0]["content"] = "已修改"
+        leaves[1].pin()
+        for leaf in leaves[2:]:
+            leaf["content"].lower()
+        assert leaves[0].loaded and leaves[0]["content"] == "已修改"
+        assert leaves[1].loaded
+        assert len(store._cache) == 2
+    finally:
+        store.close()
+
+
+def test_in_place_edit_is_not_evicted(tmp_path, catalogue):
+    store, loaded = _open(tmp_path, catalogue, cache_size=2)
+    try:
+        leaves = list(_leaves(loaded["categories"]))[:10]
+        leaves[0]["images"].append("新图片.jpg")
+        leaves[0]["technical_params"]["型号"] = "已修改"
+        # 只读取、没有修改的设备照常被淘汰
+        leaves[1]["images"]
+        for leaf in leaves[2:]:
+            leaf["content"].lower()
+
+        assert leaves[0].loaded
+        assert leaves[0]["images"][-1] == "新图片.jpg"
+        assert leaves[0]["technical_params"]["型号"] == "已修改"
+        assert not leaves[1].loaded
+    finally:
+        store.close()
+
+
+def test_convert_json(tmp_path, catalogue):
+    json_path = str(tmp_path / "system_data.json")
+    journal = JournalStore(json_path)
+    journal.write_snapshot(catalogue)
+    journal.delete_node([next(iter(catalogue["categories"]))])
+    journal.close()
+    expected = JournalStore(json_path).load()
+
+    assert convert_json(json_path) == skeleton_path_for(json_path)
+    store = LazyStore(skeleton_path_for(json_path))
+    try:
+        assert json.loads(store.encode_snapshot(store.load())) == expected
+    finally:
+        store.close()
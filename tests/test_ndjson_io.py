@@ -0,0 +1,100 @@
+import json
+
+import pytest
+
+import ndjson_io
+from lazy_store import LazyStore
+
+
+def test_round_trip(tmp_path, catalogue):
+    catalogue["suppliers"] = {"锅炉设备厂": {"contact": "张工"}}
+    first = next(iter(catalogue["categories"].values()))
+    first["description"] = "分类的其他字段"
+    path = str(tmp_path / "export.ndjson")
+    progress = []
+    written = ndjson_io.export_ndjson(catalogue, path, progress=lambda *args: progress.append(args))
+
+    assert written == ndjson_io.count_nodes(catalogue["categories"])
+    assert progress[-1] == (written, written, written)
+    assert ndjson_io.import_ndjson(path, validate=True) == catalogue
+
+
+def test_lazy_export_does_not_fill_cache(tmp_path, catalogue):
+    store = LazyStore(str(tmp_path / "system_data.skeleton.json"), cache_size=16)
+    store.write_snapshot(catalogue)
+    loaded = store.load()
+    path = str(tmp_path / "export.ndjson")
+    try:
+        ndjson_io.export_ndjson(loaded, path)
+        assert len(store._cache) == 0
+    finally:
+        store.close()
+    assert ndjson_io.import_ndjson(path, validate=True)["categories"] == catalogue["categories"]
+
+
+def _write_lines(path, records):
+    with open(path, "w", encoding="utf-8") as f:
+        for record in records:
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+
+@pytest.mark.parametrize("record, message", [
+    ({"path": ["系统", "泵"], "type": "device", "value": {"tags": "不是列表"}}, "tags"),
+    ({"path": ["不存在", "泵"], "type": "device", "value": {}}, "上级分类"),
+    ({"path": ["系统", "泵"], "type": "unknown"}, "未知的记录类型"),
+])
+def test_validation_reports_line(tmp_path, record, message):
+    path = str(tmp_path / "bad.ndjson")
+    _write_lines(path, [{"format": ndjson_io.FORMAT, "version": 1, "nodes": 2},
+                        {"path": ["系统"], "type": "category"},
+                        record])
+    with pytest.raises(ndjson_io.SchemaError) as error:
+        ndjson_io.import_ndjson(path, validate=True)
+    assert error.value.line == 3
+    assert message in str(error.value)
+
+
+def test_truncated_file(tmp_path):
+    path = str(tmp_path / "short.ndjson")
+    _write_lines(path, [{"format": ndjson_io.FORMAT, "version": 1, "nodes": 5},
+                        {"path": ["系统"], "type": "category"}])
+    with pytest.raises(ndjson_io.SchemaError):
+        ndjson_io.import_ndjson(path, validate=True)
+    assert ndjson_io.import_ndjson(path)["categories"] == {"系统": {"children": {}}}
+
+
+def test_legacy_json(tmp_path, catalogue):
+    path = tmp_path / "old.json"
+    path.write_text(json.dumps(catalogue, ensure_ascii=False), encoding="utf-8")
+    assert ndjson_io.import_file(str(path), validate=True) == catalogue
+
+
+def test_export_job_uses_snapshot(tmp_path, catalogue):
+    path = str(tmp_path / "export.ndjson")
+    expected = json.loads(json.dumps(catalogue))
+    finished = []
+    job = ndjson_io.ExportJob(catalogue, path, on_finished=finished.append)
+
+    # 创建任务之后的修改（包括设备中嵌套的列表和字典）不影响导出的内容
+    first, second = list(catalogue["categories"])[:2]
+    del catalogue["categories"][first]
+    catalogue["suppliers"]["新供应商"] = {}
+    stack = [catalogue["categories"][second]]
+    while "children" in stack[-1]:
+        stack.append(next(iter(stack[-1]["children"].values())))
+    device = stack[-1]
+    device.setdefault("tags", []).append("导出后添加")
+    device.setdefault("technical_params", {})["导出后"] = "修改"
+
+    assert job.start().wait(30)
+    assert finished == [job] and job.error is None
+    assert job.result == ndjson_io.count_nodes(expected["categories"])
+    assert ndjson_io.import_ndjson(path) == expected
+
+
+def test_cancelled_import(tmp_path, catalogue):
+    path = str(tmp_path / "export.ndjson")
+    ndjson_io.export_ndjson(catalogue, path)
+    job = ndjson_io.ImportJob(path, on_progress=lambda *args: job.cancel())
+    assert job.start().wait(30)
+    assert job.cancelled and job.result is None and job.error is None
@@ -0,0 +1,139 @@
+from node_index import NodeIndex
+
+
+def _tree():
+    return {
+        "锅炉系统": {"children": {
+            "给料系统": {"children": {"皮带": {"content": "皮带"}, "给料机": {"content": "给料机"}}},
+            "燃烧系统": {"children": {"燃烧器": {"content": "燃烧器"}}},
+        }},
+        "汽水系统": {"children": {}},
+    }
+
+
+def _index(categories):
+    index = NodeIndex()
+    index.rebuild(categories)
+    return index
+
+
+def test_paths_and_ids(node_index):
+    for node_id in node_index.all_ids():
+        path = node_index.path(node_id)
+        assert node_index.id_for_path(path) == node_id
+        assert node_index.name(node_id) == path[-1]
+    assert node_index.id_for_path(["不存在"]) is None
+    assert node_index.path(0) is None and node_index.node(0) is None
+
+
+def test_categories_and_children():
+    categories = _tree()
+    index = _index(categories)
+    feed = index.id_for_path(["锅炉系统", "给料系统"])
+    belt = index.id_for_path(["锅炉系统", "给料系统", "皮带"])
+    assert index.is_category(feed) and not index.is_category(belt)
+    assert index.is_category(index.id_for_path(["汽水系统"]))
+    assert index.parent_id(belt) == feed
+    assert index.node(belt) is categories["锅炉系统"]["children"]["给料系统"]["children"]["皮带"]
+    assert [index.name(i) for i in index.ordered_child_ids(feed)] == ["皮带", "给料机"]
+    assert [index.name(i) for i in index.ordered_child_ids(None)] == ["锅炉系统", "汽水系统"]
+    assert sorted(index.name(i) for i in index.leaf_ids()) == ["燃烧器", "皮带", "给料机"]
+
+
+def test_rename_keeps_ids():
+    categories = _tree()
+    index = _index(categories)
+    path = ["锅炉系统", "给料系统"]
+    subtree = {node_id: index.path(node_id) for node_id in index.walk_ids(index.id_for_path(path))}
+
+    boiler = categories["锅炉系统"]["children"]
+    boiler["输煤系统"] = boiler.pop("给料系统")
+    node_id = index.rename(path, "输煤系统")
+
+    assert node_id == index.id_for_path(["锅炉系统", "输煤系统"])
+    assert index.id_for_path(path) is None
+    for descendant, old_path in subtree.items():
+        new_path = ["锅炉系统", "输煤系统"] + old_path[2:]
+        assert index.path(descendant) == new_path
+        assert index.id_for_path(new_path) == descendant
+        assert index.id_for_path(old_path) is None
+    assert index.node(index.id_for_path(["锅炉系统", "输煤系统", "皮带"]))["content"] == "皮带"
+    # 字典中改名的节点移到了末尾
+    assert [index.name(i) for i in index.ordered_child_ids(index.id_for_path(["锅炉系统"]))] == \
+        ["燃烧系统", "输煤系统"]
+
+
+def test_rename_over_sibling_drops_its_subtree():
+    categories = _tree()
+    index = _index(categories)
+    replaced = index.walk_ids(index.id_for_path(["锅炉系统", "燃烧系统"]))
+    boiler = categories["锅炉系统"]["children"]
+    boiler["燃烧系统"] = boiler.pop("给料系统")
+    index.rename(["锅炉系统", "给料系统"], "燃烧系统")
+
+    for node_id in replaced:
+        assert index.path(node_id) is None
+    assert index.id_for_path(["锅炉系统", "燃烧系统", "燃烧器"]) is None
+    assert index.id_for_path(["锅炉系统", "燃烧系统", "皮带"]) is not None
+
+
+def test_remove_invalidates_subtree():
+    categories = _tree()
+    index = _index(categories)
+    boiler_id = index.id_for_path(["锅炉系统"])
+    removed = index.walk_ids(index.id_for_path(["锅炉系统", "给料系统"]))
+    assert len(removed) == 3
+
+    del categories["锅炉系统"]["children"]["给料系统"]
+    index.remove(["锅炉系统", "给料系统"])
+
+    for node_id in removed:
+        assert index.path(node_id) is None
+        assert index.node(node_id) is None
+        assert index.name(node_id) is None
+        assert node_id not in index.all_ids()
+    assert index.child_ids(boiler_id) == {index.id_for_path(["锅炉系统", "燃烧系统"])}
+    assert len(index) == 4
+
+
+def test_add_registers_subtree():
+    categories = _tree()
+    index = _index(categories)
+    old_id = index.id_for_path(["锅炉系统", "燃烧系统", "燃烧器"])
+    old_ids = index.walk_ids(index.id_for_path(["锅炉系统", "燃烧系统"]))
+    categories["锅炉系统"]["children"]["燃烧系统"] = {"children": {"点火器": {}}}
+    new_id = index.add(["锅炉系统", "燃烧系统"])
+
+    assert index.path(old_id) is None
+    assert index.id_for_path(["锅炉系统", "燃烧系统"]) == new_id
+    assert index.id_for_path(["锅炉系统", "燃烧系统", "点火器"]) is not None
+    # 新 id 不会与已删除的 id 重复
+    assert set(index.walk_ids(new_id)).isdisjoint(old_ids)
+    # 数据中不存在的节点不登记
+    assert index.add(["锅炉系统", "不存在"]) is None
+    assert index.add(["锅炉系统", "给料系统", "皮带", "子节点"]) is None
+
+
+def test_snapshot():
+    categories = _tree()
+    index = _index(categories)
+    ids = index.leaf_ids()
+    snapshot = index.snapshot(ids)
+    assert [(node_id, name) for node_id, name, _ in snapshot] == [(i, index.name(i)) for i in ids]
+    for node_id, _, read in snapshot:
+        assert read() == index.node(node_id)
+
+
+def test_snapshot_is_isolated_from_later_edits():
+    categories = _tree()
+    index = _index(categories)
+    leaf_id = index.id_for_path(["锅炉系统", "给料系统", "皮带"])
+    category_id = index.id_for_path(["锅炉系统", "给料系统"])
+    index.node(leaf_id)["tags"] = ["输送"]
+    snapshot = dict((node_id, read) for node_id, _, read in index.snapshot([leaf_id, category_id]))
+
+    index.node(leaf_id)["tags"].append("改后")
+    index.node(leaf_id)["content"] = "改后"
+    assert snapshot[leaf_id]() == {"content": "皮带", "tags": ["输送"]}
+    # 分类不复制子树
+    assert snapshot[category_id]() == {"children": {}}
@@ -0,0 +1,53 @@
+import random
+
+import pytest
+
+from perf_stats import Histogram, Recorder
+
+
+def test_percentile_error():
+    rng = random.Random(0)
+    values = [int(rng.lognormvariate(12, 1.5)) for _ in range(20000)]
+    histogram = Histogram()
+    for value in values:
+        histogram.add(value)
+    values.sort()
+    for q in (50, 90, 95, 99):
+        exact = values[max(0, -(-len(values) * q // 100) - 1)]
+        assert histogram.percentile(q) == pytest.approx(exact, rel=0.1)
+    assert histogram.count == len(values)
+    assert histogram.max == values[-1]
+
+
+def test_small_values_are_exact():
+    histogram = Histogram()
+    for value in range(1, 10):
+        histogram.add(value)
+    assert histogram.percentile(50) == 5
+
+
+def test_timed_and_measure(tmp_path):
+    recorder = Recorder()
+
+    @recorder.timed("work")
+    def work(fail=False):
+        if fail:
+            raise ValueError()
+        return 42
+
+    assert work() == 42
+    with pytest.raises(ValueError):
+        work(fail=True)
+    with recorder.measure("block"):
+        pass
+
+    stats = recorder.snapshot()
+    assert stats["work"]["count"] == 2
+    assert stats["block"]["count"] == 1
+
+    recorder.enabled = False
+    work()
+    assert recorder.snapshot()["work"]["count"] == 2
+
+    profile = recorder.export_json(str(tmp_path / "profile.json"), extra={"nodes": 10})
+    assert profile["nodes"] == 10 and "work" in profile["operations"]
@@ -0,0 +1,99 @@
+import random
+
+import pytest
+
+from price_index import PriceIndex
+
+
+def _all_entries(node_index):
+    entries = []
+    for node_id in node_index.leaf_ids():
+        currency, items = PriceIndex.entries_for(node_id, node_index.node(node_id).get("pricing"))
+        entries.extend(entry + (currency,) for entry in items)
+    return entries
+
+
+def test_incremental_updates_match_rebuild(node_index):
+    index = PriceIndex()
+    index.rebuild(node_index)
+    rng = random.Random(0)
+    leaf_ids = node_index.leaf_ids()
+    for _ in range(300):
+        node_id = rng.choice(leaf_ids)
+        pricing = {"currency": rng.choice(["CNY", "USD"]),
+                   "suppliers": [{"name": f"供应商{rng.randint(1, 20)}", "price": rng.randint(1, 5000)}
+                                 for _ in range(rng.randint(0, 3))]}
+        node_index.node(node_id)["pricing"] = pricing
+        index.set_pricing(node_id, pricing)
+
+    removed = rng.sample(leaf_ids, 100)
+    for node_id in removed:
+        path = node_index.path(node_id)
+        del node_index.node(node_index.parent_id(node_id))["children"][path[-1]]
+        node_index.remove(path)
+    index.remove(removed)
+
+    expected = PriceIndex()
+    expected.rebuild(node_index)
+    assert index._by_currency == expected._by_currency
+    assert index._by_node == expected._by_node
+
+
+def test_invalid_prices_are_skipped():
+    currency, entries = PriceIndex.entries_for(1, {"suppliers": [
+        {"name": "甲", "price": "12.5"}, {"name": "乙", "price": ""},
+        {"name": "丙", "price": "面议"}, "无效"]})
+    assert currency == "CNY"
+    assert entries == [(12.5, "甲", 1, 0)]
+
+
+@pytest.mark.parametrize("min_price, max_price, currency, descending", [
+    (None, None, None, False),
+    (1000, 50000, None, True),
+    (None, 20000, "USD", False),
+    (5000, None, "CNY", True),
+])
+def test_query_matches_full_scan(node_index, min_price, max_price, currency, descending):
+    index = PriceIndex()
+    index.rebuild(node_index)
+    expected = sorted((entry for entry in _all_entries(node_index)
+                       if (min_price is None or entry[0] >= min_price)
+                       and (max_price is None or entry[0] <= max_price)
+                       and (currency is None or entry[4] == currency)),
+                      key=lambda entry: entry[:4], reverse=descending)
+    # 不同币种不混排：按币种分组，组内按价格排序
+    expected.sort(key=lambda entry: entry[4])
+    assert index.count(min_price, max_price, currency) == len(expected)
+
+    pages = []
+    offset = 0
+    while True:
+        total, page = index.query(min_price, max_price, currency, offset=offset, limit=37,
+                                  descending=descending)
+        assert total == len(expected)
+        if not page:
+            break
+        pages.extend(page)
+        offset += len(page)
+    assert [entry[:4] for entry in pages] == [entry[:4] for entry in expected]
+    assert [entry[4] for entry in pages] == [entry[4] for entry in expected]
+
+
+def test_build_uses_pricing_as_prepared_and_clears_building(node_index):
+    index = PriceIndex()
+    node_id = node_index.leaf_ids()[0]
+    node_index.node(node_id)["pricing"] = {"currency": "XTS", "suppliers": [{"name": "甲", "price": 10}]}
+    task = index.prepare(node_index)
+    node_index.node(node_id)["pricing"]["suppliers"].append({"name": "乙", "price": 20})
+    assert index.build(task) is True
+    assert index.query(currency="XTS") == (1, [(10.0, "甲", node_id, 0, "XTS")])
+
+    generation, nodes = index.prepare(node_index)
+
+    def broken():
+        raise OSError("数据文件不可读")
+
+    nodes[3] = (nodes[3][0], nodes[3][1], broken)
+    with pytest.raises(OSError):
+        index.build((generation, nodes))
+    assert not index.building and not index.built
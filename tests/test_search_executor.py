@@ -0,0 +1,71 @@
+import threading
+
+from search_index import SearchIndex
+from search_executor import SearchExecutor
+
+
+def test_only_latest_query_completes(node_index):
+    index = SearchIndex()
+    index.rebuild(node_index)
+    finished = {}
+    done = threading.Event()
+
+    def on_finished(query_id, stats):
+        finished[query_id] = stats
+        if query_id == latest:
+            done.set()
+
+    executor = SearchExecutor(index, on_finished=on_finished, page_size=10)
+    try:
+        # 持有索引的锁，使查询排队，之后提交的查询使之前的作废
+        with index.lock:
+            ids = [executor.submit(query) for query in ("给", "给料", "皮带", "系统")]
+            latest = ids[-1]
+        assert done.wait(10)
+        completed = [query_id for query_id, stats in finished.items() if not stats["cancelled"]]
+        assert completed == [latest]
+        assert finished[latest]["results"] > 0
+        assert executor.completed == 1
+    finally:
+        executor.close()
+
+
+def test_pages_are_ordered(node_index):
+    index = SearchIndex()
+    index.rebuild(node_index)
+    pages = []
+    done = threading.Event()
+    executor = SearchExecutor(index, on_page=lambda query_id, page: pages.append(page),
+                              on_finished=lambda query_id, stats: done.set(), page_size=7)
+    try:
+        executor.submit("系统")
+        assert done.wait(10)
+    finally:
+        executor.close()
+    scores = [score for page in pages for _, score in page]
+    assert len(pages[0]) == 7
+    assert scores == sorted(scores, reverse=True)
+    assert len(scores) == len(index._score("系统"))
+
+
+def test_build_runs_before_queued_query(node_index):
+    index = SearchIndex()
+    events = []
+    done = threading.Event()
+
+    def on_finished(query_id, stats):
+        events.append(("query", stats["results"]))
+        done.set()
+
+    executor = SearchExecutor(index, on_finished=on_finished,
+                              on_built=lambda stats: events.append(("built", stats)))
+    try:
+        executor.build_index(index.prepare(node_index))
+        executor.submit("系统")
+        assert done.wait(30)
+    finally:
+        executor.close()
+    assert events[0][0] == "built"
+    assert events[0][1]["built"] is True
+    assert events[0][1]["nodes"] == len(index) > 0
+    assert events[1][0] == "query" and events[1][1] > 0
@@ -0,0 +1,114 @@
+import random
+import threading
+
+import pytest
+
+from search_index import SearchIndex
+
+
+def _state(index):
+    return index._doc_terms, index._postings, index._doc_len, index._total_len, index._ascii_terms
+
+
+def test_incremental_updates_match_rebuild(node_index):
+    index = SearchIndex()
+    index.rebuild(node_index)
+    rng = random.Random(0)
+    leaf_ids = node_index.leaf_ids()
+    for number in range(300):
+        node_id = rng.choice(leaf_ids)
+        node = node_index.node(node_id)
+        node["content"] = f"检修记录 model{number} B{rng.randint(100, 999)}"
+        index.update(node_id, node_index.name(node_id), node)
+
+    removed = rng.sample(leaf_ids, 100)
+    for node_id in removed:
+        path = node_index.path(node_id)
+        del node_index.node(node_index.parent_id(node_id))["children"][path[-1]]
+        node_index.remove(path)
+    index.remove(removed)
+
+    expected = SearchIndex()
+    expected.rebuild(node_index)
+    assert _state(index) == _state(expected)
+
+
+def test_name_hit_ranks_first(node_index):
+    index = SearchIndex()
+    node_id = node_index.leaf_ids()[0]
+    node_index.node(node_id)["content"] = "普通内容"
+    path = node_index.path(node_id)
+    children = node_index.node(node_index.parent_id(node_id))["children"]
+    children["磨煤机唯一设备"] = children.pop(path[-1])
+    node_index.rename(path, "磨煤机唯一设备")
+    other = node_index.leaf_ids()[1]
+    node_index.node(other)["content"] = "磨煤机唯一设备的备件说明"
+    index.rebuild(node_index)
+
+    results = index.search("磨煤机唯一设备")
+    assert [node_id for node_id, _ in results[:2]] == [node_id, other]
+
+
+def test_prefix_match(node_index):
+    index = SearchIndex()
+    node_id = node_index.leaf_ids()[0]
+    node_index.node(node_id)["content"] = "型号 zx9800"
+    index.rebuild(node_index)
+    assert node_id in {result[0] for result in index.search("zx98")}
+
+
+def test_background_build_matches_rebuild(node_index):
+    index = SearchIndex()
+    task = index.prepare(node_index)
+    assert index.building and not index.built
+
+    results = []
+    worker = threading.Thread(target=lambda: results.append(index.build(task)))
+    worker.start()
+    worker.join()
+
+    assert results == [True]
+    assert index.built and not index.building
+    expected = SearchIndex()
+    expected.rebuild(node_index)
+    assert _state(index) == _state(expected)
+
+
+def test_clear_discards_running_build(node_index):
+    index = SearchIndex()
+    task = index.prepare(node_index)
+    index.clear()
+    assert index.build(task) is False
+    assert not index.built and len(index) == 0
+
+
+def test_cancelled_build(node_index):
+    index = SearchIndex()
+    task = index.prepare(node_index)
+    assert index.build(task, cancelled=lambda: True) is False
+    assert not index.built and not index.building
+
+
+def test_build_uses_nodes_as_prepared(node_index):
+    index = SearchIndex()
+    node_id = node_index.leaf_ids()[0]
+    node_index.node(node_id)["tags"] = ["原标签"]
+    task = index.prepare(node_index)
+    node_index.node(node_id)["tags"].append("zq7731")
+    assert index.build(task) is True
+    assert index.search("zq7731") == []
+    assert node_id in {result[0] for result in index.search("原标签")}
+
+
+def test_failed_build_clears_building(node_index):
+    index = SearchIndex()
+    generation, nodes = index.prepare(node_index)
+
+    def broken():
+        raise OSError("数据文件不可读")
+
+    nodes[5] = (nodes[5][0], nodes[5][1], broken)
+    with pytest.raises(OSError):
+        index.build((generation, nodes))
+    assert not index.building and not index.built
+    assert index.build(index.prepare(node_index)) is True
@@ -0,0 +1,77 @@
+from journal_store import JournalStore, apply_record
+from sqlite_store import SQLiteStore, migrate_json
+
+
+def _order(categories):
+    """分类树中各级节点名称的顺序"""
+    return [(name, _order(node["children"]) if "children" in node else None)
+            for name, node in categories.items()]
+
+
+def _assert_same(loaded, expected):
+    assert loaded == expected
+    assert _order(loaded["categories"]) == _order(expected["categories"])
+
+
+def test_migrate_round_trip(tmp_path, catalogue):
+    json_path = str(tmp_path / "system_data.json")
+    journal = JournalStore(json_path)
+    journal.write_snapshot(catalogue)
+    first = next(iter(catalogue["categories"]))
+    journal.rename_node([first], "改名的系统")
+    journal.close()
+    expected = JournalStore(json_path).load()
+
+    db_path = migrate_json(json_path)
+    store = SQLiteStore(db_path)
+    try:
+        _assert_same(store.load(), expected)
+    finally:
+        store.close()
+
+
+def test_records_match_dict_semantics(tmp_path):
+    data = {"categories": {"锅炉系统": {"children": {
+        "燃烧系统": {"children": {}},
+        "汽水系统": {"children": {"汽包": {"content": "汽包", "tags": ["承压部件"]}}},
+        "给料系统": {"children": {"皮带": {"content": "皮带", "images": ["a.jpg"],
+                                          "pricing": {"base_price": 1, "suppliers": [{"name": "甲", "price": 2}]},
+                                          "parts": [{"name": "托辊", "principle_images": ["b.jpg"]}]}}},
+    }}}, "tags": {}, "suppliers": {"甲": {}}}
+    records = [
+        # 改名的节点移到末尾
+        {"op": "rename", "path": ["锅炉系统", "给料系统"], "new_name": "X"},
+        # 改名覆盖同名的兄弟节点时占据其位置
+        {"op": "rename", "path": ["锅炉系统", "X"], "new_name": "燃烧系统"},
+        # 整体替换的节点保持原位置，新增的节点在末尾
+        {"op": "set", "path": ["锅炉系统", "汽水系统", "汽包"], "value": {"content": "已修改"}},
+        {"op": "set", "path": ["锅炉系统", "烟风系统"], "value": {"children": {}}},
+        {"op": "set", "path": ["锅炉系统", "烟风系统", "引风机"], "value": {"content": "引风机"}},
+        {"op": "delete", "path": ["锅炉系统", "汽水系统", "汽包"]},
+        {"op": "delete", "path": ["不存在"]},
+    ]
+    store = SQLiteStore(str(tmp_path / "system_data.db"))
+    try:
+        store.write_snapshot(data)
+        _assert_same(store.load(), data)
+        for record in records:
+            store.append_encoded(store.encode_records([record]), 1)
+            apply_record(data, record)
+            _assert_same(store.load(), data)
+    finally:
+        store.close()
+
+
+def test_reopen(tmp_path, catalogue):
+    path = str(tmp_path / "system_data.db")
+    store = SQLiteStore(path)
+    assert not store.exists()
+    store.write_snapshot(catalogue)
+    store.close()
+
+    store = SQLiteStore(path)
+    try:
+        assert store.exists()
+        _assert_same(store.load(), catalogue)
+    finally:
+        store.close()
@@ -0,0 +1,44 @@
+import random
+
+from tag_index import TagIndex
+
+
+def test_incremental_updates_match_rebuild(catalogue, node_index):
+    index = TagIndex()
+    index.rebuild(node_index)
+    rng = random.Random(0)
+    leaf_ids = node_index.leaf_ids()
+    for _ in range(500):
+        node_id = rng.choice(leaf_ids)
+        tags = [f"标签{rng.randrange(50)}" for _ in range(3)]
+        node_index.node(node_id)["tags"] = tags
+        index.set_tags(node_id, tags)
+
+    # 删除一个分类及其下的设备
+    path = node_index.path(next(i for i in node_index.all_ids() if node_index.is_category(i)))
+    removed = node_index.walk_ids(node_index.id_for_path(path))
+    container = catalogue["categories"]
+    for name in path[:-1]:
+        container = container[name]["children"]
+    del container[path[-1]]
+    index.remove(removed)
+    node_index.remove(path)
+
+    assert index.check(node_index) == []
+    expected = TagIndex()
+    expected.rebuild(node_index)
+    assert {tag: index.ids_for(tag) for tag in index.tags()} == \
+        {tag: expected.ids_for(tag) for tag in expected.tags()}
+
+
+def test_rename_keeps_ids(node_index):
+    index = TagIndex()
+    index.rebuild(node_index)
+    node_id = node_index.leaf_ids()[0]
+    tags = index.tags_of(node_id)
+    path = node_index.path(node_id)
+    children = node_index.node(node_index.parent_id(node_id))["children"]
+    children["改名后的设备"] = children.pop(path[-1])
+    node_index.rename(path, "改名后的设备")
+    assert index.tags_of(node_id) == tags
+    assert index.check(node_index) == []